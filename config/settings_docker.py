@@ -132,6 +132,12 @@ CHANNEL_LAYERS = {
     },
 }
 
+# 集計ジョブ（aggregation_worker サービスの run_workers が処理）
+AGGREGATION_JOBS_EAGER = os.environ.get('AGGREGATION_JOBS_EAGER', 'False').lower() == 'true'
+
+# ストリーム集計（stream_aggregate サービス）。有効にする場合は全サービス共通の .env で指定する
+STREAM_AGGREGATION_ENABLED = os.environ.get('STREAM_AGGREGATION_ENABLED', 'False').lower() == 'true'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
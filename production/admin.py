@@ -3,7 +3,8 @@ from django import forms
 from .models import (
     Line, UserLineAccess, Machine, Category, Tag, Part, Plan, Result,
     PartChangeDowntime, WorkCalendar, WorkingDay, DashboardCardSetting, UserPreference,
-    PlannedHourlyProduction, Feedback, WeeklyResultAggregation
+    PlannedHourlyProduction, Feedback, WeeklyResultAggregation, HourlyResultAggregation,
+    PeriodResultAggregation, AggregationJob, StreamWatermark, GraphSnapshot
 )
 
 
@@ -302,3 +303,123 @@ class WeeklyResultAggregationAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         """クエリの最適化"""
         return super().get_queryset(request).select_related()
+
+
+@admin.register(HourlyResultAggregation)
+class HourlyResultAggregationAdmin(admin.ModelAdmin):
+    """時間別実績集計の管理者画面（読み取り専用）"""
+    list_display = [
+        'date', 'hour', 'line', 'machine', 'part', 'judgment',
+        'total_quantity', 'result_count', 'last_updated'
+    ]
+    list_filter = ['date', 'line', 'judgment']
+    search_fields = ['line', 'part']
+    date_hierarchy = 'date'
+    ordering = ['-date', 'line', 'hour', 'part']
+    list_per_page = 100
+
+    readonly_fields = [
+        'date', 'line', 'hour', 'machine', 'part', 'judgment',
+        'total_quantity', 'result_count', 'last_updated', 'created_at'
+    ]
+
+    def has_add_permission(self, request):
+        """新規追加を無効化（自動生成データのため）"""
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        """削除を無効化（自動管理データのため）"""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """変更を無効化（自動管理データのため）"""
+        return False
+
+
+@admin.register(PeriodResultAggregation)
+class PeriodResultAggregationAdmin(admin.ModelAdmin):
+    """期間別（ISO週・月）実績集計の管理者画面（読み取り専用）"""
+    list_display = [
+        'period', 'date', 'line', 'part', 'judgment',
+        'total_quantity', 'result_count', 'last_updated'
+    ]
+    list_filter = ['period', 'line', 'judgment']
+    search_fields = ['line', 'part']
+    date_hierarchy = 'date'
+    ordering = ['-date', 'period', 'line', 'part']
+    list_per_page = 100
+
+    readonly_fields = [
+        'period', 'date', 'line', 'part', 'judgment',
+        'total_quantity', 'result_count', 'last_updated'
+    ]
+
+    def has_add_permission(self, request):
+        """新規追加を無効化（自動生成データのため）"""
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        """削除を無効化（自動管理データのため）"""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """変更を無効化（自動管理データのため）"""
+        return False
+
+
+@admin.register(AggregationJob)
+class AggregationJobAdmin(admin.ModelAdmin):
+    """集計ジョブの管理者画面（状態確認と失敗ジョブの再実行）"""
+    list_display = [
+        'id', 'kind', 'line', 'date', 'priority', 'status',
+        'attempts', 'available_at', 'locked_by', 'created_at', 'finished_at'
+    ]
+    list_filter = ['status', 'kind', 'line']
+    date_hierarchy = 'date'
+    ordering = ['status', 'priority', 'available_at']
+    list_per_page = 100
+    actions = ['retry_jobs']
+
+    readonly_fields = [
+        'kind', 'line', 'date', 'status', 'attempts', 'locked_by', 'locked_at',
+        'last_error', 'created_at', 'started_at', 'finished_at'
+    ]
+
+    def has_add_permission(self, request):
+        """新規追加を無効化（シグナル・コマンドから登録するため）"""
+        return False
+
+    @admin.action(description='選択したジョブを再実行')
+    def retry_jobs(self, request, queryset):
+        """失敗・完了したジョブを再登録"""
+        from .jobs import enqueue
+
+        count = 0
+        for job in queryset.exclude(status=AggregationJob.STATUS_RUNNING):
+            enqueue(job.kind, job.line_id, job.date, priority=job.priority)
+            count += 1
+        self.message_user(request, f'{count}件のジョブを再登録しました。')
+
+
+@admin.register(StreamWatermark)
+class StreamWatermarkAdmin(admin.ModelAdmin):
+    """ストリーム集計位置の管理者画面（位置の変更は stream_aggregate --reset で行う）"""
+    list_display = ['name', 'last_created_at', 'last_id', 'processed_rows', 'lag_seconds', 'updated_at']
+    readonly_fields = ['name', 'last_created_at', 'last_id', 'processed_rows', 'lag_seconds', 'updated_at']
+
+    def has_add_permission(self, request):
+        """新規追加を無効化（stream_aggregate コマンドから登録するため）"""
+        return False
+
+
+@admin.register(GraphSnapshot)
+class GraphSnapshotAdmin(admin.ModelAdmin):
+    """グラフスナップショットの管理者画面（削除すると次回表示時に再作成される）"""
+    list_display = ['line', 'period', 'period_key', 'data_version', 'built_at']
+    list_filter = ['period', 'line']
+    ordering = ['line', 'period', '-period_key']
+    readonly_fields = ['line', 'period', 'period_key', 'data_version', 'payload', 'built_at']
+
+    def has_add_permission(self, request):
+        """新規追加を無効化（グラフ表示時・warm_graph_snapshots コマンドで作成するため）"""
+        return False
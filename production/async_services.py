@@ -0,0 +1,165 @@
+"""
+WebSocketコンシューマー向けの非同期サービス
+
+database_sync_to_async（thread_sensitive）は全コンシューマーのクエリを1本のスレッドで
+順番に実行するため、遅いクエリが他の接続を待たせてしまう。
+ここでは上限付きのスレッドプール（settings.CONSUMER_DB_POOL_SIZE、デフォルト8）で
+クエリを実行し、互いに独立したクエリ（ダッシュボード・週別データ・指標など）を並行に取得する。
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'CONSUMER_DB_POOL_SIZE', 8),
+                    thread_name_prefix='consumer-db'
+                )
+    return _executor
+
+
+def _call_with_connection_cleanup(func, *args, **kwargs):
+    """プールスレッドで関数を実行（前後で期限切れ・異常なDB接続を破棄）"""
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_db_pool(func, *args, **kwargs):
+    """同期関数をDBスレッドプールで実行"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(),
+        functools.partial(_call_with_connection_cleanup, func, *args, **kwargs)
+    )
+
+
+def get_line_name(line_id) -> str:
+    from .models import Line
+    return Line.objects.values_list('name', flat=True).get(id=line_id)
+
+
+def _current_week(target_date: date) -> tuple:
+    week_start = target_date - timedelta(days=target_date.weekday())
+    return week_start, week_start + timedelta(days=6)
+
+
+class AsyncWeeklyAnalysisService:
+    """WeeklyAnalysisService の非同期版"""
+
+    def __init__(self):
+        from .services import WeeklyAnalysisService
+        self.service = WeeklyAnalysisService()
+        self.logger = logger
+
+    async def get_weekly_data(self, line_name: str, start_date: date, end_date: date) -> list:
+        return await run_in_db_pool(self.service.get_weekly_data, line_name, start_date, end_date)
+
+    async def get_part_analysis(self, line_name: str, part_name: str, start_date: date, end_date: date) -> list:
+        return await run_in_db_pool(self.service.get_part_analysis, line_name, part_name, start_date, end_date)
+
+    async def get_performance_metrics(self, line_name: str, start_date: date, end_date: date) -> dict:
+        return await run_in_db_pool(self.service.get_performance_metrics, line_name, start_date, end_date)
+
+    async def get_weekly_analysis(self, line_id, start_date: date, end_date: date) -> dict:
+        """
+        週別データとパフォーマンス指標を並行に取得
+
+        Returns:
+            dict: {'line_name', 'weekly_data', 'performance_metrics'}
+        """
+        line_name = await run_in_db_pool(get_line_name, line_id)
+        weekly_data, performance_metrics = await asyncio.gather(
+            self.get_weekly_data(line_name, start_date, end_date),
+            self.get_performance_metrics(line_name, start_date, end_date),
+        )
+        return {
+            'line_name': line_name,
+            'weekly_data': weekly_data,
+            'performance_metrics': performance_metrics,
+        }
+
+
+class AsyncDashboardService:
+    """ダッシュボードデータ取得の非同期版"""
+
+    def __init__(self):
+        self.weekly_service = AsyncWeeklyAnalysisService()
+        self.logger = logger
+
+    async def get_dashboard_data(self, line_id, date_str: str) -> dict:
+        """ダッシュボードデータを取得（キャッシュ経由）"""
+        from .utils import get_cached_dashboard_data
+        return await run_in_db_pool(get_cached_dashboard_data, line_id, date_str)
+
+    async def get_dashboard_with_weekly(self, line_id, date_str: str) -> dict:
+        """
+        ダッシュボードデータと該当週の集計データを並行に取得
+
+        Returns:
+            dict: ダッシュボードデータ（aggregated_weekly_data / performance_metrics 付き）
+        """
+        target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        week_start, week_end = _current_week(target_date)
+
+        dashboard_data, weekly = await asyncio.gather(
+            self.get_dashboard_data(line_id, date_str),
+            self.weekly_service.get_weekly_analysis(line_id, week_start, week_end),
+        )
+
+        dashboard_data['aggregated_weekly_data'] = weekly['weekly_data']
+        dashboard_data['performance_metrics'] = weekly['performance_metrics']
+        dashboard_data['data_source'] = 'aggregated'  # データソースを明示
+        return dashboard_data
+
+
+async def get_aggregation_status() -> dict:
+    """集計処理の状況を取得（互いに独立した集計クエリを並行実行）"""
+    from django.db.models import Count
+    from .models import WeeklyResultAggregation, Result
+
+    def latest_aggregation_date():
+        return WeeklyResultAggregation.objects.order_by('-date').values_list('date', flat=True).first()
+
+    def latest_result_timestamp():
+        return Result.objects.order_by('-timestamp').values_list('timestamp', flat=True).first()
+
+    def line_stats():
+        return list(WeeklyResultAggregation.objects.values('line').annotate(
+            count=Count('id')
+        ).order_by('-count'))
+
+    aggregation_count, result_count, latest_date, latest_timestamp, stats = await asyncio.gather(
+        run_in_db_pool(WeeklyResultAggregation.objects.count),
+        run_in_db_pool(Result.objects.count),
+        run_in_db_pool(latest_aggregation_date),
+        run_in_db_pool(latest_result_timestamp),
+        run_in_db_pool(line_stats),
+    )
+
+    return {
+        'aggregation_count': aggregation_count,
+        'result_count': result_count,
+        'latest_aggregation_date': latest_date.isoformat() if latest_date else None,
+        'latest_result_timestamp': latest_timestamp.isoformat() if latest_timestamp else None,
+        'line_stats': stats,
+        'timestamp': datetime.now().isoformat()
+    }
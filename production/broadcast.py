@@ -0,0 +1,159 @@
+"""
+WebSocket通知のまとめ送信
+
+実績1件ごとに行っていた group_send を (グループ, ライン, 日付) 単位のキーでまとめ、
+設定された時間窓（settings.BROADCAST_COALESCE_WINDOW 秒、デフォルト0.5秒）の間に
+届いた通知を1回の送信にまとめる。時間窓を0以下にすると即時送信する。
+
+時間窓が終わった通知はプロセスごとに1つの送信スレッドが送信し、DB接続は
+close_old_connections で CONN_MAX_AGE に従って再利用・破棄する。
+
+送信関数は async_to_sync を使うため、atexit では concurrent.futures の終了後となり送信できない。
+プロセスの正常終了時はスレッドの終了処理（threading._register_atexit、executor の終了より前）で
+送信待ちの通知を送信する。常駐コマンド（run_workers・stream_aggregate）は終了時に flush を明示的に呼ぶ。
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, List
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _Pending:
+    """送信待ちの通知"""
+
+    __slots__ = ('sender', 'payloads', 'deadline')
+
+    def __init__(self, sender: Callable[[List[Any]], None], payload: Any, deadline: float = 0.0):
+        self.sender = sender
+        self.payloads = [payload]
+        self.deadline = deadline
+
+
+class BroadcastCoalescer:
+    """キー単位で通知をまとめて送信するクラス"""
+
+    def __init__(self):
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pending: Dict[Hashable, _Pending] = {}
+        self._flusher = None
+        self._atexit_registered = False
+        self._stats = Counter()
+        self._folded_by_group = Counter()
+
+    @property
+    def window(self) -> float:
+        """まとめる時間窓（秒）"""
+        return getattr(settings, 'BROADCAST_COALESCE_WINDOW', 0.5)
+
+    def submit(self, key: tuple, sender: Callable[[List[Any]], None], payload: Any = None) -> None:
+        """
+        通知を登録（同じキーの通知は時間窓の終わりに1回だけ送信）
+
+        Args:
+            key: まとめる単位。先頭要素はグループ種別（統計に使用）
+            sender: 時間窓内に登録された payload のリストを受け取って送信する関数
+            payload: 通知内容
+        """
+        window = self.window
+        with self._lock:
+            self._stats['submitted'] += 1
+            pending = self._pending.get(key)
+            if pending is not None:
+                pending.payloads.append(payload)
+                self._stats['folded'] += 1
+                self._folded_by_group[key[0]] += 1
+                return
+
+            pending = _Pending(sender, payload, time.monotonic() + window)
+            if window > 0:
+                self._pending[key] = pending
+                self._start_flusher()
+                self._wakeup.notify()
+                return
+
+        self._send(pending)
+
+    def _start_flusher(self) -> None:
+        """送信スレッドを起動し、終了時の送信を登録（ロック内で呼ぶ）"""
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._run_flusher, name='broadcast-coalescer', daemon=True)
+            self._flusher.start()
+        if not self._atexit_registered:
+            try:
+                threading._register_atexit(self.flush)
+            except RuntimeError:
+                pass  # 終了処理の開始後は登録できない
+            self._atexit_registered = True
+
+    def _take_due(self) -> List[_Pending]:
+        """時間窓が終わった通知を待って取り出す"""
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                due = [key for key, pending in self._pending.items() if pending.deadline <= now]
+                if due:
+                    return [self._pending.pop(key) for key in due]
+                next_deadline = min((pending.deadline for pending in self._pending.values()), default=None)
+                self._wakeup.wait(None if next_deadline is None else next_deadline - now)
+
+    def _run_flusher(self) -> None:
+        """時間窓の終了時にまとめて送信（送信スレッド）"""
+        from django.db import close_old_connections
+
+        while True:
+            ready = self._take_due()
+            try:
+                for pending in ready:
+                    self._send(pending)
+            finally:
+                close_old_connections()
+
+    def _send(self, pending: _Pending) -> None:
+        try:
+            pending.sender(pending.payloads)
+            with self._lock:
+                self._stats['sent'] += 1
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            self.logger.error(f"まとめ送信エラー: {e}")
+
+    def flush(self) -> None:
+        """送信待ちの通知をすべて即時送信（終了処理・テスト用）"""
+        with self._lock:
+            pending_items = list(self._pending.values())
+            self._pending.clear()
+        for pending in pending_items:
+            self._send(pending)
+
+    def get_stats(self) -> dict:
+        """送信・まとめ件数の統計を取得"""
+        with self._lock:
+            submitted = self._stats['submitted']
+            return {
+                'window': self.window,
+                'submitted': submitted,
+                'sent': self._stats['sent'],
+                'folded': self._stats['folded'],
+                'errors': self._stats['errors'],
+                'pending': len(self._pending),
+                'fold_rate': (self._stats['folded'] / submitted * 100) if submitted else 0,
+                'folded_by_group': dict(self._folded_by_group),
+            }
+
+    def reset_stats(self) -> None:
+        """統計をリセット"""
+        with self._lock:
+            self._stats.clear()
+            self._folded_by_group.clear()
+
+
+# グローバルインスタンス
+broadcast_coalescer = BroadcastCoalescer()
@@ -0,0 +1,190 @@
+"""
+一括投入時の集計遅延
+
+シード・バックフィル・一括取り込みでは、実績・計画1件ごとのシグナル処理
+（集計の増分更新、計画PPH再計算、ダッシュボードキャッシュ無効化、WebSocket通知）が
+大量に発生する。aggregation_deferred() のブロック内ではこれらを実行せず、
+影響を受けた (ライン, 日付) だけを記録し、ブロック終了時にまとめて
+集計の再作成・計画PPH再計算・通知を1回ずつ行う。
+
+    with aggregation_deferred():
+        for row in rows:
+            Result.objects.create(**row)
+
+    @aggregation_deferred()
+    def load():
+        ...
+
+入れ子で使用した場合は最も外側のブロック終了時にのみ処理する。
+ブロック内で例外が発生した場合も、それまでに保存された分を処理してから例外を送出する。
+"""
+
+import logging
+import threading
+from contextlib import ContextDecorator
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class _Touched:
+    """遅延中に変更された (ライン, 日付)"""
+
+    def __init__(self):
+        self.result_dates = {}     # {ライン名: {稼働日}}
+        self.dashboard_names = {}  # {ライン名: {日付}}
+        self.dashboard_ids = {}    # {ライン ID: {日付}}
+        self.pph_keys = set()      # {(ライン ID, 日付)}
+
+
+def is_aggregation_deferred() -> bool:
+    """現在のスレッドで集計が遅延中かどうか"""
+    return getattr(_local, 'depth', 0) > 0
+
+
+def record_result_change(instance) -> bool:
+    """
+    遅延中であれば実績の変更を記録
+
+    Returns:
+        bool: 記録した場合 True（シグナル処理はスキップする）
+    """
+    if not is_aggregation_deferred():
+        return False
+    if not instance.line or not instance.timestamp:
+        return True
+
+    from .registry import calendar_registry
+
+    touched = _local.touched
+    work_date = calendar_registry.resolve(instance.line).work_date(instance.timestamp)
+    timestamp = instance.timestamp
+    if timezone.is_aware(timestamp):
+        timestamp = timezone.localtime(timestamp)
+
+    touched.result_dates.setdefault(instance.line, set()).add(work_date)
+    # ダッシュボードは稼働日とカレンダー日の両方に実績が表示される
+    touched.dashboard_names.setdefault(instance.line, set()).update({work_date, timestamp.date()})
+    return True
+
+
+def record_plan_change(line_id, target_date, recalculate_pph: bool = True) -> bool:
+    """
+    遅延中であれば計画（または計画PPH）の変更を記録
+
+    Returns:
+        bool: 記録した場合 True（シグナル処理はスキップする）
+    """
+    if not is_aggregation_deferred():
+        return False
+
+    touched = _local.touched
+    touched.dashboard_ids.setdefault(line_id, set()).add(target_date)
+    if recalculate_pph:
+        touched.pph_keys.add((line_id, target_date))
+    return True
+
+
+class aggregation_deferred(ContextDecorator):
+    """実績・計画のシグナル処理を遅延し、終了時にまとめて実行するコンテキストマネージャー／デコレーター"""
+
+    def __init__(self, notify: bool = True):
+        self.notify = notify
+
+    def __enter__(self):
+        depth = getattr(_local, 'depth', 0)
+        if depth == 0:
+            _local.touched = _Touched()
+        _local.depth = depth + 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.depth -= 1
+        if _local.depth > 0:
+            return False
+
+        touched = _local.touched
+        del _local.touched
+        try:
+            # 外側のトランザクションがある場合はコミット後に実行（ロールバック時は不要）
+            transaction.on_commit(lambda: flush_deferred(touched, notify=self.notify))
+        except Exception as e:
+            if exc_type is None:
+                raise
+            # ブロック内の例外を優先して送出する
+            logger.error(f"遅延集計エラー: {e}")
+        return False
+
+
+def flush_deferred(touched: _Touched, notify: bool = True) -> dict:
+    """
+    記録された (ライン, 日付) の集計・計画PPHをまとめて再作成
+
+    Returns:
+        dict: 処理件数
+    """
+    from .models import Line, send_aggregation_status_notification
+    from .dashboard_cache import dashboard_cache
+    from .services import AggregationService
+    from .utils import calculate_planned_pph_for_date
+
+    line_ids = dict(Line.objects.filter(
+        name__in=set(touched.result_dates) | set(touched.dashboard_names)
+    ).values_list('name', 'id'))
+
+    service = AggregationService()
+    stats = {'lines': 0, 'dates': 0, 'aggregation_records': 0, 'hourly_records': 0, 'pph_recalculated': 0}
+
+    for line_name, dates in touched.result_dates.items():
+        line_id = line_ids.get(line_name)
+        if line_id is None:
+            logger.warning(f"ライン '{line_name}' が見つかりません")
+            continue
+        stats['lines'] += 1
+        stats['dates'] += len(dates)
+        stats['aggregation_records'] += service.aggregate_dates(line_id, dates)
+        stats['hourly_records'] += service.aggregate_hourly_dates(line_id, dates)
+
+    for line_id, target_date in sorted(touched.pph_keys):
+        calculate_planned_pph_for_date(line_id, target_date)
+        stats['pph_recalculated'] += 1
+
+    dashboard_keys = {
+        (line_id, target_date)
+        for line_id, dates in touched.dashboard_ids.items()
+        for target_date in dates
+    }
+    for line_name, dates in touched.dashboard_names.items():
+        if line_name in line_ids:
+            dashboard_keys.update((line_ids[line_name], target_date) for target_date in dates)
+    for line_id, target_date in dashboard_keys:
+        dashboard_cache.bump(line_id, target_date)
+
+    logger.info(f"遅延集計完了: {stats}")
+
+    if notify and (dashboard_keys or stats['dates']):
+        _notify_deferred(dashboard_keys)
+        send_aggregation_status_notification('bulk_load_completed', {
+            **stats,
+            'line_names': sorted(touched.result_dates),
+        })
+    return stats
+
+
+def _notify_deferred(dashboard_keys) -> None:
+    """ダッシュボードの差分通知を (ライン, 日付) ごとにまとめて送信"""
+    from .broadcast import broadcast_coalescer
+    from .utils import send_dashboard_update
+
+    for line_id, target_date in dashboard_keys:
+        date_str = target_date.isoformat()
+        try:
+            broadcast_coalescer.submit(
+                ('dashboard', line_id, date_str),
+                lambda payloads, line_id=line_id, date_str=date_str: send_dashboard_update(line_id, date_str)
+            )
+        except Exception as e:
+            logger.error(f"遅延集計通知送信エラー: {e}")
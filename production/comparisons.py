@@ -0,0 +1,123 @@
+"""
+週別・月別統計の前期間比較・前年同期比較
+
+比較対象の期間（前週・前月、前年同週・前年同月）は完全な ISO週・月のため、実績は
+PeriodResultAggregation の期間別集計行、計画は Plan を期間ごとに CASE で振り分けて集計し、
+UNION ALL で1クエリにまとめる。現在の期間の値はグラフデータ構築時の集計値をそのまま使うため、
+比較の追加によるページのコストは1クエリのみ。
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Tuple
+from django.db.models import Case, DateField, F, Q, Sum, Value, When
+
+from .models import PeriodResultAggregation, Plan
+from .rollups import WEEK, period_end, period_start, union_all
+
+
+def previous_period_start(period: str, start: date) -> date:
+    """前週の月曜日・前月の月初日"""
+    return period_start(period, start - timedelta(days=1))
+
+
+def last_year_period_start(period: str, start: date) -> date:
+    """前年同週（同じISO週番号、53週目がない年は52週目）の月曜日・前年同月の月初日"""
+    if period == WEEK:
+        year, week, _ = start.isocalendar()
+        last_week = date(year - 1, 12, 28).isocalendar()[1]
+        return date.fromisocalendar(year - 1, min(week, last_week), 1)
+    return start.replace(year=start.year - 1)
+
+
+def comparison_totals(line_id: int, line_name: str, period: str, start: date) -> Dict[date, Tuple[int, int]]:
+    """
+    前期間・前年同期の計画数量・実績数量（OK）を1クエリで集計
+
+    Returns:
+        dict: {期間開始日: (計画数量, 実績数量)}
+    """
+    starts = [previous_period_start(period, start), last_year_period_start(period, start)]
+
+    actuals = PeriodResultAggregation.objects.filter(
+        period=period,
+        line=line_name,
+        date__in=starts,
+        judgment='OK'
+    ).order_by().annotate(
+        source=Value('actual'),
+        start=F('date')
+    ).values('source', 'start').annotate(quantity=Sum('total_quantity'))
+
+    plan_window = Q()
+    for window_start in starts:
+        plan_window |= Q(date__gte=window_start, date__lte=period_end(period, window_start))
+    plans = Plan.objects.filter(plan_window, line_id=line_id).order_by().annotate(
+        source=Value('planned'),
+        start=Case(
+            *[
+                When(date__gte=window_start, date__lte=period_end(period, window_start), then=Value(window_start))
+                for window_start in starts
+            ],
+            output_field=DateField()
+        )
+    ).values('source', 'start').annotate(quantity=Sum('planned_quantity'))
+
+    totals = {window_start: [0, 0] for window_start in starts}
+    for row in union_all([actuals, plans]):
+        index = 0 if row['source'] == 'planned' else 1
+        totals[row['start']][index] += row['quantity'] or 0
+    return {window_start: tuple(values) for window_start, values in totals.items()}
+
+
+def _achievement_rate(planned: int, actual: int) -> float:
+    return (actual / planned * 100) if planned > 0 else 0
+
+
+def _change_rate(current: int, previous: int) -> float:
+    """前期間比（%）"""
+    return round((current - previous) / previous * 100, 1) if previous else 0
+
+
+def _trend(change: float) -> str:
+    if change > 0:
+        return 'up'
+    if change < 0:
+        return 'down'
+    return 'neutral'
+
+
+def add_comparisons(stats: dict, line_id: int, line_name: str, period: str, day: date) -> dict:
+    """
+    週間・月間統計に前期間比較（*_trend, *_change）と前年同期比較（last_year_*）を追加
+
+    Args:
+        stats: total_planned, total_actual, achievement_rate を含む統計（更新して返す）
+    """
+    start = period_start(period, day)
+    totals = comparison_totals(line_id, line_name, period, start)
+    previous_planned, previous_actual = totals[previous_period_start(period, start)]
+    last_year_planned, last_year_actual = totals[last_year_period_start(period, start)]
+
+    planned_change = _change_rate(stats['total_planned'], previous_planned)
+    actual_change = _change_rate(stats['total_actual'], previous_actual)
+    previous_rate = _achievement_rate(previous_planned, previous_actual)
+    achievement_change = round(stats['achievement_rate'] - previous_rate, 1) if previous_planned else 0
+    last_year_rate = _achievement_rate(last_year_planned, last_year_actual)
+
+    stats.update({
+        'planned_trend': _trend(planned_change),
+        'actual_trend': _trend(actual_change),
+        'achievement_trend': _trend(achievement_change),
+        'planned_change': planned_change,
+        'actual_change': actual_change,
+        'achievement_change': achievement_change,
+        'previous_planned': previous_planned,
+        'previous_actual': previous_actual,
+        'previous_achievement_rate': previous_rate,
+        'last_year_planned': last_year_planned,
+        'last_year_actual': last_year_actual,
+        'last_year_achievement_rate': last_year_rate,
+        'last_year_actual_change': _change_rate(stats['total_actual'], last_year_actual),
+        'last_year_achievement_change': round(stats['achievement_rate'] - last_year_rate, 1) if last_year_planned else 0,
+    })
+    return stats
@@ -0,0 +1,133 @@
+"""
+JSON API の条件付きレスポンス（ETag）
+
+API ごとに安価な検証子（Validator）を求め、If-None-Match が一致する場合は
+ペイロードを構築せずに 304 を返す。検証子はライン・日付範囲の日別・時間別・期間別集計の
+last_updated と計画・計画PPHの updated_at（件数・最大値）を UNION ALL の1クエリで取得して求める。
+件数も含めるため、行の削除でも検証子が変わる。
+
+Last-Modified は返さない。検証子には件数（行の削除）やダッシュボードのデータバージョンなど
+更新日時で表せない要素が含まれるため、If-Modified-Since だけを送るクライアントに
+古いデータで 304 を返さないようにする。
+
+- ConditionalResponseMixin を View に追加し、get_validator を実装する
+- ユーザーごとにアクセス権限が異なるため Cache-Control は private, no-cache（毎回再検証）
+"""
+
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db.models import Count, Max, Value
+from django.utils.cache import get_conditional_response
+
+from .models import (
+    HourlyResultAggregation, PeriodResultAggregation, Plan, PlannedHourlyProduction, WeeklyResultAggregation
+)
+from .rollups import union_all
+
+logger = logging.getLogger(__name__)
+
+AGGREGATION = 'aggregation'
+HOURLY = 'hourly'
+ROLLUP = 'rollup'
+PLAN = 'plan'
+PPH = 'pph'
+
+# ソース: (モデル, ラインの絞り込み条件（ライン名 / ライン ID）, 更新日時フィールド)
+SOURCES = {
+    AGGREGATION: (WeeklyResultAggregation, 'line', 'last_updated'),
+    HOURLY: (HourlyResultAggregation, 'line', 'last_updated'),
+    ROLLUP: (PeriodResultAggregation, 'line', 'last_updated'),  # date は期間開始日
+    PLAN: (Plan, 'line_id', 'updated_at'),
+    PPH: (PlannedHourlyProduction, 'line_id', 'updated_at'),
+}
+
+CACHE_CONTROL = 'private, no-cache'
+
+
+def source_state(line_id: int, line_name: str, start_date: date, end_date: date,
+                 sources: Iterable[str] = tuple(SOURCES)) -> Dict[str, Tuple[int, Optional[datetime]]]:
+    """
+    期間内の各ソースの件数と最終更新日時を1クエリで取得
+
+    Returns:
+        dict: {ソース: (件数, 最終更新日時（行がない場合は None）)}
+    """
+    sources = tuple(sources)
+    querysets = []
+    for source in sources:
+        model, line_field, updated_field = SOURCES[source]
+        querysets.append(model.objects.filter(**{
+            line_field: line_name if line_field == 'line' else line_id,
+            'date__gte': start_date,
+            'date__lte': end_date,
+        }).order_by().annotate(source=Value(source)).values('source').annotate(
+            rows=Count('id'), updated=Max(updated_field)
+        ))
+
+    state = {source: (0, None) for source in sources}
+    for row in union_all(querysets):
+        state[row['source']] = (row['rows'], row['updated'])
+    return state
+
+
+@dataclass(frozen=True)
+class Validator:
+    """レスポンスの検証子"""
+    etag: str
+
+    @classmethod
+    def build(cls, *parts) -> 'Validator':
+        """検証子の構成要素（スコープ・バージョン等）から ETag を生成"""
+        digest = hashlib.md5(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+        return cls(etag=f'"{digest}"')
+
+    @classmethod
+    def from_state(cls, scope: str, state: Dict[str, Tuple[int, Optional[datetime]]], *extra) -> 'Validator':
+        """source_state の結果から検証子を生成"""
+        parts = [scope]
+        for source in sorted(state):
+            rows, updated = state[source]
+            parts.append(f"{source}{rows}@{updated.isoformat() if updated else '-'}")
+        return cls.build(*parts, *extra)
+
+    def apply(self, response):
+        """ETag・Cache-Control ヘッダーを設定"""
+        response['ETag'] = self.etag
+        response['Cache-Control'] = CACHE_CONTROL
+        return response
+
+
+class ConditionalResponseMixin:
+    """
+    GET / HEAD に条件付きレスポンスを追加するミックスイン
+
+    get_validator で検証子を返すと、リクエストの If-None-Match が一致する場合は
+    get() を実行せずに 304 を返し、それ以外の 200 レスポンスには ETag を付与する。
+    LineAccessMixin より後（右）に指定し、アクセス権限チェック後に評価する。
+    """
+
+    def get_validator(self, request, *args, **kwargs) -> Optional[Validator]:
+        """検証子を返す（None の場合は条件付きにしない。不正なパラメータ等は get() 側で処理）"""
+        return None
+
+    def dispatch(self, request, *args, **kwargs):
+        validator = None
+        if request.method in ('GET', 'HEAD'):
+            try:
+                validator = self.get_validator(request, *args, **kwargs)
+            except Exception as e:
+                logger.error(f"検証子取得エラー: {request.path} - {e}")
+
+        if validator is not None:
+            response = get_conditional_response(request, etag=validator.etag)
+            if response is not None:
+                return validator.apply(response) if response.status_code == 304 else response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if validator is not None and response.status_code == 200:
+            validator.apply(response)
+        return response
@@ -3,7 +3,9 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import User
 from .models import Line, UserLineAccess
-from .services import WeeklyAnalysisService
+from .async_services import (
+    AsyncDashboardService, AsyncWeeklyAnalysisService, get_aggregation_status, run_in_db_pool, get_line_name
+)
 from datetime import datetime, date, timedelta
 import logging
 
@@ -34,6 +36,10 @@ class DashboardConsumer(AsyncWebsocketConsumer):
         )
 
         await self.accept()
+        
+        # 接続時にシーケンス番号付きのスナップショットを送信（以降は差分のみ）
+        self.sequence = None
+        await self.send_snapshot()
 
     async def disconnect(self, close_code):
         # Leave room group
@@ -54,6 +60,9 @@ class DashboardConsumer(AsyncWebsocketConsumer):
                 'type': 'dashboard_update',
                 'data': dashboard_data
             }))
+        elif message_type == 'resync':
+            # 最後に受け取ったシーケンス番号からの再同期要求
+            await self.resync(text_data_json.get('sequence'))
 
     # Receive message from room group
     async def dashboard_update(self, event):
@@ -63,6 +72,61 @@ class DashboardConsumer(AsyncWebsocketConsumer):
             'data': event['data']
         }))
 
+    async def dashboard_delta(self, event):
+        """差分をクライアントへ転送（取りこぼしがあればスナップショットを送り直す）"""
+        message = event['message']
+        if self.sequence is not None and message['sequence'] <= self.sequence:
+            # 送信済みのスナップショットに含まれている
+            return
+        if self.sequence is not None and message['base_sequence'] != self.sequence:
+            await self.resync(self.sequence)
+            return
+        self.sequence = message['sequence']
+        await self.send(text_data=json.dumps(message))
+
+    async def send_snapshot(self):
+        """シーケンス番号付きの全体スナップショットを送信"""
+        sequence, dashboard_data = await self.get_dashboard_snapshot()
+        self.sequence = sequence
+        await self.send(text_data=json.dumps({
+            'type': 'dashboard_snapshot',
+            'sequence': sequence,
+            'data': dashboard_data
+        }))
+
+    async def resync(self, sequence):
+        """指定シーケンス番号以降の差分を送信（履歴が足りない場合はスナップショット）"""
+        deltas = None
+        if isinstance(sequence, int):
+            deltas = await self.get_deltas_since(sequence)
+        
+        if deltas is None:
+            await self.send_snapshot()
+            return
+        if not deltas:
+            self.sequence = sequence
+            await self.send(text_data=json.dumps({
+                'type': 'dashboard_in_sync',
+                'sequence': sequence
+            }))
+            return
+        for message in deltas:
+            await self.send(text_data=json.dumps(message))
+        self.sequence = deltas[-1]['sequence']
+
+    async def get_dashboard_snapshot(self):
+        """最新スナップショットとシーケンス番号を取得（変化があれば他の接続へ差分を配信）"""
+        from .utils import publish_dashboard_delta
+        
+        sequence, dashboard_data, _ = await run_in_db_pool(publish_dashboard_delta, self.line_id, self.date)
+        return sequence, dashboard_data
+
+    async def get_deltas_since(self, sequence):
+        """指定シーケンス番号以降の差分を取得"""
+        from .dashboard_stream import dashboard_stream
+        
+        return await run_in_db_pool(dashboard_stream.get_deltas_since, self.line_id, self.date, sequence)
+
     @database_sync_to_async
     def check_line_access(self, user, line_id):
         """ユーザーのライン アクセス権限をチェック"""
@@ -72,39 +136,16 @@ class DashboardConsumer(AsyncWebsocketConsumer):
         except Line.DoesNotExist:
             return False
 
-    @database_sync_to_async
-    def get_dashboard_data(self):
-        """ダッシュボードデータを取得（集計データ使用）"""
-        from .utils import get_dashboard_data
-        from .services import WeeklyAnalysisService
-        from datetime import datetime, timedelta
-        
+    async def get_dashboard_data(self):
+        """ダッシュボードデータを取得（集計データ使用、独立したクエリを並行実行）"""
         try:
-            # 従来のダッシュボードデータを取得
-            dashboard_data = get_dashboard_data(self.line_id, self.date)
-            
-            # 集計サービスを使用して追加の高速データを取得
-            weekly_service = WeeklyAnalysisService()
-            target_date = datetime.strptime(self.date, '%Y-%m-%d').date()
-            
-            # 週別データを取得
-            week_start = target_date - timedelta(days=target_date.weekday())
-            week_end = week_start + timedelta(days=6)
-            
-            line = Line.objects.get(id=self.line_id)
-            weekly_data = weekly_service.get_weekly_data(line.name, week_start, week_end)
-            performance_metrics = weekly_service.get_performance_metrics(line.name, week_start, week_end)
-            
-            # 集計データを追加
-            dashboard_data['aggregated_weekly_data'] = weekly_data
-            dashboard_data['performance_metrics'] = performance_metrics
-            dashboard_data['data_source'] = 'aggregated'  # データソースを明示
-            
-            return dashboard_data
+            return await AsyncDashboardService().get_dashboard_with_weekly(self.line_id, self.date)
             
         except Exception as e:
             # エラー時は従来のデータのみ返す
-            return get_dashboard_data(self.line_id, self.date) 
+            logger.error(f"ダッシュボードデータ取得エラー: {e}")
+            return await AsyncDashboardService().get_dashboard_data(self.line_id, self.date)
+
 
 class WeeklyAnalysisConsumer(AsyncWebsocketConsumer):
     """週別分析専用のWebSocketコンシューマー（集計データ使用）"""
@@ -208,27 +249,22 @@ class WeeklyAnalysisConsumer(AsyncWebsocketConsumer):
         except Line.DoesNotExist:
             return False
 
-    @database_sync_to_async
-    def get_weekly_analysis_data(self):
-        """週別分析データを取得（初期データ）"""
+    async def get_weekly_analysis_data(self):
+        """週別分析データを取得（初期データ、週別データと指標を並行取得）"""
         try:
-            line = Line.objects.get(id=self.line_id)
-            service = WeeklyAnalysisService()
-            
             # 今週のデータを取得
             today = date.today()
             week_start = today - timedelta(days=today.weekday())
             week_end = week_start + timedelta(days=6)
             
-            weekly_data = service.get_weekly_data(line.name, week_start, week_end)
-            performance_metrics = service.get_performance_metrics(line.name, week_start, week_end)
+            weekly = await AsyncWeeklyAnalysisService().get_weekly_analysis(self.line_id, week_start, week_end)
             
             return {
-                'line_name': line.name,
+                'line_name': weekly['line_name'],
                 'week_start': week_start.isoformat(),
                 'week_end': week_end.isoformat(),
-                'weekly_data': weekly_data,
-                'performance_metrics': performance_metrics,
+                'weekly_data': weekly['weekly_data'],
+                'performance_metrics': weekly['performance_metrics'],
                 'timestamp': datetime.now().isoformat()
             }
             
@@ -236,20 +272,18 @@ class WeeklyAnalysisConsumer(AsyncWebsocketConsumer):
             logger.error(f"週別分析データ取得エラー: {e}")
             return {'error': str(e)}
 
-    @database_sync_to_async
-    def get_weekly_data_range(self, start_date_str, end_date_str):
+    async def get_weekly_data_range(self, start_date_str, end_date_str):
         """指定期間の週別データを取得"""
         try:
-            line = Line.objects.get(id=self.line_id)
-            service = WeeklyAnalysisService()
+            line_name = await run_in_db_pool(get_line_name, self.line_id)
             
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
             
-            weekly_data = service.get_weekly_data(line.name, start_date, end_date)
+            weekly_data = await AsyncWeeklyAnalysisService().get_weekly_data(line_name, start_date, end_date)
             
             return {
-                'line_name': line.name,
+                'line_name': line_name,
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat(),
                 'weekly_data': weekly_data,
@@ -260,20 +294,20 @@ class WeeklyAnalysisConsumer(AsyncWebsocketConsumer):
             logger.error(f"週別データ範囲取得エラー: {e}")
             return {'error': str(e)}
 
-    @database_sync_to_async
-    def get_part_analysis_data(self, part_name, start_date_str, end_date_str):
+    async def get_part_analysis_data(self, part_name, start_date_str, end_date_str):
         """機種別分析データを取得"""
         try:
-            line = Line.objects.get(id=self.line_id)
-            service = WeeklyAnalysisService()
+            line_name = await run_in_db_pool(get_line_name, self.line_id)
             
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
             
-            part_data = service.get_part_analysis(line.name, part_name, start_date, end_date)
+            part_data = await AsyncWeeklyAnalysisService().get_part_analysis(
+                line_name, part_name, start_date, end_date
+            )
             
             return {
-                'line_name': line.name,
+                'line_name': line_name,
                 'part_name': part_name,
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat(),
@@ -285,20 +319,18 @@ class WeeklyAnalysisConsumer(AsyncWebsocketConsumer):
             logger.error(f"機種別分析データ取得エラー: {e}")
             return {'error': str(e)}
 
-    @database_sync_to_async
-    def get_performance_metrics_data(self, start_date_str, end_date_str):
+    async def get_performance_metrics_data(self, start_date_str, end_date_str):
         """パフォーマンス指標データを取得"""
         try:
-            line = Line.objects.get(id=self.line_id)
-            service = WeeklyAnalysisService()
+            line_name = await run_in_db_pool(get_line_name, self.line_id)
             
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
             
-            metrics = service.get_performance_metrics(line.name, start_date, end_date)
+            metrics = await AsyncWeeklyAnalysisService().get_performance_metrics(line_name, start_date, end_date)
             
             return {
-                'line_name': line.name,
+                'line_name': line_name,
                 'start_date': start_date.isoformat(),
                 'end_date': end_date.isoformat(),
                 'metrics': metrics,
@@ -364,35 +396,11 @@ class AggregationStatusConsumer(AsyncWebsocketConsumer):
             'data': event['data']
         }))
 
-    @database_sync_to_async
-    def get_aggregation_status(self):
-        """集計処理の状況を取得"""
+    async def get_aggregation_status(self):
+        """集計処理の状況を取得（独立した集計クエリを並行実行）"""
         try:
-            from .models import WeeklyResultAggregation, Result
-            
-            # 集計データの統計
-            aggregation_count = WeeklyResultAggregation.objects.count()
-            result_count = Result.objects.count()
-            
-            # 最新の集計データ
-            latest_aggregation = WeeklyResultAggregation.objects.order_by('-date').first()
-            latest_result = Result.objects.order_by('-timestamp').first()
-            
-            # ライン別の集計状況
-            from django.db.models import Count
-            line_stats = WeeklyResultAggregation.objects.values('line').annotate(
-                count=Count('id')
-            ).order_by('-count')
-            
-            return {
-                'aggregation_count': aggregation_count,
-                'result_count': result_count,
-                'latest_aggregation_date': latest_aggregation.date.isoformat() if latest_aggregation else None,
-                'latest_result_timestamp': latest_result.timestamp.isoformat() if latest_result else None,
-                'line_stats': list(line_stats),
-                'timestamp': datetime.now().isoformat()
-            }
+            return await get_aggregation_status()
             
         except Exception as e:
             logger.error(f"集計状況取得エラー: {e}")
-            return {'error': str(e)}
\ No newline at end of file
+            return {'error': str(e)}
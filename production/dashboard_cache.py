@@ -0,0 +1,126 @@
+"""
+ダッシュボードデータのキャッシュ
+
+get_dashboard_data の結果を (ライン, 日付, データバージョン) をキーにキャッシュする。
+Result / Plan / PlannedHourlyProduction の保存・削除シグナルでバージョンを進めるため
+（models.py 参照）、データが変わらない間のポーリングはすべてキャッシュヒットになる。
+キャッシュバックエンドは settings.CACHES（本番は Redis、開発は locmem）を使用する。
+"""
+
+import logging
+import time
+from datetime import datetime
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardCache:
+    """バージョン付きダッシュボードデータキャッシュ"""
+
+    VERSION_KEY = 'dashboard_version:{line_id}:{date}'
+    PAYLOAD_KEY = 'dashboard_payload:{line_id}:{date}:{version}'
+    HITS_KEY = 'dashboard_cache_hits'
+    MISSES_KEY = 'dashboard_cache_misses'
+
+    def __init__(self):
+        self.logger = logger
+
+    @property
+    def timeout(self) -> int:
+        """キャッシュの有効期限（秒）。稼働カレンダー・機種色の変更はこの期限で反映される"""
+        return getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+    @staticmethod
+    def normalize_date(date_str) -> str:
+        """get_dashboard_data と同じ規則で日付文字列を正規化"""
+        if hasattr(date_str, 'strftime'):
+            return date_str.strftime('%Y-%m-%d')
+        try:
+            return datetime.strptime(date_str, '%Y-%m-%d').strftime('%Y-%m-%d')
+        except (TypeError, ValueError):
+            return timezone.now().date().strftime('%Y-%m-%d')
+
+    def _incr(self, key: str) -> None:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # 未作成の場合（他プロセスと競合した場合は加算をやり直す）
+            if not cache.add(key, 1, None):
+                try:
+                    cache.incr(key)
+                except ValueError:
+                    pass
+
+    def get_version(self, line_id, date_str) -> int:
+        """現在のデータバージョンを取得"""
+        key = self.VERSION_KEY.format(line_id=line_id, date=self.normalize_date(date_str))
+        version = cache.get(key)
+        if version is None:
+            # 追い出し後に過去のバージョンを再利用しないよう、時刻を初期値にする
+            cache.add(key, time.time_ns() // 1000, None)
+            version = cache.get(key)
+        return version
+
+    def bump(self, line_id, date_str) -> None:
+        """データバージョンを進める（該当日のキャッシュを無効化）"""
+        key = self.VERSION_KEY.format(line_id=line_id, date=self.normalize_date(date_str))
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns() // 1000, None)
+
+    def get_or_build(self, line_id, date_str, builder):
+        """
+        キャッシュからダッシュボードデータを取得（なければ builder で生成して保存）
+
+        Args:
+            line_id: ライン ID
+            date_str: 日付文字列（YYYY-MM-DD）
+            builder: (line_id, date_str) を受け取りデータを返す関数
+
+        Returns:
+            dict: ダッシュボードデータ
+        """
+        normalized = self.normalize_date(date_str)
+        try:
+            version = self.get_version(line_id, normalized)
+            key = self.PAYLOAD_KEY.format(line_id=line_id, date=normalized, version=version)
+            data = cache.get(key)
+        except Exception as e:
+            self.logger.error(f"ダッシュボードキャッシュ取得エラー: {e}")
+            return builder(line_id, normalized)
+
+        if data is not None:
+            self._incr(self.HITS_KEY)
+            return data
+
+        self._incr(self.MISSES_KEY)
+        data = builder(line_id, normalized)
+        try:
+            cache.set(key, data, self.timeout)
+        except Exception as e:
+            self.logger.error(f"ダッシュボードキャッシュ保存エラー: {e}")
+        return data
+
+    def get_stats(self) -> dict:
+        """ヒット・ミス回数とヒット率を取得"""
+        hits = cache.get(self.HITS_KEY) or 0
+        misses = cache.get(self.MISSES_KEY) or 0
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': (hits / total * 100) if total else 0,
+            'timeout': self.timeout,
+        }
+
+    def reset_stats(self) -> None:
+        """ヒット・ミス回数をリセット"""
+        cache.delete_many([self.HITS_KEY, self.MISSES_KEY])
+
+
+# グローバルインスタンス
+dashboard_cache = DashboardCache()
@@ -0,0 +1,220 @@
+"""
+ダッシュボードの差分配信
+
+DashboardConsumer は接続時にシーケンス番号付きの全体スナップショットを送り、
+以降は変化した時間帯・機種のセルと合計値だけを差分として配信する。
+最新スナップショットと直近の差分履歴は (ライン, 日付) ごとにキャッシュへ保持し、
+遅れたクライアントや再接続したクライアントは最後に受け取ったシーケンス番号から再同期できる。
+
+メッセージ形式（サーバー → クライアント）:
+    {'type': 'dashboard_snapshot', 'sequence': n, 'data': {...}}
+    {'type': 'dashboard_delta', 'sequence': n, 'base_sequence': n - 1, 'diff': {...}}
+    {'type': 'dashboard_in_sync', 'sequence': n}
+
+差分（diff）の形式:
+    totals:        変化した合計値 {'total_actual': 10, ...}
+    parts:         変化・追加された機種（機種別データの要素そのもの）
+    removed_parts: 削除された機種名のリスト
+    hourly:        変化した時間帯 [{'index': i, 'total_actual': 3, 'parts': {part_id: {...}},
+                                    'removed_parts': [part_id, ...]}, ...]
+    last_updated:  データ生成日時
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from itertools import zip_longest
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+TOTAL_FIELDS = ('total_planned', 'total_actual', 'achievement_rate', 'remaining')
+HOUR_FIELDS = ('hour', 'total_planned', 'total_actual')
+
+
+def compute_dashboard_diff(old: dict, new: dict) -> dict:
+    """
+    2つのダッシュボードデータの差分を計算
+
+    Returns:
+        dict: 差分（変化がない場合は空の辞書）
+    """
+    diff = {}
+
+    totals = {field: new.get(field) for field in TOTAL_FIELDS if old.get(field) != new.get(field)}
+    if totals:
+        diff['totals'] = totals
+
+    old_parts = {part['name']: part for part in old.get('parts', [])}
+    new_parts = {part['name']: part for part in new.get('parts', [])}
+    changed_parts = [part for name, part in new_parts.items() if old_parts.get(name) != part]
+    removed_parts = [name for name in old_parts if name not in new_parts]
+    if changed_parts:
+        diff['parts'] = changed_parts
+    if removed_parts:
+        diff['removed_parts'] = removed_parts
+
+    hourly = []
+    for index, (old_hour, new_hour) in enumerate(zip_longest(old.get('hourly', []), new.get('hourly', []))):
+        if old_hour == new_hour or new_hour is None:
+            continue
+        old_hour = old_hour or {}
+        cell = {'index': index}
+        for field in HOUR_FIELDS:
+            if old_hour.get(field) != new_hour.get(field):
+                cell[field] = new_hour.get(field)
+
+        old_cells = old_hour.get('parts', {})
+        new_cells = new_hour.get('parts', {})
+        changed_cells = {
+            part_id: values for part_id, values in new_cells.items()
+            if old_cells.get(part_id) != values
+        }
+        removed_cells = [part_id for part_id in old_cells if part_id not in new_cells]
+        if changed_cells:
+            cell['parts'] = changed_cells
+        if removed_cells:
+            cell['removed_parts'] = removed_cells
+        hourly.append(cell)
+    if hourly:
+        diff['hourly'] = hourly
+
+    if diff:
+        diff['last_updated'] = new.get('last_updated')
+    return diff
+
+
+def apply_dashboard_diff(data: dict, diff: dict) -> dict:
+    """スナップショットに差分を適用（クライアント側の処理と同じ規則）"""
+    data.update(diff.get('totals', {}))
+
+    parts = {part['name']: part for part in data.get('parts', [])}
+    for name in diff.get('removed_parts', []):
+        parts.pop(name, None)
+    for part in diff.get('parts', []):
+        parts[part['name']] = part
+    data['parts'] = list(parts.values())
+
+    hourly = data.setdefault('hourly', [])
+    for cell in diff.get('hourly', []):
+        index = cell['index']
+        while len(hourly) <= index:
+            hourly.append({'parts': {}})
+        hour_record = hourly[index]
+        for field in HOUR_FIELDS:
+            if field in cell:
+                hour_record[field] = cell[field]
+        cells = hour_record.setdefault('parts', {})
+        for part_id in cell.get('removed_parts', []):
+            cells.pop(part_id, None)
+        cells.update(cell.get('parts', {}))
+
+    if 'last_updated' in diff:
+        data['last_updated'] = diff['last_updated']
+    return data
+
+
+class DashboardStream:
+    """(ライン, 日付) ごとのシーケンス番号・最新スナップショット・差分履歴の管理"""
+
+    STATE_KEY = 'dashboard_stream:{line_id}:{date}'
+    LOCK_KEY = 'dashboard_stream_lock:{line_id}:{date}'
+    LOCK_TIMEOUT = 10
+    LOCK_WAIT = 2.0
+
+    def __init__(self):
+        self.logger = logger
+
+    @property
+    def history_size(self) -> int:
+        """再同期用に保持する差分の件数"""
+        return getattr(settings, 'DASHBOARD_STREAM_HISTORY', 50)
+
+    @contextmanager
+    def _lock(self, line_id, date_str):
+        """更新の直列化（ロックを取得できたかを返す。取得できない場合は更新しないこと）"""
+        key = self.LOCK_KEY.format(line_id=line_id, date=date_str)
+        deadline = time.monotonic() + self.LOCK_WAIT
+        acquired = cache.add(key, 1, self.LOCK_TIMEOUT)
+        while not acquired and time.monotonic() < deadline:
+            time.sleep(0.05)
+            acquired = cache.add(key, 1, self.LOCK_TIMEOUT)
+        if not acquired:
+            self.logger.warning(f"ダッシュボード差分のロック取得タイムアウト: ライン={line_id}, 日付={date_str}")
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                cache.delete(key)
+
+    def update(self, line_id, date_str):
+        """
+        最新データを前回スナップショットと比較し、変化があれば差分を記録
+
+        ロックを取得できない場合は差分を記録せず、保存済みのスナップショットを返す
+        （変化は次回の更新で差分になる）。スナップショットもない場合はシーケンス番号 0 で
+        最新データを返し、クライアントは次の差分の受信時に再同期する。
+
+        Returns:
+            tuple: (シーケンス番号, 最新データ, 差分メッセージ or None)
+        """
+        from .dashboard_cache import dashboard_cache
+        from .utils import get_cached_dashboard_data
+
+        date_str = dashboard_cache.normalize_date(date_str)
+        key = self.STATE_KEY.format(line_id=line_id, date=date_str)
+        with self._lock(line_id, date_str) as acquired:
+            if not acquired:
+                state = cache.get(key)
+                if state is None:
+                    return 0, get_cached_dashboard_data(line_id, date_str), None
+                return state['sequence'], state['data'], None
+
+            data = get_cached_dashboard_data(line_id, date_str)
+            state = cache.get(key)
+
+            if state is None:
+                # 追い出し後に過去のシーケンス番号を再利用しないよう、時刻を初期値にする
+                state = {'sequence': int(time.time() * 1000), 'data': data, 'history': []}
+                cache.set(key, state, None)
+                return state['sequence'], data, None
+
+            diff = compute_dashboard_diff(state['data'], data)
+            if not diff:
+                return state['sequence'], state['data'], None
+
+            message = {
+                'type': 'dashboard_delta',
+                'sequence': state['sequence'] + 1,
+                'base_sequence': state['sequence'],
+                'diff': diff,
+            }
+            state['sequence'] = message['sequence']
+            state['data'] = data
+            state['history'] = (state['history'] + [message])[-self.history_size:]
+            cache.set(key, state, None)
+
+        return message['sequence'], data, message
+
+    def get_deltas_since(self, line_id, date_str, sequence: int):
+        """
+        指定シーケンス番号以降の差分を取得
+
+        Returns:
+            list: 差分メッセージのリスト（履歴が足りない場合は None）
+        """
+        state = cache.get(self.STATE_KEY.format(line_id=line_id, date=date_str))
+        if state is None or sequence > state['sequence']:
+            return None
+        if sequence == state['sequence']:
+            return []
+
+        deltas = [message for message in state['history'] if message['sequence'] > sequence]
+        if not deltas or deltas[0]['base_sequence'] != sequence:
+            return None
+        return deltas
+
+
+# グローバルインスタンス
+dashboard_stream = DashboardStream()
@@ -124,4 +124,14 @@ class NonRetryableError(AggregationError):
         super().__init__(message, error_code='NON_RETRYABLE_ERROR')
         self.details.update({
             'reason': reason
-        })
\ No newline at end of file
+        })
+
+class IngestionError(AggregationError):
+    """実績一括取り込みエラー"""
+    
+    def __init__(self, message, row_errors=None, status=400):
+        super().__init__(message, error_code='INGESTION_ERROR')
+        self.status = status
+        self.details.update({
+            'row_errors': row_errors or []
+        })
@@ -0,0 +1,219 @@
+"""
+集計データ整合性チェック用のフィンガープリント
+
+(ライン, 稼働日) ごとに キー数・実績件数・数量合計・チェックサム をまとめた
+フィンガープリントを、Result と WeeklyResultAggregation のそれぞれについて
+期間全体で1回の GROUP BY (稼働日) でデータベース側で集計する。両者のフィンガープリントが
+一致しない日のみ、キー（設備・機種・判定）別の行を取得して差分を求める。
+
+ハッシュの集約関数はバックエンド間で互換性がないため、チェックサムはキーから求めた重み
+（設備・機種・判定の長さと先頭・末尾の文字コード）を数量・件数に掛けた合計とする。
+重み付き合計は線形なので、キー別の行を集約しても実績の行ごとに集計しても同じ値になり、
+キー間で数量・件数が入れ替わった場合も検出できる。
+"""
+
+from dataclasses import dataclass
+from datetime import date, time
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.db.models import BigIntegerField, Count, F, Sum, Value
+from django.db.models.functions import Coalesce, Concat, Length, Ord, Right
+
+from .hourly_buckets import work_hour_expressions, work_period
+
+# {稼働日: {(設備, 機種, 判定): (数量合計, 実績件数)}}
+KeyTotals = Dict[date, Dict[Tuple[str, str, str], Tuple[int, int]]]
+
+KEY_FIELDS = ('machine', 'part', 'judgment')
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """(ライン, 稼働日) のフィンガープリント"""
+    keys: int = 0
+    rows: int = 0
+    quantity: int = 0
+    quantity_checksum: int = 0
+    count_checksum: int = 0
+
+    def as_dict(self) -> dict:
+        return {
+            'keys': self.keys,
+            'rows': self.rows,
+            'quantity': self.quantity,
+            'quantity_checksum': self.quantity_checksum,
+            'count_checksum': self.count_checksum,
+        }
+
+
+def _text(field_name: str):
+    """NULL を空文字として扱う文字列式"""
+    return Coalesce(F(field_name), Value(''))
+
+
+def _key_weight():
+    """キー（設備・機種・判定）から求めるチェックサムの重み"""
+    weight = Value(1)
+    for multiplier, field_name in enumerate(KEY_FIELDS, start=1):
+        text = _text(field_name)
+        weight = weight + multiplier * (
+            Coalesce(Length(text), Value(0))
+            + 3 * Coalesce(Ord(text), Value(0))
+            + 7 * Coalesce(Ord(Right(text, 1)), Value(0))
+        )
+    return weight
+
+
+def _fingerprint_aggregates(quantity, count) -> dict:
+    """稼働日別のフィンガープリントを求める集計式"""
+    return {
+        'key_count': Count(Concat(*(
+            part for field_name in KEY_FIELDS for part in (_text(field_name), Value('\x1f'))
+        )), distinct=True),
+        'row_count': Sum(count, output_field=BigIntegerField()),
+        'quantity_total': Sum(quantity, output_field=BigIntegerField()),
+        'quantity_checksum': Sum(quantity * _key_weight(), output_field=BigIntegerField()),
+        'count_checksum': Sum(count * _key_weight(), output_field=BigIntegerField()),
+    }
+
+
+def _fingerprints(rows: Iterable[dict]) -> Dict[date, Fingerprint]:
+    return {
+        row['day']: Fingerprint(
+            keys=row['key_count'],
+            rows=row['row_count'] or 0,
+            quantity=row['quantity_total'] or 0,
+            quantity_checksum=row['quantity_checksum'] or 0,
+            count_checksum=row['count_checksum'] or 0,
+        )
+        for row in rows
+    }
+
+
+def _source_queryset(line_name: str, start_date: date, end_date: date, work_start_time: time):
+    from .models import Result
+
+    start_datetime, end_datetime = work_period(start_date, end_date, work_start_time)
+    return Result.objects.filter(
+        line=line_name,
+        timestamp__gte=start_datetime,
+        timestamp__lt=end_datetime
+    ).annotate(
+        day=work_hour_expressions(work_start_time)['work_date']
+    ).order_by()
+
+
+def _aggregated_queryset(line_name: str, start_date: date, end_date: date):
+    from .models import WeeklyResultAggregation
+
+    return WeeklyResultAggregation.objects.filter(
+        line=line_name,
+        date__gte=start_date,
+        date__lte=end_date
+    ).annotate(day=F('date')).order_by()
+
+
+def source_fingerprints(line_name: str, start_date: date, end_date: date,
+                        work_start_time: time) -> Dict[date, Fingerprint]:
+    """実績データの稼働日別フィンガープリント（1クエリ）"""
+    return _fingerprints(
+        _source_queryset(line_name, start_date, end_date, work_start_time).values('day').annotate(
+            **_fingerprint_aggregates(F('quantity'), Value(1))
+        )
+    )
+
+
+def aggregated_fingerprints(line_name: str, start_date: date, end_date: date) -> Dict[date, Fingerprint]:
+    """集計テーブルの稼働日別フィンガープリント（1クエリ）"""
+    return _fingerprints(
+        _aggregated_queryset(line_name, start_date, end_date).values('day').annotate(
+            **_fingerprint_aggregates(F('total_quantity'), F('result_count'))
+        )
+    )
+
+
+def _key_totals(rows: Iterable[dict]) -> KeyTotals:
+    totals = {}
+    for row in rows:
+        key = (row['machine'] or '', row['part'] or '', row['judgment'])
+        day = totals.setdefault(row['day'], {})
+        quantity, count = day.get(key, (0, 0))
+        day[key] = (quantity + (row['key_quantity'] or 0), count + (row['key_count'] or 0))
+    return totals
+
+
+def source_key_totals(line_name: str, start_date: date, end_date: date, work_start_time: time,
+                      dates: Optional[Iterable[date]] = None) -> KeyTotals:
+    """実績データを稼働日・キー別に集計（1クエリ、dates 指定時はその稼働日のみ）"""
+    queryset = _source_queryset(line_name, start_date, end_date, work_start_time)
+    if dates is not None:
+        queryset = queryset.filter(day__in=list(dates))
+    return _key_totals(queryset.values('day', *KEY_FIELDS).annotate(
+        key_quantity=Sum('quantity'),
+        key_count=Count('id')
+    ))
+
+
+def aggregated_key_totals(line_name: str, start_date: date, end_date: date,
+                          dates: Optional[Iterable[date]] = None) -> KeyTotals:
+    """集計テーブルを稼働日・キー別に取得（1クエリ、dates 指定時はその稼働日のみ）"""
+    queryset = _aggregated_queryset(line_name, start_date, end_date)
+    if dates is not None:
+        queryset = queryset.filter(date__in=list(dates))
+    return _key_totals(queryset.values(
+        'day', *KEY_FIELDS, key_quantity=F('total_quantity'), key_count=F('result_count')
+    ))
+
+
+def key_deltas(source: Dict, aggregated: Dict) -> List[dict]:
+    """稼働日1日分のキー別の差分（一致しないキーのみ）"""
+    deltas = []
+    for key in sorted(set(source) | set(aggregated)):
+        source_quantity, source_count = source.get(key, (0, 0))
+        aggregated_quantity, aggregated_count = aggregated.get(key, (0, 0))
+        if (source_quantity, source_count) == (aggregated_quantity, aggregated_count):
+            continue
+        machine, part, judgment = key
+        deltas.append({
+            'machine': machine,
+            'part': part,
+            'judgment': judgment,
+            'source_quantity': source_quantity,
+            'aggregated_quantity': aggregated_quantity,
+            'source_count': source_count,
+            'aggregated_count': aggregated_count,
+        })
+    return deltas
+
+
+def find_mismatches(line_name: str, start_date: date, end_date: date, work_start_time: time) -> List[dict]:
+    """
+    稼働日ごとにフィンガープリントを比較し、不一致の日のみキー別の差分を返す
+
+    フィンガープリントの取得は期間によらず2クエリ。不一致の日がある場合のみ、
+    その日に限定してキー別の行を取得する（さらに2クエリ）。
+
+    Returns:
+        List[dict]: [{'date', 'source', 'aggregated', 'deltas'}]（日付順）
+    """
+    source = source_fingerprints(line_name, start_date, end_date, work_start_time)
+    aggregated = aggregated_fingerprints(line_name, start_date, end_date)
+
+    empty = Fingerprint()
+    mismatched_dates = [
+        work_date for work_date in sorted(set(source) | set(aggregated))
+        if source.get(work_date, empty) != aggregated.get(work_date, empty)
+    ]
+    if not mismatched_dates:
+        return []
+
+    source_totals = source_key_totals(line_name, start_date, end_date, work_start_time, mismatched_dates)
+    aggregated_totals = aggregated_key_totals(line_name, start_date, end_date, mismatched_dates)
+    return [
+        {
+            'date': work_date,
+            'source': source.get(work_date, empty).as_dict(),
+            'aggregated': aggregated.get(work_date, empty).as_dict(),
+            'deltas': key_deltas(source_totals.get(work_date, {}), aggregated_totals.get(work_date, {})),
+        }
+        for work_date in mismatched_dates
+    ]
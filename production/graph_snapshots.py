@@ -0,0 +1,172 @@
+"""
+週別・月別グラフデータのスナップショット
+
+確定済みの週・月（現在の稼働日を含まない期間）のグラフデータは再計算しても変わらないため、
+完成したグラフデータを (ライン, 期間種別, 期間キー) ごとに GraphSnapshot に保存し、
+次回以降はスナップショットをそのまま返す。現在の週・月は毎回再計算する。
+
+- データバージョンは期間内の日別集計・計画の件数と最終更新日時から1クエリで求め、
+  遅れて到着した実績や再集計・計画変更があった場合はスナップショットを作り直す
+- warm_graph_snapshots コマンドで全ラインの直近の週・月をまとめて作成できる
+"""
+
+import logging
+from datetime import date
+from django.utils import timezone
+
+from .conditional import AGGREGATION, PLAN, source_state
+from .models import GraphSnapshot
+from .registry import calendar_registry
+from .rollups import MONTH, WEEK, period_end, period_start
+from .services import WeeklyAnalysisService
+from .utils import get_monthly_graph_data, get_weekly_graph_data
+
+logger = logging.getLogger(__name__)
+
+# グラフデータの構造を変更した場合に進める（既存のスナップショットを無効化）
+SNAPSHOT_SCHEMA_VERSION = 2
+
+FRESH = 'fresh'
+BUILT = 'built'
+SKIPPED = 'skipped'
+
+
+def period_key(period: str, day: date) -> str:
+    """期間キー（ISO週は 2025-W03、月は 2025-01 形式）"""
+    if period == WEEK:
+        year, week, _ = day.isocalendar()
+        return f'{year}-W{week:02d}'
+    return day.strftime('%Y-%m')
+
+
+def data_version(line_id: int, line_name: str, start_date: date, end_date: date) -> str:
+    """期間内の日別集計・計画の件数と最終更新日時から求めるデータバージョン（1クエリ）"""
+    state = source_state(line_id, line_name, start_date, end_date, sources=(AGGREGATION, PLAN))
+    parts = [f'v{SNAPSHOT_SCHEMA_VERSION}']
+    for source in sorted(state):
+        rows, updated = state[source]
+        parts.append(f"{source[0]}{rows}@{updated.isoformat() if updated else '-'}")
+    return ':'.join(parts)
+
+
+def is_closed(period: str, day: date, work_calendar) -> bool:
+    """期間が確定済み（現在の稼働日より前に終了している）か"""
+    current = work_calendar.work_date(timezone.now())
+    return period_end(period, period_start(period, day)) < current
+
+
+def build_weekly_graph(line_id: int, day: date) -> dict:
+    """週別グラフデータ（週間統計に不良率・安定性・効率スコアを追加）"""
+    data = get_weekly_graph_data(line_id, day)
+    work_calendar = calendar_registry.get_by_id(line_id)
+    if work_calendar is None:
+        return data
+
+    start = period_start(WEEK, day)
+    performance_metrics = WeeklyAnalysisService().get_performance_metrics(
+        work_calendar.line_name, start, period_end(WEEK, start)
+    )
+    if performance_metrics:
+        data['weekly_stats'].update({
+            'defect_rate': performance_metrics.get('defect_rate', 0),
+            'production_stability': performance_metrics.get('production_stability', 0),
+            'efficiency_score': performance_metrics.get('efficiency_score', 0),
+        })
+    return data
+
+
+BUILDERS = {
+    WEEK: build_weekly_graph,
+    MONTH: get_monthly_graph_data,
+}
+
+
+def get_graph_data(line_id: int, period: str, day: date) -> dict:
+    """
+    週別・月別グラフデータを取得（確定済みの期間はスナップショットから）
+
+    Args:
+        line_id: ライン ID
+        period: 'week' または 'month'
+        day: 期間内の任意の日
+
+    Returns:
+        dict: グラフデータ（スナップショットの場合、available_parts は id・name を持つ dict のリスト）
+    """
+    builder = BUILDERS[period]
+    work_calendar = calendar_registry.get_by_id(line_id)
+    if work_calendar is None or not is_closed(period, day, work_calendar):
+        return builder(line_id, day)
+
+    try:
+        start = period_start(period, day)
+        version = data_version(line_id, work_calendar.line_name, start, period_end(period, start))
+        snapshot = GraphSnapshot.objects.filter(
+            line_id=line_id, period=period, period_key=period_key(period, day)
+        ).only('data_version', 'payload').first()
+        if snapshot is not None and snapshot.data_version == version:
+            return restore_payload(snapshot.payload)
+    except Exception as e:
+        logger.error(f"グラフスナップショット取得エラー: {e}")
+        return builder(line_id, day)
+
+    data = builder(line_id, day)
+    _save_snapshot(line_id, period, day, version, data)
+    return data
+
+
+def refresh_snapshot(line_id: int, period: str, day: date, force: bool = False) -> str:
+    """
+    スナップショットを作成・更新（warm_graph_snapshots 用）
+
+    Returns:
+        str: 'fresh'（最新）, 'built'（作成）, 'skipped'（現在の期間・未登録ライン）
+    """
+    work_calendar = calendar_registry.get_by_id(line_id)
+    if work_calendar is None or not is_closed(period, day, work_calendar):
+        return SKIPPED
+
+    start = period_start(period, day)
+    version = data_version(line_id, work_calendar.line_name, start, period_end(period, start))
+    if not force and GraphSnapshot.objects.filter(
+        line_id=line_id, period=period, period_key=period_key(period, day), data_version=version
+    ).exists():
+        return FRESH
+
+    _save_snapshot(line_id, period, day, version, BUILDERS[period](line_id, day))
+    return BUILT
+
+
+def _save_snapshot(line_id: int, period: str, day: date, version: str, data: dict) -> None:
+    try:
+        GraphSnapshot.objects.update_or_create(
+            line_id=line_id,
+            period=period,
+            period_key=period_key(period, day),
+            defaults={'data_version': version, 'payload': serialize_payload(data)}
+        )
+    except Exception as e:
+        logger.error(f"グラフスナップショット保存エラー: {e}")
+
+
+def serialize_payload(data: dict) -> dict:
+    """グラフデータを JSON に保存できる形式に変換（機種は ID・名称、日付は ISO 形式）"""
+    payload = dict(data)
+    payload['available_parts'] = [{'id': part.id, 'name': part.name} for part in data.get('available_parts', [])]
+    if 'weekly_summary' in data:
+        payload['weekly_summary'] = [
+            dict(week, start_date=week['start_date'].isoformat(), end_date=week['end_date'].isoformat())
+            for week in data['weekly_summary']
+        ]
+    return payload
+
+
+def restore_payload(payload: dict) -> dict:
+    """保存したグラフデータを復元（機種は id・name を持つ dict、日付は date に戻す）"""
+    data = dict(payload)
+    if 'weekly_summary' in payload:
+        data['weekly_summary'] = [
+            dict(week, start_date=date.fromisoformat(week['start_date']), end_date=date.fromisoformat(week['end_date']))
+            for week in payload['weekly_summary']
+        ]
+    return data
@@ -0,0 +1,108 @@
+"""
+実績の時間帯別集計クエリビルダー
+
+稼働日は work_start_time から翌日の work_start_time まで。タイムスタンプから
+work_start_time 分だけ戻した時刻をローカルタイムゾーンで見ると、その日付が稼働日、
+時が work_start_time からの経過時間（hour_index, 0～23）になる。
+この計算をデータベース側で行い、1回の GROUP BY で
+(稼働日, hour_index, 機種, 設備, 判定) 別の数量合計・件数を取得する。
+
+日時演算とタイムゾーン変換は各バックエンドの DatabaseOperations が生成するため、
+SQLite（django_datetime_* 関数）・PostgreSQL（AT TIME ZONE / EXTRACT）・
+Oracle（FROM_TZ / EXTRACT）のいずれでも同じクエリセットで動作する。
+"""
+
+from datetime import datetime, time, timedelta
+from django.db.models import Count, DateTimeField, ExpressionWrapper, F, QuerySet, Sum, Value
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+DEFAULT_GROUP_FIELDS = ('part', 'machine', 'judgment')
+
+
+def work_hour_expressions(work_start_time: time, field_name: str = 'timestamp') -> dict:
+    """
+    稼働日と hour_index を求める式を生成
+
+    Args:
+        work_start_time: 稼働開始時刻
+        field_name: タイムスタンプのフィールド名
+
+    Returns:
+        dict: {'work_date': 稼働日の式, 'hour_index': 経過時間の式}
+    """
+    offset = timedelta(
+        hours=work_start_time.hour,
+        minutes=work_start_time.minute,
+        seconds=work_start_time.second
+    )
+    shifted = ExpressionWrapper(F(field_name) - Value(offset), output_field=DateTimeField())
+    tzinfo = timezone.get_current_timezone()
+    return {
+        'work_date': TruncDate(shifted, tzinfo=tzinfo),
+        'hour_index': ExtractHour(shifted, tzinfo=tzinfo),
+    }
+
+
+def bucket_by_work_hour(queryset: QuerySet, work_start_time: time,
+                        group_fields: tuple = DEFAULT_GROUP_FIELDS) -> QuerySet:
+    """
+    実績クエリセットを (稼働日, hour_index, group_fields) 別に集計
+
+    Args:
+        queryset: 期間等で絞り込み済みの Result クエリセット
+        work_start_time: 稼働開始時刻
+        group_fields: hour_index 以外の集計キー
+
+    Returns:
+        QuerySet: work_date, hour_index, group_fields, total_quantity, result_count を持つ行
+    """
+    return queryset.annotate(
+        **work_hour_expressions(work_start_time)
+    ).order_by().values(
+        'work_date', 'hour_index', *group_fields
+    ).annotate(
+        total_quantity=Sum('quantity'),
+        result_count=Count('id')
+    )
+
+
+def work_period(start_date, end_date, work_start_time: time) -> tuple[datetime, datetime]:
+    """
+    稼働日の範囲 [start_date, end_date] に対応するタイムスタンプの範囲を取得
+
+    Returns:
+        tuple: (開始datetime, 終了datetime)  ※終了は含まない
+    """
+    return (
+        timezone.make_aware(datetime.combine(start_date, work_start_time)),
+        timezone.make_aware(datetime.combine(end_date + timedelta(days=1), work_start_time)),
+    )
+
+
+def hourly_result_rows(line_name: str, start_date, end_date, work_start_time: time,
+                       group_fields: tuple = DEFAULT_GROUP_FIELDS, **filters) -> QuerySet:
+    """
+    ラインの稼働日範囲の実績を時間帯別に集計（1クエリ）
+
+    Args:
+        line_name: ライン名
+        start_date: 開始稼働日
+        end_date: 終了稼働日（含む）
+        work_start_time: 稼働開始時刻
+        group_fields: hour_index 以外の集計キー
+        **filters: 追加の絞り込み条件（judgment='OK' など）
+
+    Returns:
+        QuerySet: bucket_by_work_hour の結果
+    """
+    from .models import Result
+
+    start_datetime, end_datetime = work_period(start_date, end_date, work_start_time)
+    queryset = Result.objects.filter(
+        line=line_name,
+        timestamp__gte=start_datetime,
+        timestamp__lt=end_datetime,
+        **filters
+    )
+    return bucket_by_work_hour(queryset, work_start_time, group_fields)
@@ -0,0 +1,247 @@
+"""
+実績データの一括取り込み
+
+検査ステーションから送られる実績のバッチ（JSON配列・NDJSON・CSV）を検証し、
+1トランザクションで bulk_create する。bulk_create は post_save シグナルを発火しないため、
+実績1件ごとの集計更新は行わず、バッチ内で影響を受けた
+(ライン, 稼働日, 設備, 機種, 判定) の集計キーのみをまとめて再計算する。
+ストリーム集計（streaming.py）が有効な場合は登録のみ行い、集計は stream_aggregate に任せる。
+
+本番環境では Result は DatabaseRouter により oracle、集計テーブルは default に保存されるため、
+両方のデータベースでトランザクションを開始する（Result 側を内側にして先にコミット）。
+2つのデータベースをまたぐ分散トランザクションではないため、Result のコミット後に default の
+コミットが失敗した場合は実績のみが残る。その場合は validate_aggregation --repair で集計を修復する。
+"""
+
+import csv
+import io
+import json
+import logging
+import time as time_module
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .exceptions import IngestionError
+from .models import Line, Result
+from .registry import calendar_registry
+from .streaming import is_pending
+
+logger = logging.getLogger(__name__)
+
+JUDGMENTS = {choice for choice, _ in Result.JUDGMENT_CHOICES}
+
+
+def parse_payload(body: bytes, content_type: str) -> list:
+    """
+    リクエストボディを実績レコード（dict）のリストに変換
+
+    Args:
+        body: リクエストボディ
+        content_type: Content-Type（application/json, application/x-ndjson, text/csv）
+
+    Returns:
+        list: レコードのリスト
+    """
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    try:
+        text = body.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise IngestionError('リクエストボディはUTF-8である必要があります')
+
+    if media_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        records = []
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise IngestionError(f'{line_number}行目のJSONが不正です: {e}')
+        return records
+
+    if media_type == 'text/csv':
+        return [dict(row) for row in csv.DictReader(io.StringIO(text))]
+
+    if media_type in ('', 'application/json'):
+        try:
+            records = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise IngestionError(f'無効なJSONデータです: {e}')
+        if not isinstance(records, list):
+            raise IngestionError('JSONは実績の配列である必要があります')
+        return records
+
+    raise IngestionError(f'未対応のContent-Typeです: {media_type}', status=415)
+
+
+def build_results(records: list, allowed_lines=None) -> list:
+    """
+    レコードを検証して Result インスタンスに変換（1件でも不正があれば全件拒否）
+
+    Args:
+        records: parse_payload の結果
+        allowed_lines: 取り込みを許可するライン名の集合（None の場合は登録済みの全ライン）
+
+    Returns:
+        list: 未保存の Result インスタンス
+    """
+    known_lines = set(Line.objects.values_list('name', flat=True))
+    if allowed_lines is not None:
+        known_lines &= set(allowed_lines)
+
+    results = []
+    row_errors = []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            row_errors.append({'row': index, 'errors': ['オブジェクトである必要があります']})
+            continue
+
+        errors = []
+        line_name = (record.get('line') or '').strip()
+        if line_name not in known_lines:
+            errors.append(f'ライン "{line_name}" に取り込みできません')
+
+        timestamp = record.get('timestamp')
+        try:
+            timestamp = parse_datetime(timestamp) if isinstance(timestamp, str) else None
+        except ValueError:
+            # 形式は正しいが存在しない日時（2月30日等）
+            timestamp = None
+        if timestamp is None:
+            errors.append('timestamp はISO 8601形式の日時である必要があります')
+        elif timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+
+        serial_number = str(record.get('serial_number') or '').strip()
+        if not serial_number:
+            errors.append('serial_number は必須です')
+
+        judgment = record.get('judgment')
+        if judgment not in JUDGMENTS:
+            errors.append('judgment は OK または NG である必要があります')
+
+        quantity = record.get('quantity')
+        try:
+            quantity = 1 if quantity in (None, '') else int(quantity)
+            if quantity < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors.append('quantity は1以上の整数である必要があります')
+
+        if errors:
+            row_errors.append({'row': index, 'errors': errors})
+            continue
+
+        results.append(Result(
+            line=line_name,
+            machine=record.get('machine') or '',
+            part=record.get('part') or '',
+            timestamp=timestamp,
+            serial_number=serial_number,
+            judgment=judgment,
+            quantity=quantity,
+            notes=record.get('notes') or ''
+        ))
+
+    if row_errors:
+        raise IngestionError(f'{len(row_errors)}件の不正なレコードがあります', row_errors=row_errors)
+    return results
+
+
+def ingest_results(records: list, allowed_lines=None) -> dict:
+    """
+    実績レコードを一括登録し、影響を受けた集計キーのみを再計算
+
+    Args:
+        records: parse_payload の結果
+        allowed_lines: 取り込みを許可するライン名の集合
+
+    Returns:
+        dict: 件数と処理時間（ミリ秒）
+    """
+    from .services import AggregationService
+
+    max_rows = getattr(settings, 'RESULT_INGEST_MAX_ROWS', 10000)
+    if len(records) > max_rows:
+        raise IngestionError(f'1回に取り込める実績は{max_rows}件までです', status=413)
+
+    started = time_module.perf_counter()
+    results = build_results(records, allowed_lines)
+    validated = time_module.perf_counter()
+
+    service = AggregationService()
+    line_names = {result.line for result in results}
+    calendars = {name: calendar_registry.get(name) for name in line_names}
+    if None in calendars.values():
+        # 他プロセスで登録された直後のラインはレジストリを再ロードして取得
+        calendar_registry.invalidate()
+        calendars = {name: calendar_registry.get(name) for name in line_names}
+
+    keys = set()
+    hourly_dates = {}
+    dashboard_dates = set()
+    for result in results:
+        calendar = calendars[result.line]
+        line_id = calendar.line_id
+        work_date, _, _ = service._get_work_date_and_hour(result.timestamp, calendar.work_start_time)
+        keys.add((result.line, work_date, result.machine, result.part, result.judgment))
+        hourly_dates.setdefault(line_id, set()).add(work_date)
+        # ダッシュボードは稼働日とカレンダー日の両方に実績が表示される
+        dashboard_dates.add((line_id, work_date))
+        dashboard_dates.add((line_id, timezone.localtime(result.timestamp).date()))
+
+    with transaction.atomic(), transaction.atomic(using=router.db_for_write(Result)):
+        Result.objects.bulk_create(results, batch_size=1000)
+        inserted = time_module.perf_counter()
+
+        # ストリーム集計が有効な場合、取り込んだ実績はウォーターマークより後のため stream_aggregate が集計する
+        if results and is_pending(results[0]):
+            aggregation_stats = {'created': 0, 'updated': 0, 'deleted': 0}
+            hourly_count = 0
+        else:
+            aggregation_stats = service.refresh_aggregation_keys(keys)
+            hourly_count = sum(
+                service.aggregate_hourly_dates(line_id, sorted(dates))
+                for line_id, dates in hourly_dates.items()
+            )
+            transaction.on_commit(lambda: _notify_ingested(dashboard_dates))
+    aggregated = time_module.perf_counter()
+
+    stats = {
+        'received': len(records),
+        'inserted': len(results),
+        'aggregation_keys': len(keys),
+        'aggregation': aggregation_stats,
+        'hourly_records': hourly_count,
+        'dates': sorted({work_date.isoformat() for _, work_date, _, _, _ in keys}),
+        'timing_ms': {
+            'validate': round((validated - started) * 1000, 1),
+            'insert': round((inserted - validated) * 1000, 1),
+            'aggregate': round((aggregated - inserted) * 1000, 1),
+            'total': round((aggregated - started) * 1000, 1),
+        },
+    }
+    logger.info(
+        f"実績一括取り込み完了: {stats['inserted']}件, 集計キー{stats['aggregation_keys']}件, "
+        f"{stats['timing_ms']['total']}ms"
+    )
+    return stats
+
+
+def _notify_ingested(dashboard_dates) -> None:
+    """取り込み後にダッシュボードキャッシュを無効化し、WebSocket通知を送信"""
+    from .broadcast import broadcast_coalescer
+    from .dashboard_cache import dashboard_cache
+    from .utils import send_dashboard_update
+
+    for line_id, target_date in dashboard_dates:
+        date_str = target_date.isoformat()
+        dashboard_cache.bump(line_id, date_str)
+        try:
+            broadcast_coalescer.submit(
+                ('dashboard', line_id, date_str),
+                lambda payloads, line_id=line_id, date_str=date_str: send_dashboard_update(line_id, date_str)
+            )
+        except Exception as e:
+            logger.error(f"取り込み通知送信エラー: {e}")
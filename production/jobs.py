@@ -0,0 +1,295 @@
+"""
+集計・計画PPH再計算のバックグラウンドジョブキュー
+
+重い再計算（実績の完全再集計、計画PPHの再計算）はリクエストやシグナルの中で実行せず、
+AggregationJob テーブルに登録して run_workers コマンドのワーカーが処理する。
+
+- 待機中のジョブは (種別, ライン, 対象日) ごとに1件にまとめる（重複登録は優先度のみ引き上げ）
+- priority の小さい順、available_at の古い順に取り出す
+- 失敗したジョブは指数バックオフで再実行し、max_attempts 回で失敗とする
+- ロックから settings.AGGREGATION_JOB_VISIBILITY_TIMEOUT 秒（デフォルト300秒）経過した
+  実行中ジョブは、ワーカーが異常終了したとみなして待機中に戻す
+
+settings.AGGREGATION_JOBS_EAGER が True の場合は登録時にその場で実行する（ワーカーのない開発環境向け）。
+"""
+
+import logging
+import os
+import socket
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import AggregationJob, Line
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRIORITIES = {
+    AggregationJob.KIND_PLANNED_PPH: 10,   # ダッシュボードの計画値に直結するため優先
+    AggregationJob.KIND_REAGGREGATE: 50,
+}
+
+
+def _visibility_timeout() -> timedelta:
+    return timedelta(seconds=getattr(settings, 'AGGREGATION_JOB_VISIBILITY_TIMEOUT', 300))
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    base_delay = getattr(settings, 'AGGREGATION_JOB_RETRY_DELAY', 5)
+    return timedelta(seconds=min(base_delay * (2 ** max(attempts - 1, 0)), 3600))
+
+
+def default_worker_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue(kind: str, line_id: int, target_date, priority: int = None) -> AggregationJob:
+    """
+    ジョブを登録（同じ (種別, ライン, 対象日) の待機中ジョブがあればまとめる）
+
+    Returns:
+        AggregationJob: 登録済み（またはまとめ先）のジョブ
+
+    Raises:
+        Line.DoesNotExist: ラインが存在しない場合
+    """
+    if priority is None:
+        priority = DEFAULT_PRIORITIES.get(kind, 50)
+
+    # 外部キー制約の検査がコミット時まで遅延されるバックエンドでも登録時にエラーとする
+    if not Line.objects.filter(id=line_id).exists():
+        raise Line.DoesNotExist(f"ライン ID {line_id} が見つかりません")
+
+    if getattr(settings, 'AGGREGATION_JOBS_EAGER', False):
+        job = AggregationJob(kind=kind, line_id=line_id, date=target_date, priority=priority)
+        JOB_HANDLERS[kind](job)
+        return job
+
+    job, created = AggregationJob.objects.get_or_create(
+        kind=kind,
+        line_id=line_id,
+        date=target_date,
+        status=AggregationJob.STATUS_PENDING,
+        defaults={'priority': priority}
+    )
+    if created:
+        logger.info(f"ジョブ登録: {kind} ライン ID={line_id}, 日付={target_date}")
+    elif priority < job.priority:
+        AggregationJob.objects.filter(id=job.id, priority__gt=priority).update(priority=priority)
+        job.priority = priority
+    return job
+
+
+def enqueue_on_commit(kind: str, line_id: int, target_date, priority: int = None) -> None:
+    """トランザクションのコミット後にジョブを登録"""
+    def run():
+        try:
+            enqueue(kind, line_id, target_date, priority)
+        except Exception as e:
+            logger.error(f"ジョブ登録エラー: {kind} ライン ID={line_id}, 日付={target_date}, エラー={e}")
+
+    transaction.on_commit(run)
+
+
+def reclaim_expired(now=None) -> int:
+    """
+    可視性タイムアウトを過ぎた実行中ジョブを待機中に戻す
+
+    同じキーの待機中ジョブが既にある場合は、そちらで処理されるため期限切れのジョブは削除する。
+
+    Returns:
+        int: 戻した（または削除した）ジョブ数
+    """
+    now = now or timezone.now()
+    expired = AggregationJob.objects.filter(
+        status=AggregationJob.STATUS_RUNNING,
+        locked_at__lt=now - _visibility_timeout()
+    )
+    count = 0
+    for job in expired:
+        logger.warning(f"ジョブのロック期限切れ: {job.id} (ワーカー={job.locked_by})")
+        _release(job, now, 'ロック期限切れ（ワーカー停止の可能性）')
+        count += 1
+    return count
+
+
+def claim(worker_id: str, limit: int = 1, now=None) -> list:
+    """
+    実行可能なジョブを優先度順に取得してロック
+
+    候補を読み出した後、status が待機中のままの場合のみ更新する（楽観的ロック）。
+    複数ワーカーが同じジョブを取得することはない。
+
+    Returns:
+        list: ロックした AggregationJob のリスト
+    """
+    now = now or timezone.now()
+    candidates = list(AggregationJob.objects.filter(
+        status=AggregationJob.STATUS_PENDING,
+        available_at__lte=now
+    ).order_by('priority', 'available_at', 'id').values_list('id', flat=True)[:limit * 4])
+
+    claimed = []
+    for job_id in candidates:
+        updated = AggregationJob.objects.filter(
+            id=job_id,
+            status=AggregationJob.STATUS_PENDING
+        ).update(
+            status=AggregationJob.STATUS_RUNNING,
+            locked_by=worker_id,
+            locked_at=now,
+            started_at=now,
+            attempts=F('attempts') + 1
+        )
+        if updated:
+            claimed.append(AggregationJob.objects.select_related('line').get(id=job_id))
+            if len(claimed) >= limit:
+                break
+    return claimed
+
+
+def run_job(job: AggregationJob) -> bool:
+    """
+    ロック済みのジョブを実行し、結果に応じて完了・再実行待ち・失敗に更新
+
+    Returns:
+        bool: 成功した場合 True
+    """
+    try:
+        JOB_HANDLERS[job.kind](job)
+    except Exception as e:
+        now = timezone.now()
+        logger.error(f"ジョブ実行エラー: {job.id} {job.kind} 試行={job.attempts}/{job.max_attempts}, エラー={e}")
+        if job.attempts >= job.max_attempts:
+            AggregationJob.objects.filter(id=job.id).update(
+                status=AggregationJob.STATUS_FAILED,
+                finished_at=now,
+                last_error=str(e)
+            )
+        else:
+            _release(job, now, str(e), available_at=now + _retry_delay(job.attempts))
+        return False
+
+    AggregationJob.objects.filter(id=job.id).update(
+        status=AggregationJob.STATUS_DONE,
+        finished_at=timezone.now(),
+        last_error=''
+    )
+    return True
+
+
+def run_pending(worker_id: str = None, limit: int = None) -> dict:
+    """
+    実行可能なジョブがなくなるまで（または limit 件まで）処理
+
+    Returns:
+        dict: {'processed', 'succeeded', 'failed', 'reclaimed'}
+    """
+    worker_id = worker_id or default_worker_id()
+    stats = {'processed': 0, 'succeeded': 0, 'failed': 0, 'reclaimed': reclaim_expired()}
+    while limit is None or stats['processed'] < limit:
+        jobs = claim(worker_id)
+        if not jobs:
+            break
+        for job in jobs:
+            stats['processed'] += 1
+            if run_job(job):
+                stats['succeeded'] += 1
+            else:
+                stats['failed'] += 1
+    return stats
+
+
+def purge_finished(days: int = None) -> int:
+    """完了から days 日（settings.AGGREGATION_JOB_RETENTION_DAYS、デフォルト7日）以上経過したジョブを削除"""
+    if days is None:
+        days = getattr(settings, 'AGGREGATION_JOB_RETENTION_DAYS', 7)
+    deleted, _ = AggregationJob.objects.filter(
+        status=AggregationJob.STATUS_DONE,
+        finished_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return deleted
+
+
+def queue_metrics(window_minutes: int = 60) -> dict:
+    """
+    キューの状態とレイテンシの指標
+
+    Returns:
+        dict: 状態別・種別別の件数、最古の待機ジョブの待ち時間、
+              直近 window_minutes 分に完了したジョブの平均待ち時間・平均実行時間（秒）
+    """
+    now = timezone.now()
+    counts = {status: 0 for status, _ in AggregationJob.STATUS_CHOICES}
+    by_kind = {}
+    for row in AggregationJob.objects.values('status', 'kind').annotate(count=Count('id')).order_by():
+        counts[row['status']] += row['count']
+        if row['status'] == AggregationJob.STATUS_PENDING:
+            by_kind[row['kind']] = row['count']
+
+    oldest = AggregationJob.objects.filter(
+        status=AggregationJob.STATUS_PENDING
+    ).aggregate(oldest=Min('created_at'))['oldest']
+
+    recent = list(AggregationJob.objects.filter(
+        status=AggregationJob.STATUS_DONE,
+        finished_at__gte=now - timedelta(minutes=window_minutes)
+    ).values_list('created_at', 'started_at', 'finished_at')[:1000])
+    waits = [(started - created).total_seconds() for created, started, _ in recent]
+    runs = [(finished - started).total_seconds() for _, started, finished in recent]
+
+    return {
+        'depth': counts[AggregationJob.STATUS_PENDING],
+        'counts': counts,
+        'pending_by_kind': by_kind,
+        'oldest_pending_seconds': (now - oldest).total_seconds() if oldest else 0,
+        'completed_recently': len(recent),
+        'avg_wait_seconds': sum(waits) / len(waits) if waits else 0,
+        'avg_run_seconds': sum(runs) / len(runs) if runs else 0,
+    }
+
+
+def _release(job: AggregationJob, now, error: str, available_at=None) -> None:
+    """実行中のジョブを待機中に戻す（同じキーの待機中ジョブがあれば削除）"""
+    try:
+        with transaction.atomic():
+            AggregationJob.objects.filter(id=job.id).update(
+                status=AggregationJob.STATUS_PENDING,
+                available_at=available_at or now,
+                locked_by='',
+                locked_at=None,
+                last_error=error
+            )
+    except IntegrityError:
+        AggregationJob.objects.filter(id=job.id).delete()
+
+
+def _run_reaggregate(job: AggregationJob) -> None:
+    from .dashboard_cache import dashboard_cache
+    from .services import AggregationService
+
+    service = AggregationService()
+    count = service.aggregate_dates(job.line_id, [job.date])
+    count += service.aggregate_hourly_dates(job.line_id, [job.date])
+    dashboard_cache.bump(job.line_id, job.date)
+    logger.info(f"完全再集計完了: ライン ID={job.line_id}, 日付={job.date}, {count}件のレコードを作成")
+
+
+def _run_planned_pph(job: AggregationJob) -> None:
+    from .dashboard_cache import dashboard_cache
+    from .utils import calculate_planned_pph_for_date, send_dashboard_update
+
+    calculate_planned_pph_for_date(job.line_id, job.date)
+    dashboard_cache.bump(job.line_id, job.date)
+    try:
+        send_dashboard_update(job.line_id, job.date.isoformat())
+    except Exception as e:
+        logger.error(f"計画PPH再計算後の通知エラー: {e}")
+
+
+JOB_HANDLERS = {
+    AggregationJob.KIND_REAGGREGATE: _run_reaggregate,
+    AggregationJob.KIND_PLANNED_PPH: _run_planned_pph,
+}
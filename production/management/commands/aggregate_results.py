@@ -6,13 +6,19 @@ python manage.py aggregate_results --line-id 1 --start-date 2025-01-01 --end-dat
 python manage.py aggregate_results --line-id 1 --date 2025-01-15
 python manage.py aggregate_results --all-lines --start-date 2025-01-01 --end-date 2025-01-07
 python manage.py aggregate_results --line-id 1 --date 2025-01-15 --force
+python manage.py aggregate_results --line-id 1 --date 2025-01-15 --hourly
+python manage.py aggregate_results --all-lines --start-date 2024-01-01 --end-date 2024-12-31 --workers 4
 """
 
 import logging
+import os
+import time
 from datetime import datetime, date, timedelta
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from production.models import Line, WeeklyResultAggregation
+from production.models import Line, WeeklyResultAggregation, HourlyResultAggregation
+from production.parallel_aggregation import build_work_units, run_work_units
 from production.services import AggregationService
 
 
@@ -65,6 +71,12 @@ class Command(BaseCommand):
             help='既存の集計データを強制的に再作成'
         )
         
+        parser.add_argument(
+            '--hourly',
+            action='store_true',
+            help='時間別集計（HourlyResultAggregation）も作成'
+        )
+        
         parser.add_argument(
             '--batch-size',
             type=int,
@@ -72,6 +84,27 @@ class Command(BaseCommand):
             help='バッチ処理のサイズ（デフォルト: 100）'
         )
         
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=None,
+            help='1回の集計クエリで処理する最大日数（デフォルト: settings.AGGREGATION_CHUNK_DAYS または31）'
+        )
+        
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='並列実行するワーカープロセス数（デフォルト: 1 = 逐次実行）'
+        )
+        
+        parser.add_argument(
+            '--retries',
+            type=int,
+            default=2,
+            help='並列実行時の作業単位ごとのリトライ回数（デフォルト: 2）'
+        )
+        
         parser.add_argument(
             '--validate',
             action='store_true',
@@ -106,7 +139,10 @@ class Command(BaseCommand):
                 return
             
             # 集計処理の実行
-            self._execute_aggregation(target_lines, target_dates, options)
+            if options['workers'] > 1:
+                self._execute_parallel_aggregation(target_lines, target_dates, options)
+            else:
+                self._execute_aggregation(target_lines, target_dates, options)
             
             self.stdout.write(
                 self.style.SUCCESS('集計処理が正常に完了しました。')
@@ -140,6 +176,13 @@ class Command(BaseCommand):
         if (options['start_date'] and not options['end_date']) or \
            (not options['start_date'] and options['end_date']):
             raise CommandError('--start-date と --end-date は両方指定してください。')
+        
+        # 並列実行の検証
+        if options['workers'] < 1:
+            raise CommandError('--workers には1以上を指定してください。')
+        
+        if options['retries'] < 0:
+            raise CommandError('--retries には0以上を指定してください。')
     
     def _get_target_lines(self, options):
         """対象ラインを取得"""
@@ -201,9 +244,15 @@ class Command(BaseCommand):
         if options['force']:
             self.stdout.write(self.style.WARNING('強制再作成モード: 既存データを削除して再作成'))
         
+        if options['hourly']:
+            self.stdout.write('時間別集計: 有効')
+        
         if options['validate']:
             self.stdout.write('データ整合性検証: 有効')
         
+        if options['workers'] > 1:
+            self.stdout.write(f'並列実行: {options["workers"]}ワーカー (CPU数: {os.cpu_count()})')
+        
         if options['dry_run']:
             self.stdout.write(self.style.WARNING('ドライランモード: 実際の処理は行いません'))
         
@@ -215,68 +264,193 @@ class Command(BaseCommand):
         self.stdout.write('')
     
     def _execute_aggregation(self, target_lines, target_dates, options):
-        """集計処理を実行"""
+        """集計処理を実行（ライン単位でチャンクごとに1回の GROUP BY）"""
         total_operations = len(target_lines) * len(target_dates)
         completed_operations = 0
+        total_source_rows = 0
+        total_elapsed = 0.0
         
         self.stdout.write(self.style.HTTP_INFO('集計処理を開始します...'))
         
         for line in target_lines:
             self.stdout.write(f'ライン: {line.name} の処理中...')
             
-            for target_date in target_dates:
-                try:
-                    # 既存データの確認
-                    existing_count = WeeklyResultAggregation.objects.filter(
-                        line=line.name,
-                        date=target_date
-                    ).count()
-                    
-                    if existing_count > 0 and not options['force']:
+            # 既存データの確認（1クエリ）
+            rebuild_dates = list(target_dates)
+            if not options['force']:
+                existing_dates = set(WeeklyResultAggregation.objects.filter(
+                    line=line.name,
+                    date__in=target_dates
+                ).values_list('date', flat=True).distinct())
+                rebuild_dates = [d for d in target_dates if d not in existing_dates]
+                
+                skipped_dates = [d for d in target_dates if d in existing_dates]
+                if len(skipped_dates) <= 7:
+                    for target_date in skipped_dates:
                         self.stdout.write(
                             f'  {target_date}: スキップ（既存データあり、--force で強制実行可能）'
                         )
-                        completed_operations += 1
-                        continue
-                    
-                    # 集計処理の実行
-                    with transaction.atomic():
-                        created_count = self.service.aggregate_single_date(line.id, target_date)
-                    
-                    # 進捗表示
+                elif skipped_dates:
+                    self.stdout.write(
+                        f'  {len(skipped_dates)}日: スキップ（既存データあり、--force で強制実行可能）'
+                    )
+                completed_operations += len(skipped_dates)
+            
+            def report_chunk(chunk, created_by_date):
+                nonlocal completed_operations
+                for target_date in chunk:
                     completed_operations += 1
                     progress = (completed_operations / total_operations) * 100
-                    
                     self.stdout.write(
-                        f'  {target_date}: 完了 ({created_count}件作成) '
+                        f'  {target_date}: 完了 ({created_by_date[target_date]}件作成) '
                         f'[{progress:.1f}%]'
                     )
-                    
-                    # データ整合性検証
-                    if options['validate']:
-                        is_valid = self.service.validate_aggregation(line.id, target_date)
-                        if not is_valid:
+            
+            try:
+                stats = self.service.aggregate_dates_in_chunks(
+                    line.id, rebuild_dates, chunk_days=options['chunk_days'], progress=report_chunk
+                )
+                total_source_rows += stats['source_rows']
+                total_elapsed += stats['elapsed']
+                
+                if stats['days']:
+                    self.stdout.write(
+                        f'  実績{stats["source_rows"]}行 → {stats["records"]}件 '
+                        f'({self._format_duration(stats["elapsed"])}, {stats["rows_per_second"]:.0f}行/秒)'
+                    )
+                
+                # データ整合性検証
+                if options['validate']:
+                    for target_date in rebuild_dates:
+                        if not self.service.validate_aggregation(line.id, target_date):
                             self.stdout.write(
-                                self.style.WARNING(f'    警告: データ整合性に問題があります')
+                                self.style.WARNING(f'    警告: {target_date} のデータ整合性に問題があります')
                             )
-                    
+                
+            except Exception as e:
+                self.logger.error(f"集計エラー: ライン={line.name}, エラー={e}")
+                self.stdout.write(
+                    self.style.ERROR(f'  エラー - {e}')
+                )
+                completed_operations = min(total_operations, completed_operations + len(rebuild_dates))
+            
+            if options['hourly']:
+                try:
+                    self._execute_hourly_aggregation(line, target_dates, options)
                 except Exception as e:
-                    self.logger.error(f"集計エラー: ライン={line.name}, 日付={target_date}, エラー={e}")
-                    self.stdout.write(
-                        self.style.ERROR(f'  {target_date}: エラー - {e}')
-                    )
-                    completed_operations += 1
-                    continue
+                    self.logger.error(f"時間別集計エラー: ライン={line.name}, エラー={e}")
+                    self.stdout.write(self.style.ERROR(f'  時間別: エラー - {e}'))
         
         # 処理結果のサマリー
         self.stdout.write('')
         self.stdout.write(self.style.HTTP_INFO('=== 処理結果 ==='))
         self.stdout.write(f'総処理数: {total_operations}')
         self.stdout.write(f'完了数: {completed_operations}')
+        if total_elapsed > 0:
+            self.stdout.write(
+                f'処理速度: {total_source_rows / total_elapsed:.0f}行/秒 '
+                f'(実績{total_source_rows}行, {self._format_duration(total_elapsed)})'
+            )
         
         # 最終的なデータ統計
         total_aggregations = WeeklyResultAggregation.objects.count()
         self.stdout.write(f'総集計レコード数: {total_aggregations}')
+        if options['hourly']:
+            self.stdout.write(f'時間別集計レコード数: {HourlyResultAggregation.objects.count()}')
+    
+    def _execute_parallel_aggregation(self, target_lines, target_dates, options):
+        """集計処理をプロセスプールで並列実行（ライン × 日付範囲の作業単位ごと）"""
+        unit_days = options['chunk_days'] or getattr(settings, 'AGGREGATION_CHUNK_DAYS', 31)
+        units = build_work_units(target_lines, target_dates, unit_days)
+        total_days = len(target_lines) * len(target_dates)
+        completed_days = 0
+        
+        self.stdout.write(self.style.HTTP_INFO(
+            f'集計処理を開始します...（{len(units)}作業単位, {options["workers"]}ワーカー）'
+        ))
+        
+        def report(result):
+            nonlocal completed_days
+            completed_days += len(result.unit.dates)
+            progress = (completed_days / total_days) * 100
+            if result.success:
+                message = (
+                    f'  {result.unit.label}: 完了 ({result.records}件作成, 実績{result.source_rows}行'
+                    f'{f", スキップ{result.skipped_days}日" if result.skipped_days else ""}'
+                    f'{f", 時間別{result.hourly_records}件" if options["hourly"] else ""}'
+                    f'{f", 試行{result.attempts}回" if result.attempts > 1 else ""}) '
+                    f'[{progress:.1f}%]'
+                )
+                self.stdout.write(message)
+                for target_date in result.invalid_dates:
+                    self.stdout.write(
+                        self.style.WARNING(f'    警告: {target_date} のデータ整合性に問題があります')
+                    )
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f'  {result.unit.label}: エラー - {result.error} (試行{result.attempts}回) [{progress:.1f}%]'
+                ))
+        
+        started = time.perf_counter()
+        results = run_work_units(
+            units,
+            options['workers'],
+            on_result=report,
+            force=options['force'],
+            hourly=options['hourly'],
+            validate=options['validate'],
+            chunk_days=options['chunk_days'],
+            max_retries=options['retries']
+        )
+        elapsed = time.perf_counter() - started
+        
+        failed = [result for result in results if not result.success]
+        source_rows = sum(result.source_rows for result in results)
+        
+        self.stdout.write('')
+        self.stdout.write(self.style.HTTP_INFO('=== 処理結果 ==='))
+        self.stdout.write(f'作業単位: {len(results) - len(failed)}/{len(units)} 成功')
+        self.stdout.write(f'作成レコード数: {sum(result.records for result in results)}')
+        if options['hourly']:
+            self.stdout.write(f'時間別作成レコード数: {sum(result.hourly_records for result in results)}')
+        self.stdout.write(
+            f'処理速度: {source_rows / elapsed if elapsed > 0 else 0:.0f}行/秒 '
+            f'(実績{source_rows}行, {self._format_duration(elapsed)}, '
+            f'{total_days / elapsed if elapsed > 0 else 0:.1f}ライン日/秒)'
+        )
+        
+        if failed:
+            for result in failed:
+                self.stdout.write(self.style.ERROR(f'  失敗: {result.unit.label} - {result.error}'))
+            raise CommandError(f'{len(failed)}件の作業単位が失敗しました。')
+    
+    def _execute_hourly_aggregation(self, line, target_dates, options):
+        """時間別集計を実行（ライン単位で対象期間を1回のクエリで集計）"""
+        if options['force']:
+            rebuild_dates = list(target_dates)
+        else:
+            existing_dates = set(HourlyResultAggregation.objects.filter(
+                line=line.name,
+                date__in=target_dates
+            ).values_list('date', flat=True).distinct())
+            rebuild_dates = [d for d in target_dates if d not in existing_dates]
+            if existing_dates:
+                self.stdout.write(
+                    f'  時間別: {len(existing_dates)}日スキップ（既存データあり、--force で強制実行可能）'
+                )
+        
+        if not rebuild_dates:
+            return
+        
+        created_count = self.service.aggregate_hourly_dates(line.id, rebuild_dates)
+        self.stdout.write(f'  時間別: 完了 ({created_count}件作成) [{len(rebuild_dates)}日]')
+        
+        if options['validate']:
+            for target_date in rebuild_dates:
+                if not self.service.validate_hourly_aggregation(line.id, target_date):
+                    self.stdout.write(
+                        self.style.WARNING(f'    警告: {target_date} の時間別集計の整合性に問題があります')
+                    )
     
     def _format_duration(self, seconds):
         """秒数を読みやすい形式に変換"""
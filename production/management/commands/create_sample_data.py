@@ -9,6 +9,7 @@ from production.models import (
     PartChangeDowntime, WorkCalendar, WorkingDay, DashboardCardSetting, UserPreference
 )
 from production.utils import calculate_planned_pph_for_date
+from production.bulk_load import aggregation_deferred
 
 
 class Command(BaseCommand):
@@ -58,12 +59,14 @@ class Command(BaseCommand):
         # 8. ダッシュボード設定作成
         self.create_dashboard_settings()
         
-        # 9. 計画作成（過去1週間分）
-        plans = self.create_plans(lines, parts, machines)
-        
-        # 10. 実績作成（オプション）
-        if options['with_results']:
-            self.create_results(plans)
+        # 9-10. 計画・実績作成（集計・計画PPH再計算は終了時にまとめて実行）
+        with aggregation_deferred():
+            # 9. 計画作成（過去1週間分）
+            plans = self.create_plans(lines, parts, machines)
+            
+            # 10. 実績作成（オプション）
+            if options['with_results']:
+                self.create_results(plans)
         
         # 11. ユーザーアクセス設定
         self.create_user_access(lines)
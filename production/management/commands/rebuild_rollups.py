@@ -0,0 +1,127 @@
+"""
+週・月の期間別集計（PeriodResultAggregation）の再構築・整合性検証
+
+使用例:
+python manage.py rebuild_rollups --all-lines
+python manage.py rebuild_rollups --line-id 1 --start-date 2025-01-01 --end-date 2025-03-31
+python manage.py rebuild_rollups --all-lines --check
+"""
+
+import logging
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from production.models import Line
+from production.rollups import find_rollup_inconsistencies, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = '日別集計から週・月の期間別集計を再構築、または整合性を検証します'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.logger = logging.getLogger(__name__)
+
+    def add_arguments(self, parser):
+        """コマンドライン引数を定義"""
+        parser.add_argument(
+            '--line-id',
+            type=int,
+            help='対象のライン ID'
+        )
+
+        parser.add_argument(
+            '--all-lines',
+            action='store_true',
+            help='全ラインを対象にする'
+        )
+
+        parser.add_argument(
+            '--start-date',
+            type=str,
+            help='開始日（YYYY-MM-DD形式、省略時は日別集計の最初の日）'
+        )
+
+        parser.add_argument(
+            '--end-date',
+            type=str,
+            help='終了日（YYYY-MM-DD形式、省略時は日別集計の最後の日）'
+        )
+
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='再構築せず、日別集計との整合性のみ検証'
+        )
+
+    def handle(self, *args, **options):
+        """メインの処理"""
+        if not options['line_id'] and not options['all_lines']:
+            raise CommandError('--line-id または --all-lines のいずれかを指定してください。')
+        if options['line_id'] and options['all_lines']:
+            raise CommandError('--line-id と --all-lines は同時に指定できません。')
+
+        start_date = self._parse_date(options['start_date'])
+        end_date = self._parse_date(options['end_date'])
+        if start_date and end_date and start_date > end_date:
+            raise CommandError('開始日は終了日より前の日付を指定してください。')
+
+        if options['all_lines']:
+            lines = list(Line.objects.filter(is_active=True))
+        else:
+            lines = list(Line.objects.filter(id=options['line_id']))
+            if not lines:
+                raise CommandError(f"ライン ID {options['line_id']} が見つかりません。")
+
+        if options['check']:
+            self._check(lines, start_date, end_date)
+        else:
+            self._rebuild(lines, start_date, end_date)
+
+    def _parse_date(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'日付形式が正しくありません（YYYY-MM-DD形式で指定してください）: {value}')
+
+    def _rebuild(self, lines, start_date, end_date):
+        """期間別集計を再構築"""
+        self.stdout.write(self.style.HTTP_INFO('期間別集計を再構築します...'))
+        total = 0
+        started = time.perf_counter()
+        for line in lines:
+            created = rebuild_rollups(line.name, start_date, end_date)
+            total += created
+            self.stdout.write(f'  {line.name}: {created}件作成')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'再構築完了: {total}件 ({time.perf_counter() - started:.2f}秒)'
+        ))
+
+    def _check(self, lines, start_date, end_date):
+        """期間別集計と日別集計の整合性を検証"""
+        self.stdout.write(self.style.HTTP_INFO('期間別集計の整合性を検証します...'))
+        total = 0
+        for line in lines:
+            mismatches = find_rollup_inconsistencies(line.name, start_date, end_date)
+            total += len(mismatches)
+            if not mismatches:
+                self.stdout.write(f'  {line.name}: 整合')
+                continue
+
+            self.stdout.write(self.style.ERROR(f'  {line.name}: 不整合 {len(mismatches)}件'))
+            for mismatch in mismatches:
+                self.stdout.write(
+                    f"    {mismatch['period']} {mismatch['date']} / {mismatch['part']} / {mismatch['judgment']}: "
+                    f"数量 日別={mismatch['expected_quantity']} 期間別={mismatch['actual_quantity']}, "
+                    f"件数 日別={mismatch['expected_count']} 期間別={mismatch['actual_count']}"
+                )
+
+        if total:
+            self.stdout.write(self.style.ERROR(
+                f'{total}件の不整合が検出されました。--check を外して実行すると再構築できます。'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('すべての期間別集計が日別集計と一致しています。'))
@@ -0,0 +1,154 @@
+"""
+集計ジョブワーカー
+
+使用例:
+python manage.py run_workers
+python manage.py run_workers --once
+python manage.py run_workers --poll-interval 2 --metrics-interval 60
+python manage.py run_workers --stats
+"""
+
+import json
+import logging
+import signal
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from production.broadcast import broadcast_coalescer
+from production.jobs import claim, default_worker_id, purge_finished, queue_metrics, reclaim_expired, run_job
+
+
+class Command(BaseCommand):
+    help = '集計・計画PPH再計算ジョブを処理するワーカーを起動します'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.logger = logging.getLogger(__name__)
+        self.stopping = False
+
+    def add_arguments(self, parser):
+        """コマンドライン引数を定義"""
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='実行可能なジョブを処理したら終了'
+        )
+
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            help='処理するジョブ数の上限（到達したら終了）'
+        )
+
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='ジョブがない場合の待機秒数（デフォルト: 1秒）'
+        )
+
+        parser.add_argument(
+            '--metrics-interval',
+            type=int,
+            default=60,
+            help='キュー指標を出力する間隔（秒、デフォルト: 60秒）'
+        )
+
+        parser.add_argument(
+            '--worker-id',
+            type=str,
+            help='ワーカー識別子（デフォルト: ホスト名:PID）'
+        )
+
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='キュー指標をJSONで表示して終了'
+        )
+
+    def handle(self, *args, **options):
+        """メインの処理"""
+        if options['stats']:
+            self.stdout.write(json.dumps(queue_metrics(), indent=2, ensure_ascii=False))
+            return
+
+        if options['poll_interval'] <= 0:
+            raise CommandError('--poll-interval には0より大きい値を指定してください。')
+
+        worker_id = options['worker_id'] or default_worker_id()
+        signal.signal(signal.SIGTERM, self._request_stop)
+
+        self.stdout.write(self.style.HTTP_INFO(f'ワーカー {worker_id} を起動しました'))
+
+        stats = {'processed': 0, 'succeeded': 0, 'failed': 0, 'reclaimed': 0}
+        last_maintenance = 0.0
+
+        try:
+            while not self.stopping:
+                close_old_connections()
+
+                # 期限切れジョブの回収・古いジョブの削除・指標の出力
+                if time.monotonic() - last_maintenance >= options['metrics_interval']:
+                    stats['reclaimed'] += reclaim_expired()
+                    purge_finished()
+                    self._write_metrics()
+                    last_maintenance = time.monotonic()
+
+                jobs = claim(worker_id)
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                for job in jobs:
+                    started = time.perf_counter()
+                    success = run_job(job)
+                    elapsed = time.perf_counter() - started
+
+                    stats['processed'] += 1
+                    stats['succeeded' if success else 'failed'] += 1
+
+                    label = f'{job.get_kind_display()} {job.line.name} {job.date}'
+                    if success:
+                        self.stdout.write(f'  {label}: 完了 ({elapsed:.2f}秒, 試行{job.attempts}回)')
+                    else:
+                        self.stdout.write(self.style.ERROR(f'  {label}: 失敗 (試行{job.attempts}/{job.max_attempts}回)'))
+
+                if options['max_jobs'] and stats['processed'] >= options['max_jobs']:
+                    break
+
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # 送信待ちの WebSocket 通知を終了前に送信
+            broadcast_coalescer.flush()
+
+        self.stdout.write('')
+        self.stdout.write(self.style.HTTP_INFO('=== 処理結果 ==='))
+        self.stdout.write(f'処理数: {stats["processed"]}')
+        self.stdout.write(f'成功: {stats["succeeded"]}')
+        self.stdout.write(f'失敗: {stats["failed"]}')
+        if stats['reclaimed']:
+            self.stdout.write(f'期限切れ回収: {stats["reclaimed"]}')
+        self._write_metrics()
+
+    def _request_stop(self, signum, frame):
+        """SIGTERM 受信時は実行中のジョブを完了してから終了"""
+        self.stopping = True
+
+    def _write_metrics(self):
+        """キュー指標を表示"""
+        try:
+            metrics = queue_metrics()
+        except Exception as e:
+            self.logger.error(f"キュー指標取得エラー: {e}")
+            return
+
+        self.stdout.write(
+            f'キュー: 待機{metrics["depth"]}件 '
+            f'(最古 {metrics["oldest_pending_seconds"]:.0f}秒), '
+            f'実行中{metrics["counts"]["running"]}件, 失敗{metrics["counts"]["failed"]}件, '
+            f'平均待ち時間 {metrics["avg_wait_seconds"]:.1f}秒, '
+            f'平均実行時間 {metrics["avg_run_seconds"]:.1f}秒'
+        )
@@ -6,6 +6,7 @@ from django.utils import timezone
 from django.db import transaction
 
 from production.models import Plan, Result, WorkCalendar
+from production.bulk_load import aggregation_deferred
 
 
 def generate_unique_serial(existing_serials, length=15):
@@ -41,6 +42,7 @@ class Command(BaseCommand):
             help='指定日以降何日分実行するか（デフォルト:1日）'
         )
 
+    @aggregation_deferred()
     def handle(self, *args, **options):
         # 実績テーブルをクリア（Oracleデータベース）
         Result.objects.using('oracle').all().delete()
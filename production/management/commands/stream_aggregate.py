@@ -0,0 +1,187 @@
+"""
+外部から挿入された実績のストリーム集計
+
+使用例:
+python manage.py stream_aggregate
+python manage.py stream_aggregate --once
+python manage.py stream_aggregate --batch-size 1000 --interval 2
+python manage.py stream_aggregate --reset --since 2025-01-15T08:30:00
+python manage.py stream_aggregate --status
+"""
+
+import json
+import logging
+import signal
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from production.broadcast import broadcast_coalescer
+from production.streaming import (
+    DEFAULT_STREAM, process_batch, reset_watermark, stream_aggregation_enabled, stream_status
+)
+
+
+class Command(BaseCommand):
+    help = '設備・ETLから挿入された実績をウォーターマークで追跡し、集計テーブルに反映します'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.logger = logging.getLogger(__name__)
+        self.stopping = False
+
+    def add_arguments(self, parser):
+        """コマンドライン引数を定義"""
+        parser.add_argument(
+            '--stream',
+            type=str,
+            default=DEFAULT_STREAM,
+            help=f'ストリーム名（ウォーターマークの保存キー、デフォルト: {DEFAULT_STREAM}）'
+        )
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='1回のマイクロバッチで処理する実績の上限（デフォルト: 500件）'
+        )
+
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='未処理の実績がない場合の待機秒数（デフォルト: 1秒）'
+        )
+
+        parser.add_argument(
+            '--report-interval',
+            type=int,
+            default=60,
+            help='処理状況を出力する間隔（秒、デフォルト: 60秒）'
+        )
+
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='未処理の実績を処理したら終了'
+        )
+
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='ウォーターマークを設定し直して終了（--since 省略時は既存の実績の末尾）'
+        )
+
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='--reset で指定する開始日時（ISO 8601、この日時より後に作成された実績から処理）'
+        )
+
+        parser.add_argument(
+            '--status',
+            action='store_true',
+            help='ウォーターマークと遅延をJSONで表示して終了'
+        )
+
+    def handle(self, *args, **options):
+        """メインの処理"""
+        stream = options['stream']
+
+        if options['status']:
+            self.stdout.write(json.dumps(stream_status(stream), indent=2, ensure_ascii=False))
+            return
+
+        if options['reset']:
+            since = self._parse_since(options['since'])
+            watermark = reset_watermark(stream, since)
+            self.stdout.write(self.style.SUCCESS(
+                f'ウォーターマークを設定しました: {watermark.last_created_at} / ID {watermark.last_id}'
+            ))
+            return
+
+        if not stream_aggregation_enabled():
+            raise CommandError(
+                'STREAM_AGGREGATION_ENABLED が無効です。シグナル・一括取り込みによる集計と二重に集計されるため、'
+                '設定で有効にしてから起動してください。'
+            )
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size には0より大きい値を指定してください。')
+        if options['interval'] <= 0:
+            raise CommandError('--interval には0より大きい値を指定してください。')
+
+        signal.signal(signal.SIGTERM, self._request_stop)
+        self.stdout.write(self.style.HTTP_INFO(f'ストリーム {stream} の集計を開始しました'))
+
+        totals = {'batches': 0, 'rows': 0, 'skipped': 0, 'keys': 0}
+        window = {'rows': 0, 'started': time.monotonic()}
+        last_report = time.monotonic()
+        lag_seconds = 0.0
+
+        try:
+            while not self.stopping:
+                close_old_connections()
+
+                started = time.perf_counter()
+                stats = process_batch(stream, options['batch_size'])
+                elapsed = time.perf_counter() - started
+
+                if stats.rows:
+                    totals['batches'] += 1
+                    totals['rows'] += stats.rows
+                    totals['skipped'] += stats.skipped
+                    totals['keys'] += stats.keys
+                    window['rows'] += stats.rows
+                    self.logger.debug(
+                        f"マイクロバッチ: {stats.rows}件, キー{stats.keys}件, {elapsed * 1000:.0f}ms"
+                    )
+                lag_seconds = stats.lag_seconds
+
+                if time.monotonic() - last_report >= options['report_interval']:
+                    self._write_report(window, lag_seconds)
+                    window = {'rows': 0, 'started': time.monotonic()}
+                    last_report = time.monotonic()
+
+                if stats.caught_up:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # 送信待ちの WebSocket 通知を終了前に送信
+            broadcast_coalescer.flush()
+
+        self.stdout.write('')
+        self.stdout.write(self.style.HTTP_INFO('=== 処理結果 ==='))
+        self.stdout.write(f'バッチ数: {totals["batches"]}')
+        self.stdout.write(f'処理件数: {totals["rows"]}')
+        if totals['skipped']:
+            self.stdout.write(f'スキップ: {totals["skipped"]} (未登録ライン・機種名なし)')
+        self.stdout.write(f'更新キー数: {totals["keys"]}')
+        self.stdout.write(f'遅延: {lag_seconds:.1f}秒')
+
+    def _parse_since(self, value):
+        """--since の日時を解析"""
+        if not value:
+            return None
+        since = parse_datetime(value)
+        if since is None:
+            raise CommandError(f'日時の形式が正しくありません: {value}')
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
+    def _request_stop(self, signum, frame):
+        """SIGTERM 受信時は処理中のバッチを完了してから終了"""
+        self.stopping = True
+
+    def _write_report(self, window, lag_seconds):
+        """直近の処理件数・スループット・遅延を表示"""
+        elapsed = max(time.monotonic() - window['started'], 1e-9)
+        self.stdout.write(
+            f'{timezone.localtime():%H:%M:%S} 処理 {window["rows"]}件 '
+            f'({window["rows"] / elapsed:.1f}件/秒), 遅延 {lag_seconds:.1f}秒'
+        )
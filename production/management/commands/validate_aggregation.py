@@ -6,13 +6,14 @@ python manage.py validate_aggregation --line-id 1 --date 2025-01-15
 python manage.py validate_aggregation --all-lines --start-date 2025-01-01 --end-date 2025-01-31
 python manage.py validate_aggregation --line-id 1 --date 2025-01-15 --repair
 python manage.py validate_aggregation --all-lines --date 2025-01-15 --detailed
+python manage.py validate_aggregation --line-id 1 --date 2025-01-15 --hourly --repair
 """
 
 import logging
 from datetime import datetime, date, timedelta
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from production.models import Line, WeeklyResultAggregation
+from production.models import Line, Result, WeeklyResultAggregation, HourlyResultAggregation
 from production.services import AggregationService
 
 
@@ -71,6 +72,12 @@ class Command(BaseCommand):
             help='詳細な検証結果を表示'
         )
         
+        parser.add_argument(
+            '--hourly',
+            action='store_true',
+            help='時間別集計（HourlyResultAggregation）も検証'
+        )
+        
         parser.add_argument(
             '--report-only',
             action='store_true',
@@ -224,6 +231,9 @@ class Command(BaseCommand):
         if options['detailed']:
             self.stdout.write('詳細モード: 詳細な検証結果を表示')
         
+        if options['hourly']:
+            self.stdout.write('時間別集計: 検証対象に含める')
+        
         if options['report_only']:
             self.stdout.write('レポートモード: 修復は行わず結果のみ表示')
         
@@ -263,15 +273,30 @@ class Command(BaseCommand):
             
             self.stdout.write(f'ライン: {line.name} の検証中...')
             
+            # 期間全体のフィンガープリントを比較（実績・集計テーブルそれぞれ1クエリ）
+            try:
+                aggregated_dates = set(WeeklyResultAggregation.objects.filter(
+                    line=line.name,
+                    date__in=target_dates
+                ).values_list('date', flat=True).distinct())
+                mismatches = {
+                    mismatch['date']: mismatch
+                    for mismatch in self.service.find_inconsistencies(line.id, min(target_dates), max(target_dates))
+                }
+            except Exception as e:
+                self.logger.error(f"検証エラー: ライン={line.name}, エラー={e}")
+                self.stdout.write(self.style.ERROR(f'  検証エラー - {e}'))
+                completed_operations += len(target_dates)
+                validation_results['summary_by_line'][line.name] = line_results
+                continue
+            
             for target_date in target_dates:
                 try:
-                    # 集計データの存在確認
-                    aggregation_count = WeeklyResultAggregation.objects.filter(
-                        line=line.name,
-                        date=target_date
-                    ).count()
+                    if options['hourly']:
+                        self._validate_hourly(line, target_date, options, validation_results, line_results)
                     
-                    if aggregation_count == 0:
+                    # 集計データの存在確認
+                    if target_date not in aggregated_dates:
                         detail = {
                             'date': target_date,
                             'status': 'no_aggregation',
@@ -288,7 +313,8 @@ class Command(BaseCommand):
                         continue
                     
                     # 整合性検証
-                    is_consistent = self.service.validate_aggregation(line.id, target_date)
+                    mismatch = mismatches.get(target_date)
+                    is_consistent = mismatch is None
                     
                     validation_results['total_checks'] += 1
                     line_results['total_checks'] += 1
@@ -314,12 +340,20 @@ class Command(BaseCommand):
                         detail = {
                             'date': target_date,
                             'status': 'inconsistent',
-                            'message': '不整合検出'
+                            'message': '不整合検出',
+                            'source': mismatch['source'],
+                            'aggregated': mismatch['aggregated'],
+                            'deltas': mismatch['deltas']
                         }
                         
                         self.stdout.write(
-                            self.style.ERROR(f'  {target_date}: 不整合検出')
+                            self.style.ERROR(
+                                f'  {target_date}: 不整合検出 '
+                                f'(件数 {mismatch["source"]["rows"]}/{mismatch["aggregated"]["rows"]}, '
+                                f'数量 {mismatch["source"]["quantity"]}/{mismatch["aggregated"]["quantity"]})'
+                            )
                         )
+                        self._display_deltas(mismatch['deltas'], options)
                         
                         # 自動修復の実行
                         if options['repair'] and not options['report_only']:
@@ -388,6 +422,73 @@ class Command(BaseCommand):
         
         return validation_results
     
+    def _display_deltas(self, deltas, options):
+        """キー別の差分を表示（詳細モード以外は先頭5件まで）"""
+        shown = deltas if options['detailed'] else deltas[:5]
+        for delta in shown:
+            self.stdout.write(
+                f'    {delta["machine"] or "-"} / {delta["part"]} / {delta["judgment"]}: '
+                f'数量 実績={delta["source_quantity"]} 集計={delta["aggregated_quantity"]}, '
+                f'件数 実績={delta["source_count"]} 集計={delta["aggregated_count"]}'
+            )
+        if len(deltas) > len(shown):
+            self.stdout.write(f'    ...他{len(deltas) - len(shown)}キー（--detailed で全件表示）')
+    
+    def _validate_hourly(self, line, target_date, options, validation_results, line_results):
+        """時間別集計の整合性を検証（必要に応じて修復）"""
+        start_datetime, end_datetime = self.service._get_work_period_for_date(line.id, target_date)
+        has_results = Result.objects.filter(
+            line=line.name,
+            timestamp__gte=start_datetime,
+            timestamp__lt=end_datetime
+        ).exists()
+        has_aggregation = HourlyResultAggregation.objects.filter(
+            line=line.name,
+            date=target_date
+        ).exists()
+        if not has_results and not has_aggregation:
+            return
+        
+        validation_results['total_checks'] += 1
+        line_results['total_checks'] += 1
+        
+        if self.service.validate_hourly_aggregation(line.id, target_date):
+            validation_results['consistent_checks'] += 1
+            line_results['consistent_checks'] += 1
+            detail = {
+                'date': target_date,
+                'status': 'consistent',
+                'message': '時間別: 整合性OK'
+            }
+            if options['detailed']:
+                self.stdout.write(self.style.SUCCESS(f'  {target_date}: 時間別 整合性OK'))
+        else:
+            validation_results['total_inconsistencies'] += 1
+            line_results['inconsistencies'] += 1
+            detail = {
+                'date': target_date,
+                'status': 'inconsistent',
+                'message': '時間別: 不整合検出'
+            }
+            self.stdout.write(self.style.ERROR(f'  {target_date}: 時間別 不整合検出'))
+            
+            if options['repair'] and not options['report_only']:
+                if self.service.repair_hourly_aggregation(line.id, target_date):
+                    validation_results['repaired_count'] += 1
+                    line_results['repaired'] += 1
+                    detail['status'] = 'repaired'
+                    detail['message'] = '時間別: 不整合を修復しました'
+                    self.stdout.write(self.style.SUCCESS(f'    → 修復完了'))
+                else:
+                    validation_results['failed_repairs'] += 1
+                    line_results['failed_repairs'] += 1
+                    detail['status'] = 'repair_failed'
+                    detail['message'] = '時間別: 修復に失敗しました'
+                    self.stdout.write(self.style.ERROR(f'    → 修復失敗'))
+        
+        line_results['details'].append(detail)
+        validation_results['details'].append(detail)
+    
     def _display_results(self, results, options):
         """検証結果を表示"""
         self.stdout.write('')
@@ -448,7 +549,8 @@ class Command(BaseCommand):
                     {
                         'date': detail['date'].isoformat() if hasattr(detail['date'], 'isoformat') else str(detail['date']),
                         'status': detail['status'],
-                        'message': detail['message']
+                        'message': detail['message'],
+                        **({'deltas': detail['deltas']} if detail.get('deltas') else {})
                     }
                     for detail in results['details']
                 ]
@@ -0,0 +1,114 @@
+"""
+確定済みの週・月のグラフスナップショット（GraphSnapshot）を作成
+
+使用例:
+python manage.py warm_graph_snapshots
+python manage.py warm_graph_snapshots --weeks 12 --months 6
+python manage.py warm_graph_snapshots --line-id 1 --period month --force
+"""
+
+import logging
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from production.graph_snapshots import BUILT, FRESH, refresh_snapshot
+from production.models import Line
+from production.rollups import MONTH, PERIODS, WEEK, period_start
+
+
+class Command(BaseCommand):
+    help = '確定済みの週・月の週別/月別グラフデータを事前に作成し、スナップショットとして保存します'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.logger = logging.getLogger(__name__)
+
+    def add_arguments(self, parser):
+        """コマンドライン引数を定義"""
+        parser.add_argument(
+            '--line-id',
+            type=int,
+            help='対象のライン ID（省略時は有効な全ライン）'
+        )
+
+        parser.add_argument(
+            '--period',
+            choices=PERIODS,
+            help='対象の期間種別（省略時は週・月の両方）'
+        )
+
+        parser.add_argument(
+            '--weeks',
+            type=int,
+            default=8,
+            help='作成する直近の確定済みの週の数（デフォルト: 8週）'
+        )
+
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=3,
+            help='作成する直近の確定済みの月の数（デフォルト: 3か月）'
+        )
+
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='データバージョンが一致するスナップショットも作り直す'
+        )
+
+    def handle(self, *args, **options):
+        """メインの処理"""
+        if options['weeks'] < 0 or options['months'] < 0:
+            raise CommandError('--weeks / --months には0以上の値を指定してください。')
+
+        if options['line_id']:
+            lines = list(Line.objects.filter(id=options['line_id']))
+            if not lines:
+                raise CommandError(f"ライン ID {options['line_id']} が見つかりません。")
+        else:
+            lines = list(Line.objects.filter(is_active=True))
+
+        targets = []
+        if options['period'] in (None, WEEK):
+            targets += [(WEEK, day) for day in self._closed_weeks(options['weeks'])]
+        if options['period'] in (None, MONTH):
+            targets += [(MONTH, day) for day in self._closed_months(options['months'])]
+
+        self.stdout.write(self.style.HTTP_INFO(
+            f'グラフスナップショットを作成します: {len(lines)}ライン × {len(targets)}期間'
+        ))
+        counts = {BUILT: 0, FRESH: 0}
+        started = time.perf_counter()
+        for line in lines:
+            built = 0
+            for period, day in targets:
+                try:
+                    status = refresh_snapshot(line.id, period, day, force=options['force'])
+                except Exception as e:
+                    self.logger.error(f"スナップショット作成エラー: {line.name} {period} {day} - {e}")
+                    self.stdout.write(self.style.ERROR(f'  {line.name} {period} {day}: {e}'))
+                    continue
+                if status in counts:
+                    counts[status] += 1
+                built += status == BUILT
+            self.stdout.write(f'  {line.name}: {built}件作成')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'作成: {counts[BUILT]}件, 最新: {counts[FRESH]}件 ({time.perf_counter() - started:.2f}秒)'
+        ))
+
+    def _closed_weeks(self, count):
+        """前週から遡った週の月曜日"""
+        current = period_start(WEEK, timezone.localdate())
+        return [current - timedelta(weeks=i) for i in range(1, count + 1)]
+
+    def _closed_months(self, count):
+        """前月から遡った月の月初日"""
+        months = []
+        cursor = period_start(MONTH, timezone.localdate())
+        for _ in range(count):
+            cursor = period_start(MONTH, cursor - timedelta(days=1))
+            months.append(cursor)
+        return months
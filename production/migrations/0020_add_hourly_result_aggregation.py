@@ -0,0 +1,46 @@
+# Generated manually for hourly dashboard aggregation
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0019_optimized_result_data_migration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyResultAggregation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True, verbose_name='稼働日')),
+                ('line', models.CharField(db_index=True, max_length=100, verbose_name='ライン')),
+                ('hour', models.PositiveSmallIntegerField(help_text='work_start_timeからの経過時間（0-23）', verbose_name='時間帯')),
+                ('machine', models.CharField(blank=True, max_length=100, null=True, verbose_name='設備')),
+                ('part', models.CharField(max_length=100, verbose_name='機種')),
+                ('judgment', models.CharField(choices=[('OK', 'OK'), ('NG', 'NG')], max_length=2, verbose_name='判定')),
+                ('total_quantity', models.PositiveIntegerField(default=0, verbose_name='合計数量')),
+                ('result_count', models.PositiveIntegerField(default=0, verbose_name='実績件数')),
+                ('last_updated', models.DateTimeField(auto_now=True, verbose_name='最終更新')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='作成日時')),
+            ],
+            options={
+                'verbose_name': '時間別実績集計',
+                'verbose_name_plural': '時間別実績集計',
+                'ordering': ['-date', 'line', 'hour', 'part'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='hourlyresultaggregation',
+            index=models.Index(fields=['date', 'line', 'hour'], name='production_h_date_li_hour_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hourlyresultaggregation',
+            index=models.Index(fields=['date', 'line', 'judgment'], name='production_h_date_li_judg_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='hourlyresultaggregation',
+            unique_together={('date', 'line', 'hour', 'machine', 'part', 'judgment')},
+        ),
+    ]
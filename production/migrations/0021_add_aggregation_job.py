@@ -0,0 +1,52 @@
+# Generated manually for the background aggregation job queue
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0020_add_hourly_result_aggregation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('reaggregate', '実績再集計'), ('planned_pph', '計画PPH再計算')], max_length=20, verbose_name='種別')),
+                ('date', models.DateField(verbose_name='対象日')),
+                ('priority', models.SmallIntegerField(default=50, help_text='小さいほど優先', verbose_name='優先度')),
+                ('status', models.CharField(choices=[('pending', '待機中'), ('running', '実行中'), ('done', '完了'), ('failed', '失敗')], default='pending', max_length=10, verbose_name='状態')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='試行回数')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5, verbose_name='最大試行回数')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='実行可能日時')),
+                ('locked_by', models.CharField(blank=True, max_length=100, verbose_name='実行ワーカー')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='ロック日時')),
+                ('last_error', models.TextField(blank=True, verbose_name='最終エラー')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='登録日時')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='開始日時')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='終了日時')),
+                ('line', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='production.line', verbose_name='ライン')),
+            ],
+            options={
+                'verbose_name': '集計ジョブ',
+                'verbose_name_plural': '集計ジョブ',
+                'ordering': ['priority', 'available_at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='aggregationjob',
+            index=models.Index(fields=['status', 'priority', 'available_at'], name='production_job_claim_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aggregationjob',
+            index=models.Index(fields=['status', 'locked_at'], name='production_job_lock_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='aggregationjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('kind', 'line', 'date'), name='production_job_pending_uniq'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated manually for the stream_aggregate watermark
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0021_add_aggregation_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StreamWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='ストリーム名')),
+                ('last_created_at', models.DateTimeField(blank=True, null=True, verbose_name='最終作成日時')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='最終実績ID')),
+                ('processed_rows', models.BigIntegerField(default=0, verbose_name='処理件数')),
+                ('lag_seconds', models.FloatField(default=0, verbose_name='遅延(秒)')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='更新日時')),
+            ],
+            options={
+                'verbose_name': 'ストリーム集計位置',
+                'verbose_name_plural': 'ストリーム集計位置',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['created_at', 'id'], name='production_result_stream_idx'),
+        ),
+    ]
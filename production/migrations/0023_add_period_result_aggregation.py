@@ -0,0 +1,73 @@
+# Generated manually for the week / month rollup of daily aggregations
+
+import logging
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+logger = logging.getLogger(__name__)
+
+
+def build_rollups(apps, schema_editor):
+    """既存の日別集計から週・月の集計を作成（期間種別ごとに1回の GROUP BY）"""
+    WeeklyResultAggregation = apps.get_model('production', 'WeeklyResultAggregation')
+    PeriodResultAggregation = apps.get_model('production', 'PeriodResultAggregation')
+
+    for period, trunc in (('week', TruncWeek), ('month', TruncMonth)):
+        rows = WeeklyResultAggregation.objects.annotate(
+            period_start=trunc('date')
+        ).order_by().values(
+            'period_start', 'line', 'part', 'judgment'
+        ).annotate(
+            quantity=Sum('total_quantity'),
+            count=Sum('result_count')
+        )
+        records = [
+            PeriodResultAggregation(
+                period=period,
+                date=row['period_start'],
+                line=row['line'],
+                part=row['part'],
+                judgment=row['judgment'],
+                total_quantity=row['quantity'] or 0,
+                result_count=row['count'] or 0
+            )
+            for row in rows.iterator()
+        ]
+        PeriodResultAggregation.objects.bulk_create(records, batch_size=1000)
+        logger.info(f"期間別集計を作成: {period} {len(records)}件")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0022_add_stream_watermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodResultAggregation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'ISO週'), ('month', '月')], max_length=5, verbose_name='期間種別')),
+                ('date', models.DateField(help_text='ISO週の月曜日または月初日', verbose_name='期間開始日')),
+                ('line', models.CharField(max_length=100, verbose_name='ライン')),
+                ('part', models.CharField(max_length=100, verbose_name='機種')),
+                ('judgment', models.CharField(choices=[('OK', 'OK'), ('NG', 'NG')], max_length=2, verbose_name='判定')),
+                ('total_quantity', models.PositiveIntegerField(default=0, verbose_name='合計数量')),
+                ('result_count', models.PositiveIntegerField(default=0, verbose_name='実績件数')),
+                ('last_updated', models.DateTimeField(auto_now=True, verbose_name='最終更新')),
+            ],
+            options={
+                'verbose_name': '期間別実績集計',
+                'verbose_name_plural': '期間別実績集計',
+                'ordering': ['-date', 'line', 'part'],
+                'unique_together': {('period', 'date', 'line', 'part', 'judgment')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='periodresultaggregation',
+            index=models.Index(fields=['line', 'period', 'date'], name='production_rollup_line_idx'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated manually for materialized weekly/monthly graph snapshots
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0023_add_period_result_aggregation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GraphSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'ISO週'), ('month', '月')], max_length=5, verbose_name='期間種別')),
+                ('period_key', models.CharField(help_text='2025-W03 または 2025-01 形式', max_length=10, verbose_name='期間キー')),
+                ('data_version', models.CharField(max_length=100, verbose_name='データバージョン')),
+                ('payload', models.JSONField(verbose_name='グラフデータ')),
+                ('built_at', models.DateTimeField(auto_now=True, verbose_name='作成日時')),
+                ('line', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='production.line', verbose_name='ライン')),
+            ],
+            options={
+                'verbose_name': 'グラフスナップショット',
+                'verbose_name_plural': 'グラフスナップショット',
+                'ordering': ['line', 'period', '-period_key'],
+                'unique_together': {('line', 'period', 'period_key')},
+            },
+        ),
+    ]
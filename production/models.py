@@ -4,7 +4,7 @@ from django.core.validators import MinValueValidator
 from django.utils import timezone
 import jpholiday
 from datetime import datetime, time, timedelta
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
@@ -201,6 +201,10 @@ class Result(models.Model):
     class Meta:
         verbose_name = '実績'
         verbose_name_plural = '実績'
+        indexes = [
+            # stream_aggregate の (created_at, id) ウォーターマークによる追跡用
+            models.Index(fields=['created_at', 'id'], name='production_result_stream_idx'),
+        ]
         ordering = ['-timestamp']
 
     def __str__(self):
@@ -244,6 +248,184 @@ class WeeklyResultAggregation(models.Model):
         return f'{self.date} - {self.line} - {self.part} - {self.judgment} ({self.total_quantity})'
 
 
+class PeriodResultAggregation(models.Model):
+    """ISO週・月単位の実績集計テーブル（WeeklyResultAggregation の日別集計から導出）"""
+    PERIOD_WEEK = 'week'
+    PERIOD_MONTH = 'month'
+    PERIOD_CHOICES = [
+        (PERIOD_WEEK, 'ISO週'),
+        (PERIOD_MONTH, '月'),
+    ]
+    JUDGMENT_CHOICES = [
+        ('OK', 'OK'),
+        ('NG', 'NG'),
+    ]
+
+    # 集計キー
+    period = models.CharField('期間種別', max_length=5, choices=PERIOD_CHOICES)
+    date = models.DateField('期間開始日', help_text='ISO週の月曜日または月初日')
+    line = models.CharField('ライン', max_length=100)
+    part = models.CharField('機種', max_length=100)
+    judgment = models.CharField('判定', max_length=2, choices=JUDGMENT_CHOICES)
+
+    # 集計値
+    total_quantity = models.PositiveIntegerField('合計数量', default=0)
+    result_count = models.PositiveIntegerField('実績件数', default=0)
+
+    # メタデータ
+    last_updated = models.DateTimeField('最終更新', auto_now=True)
+
+    class Meta:
+        verbose_name = '期間別実績集計'
+        verbose_name_plural = '期間別実績集計'
+        unique_together = ['period', 'date', 'line', 'part', 'judgment']
+        indexes = [
+            models.Index(fields=['line', 'period', 'date'], name='production_rollup_line_idx'),
+        ]
+        ordering = ['-date', 'line', 'part']
+
+    def __str__(self):
+        return f'{self.get_period_display()} {self.date} - {self.line} - {self.part} - {self.judgment} ({self.total_quantity})'
+
+
+class HourlyResultAggregation(models.Model):
+    """時間別の実績集計テーブル（稼働日・work_start_timeからの経過時間単位）"""
+    JUDGMENT_CHOICES = [
+        ('OK', 'OK'),
+        ('NG', 'NG'),
+    ]
+
+    # 集計キー
+    date = models.DateField('稼働日', db_index=True)
+    line = models.CharField('ライン', max_length=100, db_index=True)
+    hour = models.PositiveSmallIntegerField('時間帯', help_text='work_start_timeからの経過時間（0-23）')
+    machine = models.CharField('設備', max_length=100, blank=True, null=True)
+    part = models.CharField('機種', max_length=100)
+    judgment = models.CharField('判定', max_length=2, choices=JUDGMENT_CHOICES)
+
+    # 集計値
+    total_quantity = models.PositiveIntegerField('合計数量', default=0)
+    result_count = models.PositiveIntegerField('実績件数', default=0)
+
+    # メタデータ
+    last_updated = models.DateTimeField('最終更新', auto_now=True)
+    created_at = models.DateTimeField('作成日時', auto_now_add=True)
+
+    class Meta:
+        verbose_name = '時間別実績集計'
+        verbose_name_plural = '時間別実績集計'
+        unique_together = ['date', 'line', 'hour', 'machine', 'part', 'judgment']
+        indexes = [
+            models.Index(fields=['date', 'line', 'hour'], name='production_h_date_li_hour_idx'),
+            models.Index(fields=['date', 'line', 'judgment'], name='production_h_date_li_judg_idx'),
+        ]
+        ordering = ['-date', 'line', 'hour', 'part']
+
+    def __str__(self):
+        return f'{self.date} {self.hour}h - {self.line} - {self.part} - {self.judgment} ({self.total_quantity})'
+
+
+class AggregationJob(models.Model):
+    """集計・計画PPH再計算のバックグラウンドジョブ（run_workers コマンドで処理）"""
+    KIND_REAGGREGATE = 'reaggregate'
+    KIND_PLANNED_PPH = 'planned_pph'
+    KIND_CHOICES = [
+        (KIND_REAGGREGATE, '実績再集計'),
+        (KIND_PLANNED_PPH, '計画PPH再計算'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, '待機中'),
+        (STATUS_RUNNING, '実行中'),
+        (STATUS_DONE, '完了'),
+        (STATUS_FAILED, '失敗'),
+    ]
+
+    kind = models.CharField('種別', max_length=20, choices=KIND_CHOICES)
+    line = models.ForeignKey(Line, on_delete=models.CASCADE, verbose_name='ライン')
+    date = models.DateField('対象日')
+    priority = models.SmallIntegerField('優先度', default=50, help_text='小さいほど優先')
+    status = models.CharField('状態', max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+
+    attempts = models.PositiveSmallIntegerField('試行回数', default=0)
+    max_attempts = models.PositiveSmallIntegerField('最大試行回数', default=5)
+    available_at = models.DateTimeField('実行可能日時', default=timezone.now)
+    locked_by = models.CharField('実行ワーカー', max_length=100, blank=True)
+    locked_at = models.DateTimeField('ロック日時', null=True, blank=True)
+    last_error = models.TextField('最終エラー', blank=True)
+
+    created_at = models.DateTimeField('登録日時', auto_now_add=True)
+    started_at = models.DateTimeField('開始日時', null=True, blank=True)
+    finished_at = models.DateTimeField('終了日時', null=True, blank=True)
+
+    class Meta:
+        verbose_name = '集計ジョブ'
+        verbose_name_plural = '集計ジョブ'
+        constraints = [
+            # 待機中のジョブは (種別, ライン, 対象日) ごとに1件（重複登録はまとめる）
+            models.UniqueConstraint(
+                fields=['kind', 'line', 'date'],
+                condition=models.Q(status='pending'),
+                name='production_job_pending_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'priority', 'available_at'], name='production_job_claim_idx'),
+            models.Index(fields=['status', 'locked_at'], name='production_job_lock_idx'),
+        ]
+        ordering = ['priority', 'available_at', 'id']
+
+    def __str__(self):
+        return f'{self.get_kind_display()} - {self.line.name} - {self.date} ({self.get_status_display()})'
+
+
+class StreamWatermark(models.Model):
+    """stream_aggregate コマンドが集計済みの実績の位置（Result の created_at, id）"""
+    name = models.CharField('ストリーム名', max_length=50, unique=True)
+    last_created_at = models.DateTimeField('最終作成日時', null=True, blank=True)
+    last_id = models.BigIntegerField('最終実績ID', default=0)
+    processed_rows = models.BigIntegerField('処理件数', default=0)
+    lag_seconds = models.FloatField('遅延(秒)', default=0)
+    updated_at = models.DateTimeField('更新日時', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'ストリーム集計位置'
+        verbose_name_plural = 'ストリーム集計位置'
+
+    def __str__(self):
+        return f'{self.name} - {self.last_created_at} / {self.last_id}'
+
+
+class GraphSnapshot(models.Model):
+    """確定済みの週・月の週別/月別グラフデータ（graph_snapshots 参照）"""
+    PERIOD_WEEK = 'week'
+    PERIOD_MONTH = 'month'
+    PERIOD_CHOICES = [
+        (PERIOD_WEEK, 'ISO週'),
+        (PERIOD_MONTH, '月'),
+    ]
+
+    line = models.ForeignKey(Line, on_delete=models.CASCADE, verbose_name='ライン')
+    period = models.CharField('期間種別', max_length=5, choices=PERIOD_CHOICES)
+    period_key = models.CharField('期間キー', max_length=10, help_text='2025-W03 または 2025-01 形式')
+    data_version = models.CharField('データバージョン', max_length=100)
+    payload = models.JSONField('グラフデータ')
+    built_at = models.DateTimeField('作成日時', auto_now=True)
+
+    class Meta:
+        verbose_name = 'グラフスナップショット'
+        verbose_name_plural = 'グラフスナップショット'
+        unique_together = ['line', 'period', 'period_key']
+        ordering = ['line', 'period', '-period_key']
+
+    def __str__(self):
+        return f'{self.line.name} - {self.get_period_display()} {self.period_key}'
+
+
 class PartChangeDowntime(models.Model):
     """機種切替ダウンタイム"""
     line = models.ForeignKey(Line, on_delete=models.CASCADE, verbose_name='ライン')
@@ -411,18 +593,17 @@ class UserPreference(models.Model):
 # シグナル設定
 @receiver([post_save, post_delete], sender=Plan)
 def recalculate_planned_pph(sender, instance, **kwargs):
-    """計画の保存・削除時に計画PPHを再計算"""
-    from .utils import calculate_planned_pph_for_date
+    """計画の保存・削除時に計画PPHの再計算ジョブを登録"""
+    from .jobs import enqueue_on_commit
+    from .bulk_load import record_plan_change
+    
+    # 一括投入中は (ライン, 日付) を記録し、終了時にまとめて再計算
+    if record_plan_change(instance.line_id, instance.date):
+        return
     
     try:
-        # 非同期で計算実行（重い処理のため）
-        from django.db import transaction
-        
-        def run_calculation():
-            calculate_planned_pph_for_date(instance.line_id, instance.date)
-        
-        # トランザクション完了後に実行
-        transaction.on_commit(run_calculation)
+        # 重い処理のためワーカー（run_workers）で実行。トランザクション完了後に登録
+        enqueue_on_commit(AggregationJob.KIND_PLANNED_PPH, instance.line_id, instance.date)
         
     except Exception as e:
         import logging
@@ -430,6 +611,89 @@ def recalculate_planned_pph(sender, instance, **kwargs):
         logger.error(f"計画PPH自動計算エラー: {e}")
 
 
+@receiver([post_save, post_delete], sender=Part)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_part_registry(sender, instance, **kwargs):
+    """機種・カテゴリの保存・削除時に機種レジストリを無効化"""
+    from django.db import transaction
+    from .registry import part_registry
+
+    part_registry.invalidate()
+    # コミット前に他スレッドが旧データを再ロードした場合に備えて、コミット後にも無効化
+    transaction.on_commit(part_registry.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Line)
+@receiver([post_save, post_delete], sender=WorkCalendar)
+def invalidate_calendar_registry(sender, instance, **kwargs):
+    """ライン・稼働カレンダーの保存・削除時に稼働カレンダーレジストリを無効化"""
+    from django.db import transaction
+    from .registry import calendar_registry
+
+    calendar_registry.invalidate()
+    # コミット前に他スレッドが旧データを再ロードした場合に備えて、コミット後にも無効化
+    transaction.on_commit(calendar_registry.invalidate)
+
+
+def _bump_dashboard_versions(line_id, dates):
+    """ダッシュボードキャッシュのバージョンを進める（保存直後とコミット後の2回）"""
+    from django.db import transaction
+    from .dashboard_cache import dashboard_cache
+
+    def bump():
+        for target_date in dates:
+            dashboard_cache.bump(line_id, target_date)
+
+    bump()
+    # コミット前に他スレッドが旧データをキャッシュした場合に備えて、コミット後にも進める
+    transaction.on_commit(bump)
+
+
+@receiver([post_save, post_delete], sender=Plan)
+@receiver([post_save, post_delete], sender=PlannedHourlyProduction)
+def invalidate_dashboard_cache_on_plan_change(sender, instance, **kwargs):
+    """計画の保存・削除時に該当日のダッシュボードキャッシュを無効化"""
+    import logging
+    from .bulk_load import record_plan_change
+
+    if record_plan_change(instance.line_id, instance.date, recalculate_pph=sender is Plan):
+        return
+
+    try:
+        _bump_dashboard_versions(instance.line_id, [instance.date])
+    except Exception as e:
+        logging.getLogger(__name__).error(f"ダッシュボードキャッシュ無効化エラー: {e}")
+
+
+@receiver([post_save, post_delete], sender=Result)
+def invalidate_dashboard_cache_on_result_change(sender, instance, **kwargs):
+    """実績の保存・削除時に該当日のダッシュボードキャッシュを無効化"""
+    import logging
+    from .bulk_load import record_result_change
+
+    if record_result_change(instance):
+        return
+
+    try:
+        from .registry import calendar_registry
+
+        calendar = calendar_registry.get(instance.line)
+        if not calendar or not instance.timestamp:
+            return
+
+        timestamp = instance.timestamp
+        if timezone.is_aware(timestamp):
+            timestamp = timezone.localtime(timestamp)
+        dates = [timestamp.date()]
+        # work_start_time より前の実績は前日の稼働日の時間別データにも含まれる
+        if timestamp.time() < calendar.work_start_time:
+            dates.append(timestamp.date() - timedelta(days=1))
+
+        _bump_dashboard_versions(calendar.line_id, dates)
+    except Exception as e:
+        logging.getLogger(__name__).error(f"ダッシュボードキャッシュ無効化エラー: {e}")
+
+
 # 週別分析パフォーマンス改善用シグナル
 def retry_with_backoff(func, max_retries=3, base_delay=1):
     """
@@ -458,14 +722,56 @@ def retry_with_backoff(func, max_retries=3, base_delay=1):
             time.sleep(delay)
 
 
+RESULT_AGGREGATION_FIELDS = ('line', 'machine', 'part', 'judgment', 'timestamp', 'quantity')
+
+
+@receiver(pre_save, sender=Result)
+def remember_result_aggregation_key(sender, instance, raw=False, **kwargs):
+    """実績更新時に変更前の集計キーと数量を保持（集計の差分更新で変更前のキーから差し引くため）"""
+    from .bulk_load import is_aggregation_deferred, record_result_change
+    
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    
+    previous = Result.objects.filter(pk=instance.pk).values(*RESULT_AGGREGATION_FIELDS).first()
+    if previous is None:
+        return
+    
+    # 一括投入中は変更前の (ライン, 日付) も再集計対象として記録
+    if is_aggregation_deferred():
+        record_result_change(Result(**previous))
+        return
+    
+    instance._aggregation_previous = previous
+
+
 @receiver(post_save, sender=Result)
 def update_aggregation_on_result_save(sender, instance, created, **kwargs):
     """実績データ保存時の集計更新（エラーハンドリング強化版）"""
     from .services import AggregationService
+    from .bulk_load import record_result_change
+    from .streaming import is_pending
     import logging
     
     logger = logging.getLogger(__name__)
     
+    # ストリーム集計が未処理の実績は stream_aggregate が現在の値で集計する
+    if is_pending(instance):
+        instance.__dict__.pop('_aggregation_previous', None)
+        return
+    
+    # 一括投入中は (ライン, 日付) を記録し、終了時にまとめて再集計
+    if record_result_change(instance):
+        return
+    
+    # コミットまでにインスタンスが再変更されても、この保存分の差分を適用する
+    previous = instance.__dict__.pop('_aggregation_previous', None)
+    if previous is not None and all(
+        previous[field] == getattr(instance, field) for field in RESULT_AGGREGATION_FIELDS
+    ):
+        return
+    snapshot = Result(pk=instance.pk, **{field: getattr(instance, field) for field in RESULT_AGGREGATION_FIELDS})
+    
     try:
         # 非同期で集計更新を実行
         from django.db import transaction
@@ -473,7 +779,7 @@ def update_aggregation_on_result_save(sender, instance, created, **kwargs):
         def run_aggregation_update():
             def update_with_retry():
                 service = AggregationService()
-                service.incremental_update(instance)
+                service.incremental_update(snapshot, previous=previous)
                 return True
             
             try:
@@ -515,18 +821,30 @@ def update_aggregation_on_result_save(sender, instance, created, **kwargs):
 def update_aggregation_on_result_delete(sender, instance, **kwargs):
     """実績データ削除時の集計更新（エラーハンドリング強化版）"""
     from .services import AggregationService
+    from .bulk_load import record_result_change
+    from .streaming import is_pending
     import logging
     
     logger = logging.getLogger(__name__)
     
+    # ストリーム集計が未処理の実績は集計に含まれていない
+    if is_pending(instance):
+        return
+    
+    # 一括投入中は (ライン, 日付) を記録し、終了時にまとめて再集計
+    if record_result_change(instance):
+        return
+    
     try:
         # 非同期で集計削除を実行
         from django.db import transaction
         
+        snapshot = Result(**{field: getattr(instance, field) for field in RESULT_AGGREGATION_FIELDS})
+        
         def run_aggregation_delete():
             def delete_with_retry():
                 service = AggregationService()
-                service.incremental_delete(instance)
+                service.incremental_delete(snapshot)
                 return True
             
             try:
@@ -606,7 +924,10 @@ class Feedback(models.Model):
 
 
 def send_aggregation_update_notification(result_instance):
-    """集計更新のWebSocket通知を送信"""
+    """集計更新のWebSocket通知を送信（(グループ, ライン, 日付) 単位でまとめて送信）"""
+    from .broadcast import broadcast_coalescer
+    from .utils import send_dashboard_update
+    
     try:
         channel_layer = get_channel_layer()
         if not channel_layer:
@@ -619,12 +940,17 @@ def send_aggregation_update_notification(result_instance):
         except Line.DoesNotExist:
             return
         
+        timestamp = result_instance.timestamp
+        if timezone.is_aware(timestamp):
+            timestamp = timezone.localtime(timestamp)
+        target_date = timestamp.date().isoformat()
+        
         # 通知データを準備
         notification_data = {
             'type': 'aggregation_update',
             'line_id': line_id,
             'line_name': result_instance.line,
-            'date': result_instance.timestamp.date().isoformat(),
+            'date': target_date,
             'part': result_instance.part,
             'judgment': result_instance.judgment,
             'quantity': result_instance.quantity,
@@ -632,40 +958,23 @@ def send_aggregation_update_notification(result_instance):
         }
         
         # 週別分析コンシューマーに通知
-        weekly_analysis_group = f'weekly_analysis_{line_id}'
-        async_to_sync(channel_layer.group_send)(
-            weekly_analysis_group,
-            {
-                'type': 'aggregation_update',
-                'data': notification_data
-            }
+        broadcast_coalescer.submit(
+            ('weekly_analysis', line_id, target_date),
+            _send_merged_aggregation_update,
+            notification_data
         )
         
         # 集計状況監視コンシューマーに通知
-        async_to_sync(channel_layer.group_send)(
-            'aggregation_status',
-            {
-                'type': 'aggregation_status_update',
-                'data': {
-                    'type': 'result_updated',
-                    'line_name': result_instance.line,
-                    'timestamp': datetime.now().isoformat()
-                }
-            }
+        broadcast_coalescer.submit(
+            ('aggregation_status', result_instance.line, target_date),
+            _send_merged_result_status,
+            result_instance.line
         )
         
-        # ダッシュボードコンシューマーに通知（該当日のみ）
-        target_date = result_instance.timestamp.date().isoformat()
-        dashboard_group = f'dashboard_{line_id}_{target_date}'
-        async_to_sync(channel_layer.group_send)(
-            dashboard_group,
-            {
-                'type': 'dashboard_update',
-                'data': {
-                    'type': 'result_updated',
-                    'result_data': notification_data
-                }
-            }
+        # ダッシュボードコンシューマーに差分を通知（該当日のみ）
+        broadcast_coalescer.submit(
+            ('dashboard', line_id, target_date),
+            lambda payloads: send_dashboard_update(line_id, target_date)
         )
         
     except Exception as e:
@@ -674,6 +983,55 @@ def send_aggregation_update_notification(result_instance):
         logger.error(f"WebSocket通知送信エラー: {e}")
 
 
+def _send_merged_aggregation_update(notifications):
+    """まとめた集計更新通知を週別分析コンシューマーに送信"""
+    channel_layer = get_channel_layer()
+    if not channel_layer:
+        return
+    
+    quantity_by_judgment = {}
+    for notification in notifications:
+        judgment = notification['judgment']
+        quantity_by_judgment[judgment] = quantity_by_judgment.get(judgment, 0) + (notification['quantity'] or 0)
+    
+    # 最新の通知内容に、まとめた件数・機種・数量を付加
+    data = dict(notifications[-1])
+    data.update({
+        'event_count': len(notifications),
+        'parts': sorted({n['part'] for n in notifications if n['part']}),
+        'quantity': sum(quantity_by_judgment.values()),
+        'quantity_by_judgment': quantity_by_judgment,
+    })
+    
+    async_to_sync(channel_layer.group_send)(
+        f'weekly_analysis_{data["line_id"]}',
+        {
+            'type': 'aggregation_update',
+            'data': data
+        }
+    )
+
+
+def _send_merged_result_status(line_names):
+    """まとめた実績更新通知を集計状況監視コンシューマーに送信"""
+    channel_layer = get_channel_layer()
+    if not channel_layer:
+        return
+    
+    async_to_sync(channel_layer.group_send)(
+        'aggregation_status',
+        {
+            'type': 'aggregation_status_update',
+            'data': {
+                'type': 'result_updated',
+                'line_name': line_names[-1],
+                'event_count': len(line_names),
+                'timestamp': datetime.now().isoformat()
+            }
+        }
+    )
+
+
 def send_aggregation_status_notification(status_type, data):
     """集計状況の変更通知を送信"""
     try:
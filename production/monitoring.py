@@ -157,7 +157,9 @@ class HealthChecker:
             ('aggregation_data', self._check_aggregation_data_health),
             ('performance', self._check_performance_health),
             ('memory', self._check_memory_health),
-            ('cache', self._check_cache_health)
+            ('cache', self._check_cache_health),
+            ('job_queue', self._check_job_queue_health),
+            ('stream', self._check_stream_health)
         ]
         
         for check_name, check_func in checks:
@@ -313,6 +315,66 @@ class HealthChecker:
                 'error': str(e)
             }
     
+    def _check_job_queue_health(self) -> Dict[str, Any]:
+        """集計ジョブキューのヘルスチェック"""
+        try:
+            from .jobs import queue_metrics
+            
+            metrics = queue_metrics()
+            
+            # 待機時間・失敗ジョブの閾値チェック
+            issues = []
+            max_wait = getattr(settings, 'AGGREGATION_JOB_MAX_WAIT', 600)
+            if metrics['oldest_pending_seconds'] > max_wait:
+                issues.append(f"待機中のジョブが{metrics['oldest_pending_seconds']:.0f}秒処理されていません")
+            
+            if metrics['counts']['failed'] > 0:
+                issues.append(f"失敗したジョブが{metrics['counts']['failed']}件あります")
+            
+            return {
+                'status': 'healthy' if not issues else 'degraded',
+                'issues': issues,
+                **metrics
+            }
+            
+        except Exception as e:
+            return {
+                'status': 'unhealthy',
+                'error': str(e)
+            }
+    
+    def _check_stream_health(self) -> Dict[str, Any]:
+        """ストリーム集計（stream_aggregate）のヘルスチェック"""
+        try:
+            from .streaming import stream_status
+            
+            status = stream_status()
+            if not status['initialized']:
+                # stream_aggregate を使用していない環境
+                return {'status': 'healthy', **status}
+            
+            # 遅延・停止の閾値チェック
+            issues = []
+            max_lag = getattr(settings, 'STREAM_AGGREGATION_MAX_LAG', 60)
+            if status['lag_seconds'] > max_lag:
+                issues.append(f"ストリーム集計が{status['lag_seconds']:.0f}秒遅延しています")
+            
+            max_idle = getattr(settings, 'STREAM_AGGREGATION_MAX_IDLE', 300)
+            if status['idle_seconds'] > max_idle:
+                issues.append(f"ストリーム集計が{status['idle_seconds']:.0f}秒更新されていません（停止の可能性）")
+            
+            return {
+                'status': 'healthy' if not issues else 'degraded',
+                'issues': issues,
+                **status
+            }
+            
+        except Exception as e:
+            return {
+                'status': 'unhealthy',
+                'error': str(e)
+            }
+    
     def _check_cache_health(self) -> Dict[str, Any]:
         """キャッシュヘルスチェック"""
         try:
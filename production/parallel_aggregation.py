@@ -0,0 +1,165 @@
+"""
+集計処理の並列実行
+
+aggregate_results --workers N で使用する。対象を (ライン, 連続した日付範囲) の
+作業単位に分割し、プロセスプールの各ワーカーが自身のDB接続で処理する。
+作業単位ごとにリトライし、成否と処理件数を親プロセスに返す。
+"""
+
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WorkUnit:
+    """集計の作業単位（1ラインの連続した日付範囲）"""
+    line_id: int
+    line_name: str
+    dates: List[date]
+
+    @property
+    def label(self) -> str:
+        if len(self.dates) == 1:
+            return f'{self.line_name} {self.dates[0]}'
+        return f'{self.line_name} {self.dates[0]}～{self.dates[-1]}'
+
+
+@dataclass
+class UnitResult:
+    """作業単位の処理結果"""
+    unit: WorkUnit
+    success: bool
+    records: int = 0
+    hourly_records: int = 0
+    source_rows: int = 0
+    skipped_days: int = 0
+    attempts: int = 0
+    elapsed: float = 0.0
+    error: str = ''
+    invalid_dates: List[date] = field(default_factory=list)
+
+
+def build_work_units(lines, target_dates: List[date], unit_days: int) -> List[WorkUnit]:
+    """ライン × unit_days 日ごとの作業単位に分割"""
+    target_dates = sorted(target_dates)
+    units = []
+    for line in lines:
+        for offset in range(0, len(target_dates), unit_days):
+            units.append(WorkUnit(line.id, line.name, target_dates[offset:offset + unit_days]))
+    return units
+
+
+def aggregate_work_unit(unit: WorkUnit, force: bool = False, hourly: bool = False,
+                        validate: bool = False, chunk_days: Optional[int] = None,
+                        max_retries: int = 2) -> UnitResult:
+    """
+    作業単位を集計（ワーカープロセスで実行）
+
+    失敗した場合は指数バックオフで max_retries 回まで再実行する。
+    例外は送出せず、UnitResult に記録して返す。
+    """
+    from django.db import close_old_connections
+    from .models import WeeklyResultAggregation, HourlyResultAggregation, retry_with_backoff
+    from .services import AggregationService
+
+    service = AggregationService()
+    result = UnitResult(unit=unit, success=False)
+    started = time.perf_counter()
+
+    def run():
+        result.attempts += 1
+        close_old_connections()
+
+        rebuild_dates = list(unit.dates)
+        if not force:
+            existing_dates = set(WeeklyResultAggregation.objects.filter(
+                line=unit.line_name,
+                date__in=unit.dates
+            ).values_list('date', flat=True).distinct())
+            rebuild_dates = [d for d in unit.dates if d not in existing_dates]
+        result.skipped_days = len(unit.dates) - len(rebuild_dates)
+
+        stats = service.aggregate_dates_in_chunks(unit.line_id, rebuild_dates, chunk_days=chunk_days)
+        result.records = stats['records']
+        result.source_rows = stats['source_rows']
+
+        if hourly:
+            hourly_dates = list(unit.dates)
+            if not force:
+                existing_dates = set(HourlyResultAggregation.objects.filter(
+                    line=unit.line_name,
+                    date__in=unit.dates
+                ).values_list('date', flat=True).distinct())
+                hourly_dates = [d for d in unit.dates if d not in existing_dates]
+            result.hourly_records = service.aggregate_hourly_dates(unit.line_id, hourly_dates) if hourly_dates else 0
+
+        if validate:
+            result.invalid_dates = [
+                target_date for target_date in rebuild_dates
+                if not service.validate_aggregation(unit.line_id, target_date)
+            ]
+
+    try:
+        retry_with_backoff(run, max_retries=max_retries, base_delay=0.5)
+        result.success = True
+    except Exception as e:
+        logger.error(f"作業単位の集計エラー: {unit.label}, 試行回数={result.attempts}, エラー={e}")
+        result.error = str(e)
+    finally:
+        close_old_connections()
+
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def _init_worker():
+    """ワーカープロセスの初期化（spawn 起動時は Django をセットアップ）"""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def run_work_units(units: List[WorkUnit], workers: int,
+                   on_result: Optional[Callable[[UnitResult], None]] = None, **unit_options) -> List[UnitResult]:
+    """
+    作業単位をプロセスプールで並列に集計
+
+    親プロセスのDB接続はフォーク先に引き継がないよう事前に閉じ、各ワーカーは自身の接続を開く。
+
+    Args:
+        units: 作業単位のリスト
+        workers: ワーカープロセス数
+        on_result: 作業単位の完了ごとに呼ばれる関数
+        **unit_options: aggregate_work_unit に渡すオプション
+
+    Returns:
+        List[UnitResult]: 完了順の処理結果
+    """
+    from django.db import connections
+
+    connections.close_all()
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = {
+            executor.submit(aggregate_work_unit, unit, **unit_options): unit
+            for unit in units
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # ワーカープロセスの異常終了など
+                result = UnitResult(unit=futures[future], success=False, error=str(e))
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return results
@@ -0,0 +1,251 @@
+"""
+プロセス内レジストリ
+
+ホットパスで文字列ごとに繰り返されるマスタ参照を1回のクエリでロードしてプロセス内に保持する。
+
+- part_registry: 機種名 → ID・色・カテゴリ
+- calendar_registry: ライン名／ライン ID → 稼働カレンダー（稼働開始時刻・朝礼時間・休憩時間）
+
+モデルの post_save / post_delete シグナルで無効化される（models.py 参照）。
+"""
+
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as dt_time
+from typing import Dict, NamedTuple, Optional, Tuple
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class _Registry:
+    """名前・ID の2つのマップを持つレジストリの共通処理（TTL・未登録時の再ロード・無効化）"""
+
+    # 未登録名の参照で再ロードする最短間隔（秒）。他プロセスで追加されたデータを拾うため
+    MISS_RELOAD_INTERVAL = 5
+    TTL_SETTING = None
+    label = ''
+
+    def __init__(self):
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._by_name: Optional[Dict] = None
+        self._by_id: Dict = {}
+        self._loaded_at = 0.0
+
+    @property
+    def ttl(self) -> int:
+        """他プロセスでの変更を反映するための有効期限（秒）"""
+        return getattr(settings, self.TTL_SETTING, 300)
+
+    def _fetch(self) -> Tuple[Dict, Dict]:
+        """(名前 → 情報, ID → 情報) を1回のクエリで取得"""
+        raise NotImplementedError
+
+    def _load(self) -> None:
+        by_name, by_id = self._fetch()
+        self._by_name = by_name
+        self._by_id = by_id
+        self._loaded_at = time.monotonic()
+        self.logger.debug(f"{self.label}をロード: {len(by_name)}件")
+
+    def _ensure_loaded(self) -> Dict:
+        by_name = self._by_name
+        if by_name is None or time.monotonic() - self._loaded_at > self.ttl:
+            with self._lock:
+                if self._by_name is None or time.monotonic() - self._loaded_at > self.ttl:
+                    self._load()
+                by_name = self._by_name
+        return by_name
+
+    def _reload_on_miss(self) -> bool:
+        """未登録名の参照時、前回ロードから一定時間経過していれば再ロード"""
+        if time.monotonic() - self._loaded_at < self.MISS_RELOAD_INTERVAL:
+            return False
+        with self._lock:
+            if time.monotonic() - self._loaded_at < self.MISS_RELOAD_INTERVAL:
+                return False
+            self._load()
+        return True
+
+    def get(self, name: str):
+        """名前から情報を取得（未登録の場合は None）"""
+        if not name:
+            return None
+        info = self._ensure_loaded().get(name)
+        if info is None and self._reload_on_miss():
+            info = (self._by_name or {}).get(name)
+        return info
+
+    def get_by_id(self, item_id: int):
+        """ID から情報を取得（未登録の場合は None、数字のみの文字列は ID に変換）"""
+        if isinstance(item_id, str) and item_id.isdigit():
+            item_id = int(item_id)
+        self._ensure_loaded()
+        info = self._by_id.get(item_id)
+        if info is None and self._reload_on_miss():
+            info = self._by_id.get(item_id)
+        return info
+
+    def invalidate(self) -> None:
+        """キャッシュを破棄（次回参照時に再ロード）"""
+        with self._lock:
+            self._by_name = None
+            self._by_id = {}
+            self._loaded_at = 0.0
+
+
+class PartInfo(NamedTuple):
+    """機種の参照用情報"""
+    id: int
+    name: str
+    color: str
+    category: Optional[str]
+
+
+class PartRegistry(_Registry):
+    """機種名 → 機種情報のレジストリ"""
+
+    TTL_SETTING = 'PART_REGISTRY_TTL'
+    label = '機種レジストリ'
+
+    def _fetch(self) -> Tuple[Dict[str, PartInfo], Dict[int, PartInfo]]:
+        """全機種を1回のクエリでロード"""
+        from .models import Part
+        from .utils import generate_part_color
+
+        by_name = {}
+        by_id = {}
+        rows = Part.objects.values_list('id', 'name', 'category__name')
+        for part_id, name, category_name in rows:
+            info = PartInfo(
+                id=part_id,
+                name=name,
+                color=generate_part_color(part_id, name),
+                category=category_name,
+            )
+            by_name[name] = info
+            by_id[part_id] = info
+        return by_name, by_id
+
+    def color_for(self, name: str, default: str = '#000000') -> str:
+        """機種名から表示色を取得"""
+        info = self.get(name)
+        return info.color if info else default
+
+
+DEFAULT_WORK_START_TIME = dt_time(8, 30)
+DEFAULT_MORNING_MEETING_DURATION = 15
+DEFAULT_BREAK_TIMES = (
+    {"start": "10:45", "end": "11:00"},
+    {"start": "12:00", "end": "12:45"},
+    {"start": "15:00", "end": "15:15"},
+    {"start": "17:00", "end": "17:15"},
+)
+
+
+class WorkCalendarInfo(NamedTuple):
+    """ラインの稼働カレンダー（WorkCalendar 未設定のラインはデフォルト値）"""
+    line_id: Optional[int]
+    line_name: Optional[str]
+    work_start_time: dt_time
+    morning_meeting_duration: int
+    break_times: Tuple[dict, ...]                      # [{"start": "HH:MM", "end": "HH:MM"}]
+    break_intervals: Tuple[Tuple[dt_time, dt_time], ...]  # 解析済みの休憩時間
+    configured: bool                                   # WorkCalendar が設定されているか
+
+    def work_period(self, target_date: date) -> Tuple[datetime, datetime]:
+        """稼働日の [開始, 終了) を aware datetime で取得"""
+        return (
+            timezone.make_aware(datetime.combine(target_date, self.work_start_time)),
+            timezone.make_aware(datetime.combine(target_date + timedelta(days=1), self.work_start_time)),
+        )
+
+    def work_date(self, timestamp: datetime) -> date:
+        """タイムスタンプが属する稼働日（work_start_time より前は前日）"""
+        if timezone.is_aware(timestamp):
+            timestamp = timezone.localtime(timestamp)
+        if timestamp.time() < self.work_start_time:
+            return timestamp.date() - timedelta(days=1)
+        return timestamp.date()
+
+
+def _parse_break_intervals(break_times) -> Tuple[Tuple[dt_time, dt_time], ...]:
+    intervals = []
+    for break_time in break_times:
+        try:
+            intervals.append((
+                datetime.strptime(break_time['start'], '%H:%M').time(),
+                datetime.strptime(break_time['end'], '%H:%M').time(),
+            ))
+        except (KeyError, TypeError, ValueError):
+            logger.warning(f"休憩時間の形式が正しくありません: {break_time}")
+    return tuple(intervals)
+
+
+def compile_work_calendar(line_id=None, line_name=None, work_start_time=None,
+                          morning_meeting_duration=None, break_times=None) -> WorkCalendarInfo:
+    """稼働カレンダーの値（未設定は None）からデフォルトを補完した WorkCalendarInfo を作成"""
+    configured = work_start_time is not None
+    break_times = tuple(break_times or DEFAULT_BREAK_TIMES)
+    return WorkCalendarInfo(
+        line_id=line_id,
+        line_name=line_name,
+        work_start_time=work_start_time or DEFAULT_WORK_START_TIME,
+        morning_meeting_duration=(
+            morning_meeting_duration if morning_meeting_duration is not None else DEFAULT_MORNING_MEETING_DURATION
+        ),
+        break_times=break_times,
+        break_intervals=_parse_break_intervals(break_times),
+        configured=configured,
+    )
+
+
+DEFAULT_WORK_CALENDAR = compile_work_calendar()
+
+
+class CalendarRegistry(_Registry):
+    """ライン名／ライン ID → 稼働カレンダーのレジストリ"""
+
+    TTL_SETTING = 'WORK_CALENDAR_REGISTRY_TTL'
+    label = '稼働カレンダーレジストリ'
+
+    def _fetch(self) -> Tuple[Dict[str, WorkCalendarInfo], Dict[int, WorkCalendarInfo]]:
+        """全ラインの稼働カレンダーを1回のクエリでロード"""
+        from .models import Line
+
+        by_name = {}
+        by_id = {}
+        rows = Line.objects.values_list(
+            'id', 'name',
+            'workcalendar__work_start_time',
+            'workcalendar__morning_meeting_duration',
+            'workcalendar__break_times'
+        )
+        for line_id, name, work_start_time, morning_meeting_duration, break_times in rows:
+            info = compile_work_calendar(line_id, name, work_start_time, morning_meeting_duration, break_times)
+            by_name[name] = info
+            by_id[line_id] = info
+        return by_name, by_id
+
+    def resolve(self, line) -> WorkCalendarInfo:
+        """
+        ライン名またはライン ID から稼働カレンダーを取得（未登録のラインはデフォルト）
+
+        URL・WebSocket のルートから渡される数字のみの文字列はライン ID として扱う。
+        """
+        is_id = isinstance(line, int) or (isinstance(line, str) and line.isdigit())
+        info = self.get_by_id(line) if is_id else self.get(line)
+        return info or DEFAULT_WORK_CALENDAR
+
+    def work_start_time(self, line) -> dt_time:
+        """ライン名またはライン ID から稼働開始時刻を取得"""
+        return self.resolve(line).work_start_time
+
+
+# グローバルインスタンス
+part_registry = PartRegistry()
+calendar_registry = CalendarRegistry()
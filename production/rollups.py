@@ -0,0 +1,274 @@
+"""
+実績集計のロールアップ（時間 → 日 → ISO週 → 月）
+
+HourlyResultAggregation（時間別）・WeeklyResultAggregation（日別）に加えて、日別集計から導出した
+ISO週・月単位の集計を PeriodResultAggregation に保持する。四半期・年単位の期間も
+月・週の集計行と端数の日別集計行を読み出すだけで集計できる。
+
+- 実績1件ごとの変更は AggregationService の差分適用で、日別集計と同時に週・月の集計にも加算する
+- 日別集計をまとめて置き換えた場合は refresh_rollups で影響する週・月を日別集計から再計算する
+- rebuild_rollups コマンドで再構築し、find_rollup_inconsistencies で日別集計との整合性を検証する
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Tuple
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .models import PeriodResultAggregation, WeeklyResultAggregation
+
+WEEK = PeriodResultAggregation.PERIOD_WEEK
+MONTH = PeriodResultAggregation.PERIOD_MONTH
+PERIODS = (WEEK, MONTH)
+
+_TRUNC = {WEEK: TruncWeek, MONTH: TruncMonth}
+
+
+def period_start(period: str, day: date) -> date:
+    """日付が属する期間の開始日（ISO週の月曜日・月初日）"""
+    if period == WEEK:
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def period_end(period: str, start: date) -> date:
+    """期間の最終日"""
+    if period == WEEK:
+        return start + timedelta(days=6)
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def _day_totals_by_period(line_name: str, period: str, start_date: date, end_date: date) -> Dict[Tuple, Tuple[int, int]]:
+    """日別集計を期間・機種・判定別に集計（1クエリ）"""
+    rows = WeeklyResultAggregation.objects.filter(
+        line=line_name,
+        date__gte=start_date,
+        date__lte=end_date
+    ).annotate(
+        period_start=_TRUNC[period]('date')
+    ).order_by().values(
+        'period_start', 'part', 'judgment'
+    ).annotate(
+        quantity=Sum('total_quantity'),
+        count=Sum('result_count')
+    )
+    return {
+        (row['period_start'], row['part'], row['judgment']): (row['quantity'] or 0, row['count'] or 0)
+        for row in rows
+    }
+
+
+def _replace_rollups(line_name: str, period: str, starts: set) -> int:
+    """指定期間の集計行を日別集計から再計算して置き換える"""
+    first, last = min(starts), period_end(period, max(starts))
+    totals = _day_totals_by_period(line_name, period, first, last)
+    records = [
+        PeriodResultAggregation(
+            period=period,
+            date=start,
+            line=line_name,
+            part=part,
+            judgment=judgment,
+            total_quantity=quantity,
+            result_count=count
+        )
+        for (start, part, judgment), (quantity, count) in totals.items()
+        if start in starts
+    ]
+    PeriodResultAggregation.objects.filter(line=line_name, period=period, date__in=starts).delete()
+    PeriodResultAggregation.objects.bulk_create(records, batch_size=1000)
+    return len(records)
+
+
+def refresh_rollups(line_name: str, dates: Iterable[date]) -> int:
+    """
+    日別集計が変更された日を含む週・月の集計を再計算
+
+    Returns:
+        int: 作成した集計行数
+    """
+    dates = set(dates)
+    if not dates:
+        return 0
+
+    created = 0
+    with transaction.atomic():
+        for period in PERIODS:
+            created += _replace_rollups(line_name, period, {period_start(period, day) for day in dates})
+    return created
+
+
+def rebuild_rollups(line_name: str, start_date: date = None, end_date: date = None) -> int:
+    """
+    期間内の週・月の集計を日別集計から再構築（日付省略時は日別集計の全期間）
+
+    Returns:
+        int: 作成した集計行数
+    """
+    start_date, end_date = _date_range(line_name, start_date, end_date)
+    if start_date is None or end_date is None:
+        return 0
+
+    created = 0
+    with transaction.atomic():
+        for period in PERIODS:
+            starts = _period_starts(period, period_start(period, start_date), period_start(period, end_date))
+            created += _replace_rollups(line_name, period, set(starts))
+    return created
+
+
+def find_rollup_inconsistencies(line_name: str, start_date: date = None, end_date: date = None) -> List[dict]:
+    """
+    週・月の集計と日別集計の合計を比較（期間種別ごとに2クエリ）
+
+    Returns:
+        List[dict]: 一致しない (期間, 機種, 判定) のリスト（期間種別・期間開始日・機種・判定順）
+    """
+    start_date, end_date = _date_range(line_name, start_date, end_date)
+    if start_date is None or end_date is None:
+        return []
+
+    mismatches = []
+    for period in PERIODS:
+        first = period_start(period, start_date)
+        last = period_end(period, period_start(period, end_date))
+        expected = _day_totals_by_period(line_name, period, first, last)
+        actual = {
+            (start, part, judgment): (quantity, count)
+            for start, part, judgment, quantity, count in PeriodResultAggregation.objects.filter(
+                line=line_name, period=period, date__gte=first, date__lte=last
+            ).values_list('date', 'part', 'judgment', 'total_quantity', 'result_count')
+        }
+        for key in sorted(set(expected) | set(actual)):
+            expected_quantity, expected_count = expected.get(key, (0, 0))
+            actual_quantity, actual_count = actual.get(key, (0, 0))
+            if (expected_quantity, expected_count) == (actual_quantity, actual_count):
+                continue
+            start, part, judgment = key
+            mismatches.append({
+                'period': period,
+                'date': start,
+                'part': part,
+                'judgment': judgment,
+                'expected_quantity': expected_quantity,
+                'actual_quantity': actual_quantity,
+                'expected_count': expected_count,
+                'actual_count': actual_count,
+            })
+    return mismatches
+
+
+def split_range(start_date: date, end_date: date) -> dict:
+    """
+    期間を月・ISO週・日の区間に分割（完全に含まれる月・週はその集計行を使用する）
+
+    Returns:
+        dict: {'month': [月初日], 'week': [月曜日], 'day': [日付]}
+    """
+    segments = {MONTH: [], WEEK: [], 'day': []}
+    cursor = start_date
+    while cursor <= end_date:
+        if cursor.day == 1 and period_end(MONTH, cursor) <= end_date:
+            segments[MONTH].append(cursor)
+            cursor = period_end(MONTH, cursor) + timedelta(days=1)
+        elif cursor.weekday() == 0 and period_end(WEEK, cursor) <= end_date:
+            segments[WEEK].append(cursor)
+            cursor += timedelta(days=7)
+        else:
+            segments['day'].append(cursor)
+            cursor += timedelta(days=1)
+    return segments
+
+
+def range_totals(line_name: str, start_date: date, end_date: date,
+                 group_by: Tuple[str, ...] = ('judgment',)) -> Dict[Tuple, Tuple[int, int]]:
+    """
+    期間の実績を集計（月・週の集計行と端数の日別集計行から、1クエリ）
+
+    Args:
+        group_by: 集計キー（'part', 'judgment' の部分集合）
+
+    Returns:
+        dict: {group_by の値のタプル: (数量合計, 実績件数)}
+    """
+    rows = union_all([
+        source.order_by().values(*group_by).annotate(quantity=Sum('total_quantity'), count=Sum('result_count'))
+        for source in _range_sources(line_name, start_date, end_date)
+    ])
+
+    totals = {}
+    for row in rows:
+        key = tuple(row[field] for field in group_by)
+        quantity, count = totals.get(key, (0, 0))
+        totals[key] = (quantity + (row['quantity'] or 0), count + (row['count'] or 0))
+    return totals
+
+
+def range_metrics(line_name: str, start_date: date, end_date: date) -> Dict[str, int]:
+    """
+    期間の数量合計・OK数量・NG数量・実績件数（判定別は条件付き集計、1クエリ）
+
+    Returns:
+        dict: {'quantity', 'ok_quantity', 'ng_quantity', 'count'}
+    """
+    rows = union_all([
+        source.order_by().values('line').annotate(
+            quantity=Sum('total_quantity'),
+            ok_quantity=Sum('total_quantity', filter=Q(judgment='OK')),
+            ng_quantity=Sum('total_quantity', filter=Q(judgment='NG')),
+            count=Sum('result_count')
+        )
+        for source in _range_sources(line_name, start_date, end_date)
+    ])
+
+    metrics = {'quantity': 0, 'ok_quantity': 0, 'ng_quantity': 0, 'count': 0}
+    for row in rows:
+        for name in metrics:
+            metrics[name] += row[name] or 0
+    return metrics
+
+
+def _range_sources(line_name: str, start_date: date, end_date: date) -> list:
+    """期間を構成する集計行の QuerySet（完全に含まれる月・週は期間別集計、端数の日は日別集計）"""
+    segments = split_range(start_date, end_date)
+    sources = []
+
+    period_filter = Q()
+    for period in PERIODS:
+        if segments[period]:
+            period_filter |= Q(period=period, date__in=segments[period])
+    if period_filter:
+        sources.append(PeriodResultAggregation.objects.filter(period_filter, line=line_name))
+    if segments['day']:
+        sources.append(WeeklyResultAggregation.objects.filter(line=line_name, date__in=segments['day']))
+    return sources
+
+
+def union_all(querysets: list):
+    """集計済みの QuerySet を UNION ALL で1クエリにまとめる"""
+    if not querysets:
+        return []
+    first, *rest = querysets
+    return first.union(*rest, all=True) if rest else first
+
+
+def _period_starts(period: str, first: date, last: date) -> List[date]:
+    starts = []
+    cursor = first
+    while cursor <= last:
+        starts.append(cursor)
+        cursor = period_end(period, cursor) + timedelta(days=1)
+    return starts
+
+
+def _date_range(line_name: str, start_date: date, end_date: date) -> Tuple[date, date]:
+    """日付省略時は日別集計の最初・最後の日付"""
+    if start_date is None or end_date is None:
+        dates = WeeklyResultAggregation.objects.filter(line=line_name).order_by('date')
+        first = dates.values_list('date', flat=True).first()
+        last = dates.reverse().values_list('date', flat=True).first()
+        start_date = start_date or first
+        end_date = end_date or last
+    return start_date, end_date
@@ -5,10 +5,14 @@
 import logging
 from datetime import date, datetime, time, timedelta
 from typing import Dict, List, Optional
-from django.db import models, transaction
+from django.db import IntegrityError, models, transaction
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
-from .models import Result, WeeklyResultAggregation, Line, WorkCalendar
+from .models import Result, WeeklyResultAggregation, HourlyResultAggregation, PeriodResultAggregation, Line
+from .fingerprints import find_mismatches
+from .hourly_buckets import bucket_by_work_hour, hourly_result_rows, work_hour_expressions, work_period
+from .registry import calendar_registry
+from .rollups import PERIODS, period_start, range_metrics, refresh_rollups
 
 logger = logging.getLogger(__name__)
 
@@ -30,22 +34,12 @@ class AggregationService:
         Returns:
             tuple: (開始datetime, 終了datetime)
         """
-        try:
-            work_calendar = WorkCalendar.objects.get(line_id=line_id)
-            work_start_time = work_calendar.work_start_time
-        except WorkCalendar.DoesNotExist:
-            work_start_time = time(8, 30)  # デフォルトの稼働開始時間
-            self.logger.warning(f"ライン {line_id} のWorkCalendarが見つかりません。デフォルト時間 {work_start_time} を使用します。")
+        calendar = calendar_registry.resolve(line_id)
+        if not calendar.configured:
+            self.logger.warning(f"ライン {line_id} のWorkCalendarが見つかりません。デフォルト時間 {calendar.work_start_time} を使用します。")
         
         # work_start_timeから次の日のwork_start_timeまでの期間
-        start_datetime = datetime.combine(target_date, work_start_time)
-        end_datetime = datetime.combine(target_date + timedelta(days=1), work_start_time)
-        
-        # タイムゾーンを考慮
-        start_datetime = timezone.make_aware(start_datetime)
-        end_datetime = timezone.make_aware(end_datetime)
-        
-        return start_datetime, end_datetime
+        return calendar.work_period(target_date)
     
     def _get_work_period_for_date_by_line_name(self, line_name: str, target_date: date) -> tuple[datetime, datetime]:
         """
@@ -58,10 +52,8 @@ class AggregationService:
         Returns:
             tuple: (開始datetime, 終了datetime)
         """
-        try:
-            line = Line.objects.get(name=line_name)
-            return self._get_work_period_for_date(line.id, target_date)
-        except Line.DoesNotExist:
+        calendar = calendar_registry.get(line_name)
+        if calendar is None:
             self.logger.warning(f"ライン '{line_name}' が見つかりません。カレンダー日で集計します。")
             # フォールバック: カレンダー日
             start_datetime = datetime.combine(target_date, time.min)
@@ -69,6 +61,7 @@ class AggregationService:
             start_datetime = timezone.make_aware(start_datetime)
             end_datetime = timezone.make_aware(end_datetime)
             return start_datetime, end_datetime
+        return self._get_work_period_for_date(calendar.line_id, target_date)
     
     def aggregate_single_date(self, line_id: int, target_date: date) -> int:
         """
@@ -128,12 +121,12 @@ class AggregationService:
                 )
             
             # バルクインサートで効率的に保存
-            if aggregation_records:
-                with transaction.atomic():
-                    WeeklyResultAggregation.objects.bulk_create(
-                        aggregation_records,
-                        batch_size=1000
-                    )
+            with transaction.atomic():
+                WeeklyResultAggregation.objects.bulk_create(
+                    aggregation_records,
+                    batch_size=1000
+                )
+                refresh_rollups(line_name, [target_date])
             
             created_count = len(aggregation_records)
             self.logger.info(f"単日集計完了: {created_count}件のレコードを作成")
@@ -149,7 +142,7 @@ class AggregationService:
     
     def aggregate_date_range(self, line_id: int, start_date: date, end_date: date) -> int:
         """
-        指定期間の実績データを集計
+        指定期間の実績データを集計（チャンク単位で1回の GROUP BY）
         
         Args:
             line_id: ライン ID
@@ -159,92 +152,284 @@ class AggregationService:
         Returns:
             int: 集計されたレコード数の合計
         """
+        target_dates = [
+            start_date + timedelta(days=offset)
+            for offset in range((end_date - start_date).days + 1)
+        ]
+        return self.aggregate_dates_in_chunks(line_id, target_dates)['records']
+    
+    def aggregate_dates(self, line_id: int, target_dates: List[date]) -> int:
+        """
+        複数稼働日の実績データを集計してWeeklyResultAggregationテーブルに保存
+        
+        Args:
+            line_id: ライン ID
+            target_dates: 集計対象の稼働日のリスト
+        
+        Returns:
+            int: 集計されたレコード数
+        """
+        return self.aggregate_dates_in_chunks(line_id, target_dates)['records']
+    
+    def aggregate_dates_in_chunks(self, line_id: int, target_dates: List[date],
+                                  chunk_days: Optional[int] = None, progress=None) -> dict:
+        """
+        複数稼働日の実績データをチャンク単位でまとめて集計
+        
+        連続する最大 chunk_days 日（settings.AGGREGATION_CHUNK_DAYS、デフォルト31日）ごとに
+        1回の GROUP BY で稼働日別に集計し、1回の削除と一括作成で置き換える。
+        
+        Args:
+            line_id: ライン ID
+            target_dates: 集計対象の稼働日のリスト
+            chunk_days: 1チャンクの最大日数
+            progress: チャンク完了ごとに (チャンクの日付リスト, {稼働日: 作成件数}) で呼ばれる関数
+        
+        Returns:
+            dict: {'days', 'chunks', 'records', 'source_rows', 'elapsed', 'rows_per_second'}
+        """
+        import time as time_module
+        from django.conf import settings
+        
+        started = time_module.perf_counter()
+        stats = {'days': 0, 'chunks': 0, 'records': 0, 'source_rows': 0}
+        target_dates = sorted(set(target_dates))
+        
         try:
-            self.logger.info(f"期間集計開始: ライン ID={line_id}, 期間={start_date} - {end_date}")
-            
-            total_count = 0
-            current_date = start_date
-            
-            while current_date <= end_date:
-                count = self.aggregate_single_date(line_id, current_date)
-                total_count += count
-                current_date += timedelta(days=1)
-            
-            self.logger.info(f"期間集計完了: 合計{total_count}件のレコードを作成")
-            return total_count
-            
+            if target_dates:
+                line = Line.objects.get(id=line_id)
+                line_name = line.name
+                work_start_time = self._get_work_start_time_by_line_name(line_name)
+                chunk_days = chunk_days or getattr(settings, 'AGGREGATION_CHUNK_DAYS', 31)
+                
+                self.logger.info(
+                    f"期間集計開始: ライン={line_name}, 期間={target_dates[0]} - {target_dates[-1]} "
+                    f"({len(target_dates)}日)"
+                )
+                
+                chunks = [[]]
+                for target_date in target_dates:
+                    if chunks[-1] and (target_date - chunks[-1][0]).days >= chunk_days:
+                        chunks.append([])
+                    chunks[-1].append(target_date)
+                
+                for chunk in chunks:
+                    aggregation_records = self._replace_aggregation_dates(line_name, work_start_time, chunk)
+                    stats['days'] += len(chunk)
+                    stats['chunks'] += 1
+                    stats['records'] += len(aggregation_records)
+                    stats['source_rows'] += sum(record.result_count for record in aggregation_records)
+                    if progress:
+                        created_by_date = dict.fromkeys(chunk, 0)
+                        for record in aggregation_records:
+                            created_by_date[record.date] += 1
+                        progress(chunk, created_by_date)
+            
+            elapsed = time_module.perf_counter() - started
+            stats['elapsed'] = elapsed
+            stats['rows_per_second'] = stats['source_rows'] / elapsed if elapsed > 0 else 0
+            
+            if target_dates:
+                self.logger.info(
+                    f"期間集計完了: {stats['records']}件のレコードを作成 "
+                    f"(実績{stats['source_rows']}行, {stats['chunks']}チャンク, "
+                    f"{elapsed:.2f}秒, {stats['rows_per_second']:.0f}行/秒)"
+                )
+            return stats
+        
+        except Line.DoesNotExist:
+            self.logger.error(f"ライン ID {line_id} が見つかりません")
+            raise
         except Exception as e:
             self.logger.error(f"期間集計エラー: {e}")
             raise
     
-    def incremental_update(self, result_instance: Result) -> None:
+    def _replace_aggregation_dates(self, line_name: str, work_start_time: time,
+                                   target_dates: List[date]) -> List[WeeklyResultAggregation]:
+        """
+        稼働日群の集計レコードを1回の GROUP BY で再計算し、1回の削除と一括作成で置き換える
+        
+        Returns:
+            List[WeeklyResultAggregation]: 作成した集計レコード
+        """
+        start_datetime, end_datetime = work_period(target_dates[0], target_dates[-1], work_start_time)
+        
+        rows = Result.objects.filter(
+            line=line_name,
+            timestamp__gte=start_datetime,
+            timestamp__lt=end_datetime
+        ).annotate(
+            work_date=work_hour_expressions(work_start_time)['work_date']
+        ).order_by().values(
+            'work_date', 'machine', 'part', 'judgment'
+        ).annotate(
+            total_quantity=Sum('quantity'),
+            result_count=Count('id')
+        )
+        
+        date_set = set(target_dates)
+        aggregation_records = [
+            WeeklyResultAggregation(
+                date=row['work_date'],
+                line=line_name,
+                machine=row['machine'] or '',
+                part=row['part'] or '',
+                judgment=row['judgment'],
+                total_quantity=row['total_quantity'] or 0,
+                result_count=row['result_count']
+            )
+            for row in rows
+            if row['work_date'] in date_set
+        ]
+        
+        with transaction.atomic():
+            WeeklyResultAggregation.objects.filter(
+                line=line_name,
+                date__in=target_dates
+            ).delete()
+            WeeklyResultAggregation.objects.bulk_create(
+                aggregation_records,
+                batch_size=1000
+            )
+            refresh_rollups(line_name, target_dates)
+        
+        return aggregation_records
+    
+    def refresh_aggregation_keys(self, keys, rollups: bool = True) -> dict:
+        """
+        指定された集計キーのみを再計算（ライン単位で1回の GROUP BY）
+        
+        Args:
+            keys: (ライン名, 稼働日, 設備, 機種, 判定) のイテラブル
+            rollups: 影響する週・月の集計も再計算するか（差分を別途適用する場合は False）
+        
+        Returns:
+            dict: {'created', 'updated', 'deleted'} の件数
+        """
+        keys_by_line = {}
+        for line_name, work_date, machine, part, judgment in keys:
+            keys_by_line.setdefault(line_name, set()).add((work_date, machine or '', part or '', judgment))
+        
+        stats = {'created': 0, 'updated': 0, 'deleted': 0}
+        for line_name, line_keys in keys_by_line.items():
+            work_start_time = self._get_work_start_time_by_line_name(line_name)
+            dates = sorted({key[0] for key in line_keys})
+            parts = {key[2] for key in line_keys}
+            start_datetime, end_datetime = work_period(dates[0], dates[-1], work_start_time)
+            
+            rows = Result.objects.filter(
+                line=line_name,
+                part__in=parts,
+                timestamp__gte=start_datetime,
+                timestamp__lt=end_datetime
+            ).annotate(
+                work_date=work_hour_expressions(work_start_time)['work_date']
+            ).order_by().values(
+                'work_date', 'machine', 'part', 'judgment'
+            ).annotate(
+                total_quantity=Sum('quantity'),
+                result_count=Count('id')
+            )
+            
+            source = {}
+            for row in rows:
+                key = (row['work_date'], row['machine'] or '', row['part'] or '', row['judgment'])
+                if key in line_keys:
+                    source[key] = (row['total_quantity'] or 0, row['result_count'])
+            
+            existing = {
+                (agg.date, agg.machine or '', agg.part or '', agg.judgment): agg
+                for agg in WeeklyResultAggregation.objects.filter(
+                    line=line_name,
+                    date__in=dates,
+                    part__in=parts
+                )
+            }
+            
+            to_create, to_update, to_delete = [], [], []
+            for key in line_keys:
+                aggregation = existing.get(key)
+                if key not in source:
+                    if aggregation is not None:
+                        to_delete.append(aggregation.id)
+                    continue
+                
+                total_quantity, result_count = source[key]
+                if aggregation is None:
+                    to_create.append(WeeklyResultAggregation(
+                        date=key[0],
+                        line=line_name,
+                        machine=key[1],
+                        part=key[2],
+                        judgment=key[3],
+                        total_quantity=total_quantity,
+                        result_count=result_count
+                    ))
+                elif (aggregation.total_quantity, aggregation.result_count) != (total_quantity, result_count):
+                    aggregation.total_quantity = total_quantity
+                    aggregation.result_count = result_count
+                    aggregation.last_updated = timezone.now()
+                    to_update.append(aggregation)
+            
+            with transaction.atomic():
+                if to_delete:
+                    WeeklyResultAggregation.objects.filter(id__in=to_delete).delete()
+                WeeklyResultAggregation.objects.bulk_update(
+                    to_update, ['total_quantity', 'result_count', 'last_updated'], batch_size=1000
+                )
+                WeeklyResultAggregation.objects.bulk_create(to_create, batch_size=1000)
+                if rollups:
+                    refresh_rollups(line_name, dates)
+            
+            stats['created'] += len(to_create)
+            stats['updated'] += len(to_update)
+            stats['deleted'] += len(to_delete)
+        
+        self.logger.info(
+            f"集計キー再計算完了: {sum(len(k) for k in keys_by_line.values())}キー "
+            f"(作成={stats['created']}, 更新={stats['updated']}, 削除={stats['deleted']})"
+        )
+        return stats
+
+    def incremental_update(self, result_instance: Result, previous: Optional[dict] = None) -> None:
         """
         単一の実績データ変更に対する増分更新
         
+        該当キーの集計レコードに ±数量・±件数 の差分を F() 式で加算する（実績の再集計は行わない）。
+        更新でキー（ライン・稼働日・設備・機種・判定）が変わった場合は、変更前のキーから差し引き
+        変更後のキーに加算する。差分の適用で不整合を検出した場合はそのキーのみ再集計する。
+        定期的な validate_aggregation による検証は引き続き安全網として行う。
+        
         Args:
             result_instance: 変更された Result インスタンス
+            previous: 更新前のフィールド値（line, machine, part, judgment, timestamp, quantity）
         """
         try:
             if not result_instance.line or not result_instance.part:
                 self.logger.warning("ライン名または機種名が空のため、集計をスキップします")
                 return
             
-            target_date = result_instance.timestamp.date()
-            
             self.logger.info(
                 f"増分更新: ライン={result_instance.line}, "
-                f"日付={target_date}, 機種={result_instance.part}"
+                f"日時={result_instance.timestamp}, 機種={result_instance.part}"
             )
             
-            # トランザクションと排他制御で安全に更新
+            deltas = {}
+            if previous and previous.get('line') and previous.get('part'):
+                for key, delta in self._result_deltas(Result(**previous), -1).items():
+                    deltas[key] = delta
+            for key, delta in self._result_deltas(result_instance, 1).items():
+                quantity, count = deltas.get(key, (0, 0))
+                deltas[key] = (quantity + delta[0], count + delta[1])
+            
             with transaction.atomic():
-                # 該当する集計レコードを検索または作成（SELECT FOR UPDATE で排他制御）
-                try:
-                    aggregation = WeeklyResultAggregation.objects.select_for_update().get(
-                        date=target_date,
-                        line=result_instance.line,
-                        machine=result_instance.machine or '',
-                        part=result_instance.part,
-                        judgment=result_instance.judgment
-                    )
-                    created = False
-                except WeeklyResultAggregation.DoesNotExist:
-                    aggregation = WeeklyResultAggregation(
-                        date=target_date,
-                        line=result_instance.line,
-                        machine=result_instance.machine or '',
-                        part=result_instance.part,
-                        judgment=result_instance.judgment,
-                        total_quantity=0,
-                        result_count=0
-                    )
-                    created = True
-                
-                # 該当日の実績データを再集計（work_start_time基準）
-                start_datetime, end_datetime = self._get_work_period_for_date_by_line_name(result_instance.line, target_date)
-                
-                # 同じ条件の実績データを集計
-                result_data = Result.objects.filter(
-                    line=result_instance.line,
-                    machine=result_instance.machine or '',
-                    part=result_instance.part,
-                    judgment=result_instance.judgment,
-                    timestamp__range=(start_datetime, end_datetime)
-                ).aggregate(
-                    total_quantity=Sum('quantity'),
-                    result_count=Count('id')
-                )
-                
-                # 集計データを更新
-                aggregation.total_quantity = result_data['total_quantity'] or 0
-                aggregation.result_count = result_data['result_count'] or 0
-                aggregation.save()
-                
-                action = "作成" if created else "更新"
-                self.logger.info(f"増分更新完了: 集計レコードを{action}")
-                
-                # WebSocket通知を送信
-                _send_aggregation_notification(result_instance, action)
+                created = self._apply_result_deltas(deltas)
+            
+            action = "作成" if created else "更新"
+            self.logger.info(f"増分更新完了: 集計レコードを{action}")
+            
+            # WebSocket通知を送信
+            _send_aggregation_notification(result_instance, action)
             
         except Exception as e:
             self.logger.error(f"増分更新エラー: {e}")
@@ -252,7 +437,7 @@ class AggregationService:
     
     def incremental_delete(self, result_instance: Result) -> None:
         """
-        実績データ削除時の増分更新
+        実績データ削除時の増分更新（該当キーから数量・件数を差し引き、件数0なら削除）
         
         Args:
             result_instance: 削除された Result インスタンス
@@ -262,55 +447,201 @@ class AggregationService:
                 self.logger.warning("ライン名または機種名が空のため、集計削除をスキップします")
                 return
             
-            target_date = result_instance.timestamp.date()
-            
             self.logger.info(
                 f"増分削除: ライン={result_instance.line}, "
-                f"日付={target_date}, 機種={result_instance.part}"
+                f"日時={result_instance.timestamp}, 機種={result_instance.part}"
             )
             
             with transaction.atomic():
-                try:
-                    # 該当する集計レコードを取得
-                    aggregation = WeeklyResultAggregation.objects.select_for_update().get(
-                        date=target_date,
-                        line=result_instance.line,
-                        machine=result_instance.machine or '',
-                        part=result_instance.part,
-                        judgment=result_instance.judgment
-                    )
-                    
-                    # 該当日の残りの実績データを再集計（work_start_time基準）
-                    start_datetime, end_datetime = self._get_work_period_for_date_by_line_name(result_instance.line, target_date)
-                    
-                    result_data = Result.objects.filter(
-                        line=result_instance.line,
-                        machine=result_instance.machine or '',
-                        part=result_instance.part,
-                        judgment=result_instance.judgment,
-                        timestamp__range=(start_datetime, end_datetime)
-                    ).aggregate(
-                        total_quantity=Sum('quantity'),
-                        result_count=Count('id')
-                    )
-                    
-                    # データが残っている場合は更新、なければ削除
-                    if result_data['result_count'] and result_data['result_count'] > 0:
-                        aggregation.total_quantity = result_data['total_quantity'] or 0
-                        aggregation.result_count = result_data['result_count'] or 0
-                        aggregation.save()
-                        self.logger.info("増分削除完了: 集計レコードを更新")
-                    else:
-                        aggregation.delete()
-                        self.logger.info("増分削除完了: 集計レコードを削除")
-                        
-                except WeeklyResultAggregation.DoesNotExist:
-                    self.logger.warning("削除対象の集計レコードが見つかりません")
+                self._apply_result_deltas(self._result_deltas(result_instance, -1))
+            
+            self.logger.info("増分削除完了")
             
         except Exception as e:
             self.logger.error(f"増分削除エラー: {e}")
             raise
     
+    def _result_deltas(self, result_instance: Result, sign: int) -> dict:
+        """
+        実績1件分の日別・時間別・週・月の集計キーごとの差分を求める
+        
+        Returns:
+            dict: {(モデル, キーのタプル): (数量の差分, 件数の差分)}
+        """
+        work_start_time = self._get_work_start_time_by_line_name(result_instance.line)
+        work_date, hour, _ = self._get_work_date_and_hour(result_instance.timestamp, work_start_time)
+        machine = result_instance.machine or ''
+        delta = (sign * result_instance.quantity, sign)
+        deltas = {
+            (WeeklyResultAggregation, (
+                ('date', work_date), ('line', result_instance.line), ('machine', machine),
+                ('part', result_instance.part), ('judgment', result_instance.judgment),
+            )): delta,
+            (HourlyResultAggregation, (
+                ('date', work_date), ('line', result_instance.line), ('hour', hour), ('machine', machine),
+                ('part', result_instance.part), ('judgment', result_instance.judgment),
+            )): delta,
+        }
+        # 週・月の集計は日別集計の後に適用する（再集計へのフォールバック時に日別集計から導出するため）
+        for period in PERIODS:
+            deltas[(PeriodResultAggregation, (
+                ('period', period), ('date', period_start(period, work_date)), ('line', result_instance.line),
+                ('part', result_instance.part), ('judgment', result_instance.judgment),
+            ))] = delta
+        return deltas
+    
+    def _apply_result_deltas(self, deltas: dict) -> bool:
+        """
+        集計キーごとの差分を適用
+        
+        Returns:
+            bool: 集計レコードを新規作成した場合 True
+        """
+        created = False
+        for (model, key), (quantity, count) in deltas.items():
+            if (quantity, count) == (0, 0):
+                continue
+            key = dict(key)
+            if quantity >= 0 and count >= 0:
+                created |= self._add_to_aggregation(model, key, quantity, count)
+            elif not self._subtract_from_aggregation(model, key, quantity, count):
+                self.logger.warning(f"集計レコードの差分適用に失敗したため再集計します: {model.__name__} {key}")
+                self._recalculate_aggregation_key(model, key)
+        return created
+    
+    def apply_aggregation_deltas(self, deltas: dict) -> dict:
+        """
+        集計キーごとの差分をまとめて適用
+        
+        加算のみの場合はモデルごとに既存レコードを1回のクエリで取得し、bulk_update・bulk_create で
+        適用する（キー数に依存しないクエリ数）。差し引きを含む場合は件数0のレコードの削除や
+        不整合時の再集計が必要なため、キー単位の _apply_result_deltas で適用する。
+        
+        Args:
+            deltas: {(モデル, キーのタプル): (数量の差分, 件数の差分)}（_result_deltas と同じ形式）
+        
+        Returns:
+            dict: {'created', 'updated'} の件数
+        """
+        deltas_by_model = {}
+        for (model, key), delta in deltas.items():
+            if delta != (0, 0):
+                deltas_by_model.setdefault(model, {})[key] = delta
+        
+        stats = {'created': 0, 'updated': 0}
+        now = timezone.now()
+        with transaction.atomic():
+            for model, model_deltas in deltas_by_model.items():
+                if any(quantity < 0 or count < 0 for quantity, count in model_deltas.values()):
+                    self._apply_result_deltas({(model, key): delta for key, delta in model_deltas.items()})
+                    stats['updated'] += len(model_deltas)
+                    continue
+                
+                field_names = [name for name, _ in next(iter(model_deltas))]
+                key_values = [dict(key) for key in model_deltas]
+                existing = {
+                    tuple((name, getattr(aggregation, name)) for name in field_names): aggregation
+                    for aggregation in model.objects.select_for_update().filter(
+                        line__in={values['line'] for values in key_values},
+                        date__in={values['date'] for values in key_values},
+                        part__in={values['part'] for values in key_values}
+                    )
+                }
+                
+                to_update, to_create = [], []
+                for key, (quantity, count) in model_deltas.items():
+                    aggregation = existing.get(key)
+                    if aggregation is None:
+                        to_create.append((key, quantity, count))
+                        continue
+                    aggregation.total_quantity += quantity
+                    aggregation.result_count += count
+                    aggregation.last_updated = now
+                    to_update.append(aggregation)
+                
+                model.objects.bulk_update(
+                    to_update, ['total_quantity', 'result_count', 'last_updated'], batch_size=1000
+                )
+                try:
+                    # 同時に作成された場合は一意制約違反となるため、セーブポイント内で作成してキー単位の加算にフォールバック
+                    with transaction.atomic():
+                        model.objects.bulk_create([
+                            model(**dict(key), total_quantity=quantity, result_count=count)
+                            for key, quantity, count in to_create
+                        ], batch_size=1000)
+                except IntegrityError:
+                    for key, quantity, count in to_create:
+                        self._add_to_aggregation(model, dict(key), quantity, count)
+                
+                stats['created'] += len(to_create)
+                stats['updated'] += len(to_update)
+        
+        return stats
+    
+    def _add_to_aggregation(self, model, key: dict, quantity: int, count: int) -> bool:
+        """
+        集計レコードに数量・件数を加算（存在しなければ作成する upsert）
+        
+        Returns:
+            bool: 新規作成した場合 True
+        """
+        increment = {
+            'total_quantity': models.F('total_quantity') + quantity,
+            'result_count': models.F('result_count') + count,
+            'last_updated': timezone.now(),
+        }
+        if model.objects.filter(**key).update(**increment):
+            return False
+        try:
+            # 同時に作成された場合は一意制約違反となるため、セーブポイント内で作成して加算にフォールバック
+            with transaction.atomic():
+                model.objects.create(**key, total_quantity=quantity, result_count=count)
+            return True
+        except IntegrityError:
+            model.objects.filter(**key).update(**increment)
+            return False
+    
+    def _subtract_from_aggregation(self, model, key: dict, quantity: int, count: int) -> bool:
+        """
+        集計レコードから数量・件数を差し引き、件数0になったレコードを削除
+        
+        Returns:
+            bool: 差分を適用できた場合 True（該当レコードがない・負になる場合は False）
+        """
+        updated = model.objects.filter(
+            **key,
+            total_quantity__gte=-quantity,
+            result_count__gte=-count
+        ).update(
+            total_quantity=models.F('total_quantity') + quantity,
+            result_count=models.F('result_count') + count,
+            last_updated=timezone.now()
+        )
+        if updated:
+            model.objects.filter(**key, result_count=0).delete()
+        return bool(updated)
+    
+    def _recalculate_aggregation_key(self, model, key: dict) -> None:
+        """単一の集計キーを実績から再計算（件数0なら削除）"""
+        if model is WeeklyResultAggregation:
+            self.refresh_aggregation_keys([
+                (key['line'], key['date'], key['machine'], key['part'], key['judgment'])
+            ], rollups=False)
+            return
+        if model is PeriodResultAggregation:
+            refresh_rollups(key['line'], [key['date']])
+            return
+        
+        work_start_time = self._get_work_start_time_by_line_name(key['line'])
+        day_start = timezone.make_aware(datetime.combine(key['date'], work_start_time))
+        self._refresh_hourly_aggregation(Result(
+            line=key['line'],
+            machine=key['machine'],
+            part=key['part'],
+            judgment=key['judgment'],
+            timestamp=day_start + timedelta(hours=key['hour'])
+        ))
+    
     def validate_aggregation(self, line_id: int, target_date: date) -> bool:
         """
         集計データの整合性を検証
@@ -323,68 +654,18 @@ class AggregationService:
             bool: 整合性が取れている場合 True
         """
         try:
-            line = Line.objects.get(id=line_id)
-            line_name = line.name
-            
-            self.logger.info(f"集計検証開始: ライン={line_name}, 日付={target_date}")
-            
-            # 元データの集計（work_start_time基準）
-            start_datetime, end_datetime = self._get_work_period_for_date(line_id, target_date)
-            
-            source_data = Result.objects.filter(
-                line=line_name,
-                timestamp__range=(start_datetime, end_datetime)
-            ).values(
-                'machine', 'part', 'judgment'
-            ).annotate(
-                total_quantity=Sum('quantity'),
-                result_count=Count('id')
-            )
-            
-            # 集計テーブルのデータ
-            aggregated_data = WeeklyResultAggregation.objects.filter(
-                line=line_name,
-                date=target_date
-            ).values(
-                'machine', 'part', 'judgment', 'total_quantity', 'result_count'
-            )
-            
-            # データを辞書に変換して比較
-            source_dict = {}
-            for item in source_data:
-                key = (
-                    item['machine'] or '',
-                    item['part'] or '',
-                    item['judgment']
-                )
-                source_dict[key] = {
-                    'total_quantity': item['total_quantity'] or 0,
-                    'result_count': item['result_count'] or 0
-                }
+            self.logger.info(f"集計検証開始: ライン ID={line_id}, 日付={target_date}")
             
-            aggregated_dict = {}
-            for item in aggregated_data:
-                key = (
-                    item['machine'] or '',
-                    item['part'] or '',
-                    item['judgment']
-                )
-                aggregated_dict[key] = {
-                    'total_quantity': item['total_quantity'],
-                    'result_count': item['result_count']
-                }
+            mismatches = self.find_inconsistencies(line_id, target_date, target_date)
             
-            # 整合性チェック
-            is_consistent = source_dict == aggregated_dict
-            
-            if is_consistent:
+            if not mismatches:
                 self.logger.info("集計データの整合性OK")
-            else:
-                self.logger.warning("集計データの不整合を検出")
-                self.logger.warning(f"元データ: {len(source_dict)}件")
-                self.logger.warning(f"集計データ: {len(aggregated_dict)}件")
+                return True
             
-            return is_consistent
+            self.logger.warning("集計データの不整合を検出")
+            self.logger.warning(f"元データ: {mismatches[0]['source']}")
+            self.logger.warning(f"集計データ: {mismatches[0]['aggregated']}")
+            return False
             
         except Line.DoesNotExist:
             self.logger.error(f"ライン ID {line_id} が見つかりません")
@@ -393,6 +674,36 @@ class AggregationService:
             self.logger.error(f"集計検証エラー: {e}")
             return False
     
+    def find_inconsistencies(self, line_id: int, start_date: date, end_date: date) -> list:
+        """
+        期間内の不整合をフィンガープリントの比較で検出
+        
+        実績データと集計テーブルの (ライン, 稼働日) ごとのフィンガープリントを
+        それぞれ期間全体で1回の GROUP BY で集計し、一致しない日のみキー別の差分を求める。
+        
+        Args:
+            line_id: ライン ID
+            start_date: 開始日
+            end_date: 終了日
+            
+        Returns:
+            list: [{'date', 'source', 'aggregated', 'deltas'}]（不整合のある日のみ、日付順）
+        """
+        line_name = Line.objects.values_list('name', flat=True).get(id=line_id)
+        work_start_time = self._get_work_start_time_by_line_name(line_name)
+        
+        mismatches = find_mismatches(line_name, start_date, end_date, work_start_time)
+        
+        for mismatch in mismatches:
+            for delta in mismatch['deltas']:
+                self.logger.warning(
+                    f"不整合: ライン={line_name}, 日付={mismatch['date']}, "
+                    f"設備={delta['machine']}, 機種={delta['part']}, 判定={delta['judgment']}, "
+                    f"数量={delta['source_quantity']}/{delta['aggregated_quantity']}, "
+                    f"件数={delta['source_count']}/{delta['aggregated_count']}"
+                )
+        return mismatches
+    
     def repair_aggregation(self, line_id: int, target_date: date) -> bool:
         """
         集計データの自動修復
@@ -428,57 +739,294 @@ class AggregationService:
             self.logger.error(f"集計修復エラー: {e}")
             return False
     
-    def get_aggregation_summary(self, line_id: int, target_date: date) -> dict:
+    def _get_work_start_time_by_line_name(self, line_name: str) -> time:
+        """ライン名から稼働開始時間を取得（未設定の場合はデフォルト）"""
+        return calendar_registry.work_start_time(line_name)
+    
+    def _get_work_date_and_hour(self, timestamp: datetime, work_start_time: time) -> tuple[date, int, datetime]:
         """
-        集計データのサマリー情報を取得
+        実績のタイムスタンプから稼働日と時間帯を求める
+        
+        work_start_time より前の実績は前日の稼働日に属する。
+        
+        Returns:
+            tuple: (稼働日, work_start_timeからの経過時間, 時間帯の開始datetime)
+        """
+        local_timestamp = timezone.localtime(timestamp)
+        work_date = local_timestamp.date()
+        day_start = timezone.make_aware(datetime.combine(work_date, work_start_time))
+        if local_timestamp < day_start:
+            work_date -= timedelta(days=1)
+            day_start = timezone.make_aware(datetime.combine(work_date, work_start_time))
+        
+        hour = min(int((local_timestamp - day_start).total_seconds() // 3600), 23)
+        return work_date, hour, day_start + timedelta(hours=hour)
+    
+    def _bucket_results_by_hour(self, line_name: str, start_datetime: datetime, end_datetime: datetime) -> dict:
+        """
+        稼働日の実績を時間帯・設備・機種・判定別に集計（DB側で1回の GROUP BY）
+        
+        start_datetime の時刻を稼働開始時刻とみなして hour_index を求める。
+        
+        Returns:
+            dict: {(時間帯, 設備, 機種, 判定): {'total_quantity': int, 'result_count': int}}
+        """
+        work_start_time = timezone.localtime(start_datetime).time()
+        rows = bucket_by_work_hour(
+            Result.objects.filter(
+                line=line_name,
+                timestamp__gte=start_datetime,
+                timestamp__lt=end_datetime
+            ),
+            work_start_time
+        )
+        
+        buckets = {}
+        for row in rows:
+            key = (row['hour_index'], row['machine'] or '', row['part'] or '', row['judgment'])
+            bucket = buckets.setdefault(key, {'total_quantity': 0, 'result_count': 0})
+            bucket['total_quantity'] += row['total_quantity'] or 0
+            bucket['result_count'] += row['result_count']
+        
+        return buckets
+    
+    def _refresh_hourly_aggregation(self, result_instance: Result) -> None:
+        """実績1件が属する時間別集計レコードを再計算（件数0なら削除）"""
+        work_start_time = self._get_work_start_time_by_line_name(result_instance.line)
+        work_date, hour, hour_start = self._get_work_date_and_hour(
+            result_instance.timestamp, work_start_time
+        )
+        
+        key = {
+            'date': work_date,
+            'line': result_instance.line,
+            'hour': hour,
+            'machine': result_instance.machine or '',
+            'part': result_instance.part,
+            'judgment': result_instance.judgment,
+        }
+        
+        # 集計キーでは設備なし（NULL）と空文字を同一視する
+        machine_filter = Q(machine=result_instance.machine)
+        if not result_instance.machine:
+            machine_filter = Q(machine='') | Q(machine__isnull=True)
+        
+        result_data = Result.objects.filter(
+            machine_filter,
+            line=result_instance.line,
+            part=result_instance.part,
+            judgment=result_instance.judgment,
+            timestamp__gte=hour_start,
+            timestamp__lt=hour_start + timedelta(hours=1)
+        ).aggregate(
+            total_quantity=Sum('quantity'),
+            result_count=Count('id')
+        )
+        
+        if result_data['result_count']:
+            HourlyResultAggregation.objects.update_or_create(
+                **key,
+                defaults={
+                    'total_quantity': result_data['total_quantity'] or 0,
+                    'result_count': result_data['result_count'],
+                }
+            )
+        else:
+            HourlyResultAggregation.objects.filter(**key).delete()
+    
+    def aggregate_hourly_single_date(self, line_id: int, target_date: date) -> int:
+        """
+        指定稼働日の実績データを時間別に集計してHourlyResultAggregationテーブルに保存
         
         Args:
             line_id: ライン ID
-            target_date: 対象日
+            target_date: 集計対象の稼働日
             
         Returns:
-            dict: サマリー情報
+            int: 集計されたレコード数
         """
+        return self.aggregate_hourly_dates(line_id, [target_date])
+    
+    def aggregate_hourly_dates(self, line_id: int, target_dates: List[date]) -> int:
+        """
+        複数稼働日の実績データを時間別に集計してHourlyResultAggregationテーブルに保存
+        
+        最初の日から最後の日までを1回の GROUP BY で集計し、target_dates の日のみ置き換える。
+        
+        Args:
+            line_id: ライン ID
+            target_dates: 集計対象の稼働日のリスト
+            
+        Returns:
+            int: 集計されたレコード数
+        """
+        if not target_dates:
+            return 0
+        
         try:
             line = Line.objects.get(id=line_id)
             line_name = line.name
+            target_dates = sorted(set(target_dates))
             
-            # 集計データの統計
-            aggregations = WeeklyResultAggregation.objects.filter(
+            self.logger.info(
+                f"時間別集計開始: ライン={line_name}, 日付={target_dates[0]}～{target_dates[-1]} "
+                f"({len(target_dates)}日)"
+            )
+            
+            work_start_time = self._get_work_start_time_by_line_name(line_name)
+            rows = hourly_result_rows(line_name, target_dates[0], target_dates[-1], work_start_time)
+            
+            date_set = set(target_dates)
+            aggregation_records = [
+                HourlyResultAggregation(
+                    date=row['work_date'],
+                    line=line_name,
+                    hour=row['hour_index'],
+                    machine=row['machine'] or '',
+                    part=row['part'] or '',
+                    judgment=row['judgment'],
+                    total_quantity=row['total_quantity'] or 0,
+                    result_count=row['result_count']
+                )
+                for row in rows
+                if row['work_date'] in date_set
+            ]
+            
+            with transaction.atomic():
+                HourlyResultAggregation.objects.filter(
+                    line=line_name,
+                    date__in=target_dates
+                ).delete()
+                HourlyResultAggregation.objects.bulk_create(
+                    aggregation_records,
+                    batch_size=1000
+                )
+            
+            created_count = len(aggregation_records)
+            self.logger.info(f"時間別集計完了: {created_count}件のレコードを作成")
+            
+            return created_count
+            
+        except Line.DoesNotExist:
+            self.logger.error(f"ライン ID {line_id} が見つかりません")
+            raise
+        except Exception as e:
+            self.logger.error(f"時間別集計エラー: {e}")
+            raise
+    
+    def validate_hourly_aggregation(self, line_id: int, target_date: date) -> bool:
+        """
+        時間別集計データの整合性を検証
+        
+        Args:
+            line_id: ライン ID
+            target_date: 検証対象の稼働日
+            
+        Returns:
+            bool: 整合性が取れている場合 True
+        """
+        try:
+            line = Line.objects.get(id=line_id)
+            line_name = line.name
+            
+            start_datetime, end_datetime = self._get_work_period_for_date(line_id, target_date)
+            source_dict = self._bucket_results_by_hour(line_name, start_datetime, end_datetime)
+            
+            aggregated_dict = {}
+            aggregated_data = HourlyResultAggregation.objects.filter(
                 line=line_name,
                 date=target_date
-            )
+            ).values_list('hour', 'machine', 'part', 'judgment', 'total_quantity', 'result_count')
+            for hour, machine, part, judgment, total_quantity, result_count in aggregated_data:
+                aggregated_dict[(hour, machine or '', part or '', judgment)] = {
+                    'total_quantity': total_quantity,
+                    'result_count': result_count
+                }
             
-            total_records = aggregations.count()
-            total_quantity = sum(agg.total_quantity for agg in aggregations)
-            total_results = sum(agg.result_count for agg in aggregations)
+            is_consistent = source_dict == aggregated_dict
+            
+            if is_consistent:
+                self.logger.info(f"時間別集計データの整合性OK: ライン={line_name}, 日付={target_date}")
+            else:
+                self.logger.warning(
+                    f"時間別集計データの不整合を検出: ライン={line_name}, 日付={target_date} "
+                    f"(元データ: {len(source_dict)}件, 集計データ: {len(aggregated_dict)}件)"
+                )
             
-            # 判定別統計
-            ok_aggregations = aggregations.filter(judgment='OK')
-            ng_aggregations = aggregations.filter(judgment='NG')
+            return is_consistent
             
-            ok_quantity = sum(agg.total_quantity for agg in ok_aggregations)
-            ng_quantity = sum(agg.total_quantity for agg in ng_aggregations)
+        except Line.DoesNotExist:
+            self.logger.error(f"ライン ID {line_id} が見つかりません")
+            return False
+        except Exception as e:
+            self.logger.error(f"時間別集計検証エラー: {e}")
+            return False
+    
+    def repair_hourly_aggregation(self, line_id: int, target_date: date) -> bool:
+        """
+        時間別集計データの修復（不整合時のみ再集計）
+        
+        Args:
+            line_id: ライン ID
+            target_date: 修復対象の稼働日
             
-            # 機種別統計
-            parts = aggregations.values('part').distinct()
-            part_count = len(parts)
+        Returns:
+            bool: 修復が成功した場合 True
+        """
+        try:
+            if self.validate_hourly_aggregation(line_id, target_date):
+                return True
             
-            # 設備別統計
-            machines = aggregations.values('machine').distinct()
-            machine_count = len([m for m in machines if m['machine']])
+            self.aggregate_hourly_single_date(line_id, target_date)
+            return self.validate_hourly_aggregation(line_id, target_date)
+            
+        except Exception as e:
+            self.logger.error(f"時間別集計修復エラー: {e}")
+            return False
+    
+    def get_aggregation_summary(self, line_id: int, target_date: date, validate: bool = False) -> dict:
+        """
+        集計データのサマリー情報を取得（条件付き集計による1クエリ）
+        
+        Args:
+            line_id: ライン ID
+            target_date: 対象日
+            validate: 実績データとの整合性も検証するか（実績の集計が必要なため明示的に指定）
+            
+        Returns:
+            dict: サマリー情報（is_consistent は validate=False の場合 None）
+        """
+        try:
+            calendar = calendar_registry.get_by_id(line_id)
+            if calendar is None:
+                raise Line.DoesNotExist
+            line_name = calendar.line_name
+            
+            # 件数・数量・判定別数量・機種数・設備数を1回の集計で取得
+            stats = WeeklyResultAggregation.objects.filter(
+                line=line_name,
+                date=target_date
+            ).aggregate(
+                records=Count('id'),
+                quantity=Sum('total_quantity'),
+                results=Sum('result_count'),
+                ok_quantity=Sum('total_quantity', filter=Q(judgment='OK')),
+                ng_quantity=Sum('total_quantity', filter=Q(judgment='NG')),
+                part_count=Count('part', distinct=True),
+                machine_count=Count('machine', distinct=True, filter=~Q(machine=''))
+            )
             
             return {
                 'line_name': line_name,
                 'date': target_date,
-                'total_records': total_records,
-                'total_quantity': total_quantity,
-                'total_results': total_results,
-                'ok_quantity': ok_quantity,
-                'ng_quantity': ng_quantity,
-                'part_count': part_count,
-                'machine_count': machine_count,
-                'is_consistent': self.validate_aggregation(line_id, target_date)
+                'total_records': stats['records'],
+                'total_quantity': stats['quantity'] or 0,
+                'total_results': stats['results'] or 0,
+                'ok_quantity': stats['ok_quantity'] or 0,
+                'ng_quantity': stats['ng_quantity'] or 0,
+                'part_count': stats['part_count'],
+                'machine_count': stats['machine_count'],
+                'is_consistent': self.validate_aggregation(line_id, target_date) if validate else None
             }
             
         except Line.DoesNotExist:
@@ -503,15 +1051,9 @@ class AggregationService:
         try:
             self.logger.info(f"不整合検出開始: ライン ID={line_id}, 期間={start_date} - {end_date}")
             
-            inconsistent_dates = []
-            current_date = start_date
-            
-            while current_date <= end_date:
-                if not self.validate_aggregation(line_id, current_date):
-                    inconsistent_dates.append(current_date)
-                    self.logger.warning(f"不整合検出: {current_date}")
-                
-                current_date += timedelta(days=1)
+            inconsistent_dates = [
+                mismatch['date'] for mismatch in self.find_inconsistencies(line_id, start_date, end_date)
+            ]
             
             self.logger.info(f"不整合検出完了: {len(inconsistent_dates)}日で不整合を検出")
             return inconsistent_dates
@@ -671,36 +1213,13 @@ class WeeklyAnalysisService:
         try:
             self.logger.info(f"パフォーマンス指標取得開始: ライン={line_name}, 期間={start_date}-{end_date}")
             
-            # 集計データから統計を計算
-            stats = WeeklyResultAggregation.objects.filter(
-                line=line_name,
-                date__range=(start_date, end_date)
-            ).aggregate(
-                total_quantity=Sum('total_quantity'),
-                total_count=Sum('result_count')
-            )
-            
-            # OK/NG別の統計を個別に取得
-            ok_stats = WeeklyResultAggregation.objects.filter(
-                line=line_name,
-                date__range=(start_date, end_date),
-                judgment='OK'
-            ).aggregate(
-                ok_quantity=Sum('total_quantity')
-            )
-            
-            ng_stats = WeeklyResultAggregation.objects.filter(
-                line=line_name,
-                date__range=(start_date, end_date),
-                judgment='NG'
-            ).aggregate(
-                ng_quantity=Sum('total_quantity')
-            )
+            # 期間に完全に含まれる月・週は期間別集計、端数の日は日別集計から1クエリで取得
+            totals = range_metrics(line_name, start_date, end_date)
             
             # 指標を計算
-            total_quantity = stats['total_quantity'] or 0
-            ok_quantity = ok_stats['ok_quantity'] or 0
-            ng_quantity = ng_stats['ng_quantity'] or 0
+            total_quantity = totals['quantity']
+            ok_quantity = totals['ok_quantity']
+            ng_quantity = totals['ng_quantity']
             
             metrics = {
                 'total_quantity': total_quantity,
@@ -714,31 +1233,46 @@ class WeeklyAnalysisService:
         
         except Exception as e:
             self.logger.error(f"パフォーマンス指標取得エラー: {e}")
-            return {}    
+            return {}
+
 
 def _send_aggregation_notification(result_instance: Result, action: str) -> None:
-    """集計更新のWebSocket通知を送信"""
+    """集計更新のWebSocket通知を送信（(ライン, 日付) 単位でまとめて送信）"""
     try:
+        from .broadcast import broadcast_coalescer
         from .models import send_aggregation_status_notification, send_weekly_analysis_update
         
+        target_date = timezone.localtime(result_instance.timestamp).date()
+        line_name = result_instance.line
+        
         # 集計状況の通知
-        send_aggregation_status_notification('aggregation_updated', {
-            'line_name': result_instance.line,
-            'date': result_instance.timestamp.date().isoformat(),
-            'action': action
-        })
+        def send_status(actions):
+            send_aggregation_status_notification('aggregation_updated', {
+                'line_name': line_name,
+                'date': target_date.isoformat(),
+                'action': actions[-1],
+                'event_count': len(actions)
+            })
+        
+        broadcast_coalescer.submit(
+            ('aggregation_updated', line_name, target_date),
+            send_status,
+            action
+        )
         
         # 週別分析の更新通知（該当週）
-        target_date = result_instance.timestamp.date()
         week_start = target_date - timedelta(days=target_date.weekday())
         week_end = week_start + timedelta(days=6)
         
         try:
-            line = Line.objects.get(name=result_instance.line)
-            send_weekly_analysis_update(line.id, week_start, week_end)
+            line = Line.objects.get(name=line_name)
+            broadcast_coalescer.submit(
+                ('weekly_analysis_update', line.id, week_start),
+                lambda payloads: send_weekly_analysis_update(line.id, week_start, week_end)
+            )
         except Line.DoesNotExist:
-            logger.warning(f"ライン '{result_instance.line}' が見つかりません")
+            logger.warning(f"ライン '{line_name}' が見つかりません")
         
     except Exception as e:
         logger.error(f"WebSocket通知送信エラー: {e}")
-        # 通知エラーは集計処理に影響させない
\ No newline at end of file
+        # 通知エラーは集計処理に影響させない
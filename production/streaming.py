@@ -0,0 +1,203 @@
+"""
+外部から挿入された実績のストリーム集計（stream_aggregate コマンド）
+
+本番環境の Result は設備・ETL から Oracle に直接挿入されるため、post_save シグナルによる
+集計更新が行われない。Result を (created_at, id) のウォーターマークで追跡し、
+マイクロバッチごとに集計キー別の差分をまとめて週別・時間別集計テーブルに適用する。
+
+- 差分の適用とウォーターマークの更新は同一トランザクションで行うため、
+  停止・再起動しても実績が二重に集計されることはない
+- 同じ時刻に作成され遅れてコミットされた行を取りこぼさないよう、created_at から
+  settings.STREAM_AGGREGATION_SETTLE_SECONDS 秒（デフォルト5秒）経過した行のみ処理する
+- 実績の更新・削除は追跡しない（validate_aggregation による検証・修復で補う）
+
+Django 経由の保存（post_save シグナル）・一括取り込み API も集計を更新するため、
+二重集計を避けるには settings.STREAM_AGGREGATION_ENABLED = True としてストリーム集計を有効にする。
+有効な場合、ウォーターマークより後の実績（ストリームがこれから集計する実績）は
+シグナル・一括取り込みでは集計せずストリームに任せる。無効な場合 stream_aggregate は起動しない。
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import RESULT_AGGREGATION_FIELDS, Result, StreamWatermark
+from .registry import calendar_registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAM = 'results'
+
+
+@dataclass
+class BatchStats:
+    """マイクロバッチ1回分の処理結果"""
+    rows: int = 0
+    skipped: int = 0
+    keys: int = 0
+    created: int = 0
+    updated: int = 0
+    lag_seconds: float = 0.0
+    caught_up: bool = True
+
+
+def _settle_delay() -> timedelta:
+    return timedelta(seconds=getattr(settings, 'STREAM_AGGREGATION_SETTLE_SECONDS', 5))
+
+
+def stream_aggregation_enabled() -> bool:
+    return getattr(settings, 'STREAM_AGGREGATION_ENABLED', False)
+
+
+def is_pending(result: Result, name: str = DEFAULT_STREAM) -> bool:
+    """
+    実績がストリームで集計される予定か（ストリーム集計が有効で、ウォーターマークより後の実績）
+
+    ウォーターマークが未作成の場合、ストリームの初回起動時に既存の実績は集計済みとみなされるため False。
+    """
+    if not stream_aggregation_enabled():
+        return False
+    watermark = StreamWatermark.objects.filter(name=name).values_list('last_created_at', 'last_id').first()
+    if watermark is None:
+        return False
+    last_created_at, last_id = watermark
+    if last_created_at is None or result.created_at is None:
+        return True
+    return (result.created_at, result.pk or 0) > (last_created_at, last_id)
+
+
+def get_watermark(name: str = DEFAULT_STREAM) -> StreamWatermark:
+    """
+    ウォーターマークを取得（初回は既存の実績の末尾から開始する）
+
+    既存の実績は aggregate_results で集計済みとみなし、二重に集計しない。
+    """
+    watermark = StreamWatermark.objects.filter(name=name).first()
+    if watermark is None:
+        watermark = reset_watermark(name)
+    return watermark
+
+
+def reset_watermark(name: str = DEFAULT_STREAM, since=None) -> StreamWatermark:
+    """
+    ウォーターマークを設定
+
+    Args:
+        since: この日時より後に作成された実績から処理する（None の場合は既存の実績の末尾）
+    """
+    if since is None:
+        latest = Result.objects.order_by('-created_at', '-id').values_list('created_at', 'id').first()
+        last_created_at, last_id = latest if latest else (None, 0)
+    else:
+        last_created_at, last_id = since, 0
+
+    watermark, _ = StreamWatermark.objects.update_or_create(
+        name=name,
+        defaults={
+            'last_created_at': last_created_at,
+            'last_id': last_id,
+            'lag_seconds': 0,
+            'updated_at': timezone.now(),
+        }
+    )
+    logger.info(f"ストリーム {name} のウォーターマークを設定: {last_created_at} / {last_id}")
+    return watermark
+
+
+def fetch_batch(watermark: StreamWatermark, batch_size: int, now=None) -> list:
+    """ウォーターマークより後の実績を (created_at, id) 順に最大 batch_size 件取得"""
+    now = now or timezone.now()
+    queryset = Result.objects.filter(created_at__lte=now - _settle_delay())
+    if watermark.last_created_at is not None:
+        queryset = queryset.filter(
+            Q(created_at__gt=watermark.last_created_at) |
+            Q(created_at=watermark.last_created_at, id__gt=watermark.last_id)
+        )
+    return list(queryset.order_by('created_at', 'id').values_list(
+        'id', 'created_at', *RESULT_AGGREGATION_FIELDS
+    )[:batch_size])
+
+
+def process_batch(name: str = DEFAULT_STREAM, batch_size: int = 500, now=None) -> BatchStats:
+    """
+    マイクロバッチを1回処理
+
+    ウォーターマークの更新は読み出し時の値と一致する場合のみ行う（楽観的ロック）。
+    同じストリームを複数のプロセスが処理している場合、後から更新しようとした側は
+    差分を適用せずにバッチを破棄する。
+    """
+    from .ingestion import _notify_ingested
+    from .services import AggregationService
+
+    now = now or timezone.now()
+    watermark = get_watermark(name)
+    rows = fetch_batch(watermark, batch_size, now)
+    stats = BatchStats(rows=len(rows), caught_up=len(rows) < batch_size)
+    if not rows:
+        StreamWatermark.objects.filter(id=watermark.id).update(lag_seconds=0, updated_at=now)
+        return stats
+
+    service = AggregationService()
+    deltas = {}
+    dashboard_dates = set()
+    for row in rows:
+        result = Result(**dict(zip(RESULT_AGGREGATION_FIELDS, row[2:])))
+        calendar = calendar_registry.get(result.line)
+        if calendar is None or not result.part:
+            stats.skipped += 1
+            continue
+        for key, (quantity, count) in service._result_deltas(result, 1).items():
+            total_quantity, total_count = deltas.get(key, (0, 0))
+            deltas[key] = (total_quantity + quantity, total_count + count)
+        # ダッシュボードは稼働日とカレンダー日の両方に実績が表示される
+        dashboard_dates.add((calendar.line_id, calendar.work_date(result.timestamp)))
+        dashboard_dates.add((calendar.line_id, timezone.localtime(result.timestamp).date()))
+
+    last_id, last_created_at = rows[-1][0], rows[-1][1]
+    # バッチの途中までしか処理できていない場合、最後に処理した行の作成からの経過時間が遅延の下限
+    stats.lag_seconds = 0.0 if stats.caught_up else max((now - last_created_at).total_seconds(), 0.0)
+
+    with transaction.atomic():
+        advanced = StreamWatermark.objects.filter(
+            id=watermark.id,
+            last_created_at=watermark.last_created_at,
+            last_id=watermark.last_id
+        ).update(
+            last_created_at=last_created_at,
+            last_id=last_id,
+            processed_rows=F('processed_rows') + len(rows),
+            lag_seconds=stats.lag_seconds,
+            updated_at=now
+        )
+        if not advanced:
+            logger.warning(f"ストリーム {name} のウォーターマークが他のプロセスで更新されたため、バッチを破棄します")
+            return BatchStats(caught_up=False)
+
+        applied = service.apply_aggregation_deltas(deltas)
+        transaction.on_commit(lambda: _notify_ingested(dashboard_dates))
+
+    stats.keys = len(deltas)
+    stats.created = applied['created']
+    stats.updated = applied['updated']
+    return stats
+
+
+def stream_status(name: str = DEFAULT_STREAM, now=None) -> dict:
+    """ストリームの位置と遅延"""
+    now = now or timezone.now()
+    watermark = StreamWatermark.objects.filter(name=name).first()
+    if watermark is None:
+        return {'name': name, 'initialized': False}
+    return {
+        'name': name,
+        'initialized': True,
+        'last_created_at': watermark.last_created_at.isoformat() if watermark.last_created_at else None,
+        'last_id': watermark.last_id,
+        'processed_rows': watermark.processed_rows,
+        'lag_seconds': watermark.lag_seconds,
+        'idle_seconds': (now - watermark.updated_at).total_seconds(),
+    }
@@ -5,7 +5,9 @@ AggregationService のテスト
 from datetime import date, datetime, time
 from django.test import TestCase, override_settings
 from django.utils import timezone
-from production.models import Line, WeeklyResultAggregation
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from production.models import Line, Result, WeeklyResultAggregation
 from production.services import AggregationService
 
 
@@ -82,7 +84,7 @@ class TestAggregationService(TestCase):
     def test_aggregation_summary(self):
         """集計サマリーのテスト"""
         # サマリー取得
-        summary = self.service.get_aggregation_summary(self.line.id, self.test_date)
+        summary = self.service.get_aggregation_summary(self.line.id, self.test_date, validate=True)
         
         # 結果確認
         self.assertEqual(summary['line_name'], self.line.name)
@@ -91,6 +93,27 @@ class TestAggregationService(TestCase):
         self.assertEqual(summary['total_quantity'], 0)
         self.assertTrue(summary['is_consistent'])  # 空データは整合性OK
     
+    def test_aggregation_summary_single_query(self):
+        """サマリーが集計テーブルへの1クエリで取得されること"""
+        for i, (machine, part, judgment) in enumerate([
+            ("設備1", "機種A", 'OK'), ("設備2", "機種A", 'OK'), ("設備1", "機種B", 'NG')
+        ]):
+            WeeklyResultAggregation.objects.create(
+                date=self.test_date, line=self.line.name, machine=machine, part=part,
+                judgment=judgment, total_quantity=i + 1, result_count=1
+            )
+        self.service.get_aggregation_summary(self.line.id, self.test_date)  # ライン情報をキャッシュ
+        
+        with self.assertNumQueries(1):
+            summary = self.service.get_aggregation_summary(self.line.id, self.test_date)
+        
+        self.assertEqual(
+            (summary['total_records'], summary['total_quantity'], summary['ok_quantity'], summary['ng_quantity']),
+            (3, 6, 3, 3)
+        )
+        self.assertEqual((summary['part_count'], summary['machine_count']), (2, 2))
+        self.assertIsNone(summary['is_consistent'])
+    
     def test_repair_aggregation(self):
         """集計修復のテスト"""
         # 修復実行（データがない状態）
@@ -127,4 +150,57 @@ class TestAggregationService(TestCase):
         self.assertEqual(result['inconsistent_days'], 0)
         self.assertEqual(result['repaired_days'], 0)
         self.assertEqual(result['failed_days'], 0)
-        self.assertEqual(result['success_rate'], 100.0)
\ No newline at end of file
+        self.assertEqual(result['success_rate'], 100.0)    
+    def _create_results(self, days):
+        """各稼働日に OK/NG の実績を作成（シグナルによる集計は削除しておく）"""
+        for offset in range(days):
+            work_date = date(2025, 1, 1 + offset)
+            for hour, judgment in ((9, 'OK'), (13, 'OK'), (20, 'NG')):
+                Result.objects.create(
+                    line=self.line.name,
+                    machine="設備1",
+                    part="機種A",
+                    timestamp=timezone.make_aware(datetime.combine(work_date, time(hour, 0))),
+                    serial_number=f"SN{offset}-{hour}",
+                    judgment=judgment,
+                    quantity=2
+                )
+        WeeklyResultAggregation.objects.all().delete()
+    
+    def test_date_range_aggregation_is_set_based(self):
+        """期間集計のクエリ数が日数に依存せず、稼働日別に正しく集計されること"""
+        query_counts = []
+        for days in (3, 10):
+            self._create_results(days)
+            with CaptureQueriesContext(connection) as queries:
+                count = self.service.aggregate_date_range(
+                    self.line.id, date(2025, 1, 1), date(2025, 1, days)
+                )
+            query_counts.append(len(queries))
+            self.assertEqual(count, days * 2)
+            Result.objects.all().delete()
+        
+        self.assertEqual(query_counts[0], query_counts[1])
+        
+        self._create_results(3)
+        self.service.aggregate_date_range(self.line.id, date(2025, 1, 1), date(2025, 1, 3))
+        ok = WeeklyResultAggregation.objects.get(line=self.line.name, date=date(2025, 1, 2), judgment='OK')
+        self.assertEqual((ok.total_quantity, ok.result_count), (4, 2))
+        for offset in range(3):
+            self.assertTrue(self.service.validate_aggregation(self.line.id, date(2025, 1, 1 + offset)))
+    
+    def test_chunked_aggregation_reports_progress(self):
+        """チャンク単位で進捗が通知され、処理速度が返されること"""
+        self._create_results(5)
+        chunks = []
+        
+        stats = self.service.aggregate_dates_in_chunks(
+            self.line.id,
+            [date(2025, 1, 1 + offset) for offset in range(5)],
+            chunk_days=2,
+            progress=lambda chunk, created: chunks.append((len(chunk), sum(created.values())))
+        )
+        
+        self.assertEqual(chunks, [(2, 4), (2, 4), (1, 2)])
+        self.assertEqual((stats['days'], stats['chunks'], stats['records'], stats['source_rows']), (5, 3, 10, 15))
+        self.assertIn('rows_per_second', stats)
@@ -4,10 +4,12 @@ APIエンドポイントのテスト
 
 import json
 from datetime import date, timedelta
+from unittest.mock import patch
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
-from production.models import Line, UserLineAccess, WeeklyResultAggregation
+from production.models import Category, Line, Part, UserLineAccess, WeeklyResultAggregation
+from production.utils import get_daily_part_breakdown
 
 
 @override_settings(
@@ -125,6 +127,65 @@ class TestAPIEndpoints(TestCase):
             self.assertIn('parts', day_data)
             self.assertIn('achievement_rate', day_data)
     
+    def test_graph_data_api_part_breakdown(self):
+        """グラフデータAPIが日別・機種別の実績を集計テーブルから返すこと（週別・月別）"""
+        url = reverse('production:graph_api', kwargs={
+            'line_id': self.line.id,
+            'period': 'weekly',
+            'date': self.test_date.strftime('%Y-%m-%d')
+        })
+        response = self.client.get(url)
+        
+        # 日別・機種別の内訳は計画・集計の2クエリ
+        with self.assertNumQueries(2):
+            get_daily_part_breakdown(self.line.id, self.line.name, self.week_dates)
+        
+        first_day = json.loads(response.content)['data'][0]
+        self.assertEqual(first_day['date'], self.week_dates[0].strftime('%Y-%m-%d'))
+        self.assertEqual(first_day['total_actual'], 50 + 60 + 70)
+        self.assertEqual(first_day['ng_count'], 2 + 3 + 4)
+        self.assertEqual([part['name'] for part in first_day['parts']], ['製品0', '製品1', '製品2'])
+        self.assertEqual(first_day['parts'][1]['actual'], 60)
+        
+        monthly_url = reverse('production:graph_api', kwargs={
+            'line_id': self.line.id,
+            'period': 'monthly',
+            'date': self.test_date.strftime('%Y-%m-%d')
+        })
+        monthly = json.loads(self.client.get(monthly_url).content)
+        self.assertEqual(len(monthly['data']), 31)
+        self.assertEqual(
+            sum(day['total_actual'] for day in monthly['data']),
+            sum(50 + i * 5 + part_num * 10 for i in range(7) for part_num in range(3))
+        )
+    
+    def test_graph_data_api_conditional_get(self):
+        """ETag が一致する場合は 304 を返し、データ変更後は新しいデータを返すこと"""
+        url = reverse('production:graph_api', kwargs={
+            'line_id': self.line.id,
+            'period': 'weekly',
+            'date': self.test_date.strftime('%Y-%m-%d')
+        })
+        etag = self.client.get(url)['ETag']
+        
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        
+        WeeklyResultAggregation.objects.create(
+            date=self.week_dates[0], line=self.line.name, machine="機械0",
+            part="製品9", judgment="OK", total_quantity=1, result_count=1
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        
+        invalid = reverse('production:graph_api', kwargs={
+            'line_id': self.line.id,
+            'period': 'yearly',
+            'date': self.test_date.strftime('%Y-%m-%d')
+        })
+        self.assertEqual(self.client.get(invalid).status_code, 400)
+    
     def test_weekly_analysis_api(self):
         """週別分析APIのテスト"""
         url = reverse('production:weekly_analysis_api', kwargs={
@@ -343,4 +404,59 @@ class TestAPIEndpoints(TestCase):
             data = json.loads(response.content)
             # 空データでも基本構造は維持される
             self.assertIn('chart_data', data)
-            self.assertIn('weekly_stats', data)
\ No newline at end of file
+            self.assertIn('weekly_stats', data)
+    
+    def test_weekly_analysis_api_conditional_get(self):
+        """If-None-Match が一致する場合はデータを構築せずに 304 を返すこと"""
+        url = reverse('production:weekly_analysis_api', kwargs={
+            'line_id': self.line.id,
+            'date': self.test_date.strftime('%Y-%m-%d')
+        })
+        response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        etag = response['ETag']
+        
+        with patch('production.utils.get_weekly_graph_data') as builder:
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            builder.assert_not_called()
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag)
+        
+        # 件数（行の削除）を含む検証子は更新日時で表せないため Last-Modified を返さない
+        self.assertNotIn('Last-Modified', response)
+        
+        # 集計行の削除でも ETag が変わる
+        WeeklyResultAggregation.objects.filter(date=self.week_dates[0]).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_performance_metrics_api_conditional_get(self):
+        """パフォーマンス指標APIの条件付き GET"""
+        url = reverse('production:performance_metrics_api', kwargs={
+            'line_id': self.line.id,
+            'date': self.test_date.strftime('%Y-%m-%d')
+        })
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        
+        # 別の日（別の時間別トレンド）は別の ETag
+        other_url = reverse('production:performance_metrics_api', kwargs={
+            'line_id': self.line.id,
+            'date': self.week_dates[0].strftime('%Y-%m-%d')
+        })
+        self.assertEqual(self.client.get(other_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+    
+    def test_part_info_api_conditional_get(self):
+        """機種の更新で機種情報APIの ETag が変わること"""
+        category = Category.objects.create(name="APIテストカテゴリ")
+        part = Part.objects.create(name="API機種", category=category, target_pph=360)
+        url = reverse('production:part_info_api', kwargs={'part_id': part.id})
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        
+        part.target_pph = 180
+        part.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['target_pph'], 180)
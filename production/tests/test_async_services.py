@@ -0,0 +1,92 @@
+"""
+WebSocketコンシューマー向け非同期サービスのテスト
+"""
+
+import asyncio
+import time as time_module
+from datetime import date, datetime, time
+from django.core.cache import cache
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from production.async_services import (
+    AsyncDashboardService, AsyncWeeklyAnalysisService, get_aggregation_status, run_in_db_pool
+)
+from production.models import Line, Category, Part, Result, WorkCalendar
+
+
+class TestRunInDbPool(SimpleTestCase):
+    """run_in_db_pool のテストクラス"""
+
+    def test_independent_calls_run_concurrently(self):
+        """独立した呼び出しが直列ではなく並行に実行されること"""
+        def slow(value):
+            time_module.sleep(0.2)
+            return value
+
+        async def run():
+            return await asyncio.gather(run_in_db_pool(slow, 1), run_in_db_pool(slow, 2), run_in_db_pool(slow, 3))
+
+        started = time_module.monotonic()
+        results = asyncio.run(run())
+        elapsed = time_module.monotonic() - started
+
+        self.assertEqual(results, [1, 2, 3])
+        self.assertLess(elapsed, 0.5)
+
+    def test_exception_is_propagated(self):
+        """プール内の例外が呼び出し元に伝わること"""
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(run_in_db_pool(fail))
+
+
+@override_settings(BROADCAST_COALESCE_WINDOW=0)  # 通知を送信スレッドに残さない
+class TestAsyncServices(TransactionTestCase):
+    """非同期サービスのテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        cache.clear()
+        self.line = Line.objects.create(name="非同期テストライン")
+        WorkCalendar.objects.create(line=self.line, work_start_time=time(8, 30))
+        category = Category.objects.create(name="非同期テストカテゴリ")
+        self.part = Part.objects.create(name="非同期機種", category=category, target_pph=60)
+        Result.objects.create(
+            line=self.line.name,
+            machine="設備1",
+            part=self.part.name,
+            timestamp=timezone.make_aware(datetime.combine(date(2025, 1, 15), time(10, 0))),
+            serial_number="SN1",
+            judgment='OK',
+            quantity=1
+        )
+
+    def test_weekly_analysis(self):
+        """週別データと指標がまとめて取得できること"""
+        weekly = asyncio.run(AsyncWeeklyAnalysisService().get_weekly_analysis(
+            self.line.id, date(2025, 1, 13), date(2025, 1, 19)
+        ))
+
+        self.assertEqual(weekly['line_name'], self.line.name)
+        self.assertIn('weekly_data', weekly)
+        self.assertIn('performance_metrics', weekly)
+
+    def test_dashboard_with_weekly(self):
+        """ダッシュボードデータに週別集計データが付与されること"""
+        data = asyncio.run(AsyncDashboardService().get_dashboard_with_weekly(self.line.id, '2025-01-15'))
+
+        self.assertEqual(data['total_actual'], 1)
+        self.assertEqual(data['data_source'], 'aggregated')
+        self.assertIn('aggregated_weekly_data', data)
+        self.assertIn('performance_metrics', data)
+
+    def test_aggregation_status(self):
+        """集計状況の各値が取得できること"""
+        status = asyncio.run(get_aggregation_status())
+
+        self.assertEqual(status['aggregation_count'], 1)
+        self.assertEqual(status['result_count'], 1)
+        self.assertEqual(status['latest_aggregation_date'], '2025-01-15')
+        self.assertEqual(status['line_stats'], [{'line': self.line.name, 'count': 1}])
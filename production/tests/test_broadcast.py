@@ -0,0 +1,105 @@
+"""
+WebSocket通知のまとめ送信のテスト
+"""
+
+import threading
+from datetime import date, datetime, timezone as dt_timezone
+from unittest.mock import patch
+from django.test import SimpleTestCase, override_settings
+from production.broadcast import BroadcastCoalescer
+from production.models import Result, _send_merged_aggregation_update
+from production.services import _send_aggregation_notification
+
+
+class TestBroadcastCoalescer(SimpleTestCase):
+    """BroadcastCoalescer のテストクラス"""
+
+    def setUp(self):
+        self.coalescer = BroadcastCoalescer()
+        self.sent = []
+        self.done = threading.Event()
+
+    def _sender(self, payloads):
+        self.sent.append(list(payloads))
+        self.done.set()
+
+    @override_settings(BROADCAST_COALESCE_WINDOW=0.05)
+    def test_events_in_window_are_merged(self):
+        """時間窓内の同じキーの通知は1回にまとめて送信されること"""
+        for i in range(5):
+            self.coalescer.submit(('dashboard', 1, '2025-01-15'), self._sender, i)
+
+        self.assertTrue(self.done.wait(2))
+        self.assertEqual(self.sent, [[0, 1, 2, 3, 4]])
+
+        stats = self.coalescer.get_stats()
+        self.assertEqual(stats['submitted'], 5)
+        self.assertEqual(stats['sent'], 1)
+        self.assertEqual(stats['folded'], 4)
+        self.assertEqual(stats['folded_by_group'], {'dashboard': 4})
+        self.assertEqual(stats['pending'], 0)
+
+    @override_settings(BROADCAST_COALESCE_WINDOW=60)
+    def test_keys_are_sent_separately(self):
+        """キーが異なる通知は別々に送信されること"""
+        self.coalescer.submit(('dashboard', 1, '2025-01-15'), self._sender, 'a')
+        self.coalescer.submit(('dashboard', 1, '2025-01-16'), self._sender, 'b')
+        self.coalescer.submit(('dashboard', 1, '2025-01-15'), self._sender, 'c')
+        self.assertEqual(self.sent, [])
+
+        self.coalescer.flush()
+
+        self.assertEqual(sorted(self.sent), [['a', 'c'], ['b']])
+        self.assertEqual(self.coalescer.get_stats()['pending'], 0)
+
+    @override_settings(BROADCAST_COALESCE_WINDOW=0)
+    def test_zero_window_sends_immediately(self):
+        """時間窓が0の場合は即時送信されること"""
+        self.coalescer.submit(('dashboard', 1, '2025-01-15'), self._sender, 'a')
+        self.coalescer.submit(('dashboard', 1, '2025-01-15'), self._sender, 'b')
+
+        self.assertEqual(self.sent, [['a'], ['b']])
+        self.assertEqual(self.coalescer.get_stats()['folded'], 0)
+
+    @override_settings(BROADCAST_COALESCE_WINDOW=0.05)
+    def test_flush_sends_pending_before_window(self):
+        """終了時の flush で送信待ちの通知が送信され、送信スレッドから重複送信されないこと"""
+        self.coalescer.submit(('dashboard', 1, '2025-01-15'), self._sender, 'a')
+        self.coalescer.flush()
+        self.assertEqual(self.sent, [['a']])
+        self.done.clear()
+
+        self.coalescer.submit(('dashboard', 1, '2025-01-15'), self._sender, 'b')
+        self.assertTrue(self.done.wait(2))
+        self.assertEqual(self.sent, [['a'], ['b']])
+        self.assertEqual(self.coalescer.get_stats()['sent'], 2)
+
+    def test_notification_uses_local_date(self):
+        """集計更新通知は実績のローカル日付（Asia/Tokyo）でまとめられること"""
+        result = Result(
+            line='通知テストライン', part='機種A', judgment='OK', quantity=1,
+            timestamp=datetime(2025, 1, 14, 17, 0, tzinfo=dt_timezone.utc)  # DB から読み込んだ値は UTC
+        )
+        with patch('production.broadcast.broadcast_coalescer.submit') as submit:
+            _send_aggregation_notification(result, 'create')
+
+        self.assertEqual(submit.call_args_list[0][0][0], ('aggregation_updated', '通知テストライン', date(2025, 1, 15)))
+
+    def test_merged_aggregation_update_message(self):
+        """まとめた集計更新通知に件数・機種・判定別数量が含まれること"""
+        notifications = [
+            {'line_id': 1, 'part': '機種A', 'judgment': 'OK', 'quantity': 1, 'timestamp': 't1'},
+            {'line_id': 1, 'part': '機種B', 'judgment': 'OK', 'quantity': 2, 'timestamp': 't2'},
+            {'line_id': 1, 'part': '機種A', 'judgment': 'NG', 'quantity': 1, 'timestamp': 't3'},
+        ]
+        with patch('production.models.get_channel_layer') as get_layer, \
+                patch('production.models.async_to_sync') as to_sync:
+            _send_merged_aggregation_update(notifications)
+
+        group, message = to_sync.return_value.call_args[0]
+        self.assertTrue(get_layer.called)
+        self.assertEqual(group, 'weekly_analysis_1')
+        self.assertEqual(message['data']['event_count'], 3)
+        self.assertEqual(message['data']['parts'], ['機種A', '機種B'])
+        self.assertEqual(message['data']['quantity_by_judgment'], {'OK': 3, 'NG': 1})
+        self.assertEqual(message['data']['timestamp'], 't3')
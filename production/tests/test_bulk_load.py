@@ -0,0 +1,119 @@
+"""
+一括投入時の集計遅延（aggregation_deferred）のテスト
+"""
+
+from datetime import date, datetime, time
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from production.broadcast import broadcast_coalescer
+from production.bulk_load import aggregation_deferred, is_aggregation_deferred
+from production.dashboard_cache import dashboard_cache
+from production.models import (
+    Line, Category, Part, Machine, Plan, Result, WorkCalendar,
+    WeeklyResultAggregation, HourlyResultAggregation
+)
+from production.services import AggregationService
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[],  # ルーターを無効化
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    BROADCAST_COALESCE_WINDOW=60
+)
+class TestAggregationDeferred(TestCase):
+    """aggregation_deferred のテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        cache.clear()
+        self.line = Line.objects.create(name="一括投入テストライン")
+        WorkCalendar.objects.create(line=self.line, work_start_time=time(8, 30))
+        self.test_date = date(2025, 1, 15)
+
+    def tearDown(self):
+        """時間窓で保留中の通知をテスト用データベースがあるうちに送信"""
+        broadcast_coalescer.flush()
+
+    def _create_result(self, hour, serial, day=None):
+        return Result.objects.create(
+            line=self.line.name,
+            machine="設備1",
+            part="機種A",
+            timestamp=timezone.make_aware(datetime.combine(day or self.test_date, time(hour, 0))),
+            serial_number=serial,
+            judgment='OK',
+            quantity=1
+        )
+
+    def test_signals_are_deferred_until_exit(self):
+        """ブロック内では集計せず、終了時にまとめて集計されること"""
+        version = dashboard_cache.get_version(self.line.id, self.test_date.isoformat())
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with aggregation_deferred():
+                self.assertTrue(is_aggregation_deferred())
+                for i in range(5):
+                    self._create_result(10 + i, f"SN{i}")
+                self._create_result(7, "SN-prev", day=date(2025, 1, 16))  # 1/15 の稼働日
+                self.assertEqual(WeeklyResultAggregation.objects.count(), 0)
+                self.assertEqual(callbacks, [])
+
+        self.assertFalse(is_aggregation_deferred())
+        self.assertEqual(len(callbacks), 1)
+        aggregation = WeeklyResultAggregation.objects.get(line=self.line.name, date=self.test_date)
+        self.assertEqual((aggregation.total_quantity, aggregation.result_count), (6, 6))
+        self.assertEqual(HourlyResultAggregation.objects.filter(date=self.test_date).count(), 6)
+        self.assertTrue(AggregationService().validate_aggregation(self.line.id, self.test_date))
+        self.assertNotEqual(dashboard_cache.get_version(self.line.id, self.test_date.isoformat()), version)
+
+    def test_nested_blocks_flush_once(self):
+        """入れ子の場合は最も外側のブロック終了時に1回だけ処理されること"""
+        with patch('production.bulk_load.flush_deferred') as flush, \
+                self.captureOnCommitCallbacks(execute=True):
+            with aggregation_deferred():
+                with aggregation_deferred():
+                    self._create_result(10, "SN1")
+                self.assertFalse(flush.called)
+                self.assertTrue(is_aggregation_deferred())
+                self._create_result(11, "SN2")
+
+        self.assertEqual(flush.call_count, 1)
+        touched = flush.call_args[0][0]
+        self.assertEqual(touched.result_dates, {self.line.name: {self.test_date}})
+
+    def test_exception_still_flushes_saved_rows(self):
+        """ブロック内で例外が発生しても保存済みの分は集計され、例外が送出されること"""
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ValueError):
+                with aggregation_deferred():
+                    self._create_result(10, "SN1")
+                    raise ValueError("load failed")
+
+        self.assertFalse(is_aggregation_deferred())
+        self.assertEqual(WeeklyResultAggregation.objects.get(line=self.line.name).result_count, 1)
+
+    def test_plan_pph_recalculated_once_per_line_and_date(self):
+        """計画PPHは (ライン, 日付) ごとに1回だけ再計算されること"""
+        category = Category.objects.create(name="一括投入カテゴリ")
+        part = Part.objects.create(name="一括投入機種", category=category, target_pph=60)
+        machine = Machine.objects.create(name="一括投入設備", line=self.line)
+
+        with patch('production.utils.calculate_planned_pph_for_date') as calculate:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with aggregation_deferred():
+                    for sequence in range(1, 4):
+                        Plan.objects.create(
+                            date=self.test_date, line=self.line, part=part, machine=machine,
+                            planned_quantity=10, sequence=sequence
+                        )
+
+        self.assertEqual(len(callbacks), 1)
+        calculate.assert_called_once_with(self.line.id, self.test_date)
@@ -0,0 +1,104 @@
+"""
+稼働カレンダーレジストリのテスト
+"""
+
+from datetime import date, datetime, time
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from production.models import Line, WorkCalendar
+from production.registry import DEFAULT_WORK_CALENDAR, calendar_registry
+from production.services import AggregationService
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[]  # ルーターを無効化
+)
+class TestCalendarRegistry(TestCase):
+    """CalendarRegistry のテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        self.line = Line.objects.create(name="カレンダーテストライン")
+        self.work_calendar = WorkCalendar.objects.create(
+            line=self.line,
+            work_start_time=time(7, 0),
+            morning_meeting_duration=10,
+            break_times=[{"start": "12:00", "end": "12:45"}, {"start": "03:00", "end": "03:30"}]
+        )
+        self.default_line = Line.objects.create(name="カレンダー未設定ライン")
+        calendar_registry.invalidate()
+
+    def test_single_query_load(self):
+        """初回参照時に1回のクエリで全ラインをロードし、以降はクエリを発行しないこと"""
+        with self.assertNumQueries(1):
+            info = calendar_registry.get("カレンダーテストライン")
+            by_id = calendar_registry.resolve(self.line.id)
+            default = calendar_registry.resolve("カレンダー未設定ライン")
+
+        self.assertEqual(by_id, info)
+        self.assertEqual((info.line_id, info.work_start_time, info.morning_meeting_duration), (self.line.id, time(7, 0), 10))
+        self.assertEqual(info.break_intervals, ((time(12, 0), time(12, 45)), (time(3, 0), time(3, 30))))
+        self.assertTrue(info.configured)
+
+        self.assertEqual(default.line_id, self.default_line.id)
+        self.assertEqual(default.work_start_time, time(8, 30))
+        self.assertEqual(len(default.break_intervals), 4)
+        self.assertFalse(default.configured)
+
+        with self.assertNumQueries(0):
+            AggregationService()._get_work_start_time_by_line_name("カレンダーテストライン")
+            AggregationService()._get_work_period_for_date(self.line.id, date(2025, 1, 15))
+
+    def test_resolve_string_line_id(self):
+        """URL 等から渡される文字列のライン ID でもラインの稼働カレンダーを返すこと"""
+        info = calendar_registry.resolve(str(self.line.id))
+
+        self.assertEqual(info, calendar_registry.resolve(self.line.id))
+        self.assertEqual(info.work_start_time, time(7, 0))
+
+    def test_unknown_line(self):
+        """未登録のラインはデフォルトの稼働カレンダーを返すこと"""
+        calendar_registry.get("カレンダーテストライン")
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(calendar_registry.get("未登録ライン"))
+            self.assertEqual(calendar_registry.resolve("未登録ライン"), DEFAULT_WORK_CALENDAR)
+
+    def test_work_period_and_date(self):
+        """稼働期間と稼働日が work_start_time 基準で求められること"""
+        info = calendar_registry.resolve(self.line.id)
+
+        start, end = info.work_period(date(2025, 1, 15))
+        self.assertEqual(start, timezone.make_aware(datetime(2025, 1, 15, 7, 0)))
+        self.assertEqual(end, timezone.make_aware(datetime(2025, 1, 16, 7, 0)))
+
+        self.assertEqual(info.work_date(timezone.make_aware(datetime(2025, 1, 16, 6, 59))), date(2025, 1, 15))
+        self.assertEqual(info.work_date(timezone.make_aware(datetime(2025, 1, 16, 7, 0))), date(2025, 1, 16))
+
+    def test_invalidation_on_calendar_save(self):
+        """稼働カレンダーの保存・削除がレジストリに反映されること"""
+        calendar_registry.get("カレンダーテストライン")
+
+        self.work_calendar.work_start_time = time(6, 0)
+        self.work_calendar.save()
+        self.assertEqual(calendar_registry.work_start_time(self.line.id), time(6, 0))
+
+        self.work_calendar.delete()
+        self.assertFalse(calendar_registry.resolve(self.line.id).configured)
+        self.assertEqual(calendar_registry.work_start_time(self.line.id), time(8, 30))
+
+    def test_invalidation_on_line_save(self):
+        """ラインの名称変更がレジストリに反映されること"""
+        calendar_registry.get("カレンダーテストライン")
+
+        self.line.name = "カレンダーテストライン改"
+        self.line.save()
+
+        self.assertIsNone(calendar_registry.get("カレンダーテストライン"))
+        self.assertEqual(calendar_registry.get("カレンダーテストライン改").work_start_time, time(7, 0))
@@ -0,0 +1,106 @@
+"""
+ダッシュボードデータキャッシュのテスト
+"""
+
+from datetime import date, datetime, time
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from production.dashboard_cache import dashboard_cache
+from production.models import Line, Machine, Category, Part, Plan, Result, WorkCalendar
+from production.utils import get_cached_dashboard_data
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[]  # ルーターを無効化
+)
+class TestDashboardCache(TestCase):
+    """バージョン付きダッシュボードキャッシュのテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        cache.clear()
+        self.line = Line.objects.create(name="キャッシュテストライン")
+        WorkCalendar.objects.create(line=self.line, work_start_time=time(8, 30))
+        category = Category.objects.create(name="キャッシュテストカテゴリ")
+        self.part = Part.objects.create(name="キャッシュ機種", category=category, target_pph=60)
+        self.machine = Machine.objects.create(name="設備1", line=self.line)
+        self.test_date = date(2025, 1, 15)
+        self.date_str = '2025-01-15'
+
+    def _create_result(self, hour, serial):
+        return Result.objects.create(
+            line=self.line.name,
+            machine="設備1",
+            part=self.part.name,
+            timestamp=timezone.make_aware(datetime.combine(self.test_date, time(hour, 0))),
+            serial_number=serial,
+            judgment='OK',
+            quantity=1
+        )
+
+    def test_repeated_requests_hit_cache(self):
+        """データ変更がない間はDBにアクセスせずキャッシュから返すこと"""
+        first = get_cached_dashboard_data(self.line.id, self.date_str)
+
+        with self.assertNumQueries(0):
+            second = get_cached_dashboard_data(self.line.id, self.date_str)
+
+        self.assertEqual(first, second)
+        stats = dashboard_cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_result_change_invalidates(self):
+        """実績の保存・削除でバージョンが進み、最新データが返ること"""
+        self.assertEqual(get_cached_dashboard_data(self.line.id, self.date_str)['total_actual'], 0)
+
+        result = self._create_result(10, "SN1")
+        self.assertEqual(get_cached_dashboard_data(self.line.id, self.date_str)['total_actual'], 1)
+
+        result.delete()
+        self.assertEqual(get_cached_dashboard_data(self.line.id, self.date_str)['total_actual'], 0)
+
+    def test_result_before_work_start_invalidates_previous_day(self):
+        """work_start_time前の実績は前日（稼働日）のキャッシュも無効化すること"""
+        version_today = dashboard_cache.get_version(self.line.id, self.date_str)
+        version_prev = dashboard_cache.get_version(self.line.id, '2025-01-14')
+        version_next = dashboard_cache.get_version(self.line.id, '2025-01-16')
+
+        self._create_result(7, "SN1")
+
+        self.assertNotEqual(dashboard_cache.get_version(self.line.id, self.date_str), version_today)
+        self.assertNotEqual(dashboard_cache.get_version(self.line.id, '2025-01-14'), version_prev)
+        self.assertEqual(dashboard_cache.get_version(self.line.id, '2025-01-16'), version_next)
+
+    def test_plan_change_invalidates(self):
+        """計画の保存でバージョンが進むこと"""
+        self.assertEqual(get_cached_dashboard_data(self.line.id, self.date_str)['total_planned'], 0)
+
+        Plan.objects.create(
+            date=self.test_date, line=self.line, part=self.part, machine=self.machine,
+            planned_quantity=50, sequence=1
+        )
+
+        self.assertEqual(get_cached_dashboard_data(self.line.id, self.date_str)['total_planned'], 50)
+
+    def test_stats_in_metrics_api(self):
+        """監視APIにヒット・ミス回数が含まれること"""
+        get_cached_dashboard_data(self.line.id, self.date_str)
+        get_cached_dashboard_data(self.line.id, self.date_str)
+
+        staff = User.objects.create_user(username='staff', password='pass', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('production:aggregation_metrics'))
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['dashboard_cache']['hits'], 1)
+        self.assertEqual(response.json()['dashboard_cache']['misses'], 1)
@@ -0,0 +1,170 @@
+"""
+ダッシュボード差分配信のテスト
+"""
+
+import copy
+from datetime import date, datetime, time
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from channels.testing import WebsocketCommunicator
+from channels.db import database_sync_to_async
+from production.consumers import DashboardConsumer
+from production.dashboard_stream import compute_dashboard_diff, apply_dashboard_diff, dashboard_stream
+from production.models import Line, Category, Part, Result, UserLineAccess, WorkCalendar
+from production.utils import get_dashboard_data, publish_dashboard_delta
+
+IN_MEMORY_CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+
+
+def _create_result(line, part, hour, serial):
+    return Result.objects.create(
+        line=line.name,
+        machine="設備1",
+        part=part.name,
+        timestamp=timezone.make_aware(datetime.combine(date(2025, 1, 15), time(hour, 0))),
+        serial_number=serial,
+        judgment='OK',
+        quantity=1
+    )
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[],  # ルーターを無効化
+    CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+    BROADCAST_COALESCE_WINDOW=0
+)
+class TestDashboardStream(TestCase):
+    """差分計算とシーケンス管理のテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        cache.clear()
+        self.line = Line.objects.create(name="差分テストライン")
+        WorkCalendar.objects.create(line=self.line, work_start_time=time(8, 30))
+        category = Category.objects.create(name="差分テストカテゴリ")
+        self.part_a = Part.objects.create(name="差分機種A", category=category, target_pph=60)
+        self.part_b = Part.objects.create(name="差分機種B", category=category, target_pph=60)
+        self.date_str = '2025-01-15'
+
+    def test_diff_contains_only_changed_cells(self):
+        """変化した時間帯・機種のセルと合計値のみが差分に含まれること"""
+        _create_result(self.line, self.part_a, 10, "SN1")
+        old = get_dashboard_data(self.line.id, self.date_str)
+
+        _create_result(self.line, self.part_b, 12, "SN2")
+        new = get_dashboard_data(self.line.id, self.date_str)
+
+        diff = compute_dashboard_diff(old, new)
+
+        self.assertEqual(diff['totals']['total_actual'], 2)
+        self.assertEqual([p['name'] for p in diff['parts']], ["差分機種B"])
+        self.assertEqual([cell['index'] for cell in diff['hourly']], [3])
+        self.assertEqual(list(diff['hourly'][0]['parts']), [self.part_b.id])
+        self.assertEqual(apply_dashboard_diff(copy.deepcopy(old), diff), new)
+        self.assertEqual(compute_dashboard_diff(new, copy.deepcopy(new)), {})
+
+    def test_sequence_and_resync(self):
+        """変化があるたびにシーケンス番号が進み、履歴から再同期できること"""
+        sequence, _, delta = dashboard_stream.update(self.line.id, self.date_str)
+        self.assertIsNone(delta)
+
+        # 変化なし → シーケンス番号は進まない
+        self.assertEqual(dashboard_stream.update(self.line.id, self.date_str)[0], sequence)
+
+        _create_result(self.line, self.part_a, 10, "SN1")
+        _, _, first = publish_dashboard_delta(self.line.id, self.date_str)
+        _create_result(self.line, self.part_a, 11, "SN2")
+        _, data, second = publish_dashboard_delta(self.line.id, self.date_str)
+
+        self.assertEqual(first['base_sequence'], sequence)
+        self.assertEqual(second['sequence'], sequence + 2)
+
+        deltas = dashboard_stream.get_deltas_since(self.line.id, self.date_str, sequence)
+        self.assertEqual([d['sequence'] for d in deltas], [sequence + 1, sequence + 2])
+        self.assertEqual(dashboard_stream.get_deltas_since(self.line.id, self.date_str, sequence + 2), [])
+        # 履歴にないシーケンス番号はスナップショットが必要
+        self.assertIsNone(dashboard_stream.get_deltas_since(self.line.id, self.date_str, sequence - 10))
+        self.assertEqual(data['total_actual'], 2)
+
+    def test_lock_timeout_skips_update(self):
+        """ロックを取得できない場合は差分を記録せず、保存済みのスナップショットを返すこと"""
+        sequence, snapshot, _ = dashboard_stream.update(self.line.id, self.date_str)
+        _create_result(self.line, self.part_a, 10, "SN1")
+
+        cache.add(dashboard_stream.LOCK_KEY.format(line_id=self.line.id, date=self.date_str), 1, 10)
+        with patch.object(dashboard_stream, 'LOCK_WAIT', 0.1):
+            self.assertEqual(dashboard_stream.update(self.line.id, self.date_str), (sequence, snapshot, None))
+        self.assertEqual(dashboard_stream.get_deltas_since(self.line.id, self.date_str, sequence), [])
+
+        # ロック解放後の更新で変化が差分になる
+        cache.delete(dashboard_stream.LOCK_KEY.format(line_id=self.line.id, date=self.date_str))
+        _, data, delta = dashboard_stream.update(self.line.id, self.date_str)
+        self.assertEqual(delta['base_sequence'], sequence)
+        self.assertEqual(data['total_actual'], 1)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, BROADCAST_COALESCE_WINDOW=0)
+class TestDashboardConsumerDelta(TransactionTestCase):
+    """DashboardConsumer の差分プロトコルのテスト"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        cache.clear()
+        self.user = User.objects.create_user(username='wallboard', password='testpass')
+        self.line = Line.objects.create(name="差分WSライン")
+        UserLineAccess.objects.create(user=self.user, line=self.line)
+        category = Category.objects.create(name="差分WSカテゴリ")
+        self.part = Part.objects.create(name="差分WS機種", category=category, target_pph=60)
+
+    def _communicator(self):
+        communicator = WebsocketCommunicator(
+            DashboardConsumer.as_asgi(),
+            f"/ws/dashboard/{self.line.id}/2025-01-15/"
+        )
+        communicator.scope["user"] = self.user
+        communicator.scope["url_route"] = {'kwargs': {'line_id': self.line.id, 'date': '2025-01-15'}}
+        return communicator
+
+    async def test_snapshot_delta_and_resync(self):
+        """接続時のスナップショット、差分配信、再同期"""
+        communicator = self._communicator()
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        snapshot = await communicator.receive_json_from()
+        self.assertEqual(snapshot['type'], 'dashboard_snapshot')
+        self.assertEqual(snapshot['data']['total_actual'], 0)
+        sequence = snapshot['sequence']
+
+        await database_sync_to_async(_create_result)(self.line, self.part, 10, "SN1")
+        await database_sync_to_async(publish_dashboard_delta)(self.line.id, '2025-01-15')
+
+        delta = await communicator.receive_json_from()
+        self.assertEqual(delta['type'], 'dashboard_delta')
+        self.assertEqual(delta['base_sequence'], sequence)
+        self.assertEqual(delta['diff']['totals']['total_actual'], 1)
+        self.assertEqual([cell['index'] for cell in delta['diff']['hourly']], [1])
+
+        # 最後に受け取ったシーケンス番号から再同期
+        await communicator.send_json_to({'type': 'resync', 'sequence': sequence})
+        replay = await communicator.receive_json_from()
+        self.assertEqual(replay['sequence'], delta['sequence'])
+
+        await communicator.send_json_to({'type': 'resync', 'sequence': delta['sequence']})
+        in_sync = await communicator.receive_json_from()
+        self.assertEqual(in_sync['type'], 'dashboard_in_sync')
+
+        await communicator.disconnect()
@@ -0,0 +1,143 @@
+"""
+フィンガープリントによる整合性チェックのテスト
+"""
+
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from production import fingerprints
+from production.models import Line, Result, WorkCalendar, WeeklyResultAggregation
+from production.services import AggregationService
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[]  # ルーターを無効化
+)
+class TestFingerprintValidation(TestCase):
+    """フィンガープリント比較のテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        self.service = AggregationService()
+        self.line = Line.objects.create(name="フィンガープリントテストライン")
+        WorkCalendar.objects.create(line=self.line, work_start_time=time(8, 30))
+        self.start_date = date(2025, 1, 1)
+
+    def _create_results(self, days):
+        for offset in range(days):
+            work_date = self.start_date + timedelta(days=offset)
+            for part, judgment in (("機種A", 'OK'), ("機種B", 'OK'), ("機種A", 'NG')):
+                Result.objects.create(
+                    line=self.line.name,
+                    machine="設備1",
+                    part=part,
+                    timestamp=timezone.make_aware(datetime.combine(work_date, time(10, 0))),
+                    serial_number=f"SN{offset}-{part}-{judgment}",
+                    judgment=judgment,
+                    quantity=2
+                )
+        self.service.aggregate_date_range(
+            self.line.id, self.start_date, self.start_date + timedelta(days=days - 1)
+        )
+
+    def test_fingerprint_detects_swapped_keys(self):
+        """件数・数量合計が同じでもキー間で入れ替わった場合はフィンガープリントが一致しないこと"""
+        self._create_results(1)
+        aggregations = WeeklyResultAggregation.objects.filter(line=self.line.name, date=self.start_date)
+        aggregations.filter(part="機種A", judgment='OK').update(total_quantity=1)
+        aggregations.filter(part="機種B").update(total_quantity=3)
+
+        source = fingerprints.source_fingerprints(
+            self.line.name, self.start_date, self.start_date, time(8, 30)
+        )[self.start_date]
+        aggregated = fingerprints.aggregated_fingerprints(
+            self.line.name, self.start_date, self.start_date
+        )[self.start_date]
+
+        self.assertEqual((source.keys, source.rows, source.quantity), (3, 3, 6))
+        self.assertEqual((aggregated.keys, aggregated.rows, aggregated.quantity), (3, 3, 6))
+        self.assertNotEqual(source, aggregated)
+
+    def test_query_count_is_constant(self):
+        """検証のクエリ数が日数に依存しないこと"""
+        self._create_results(20)
+
+        with CaptureQueriesContext(connection) as short_range:
+            self.assertEqual(self.service.find_inconsistencies(
+                self.line.id, self.start_date, self.start_date + timedelta(days=1)
+            ), [])
+        with CaptureQueriesContext(connection) as long_range:
+            self.assertEqual(self.service.detect_inconsistencies(
+                self.line.id, self.start_date, self.start_date + timedelta(days=19)
+            ), [])
+
+        self.assertEqual(len(short_range), len(long_range))
+
+    def test_key_rows_fetched_only_for_mismatched_dates(self):
+        """キー別の行は不一致の日のみ取得されること"""
+        self._create_results(3)
+        broken_date = self.start_date + timedelta(days=1)
+        WeeklyResultAggregation.objects.filter(
+            line=self.line.name, date=broken_date, part="機種B"
+        ).update(total_quantity=5)
+
+        with patch.object(fingerprints, 'source_key_totals', wraps=fingerprints.source_key_totals) as source, \
+                patch.object(fingerprints, 'aggregated_key_totals', wraps=fingerprints.aggregated_key_totals) as aggregated:
+            self.service.find_inconsistencies(self.line.id, self.start_date, self.start_date + timedelta(days=2))
+            self.assertEqual(list(source.call_args.args[-1]), [broken_date])
+            self.assertEqual(list(aggregated.call_args.args[-1]), [broken_date])
+
+        with patch.object(fingerprints, 'source_key_totals') as source:
+            WeeklyResultAggregation.objects.filter(
+                line=self.line.name, date=broken_date, part="機種B"
+            ).update(total_quantity=2)
+            self.assertEqual(self.service.find_inconsistencies(
+                self.line.id, self.start_date, self.start_date + timedelta(days=2)
+            ), [])
+            source.assert_not_called()
+
+    def test_mismatch_reports_key_deltas(self):
+        """不一致の日のみ、キー別の差分が報告されること"""
+        self._create_results(3)
+        broken_date = self.start_date + timedelta(days=1)
+        WeeklyResultAggregation.objects.filter(
+            line=self.line.name, date=broken_date, part="機種B"
+        ).update(total_quantity=5)
+        WeeklyResultAggregation.objects.filter(
+            line=self.line.name, date=broken_date, judgment='NG'
+        ).delete()
+
+        mismatches = self.service.find_inconsistencies(
+            self.line.id, self.start_date, self.start_date + timedelta(days=2)
+        )
+
+        self.assertEqual([mismatch['date'] for mismatch in mismatches], [broken_date])
+        self.assertEqual(mismatches[0]['source']['rows'], 3)
+        self.assertEqual(mismatches[0]['aggregated']['rows'], 2)
+        self.assertEqual(
+            [(d['part'], d['judgment'], d['source_quantity'], d['aggregated_quantity']) for d in mismatches[0]['deltas']],
+            [("機種A", 'NG', 2, 0), ("機種B", 'OK', 2, 5)]
+        )
+        self.assertFalse(self.service.validate_aggregation(self.line.id, broken_date))
+        self.assertTrue(self.service.validate_aggregation(self.line.id, self.start_date))
+
+        out = StringIO()
+        call_command(
+            'validate_aggregation', line_id=self.line.id,
+            start_date='2025-01-01', end_date='2025-01-03', stdout=out
+        )
+        output = out.getvalue()
+        self.assertIn('2025-01-02: 不整合検出 (件数 3/2, 数量 6/7)', output)
+        self.assertIn('設備1 / 機種B / OK: 数量 実績=2 集計=5', output)
+        self.assertIn('不整合検出: 1', output)
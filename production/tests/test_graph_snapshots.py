@@ -0,0 +1,97 @@
+"""
+週別・月別グラフスナップショットのテスト
+"""
+
+from datetime import date, time, timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from production.graph_snapshots import get_graph_data, period_key
+from production.models import Category, GraphSnapshot, Line, Machine, Part, Plan, WorkCalendar, WeeklyResultAggregation
+from production.registry import calendar_registry
+from production.rollups import MONTH, WEEK
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[]  # ルーターを無効化
+)
+class TestGraphSnapshots(TestCase):
+    """グラフスナップショットのテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        self.line = Line.objects.create(name="スナップショットテストライン")
+        WorkCalendar.objects.create(line=self.line, work_start_time=time(8, 30))
+        category = Category.objects.create(name="スナップショットテストカテゴリ")
+        machine = Machine.objects.create(name="設備1", line=self.line)
+        self.part = Part.objects.create(name="機種A", category=category, target_pph=360)
+
+        # 2週前（確定済み）の計画・実績
+        today = timezone.localdate()
+        self.past_day = today - timedelta(days=today.weekday() + 14)
+        self.week_dates = [self.past_day + timedelta(days=i) for i in range(7)]
+        Plan.objects.bulk_create([
+            Plan(line=self.line, machine=machine, date=day, part=self.part, planned_quantity=100)
+            for day in self.week_dates
+        ])
+        WeeklyResultAggregation.objects.bulk_create([
+            WeeklyResultAggregation(date=day, line=self.line.name, part=self.part.name,
+                                    judgment='OK', total_quantity=90, result_count=90)
+            for day in self.week_dates
+        ])
+        calendar_registry.invalidate()
+
+    def test_closed_week_served_from_snapshot(self):
+        """確定済みの週は2回目以降スナップショットから返され、データ変更で作り直されること"""
+        built = get_graph_data(self.line.id, WEEK, self.past_day)
+        self.assertEqual(built['weekly_stats']['total_actual'], 630)
+        self.assertEqual(GraphSnapshot.objects.get().period_key, period_key(WEEK, self.past_day))
+
+        with self.assertNumQueries(2):  # データバージョン・スナップショット
+            cached = get_graph_data(self.line.id, WEEK, self.past_day + timedelta(days=3))
+        self.assertEqual(cached['chart_data'], built['chart_data'])
+        self.assertEqual(cached['weekly_stats'], built['weekly_stats'])
+        self.assertEqual(cached['available_parts'], [{'id': self.part.id, 'name': self.part.name}])
+
+        # 遅れて到着した実績でデータバージョンが変わる
+        WeeklyResultAggregation.objects.create(
+            date=self.week_dates[0], line=self.line.name, part=self.part.name,
+            judgment='OK', total_quantity=10, result_count=10
+        )
+        rebuilt = get_graph_data(self.line.id, WEEK, self.past_day)
+        self.assertEqual(rebuilt['weekly_stats']['total_actual'], 640)
+        self.assertEqual(GraphSnapshot.objects.count(), 1)
+
+    def test_current_period_not_snapshotted(self):
+        """現在の週・月は毎回再計算され、スナップショットを作成しないこと"""
+        get_graph_data(self.line.id, WEEK, timezone.localdate() + timedelta(days=1))
+        get_graph_data(self.line.id, MONTH, timezone.localdate() + timedelta(days=1))
+        self.assertFalse(GraphSnapshot.objects.exists())
+
+    def test_monthly_snapshot_restores_dates(self):
+        """月別の週別サマリーの日付が date として復元されること"""
+        last_month = timezone.localdate().replace(day=1) - timedelta(days=1)
+        built = get_graph_data(self.line.id, MONTH, last_month)
+        cached = get_graph_data(self.line.id, MONTH, last_month)
+
+        self.assertEqual(cached['weekly_summary'], built['weekly_summary'])
+        self.assertIsInstance(cached['weekly_summary'][0]['start_date'], date)
+        self.assertEqual(cached['monthly_stats'], built['monthly_stats'])
+
+    def test_command(self):
+        """warm_graph_snapshots で確定済みの週・月を作成し、再実行時は最新として扱うこと"""
+        out = StringIO()
+        call_command('warm_graph_snapshots', '--weeks', '2', '--months', '1', stdout=out)
+        self.assertIn(f'{self.line.name}: {GraphSnapshot.objects.count()}件作成', out.getvalue())
+        self.assertTrue(GraphSnapshot.objects.filter(period=WEEK, period_key=period_key(WEEK, self.past_day)).exists())
+
+        out = StringIO()
+        call_command('warm_graph_snapshots', '--weeks', '2', '--months', '1', stdout=out)
+        self.assertIn('作成: 0件', out.getvalue())
@@ -0,0 +1,128 @@
+"""
+時間別実績集計（HourlyResultAggregation）のテスト
+"""
+
+from datetime import date, datetime, time
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from production.models import Line, Result, WorkCalendar, HourlyResultAggregation
+from production.services import AggregationService
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[],  # ルーターを無効化
+    BROADCAST_COALESCE_WINDOW=0
+)
+class TestHourlyResultAggregation(TestCase):
+    """時間別集計の作成・増分更新・検証のテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        self.service = AggregationService()
+        self.line = Line.objects.create(name="時間別集計テストライン")
+        WorkCalendar.objects.create(line=self.line, work_start_time=time(8, 30))
+        self.test_date = date(2025, 1, 15)
+
+    def _create_result(self, day, hour, minute, serial, part="機種A", judgment='OK', quantity=1, machine="設備1"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Result.objects.create(
+                line=self.line.name,
+                machine=machine,
+                part=part,
+                timestamp=timezone.make_aware(datetime.combine(day, time(hour, minute))),
+                serial_number=serial,
+                judgment=judgment,
+                quantity=quantity
+            )
+
+    def _rollup(self, target_date):
+        return {
+            (row.hour, row.part, row.judgment): (row.total_quantity, row.result_count)
+            for row in HourlyResultAggregation.objects.filter(line=self.line.name, date=target_date)
+        }
+
+    def test_aggregate_hourly_single_date(self):
+        """work_start_time基準の時間帯・稼働日に振り分けて集計されること"""
+        next_day = date(2025, 1, 16)
+        self._create_result(self.test_date, 8, 30, "SN1")
+        self._create_result(self.test_date, 9, 29, "SN2", quantity=2)
+        self._create_result(self.test_date, 9, 30, "SN3", judgment='NG')
+        self._create_result(next_day, 8, 29, "SN4")   # 前稼働日の23時間目
+        self._create_result(self.test_date, 8, 29, "SN5")  # 前々稼働日分 → 対象外
+
+        HourlyResultAggregation.objects.all().delete()
+        count = self.service.aggregate_hourly_single_date(self.line.id, self.test_date)
+
+        self.assertEqual(count, 3)
+        self.assertEqual(self._rollup(self.test_date), {
+            (0, "機種A", 'OK'): (3, 2),
+            (1, "機種A", 'NG'): (1, 1),
+            (23, "機種A", 'OK'): (1, 1),
+        })
+        self.assertTrue(self.service.validate_hourly_aggregation(self.line.id, self.test_date))
+
+    def test_incremental_update_and_delete(self):
+        """実績の保存・削除シグナルで時間別集計が増分更新されること"""
+        first = self._create_result(self.test_date, 10, 5, "SN1")
+        self._create_result(self.test_date, 10, 40, "SN2", quantity=3)
+        self.assertEqual(self._rollup(self.test_date), {(1, "機種A", 'OK'): (1, 1), (2, "機種A", 'OK'): (3, 1)})
+
+        # work_start_time より前の実績は前日の稼働日に計上
+        self._create_result(self.test_date, 7, 0, "SN3")
+        self.assertEqual(self._rollup(date(2025, 1, 14)), {(22, "機種A", 'OK'): (1, 1)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self._rollup(self.test_date), {(2, "機種A", 'OK'): (3, 1)})
+        self.assertTrue(self.service.validate_hourly_aggregation(self.line.id, self.test_date))
+
+    def test_recalculate_key_without_machine(self):
+        """設備なし（NULL）の実績も単一キーの再計算で集計されること"""
+        self._create_result(self.test_date, 10, 5, "SN1", machine=None)
+        self._create_result(self.test_date, 10, 40, "SN2", quantity=3, machine=None)
+        self.assertEqual(self._rollup(self.test_date), {(1, "機種A", 'OK'): (1, 1), (2, "機種A", 'OK'): (3, 1)})
+
+        self.service._recalculate_aggregation_key(HourlyResultAggregation, {
+            'date': self.test_date, 'line': self.line.name, 'hour': 2,
+            'machine': '', 'part': "機種A", 'judgment': 'OK',
+        })
+        self.assertEqual(self._rollup(self.test_date), {(1, "機種A", 'OK'): (1, 1), (2, "機種A", 'OK'): (3, 1)})
+
+    def test_validate_and_repair(self):
+        """不整合を検出し、修復できること"""
+        self._create_result(self.test_date, 12, 0, "SN1")
+        HourlyResultAggregation.objects.filter(line=self.line.name).update(total_quantity=99)
+
+        self.assertFalse(self.service.validate_hourly_aggregation(self.line.id, self.test_date))
+        self.assertTrue(self.service.repair_hourly_aggregation(self.line.id, self.test_date))
+        self.assertEqual(self._rollup(self.test_date), {(3, "機種A", 'OK'): (1, 1)})
+
+    def test_management_commands(self):
+        """aggregate_results / validate_aggregation の --hourly オプション"""
+        self._create_result(self.test_date, 15, 0, "SN1")
+        HourlyResultAggregation.objects.all().delete()
+
+        out = StringIO()
+        call_command(
+            'aggregate_results', line_id=self.line.id, date='2025-01-15',
+            hourly=True, force=True, stdout=out
+        )
+        self.assertIn('時間別: 完了 (1件作成)', out.getvalue())
+        self.assertEqual(self._rollup(self.test_date), {(6, "機種A", 'OK'): (1, 1)})
+
+        HourlyResultAggregation.objects.filter(line=self.line.name).delete()
+        out = StringIO()
+        call_command(
+            'validate_aggregation', line_id=self.line.id, date='2025-01-15',
+            hourly=True, repair=True, stdout=out
+        )
+        self.assertIn('時間別 不整合検出', out.getvalue())
+        self.assertEqual(self._rollup(self.test_date), {(6, "機種A", 'OK'): (1, 1)})
@@ -0,0 +1,84 @@
+"""
+時間帯別集計クエリビルダーのテスト
+"""
+
+from datetime import date, datetime, time
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from production.hourly_buckets import hourly_result_rows
+from production.models import Line, Result, WorkCalendar, HourlyResultAggregation
+from production.services import AggregationService
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[]  # ルーターを無効化
+)
+class TestHourlyBuckets(TestCase):
+    """DB側の時間帯別集計のテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        self.line = Line.objects.create(name="時間帯集計テストライン")
+        WorkCalendar.objects.create(line=self.line, work_start_time=time(8, 30))
+
+    def _create_result(self, day, hour, minute, serial, judgment='OK', quantity=1):
+        return Result.objects.create(
+            line=self.line.name,
+            machine="設備1",
+            part="機種A",
+            timestamp=timezone.make_aware(datetime.combine(day, time(hour, minute))),
+            serial_number=serial,
+            judgment=judgment,
+            quantity=quantity
+        )
+
+    def test_hour_index_and_work_date(self):
+        """稼働開始時刻基準の稼働日・時間帯に振り分けられること"""
+        self._create_result(date(2025, 1, 15), 8, 29, "SN1")   # 前稼働日 → 範囲外
+        self._create_result(date(2025, 1, 15), 8, 30, "SN2")
+        self._create_result(date(2025, 1, 15), 9, 29, "SN3", quantity=3)
+        self._create_result(date(2025, 1, 15), 9, 30, "SN4")
+        self._create_result(date(2025, 1, 16), 8, 29, "SN5")   # 1/15 の23時間目
+        self._create_result(date(2025, 1, 16), 8, 30, "SN6")   # 1/16 の0時間目
+        self._create_result(date(2025, 1, 17), 0, 10, "SN7", judgment='NG')
+
+        with CaptureQueriesContext(connection) as ctx:
+            rows = {
+                (row['work_date'], row['hour_index'], row['judgment']): (row['total_quantity'], row['result_count'])
+                for row in hourly_result_rows(self.line.name, date(2025, 1, 15), date(2025, 1, 16), time(8, 30))
+            }
+
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(rows, {
+            (date(2025, 1, 15), 0, 'OK'): (4, 2),
+            (date(2025, 1, 15), 1, 'OK'): (1, 1),
+            (date(2025, 1, 15), 23, 'OK'): (1, 1),
+            (date(2025, 1, 16), 0, 'OK'): (1, 1),
+            (date(2025, 1, 16), 15, 'NG'): (1, 1),
+        })
+
+    def test_aggregate_hourly_dates_matches_validation(self):
+        """複数日の時間別集計が一度に作成され、検証を通ること"""
+        self._create_result(date(2025, 1, 15), 10, 0, "SN1")
+        self._create_result(date(2025, 1, 16), 10, 0, "SN2")
+        self._create_result(date(2025, 1, 17), 10, 0, "SN3")
+        HourlyResultAggregation.objects.all().delete()
+
+        service = AggregationService()
+        created = service.aggregate_hourly_dates(self.line.id, [date(2025, 1, 15), date(2025, 1, 17)])
+
+        self.assertEqual(created, 2)
+        self.assertEqual(
+            sorted(HourlyResultAggregation.objects.values_list('date', 'hour')),
+            [(date(2025, 1, 15), 1), (date(2025, 1, 17), 1)]
+        )
+        self.assertTrue(service.validate_hourly_aggregation(self.line.id, date(2025, 1, 15)))
+        self.assertFalse(service.validate_hourly_aggregation(self.line.id, date(2025, 1, 16)))
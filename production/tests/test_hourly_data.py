@@ -0,0 +1,119 @@
+"""
+時間別データ生成（単一パス版）のテスト
+"""
+
+from datetime import date, datetime, time
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from production.models import (
+    Line, Category, Part, Result, WorkCalendar, PlannedHourlyProduction
+)
+from production.registry import calendar_registry, part_registry
+from production.utils import generate_hourly_data_machine_based
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[]  # ルーターを無効化
+)
+class TestGenerateHourlyData(TestCase):
+    """generate_hourly_data_machine_based のテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        self.line = Line.objects.create(name="時間別テストライン")
+        WorkCalendar.objects.create(
+            line=self.line,
+            work_start_time=time(8, 30),
+            morning_meeting_duration=15
+        )
+        category = Category.objects.create(name="時間別テストカテゴリ")
+        self.part_a = Part.objects.create(name="機種A", category=category, target_pph=60)
+        self.part_b = Part.objects.create(name="機種B", category=category, target_pph=60)
+
+        self.test_date = date(2025, 1, 15)
+
+        PlannedHourlyProduction.objects.create(
+            date=self.test_date, line=self.line, part=self.part_a, hour=0, planned_quantity=40
+        )
+        PlannedHourlyProduction.objects.create(
+            date=self.test_date, line=self.line, part=self.part_a, hour=1, planned_quantity=60
+        )
+
+    def _create_result(self, part_name, hour, minute, serial):
+        return Result.objects.create(
+            line=self.line.name,
+            machine="設備1",
+            part=part_name,
+            timestamp=timezone.make_aware(datetime.combine(self.test_date, time(hour, minute))),
+            serial_number=serial,
+            judgment='OK',
+            quantity=1
+        )
+
+    def _results(self):
+        return Result.objects.filter(line=self.line.name, judgment='OK')
+
+    def test_bucketing_by_work_start_time(self):
+        """work_start_time・朝礼時間を基準に振り分けられること"""
+        self._create_result("機種A", 8, 35, "SN1")   # 朝礼中 → 集計対象外
+        self._create_result("機種A", 8, 50, "SN2")   # 0時間目
+        self._create_result("機種A", 9, 29, "SN3")   # 0時間目
+        self._create_result("機種A", 9, 30, "SN4")   # 1時間目
+        self._create_result("機種B", 10, 0, "SN5")   # 1時間目（計画なし）
+        self._create_result("未登録機種", 10, 5, "SN6")  # Part未登録 → 除外
+
+        hourly = generate_hourly_data_machine_based(
+            self.line.id, self.test_date, None, None, self._results()
+        )
+
+        self.assertEqual(len(hourly), 24)
+        self.assertEqual(hourly[0]['hour'], '08:30(08:45~)')
+        self.assertEqual(hourly[1]['hour'], '09:30')
+
+        self.assertEqual(hourly[0]['total_planned'], 40)
+        self.assertEqual(hourly[0]['total_actual'], 2)
+        self.assertEqual(hourly[0]['parts'][self.part_a.id]['actual'], 2)
+
+        self.assertEqual(hourly[1]['total_planned'], 60)
+        self.assertEqual(hourly[1]['total_actual'], 2)
+        self.assertEqual(hourly[1]['parts'][self.part_b.id]['planned'], 0)
+        self.assertEqual(hourly[1]['parts'][self.part_b.id]['actual'], 1)
+        self.assertEqual(
+            hourly[1]['parts'][self.part_a.id]['color'],
+            hourly[0]['parts'][self.part_a.id]['color']
+        )
+
+    def test_constant_query_count(self):
+        """実績件数・機種数に関わらずクエリ数が一定であること"""
+        for i in range(30):
+            part_name = "機種A" if i % 2 else "機種B"
+            self._create_result(part_name, 9 + (i % 12), i % 60, f"SN{i}")
+
+        # 機種・稼働カレンダーのレジストリはプロセス内で共有されるため事前にロードしておく
+        part_registry.get("機種A")
+        calendar_registry.get(self.line.name)
+
+        with self.assertNumQueries(2):
+            hourly = generate_hourly_data_machine_based(
+                self.line.id, self.test_date, None, None, self._results()
+            )
+
+        self.assertEqual(sum(h['total_actual'] for h in hourly), 30)
+
+    def test_default_calendar_without_data(self):
+        """稼働カレンダー・データがない場合でも24時間分を返すこと"""
+        other_line = Line.objects.create(name="カレンダーなしライン")
+        hourly = generate_hourly_data_machine_based(
+            other_line.id, self.test_date, None, None,
+            Result.objects.filter(line=other_line.name)
+        )
+
+        self.assertEqual(len(hourly), 24)
+        self.assertEqual(hourly[0]['hour'], '08:30(08:45~)')
+        self.assertTrue(all(h['total_actual'] == 0 and not h['parts'] for h in hourly))
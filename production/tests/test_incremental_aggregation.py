@@ -0,0 +1,127 @@
+"""
+実績の保存・更新・削除による集計の差分更新のテスト
+"""
+
+from datetime import date, datetime, time
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from production.broadcast import broadcast_coalescer
+from production.models import Line, Result, WorkCalendar, WeeklyResultAggregation, HourlyResultAggregation
+from production.services import AggregationService
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[],  # ルーターを無効化
+    BROADCAST_COALESCE_WINDOW=60
+)
+class TestIncrementalAggregation(TestCase):
+    """集計の差分更新のテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        self.service = AggregationService()
+        self.line = Line.objects.create(name="差分更新テストライン")
+        WorkCalendar.objects.create(line=self.line, work_start_time=time(8, 30))
+        self.test_date = date(2025, 1, 15)
+
+    def tearDown(self):
+        """時間窓で保留中の通知をテスト用データベースがあるうちに送信"""
+        broadcast_coalescer.flush()
+
+    def _create_result(self, serial, hour=10, part="機種A", judgment='OK', quantity=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Result.objects.create(
+                line=self.line.name,
+                machine="設備1",
+                part=part,
+                timestamp=timezone.make_aware(datetime.combine(self.test_date, time(hour, 0))),
+                serial_number=serial,
+                judgment=judgment,
+                quantity=quantity
+            )
+
+    def _weekly(self):
+        return {
+            (agg.date, agg.part, agg.judgment): (agg.total_quantity, agg.result_count)
+            for agg in WeeklyResultAggregation.objects.filter(line=self.line.name)
+        }
+
+    def _assert_consistent(self):
+        self.assertTrue(self.service.validate_aggregation(self.line.id, self.test_date))
+        self.assertTrue(self.service.validate_hourly_aggregation(self.line.id, self.test_date))
+
+    def test_insert_applies_delta(self):
+        """保存ごとに数量・件数が加算され、クエリ数が実績件数に依存しないこと"""
+        self._create_result("SN1", quantity=2)
+        self._create_result("SN2", hour=7, quantity=3)  # 前日の稼働日
+        self.assertEqual(self._weekly(), {
+            (self.test_date, "機種A", 'OK'): (2, 1),
+            (date(2025, 1, 14), "機種A", 'OK'): (3, 1),
+        })
+
+        for i in range(20):
+            self._create_result(f"BULK{i}")
+        with CaptureQueriesContext(connection) as few:
+            self._create_result("SN-few")
+        for i in range(50):
+            self._create_result(f"MORE{i}")
+        with CaptureQueriesContext(connection) as many:
+            self._create_result("SN-many")
+
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(self._weekly()[(self.test_date, "機種A", 'OK')], (74, 73))
+        self._assert_consistent()
+
+    def test_update_moves_between_keys(self):
+        """更新で集計キーが変わった場合、変更前のキーから差し引き変更後のキーに加算すること"""
+        result = self._create_result("SN1", quantity=2)
+        self._create_result("SN2")
+
+        result.judgment = 'NG'
+        result.part = "機種B"
+        result.quantity = 5
+        with self.captureOnCommitCallbacks(execute=True):
+            result.save()
+
+        self.assertEqual(self._weekly(), {
+            (self.test_date, "機種A", 'OK'): (1, 1),
+            (self.test_date, "機種B", 'NG'): (5, 1),
+        })
+        self._assert_consistent()
+
+        # 数量のみの変更
+        result.quantity = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            result.save()
+        self.assertEqual(self._weekly()[(self.test_date, "機種B", 'NG')], (1, 1))
+        self._assert_consistent()
+
+    def test_delete_removes_empty_keys(self):
+        """削除で件数0になった集計レコードが削除されること"""
+        result = self._create_result("SN1")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result.delete()
+
+        self.assertEqual(self._weekly(), {})
+        self.assertFalse(HourlyResultAggregation.objects.filter(line=self.line.name).exists())
+
+    def test_drift_falls_back_to_recalculation(self):
+        """差し引くと負になる不整合がある場合はキーを再集計すること"""
+        result = self._create_result("SN1", quantity=3)
+        self._create_result("SN2")
+        WeeklyResultAggregation.objects.filter(line=self.line.name).update(total_quantity=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result.delete()
+
+        self.assertEqual(self._weekly(), {(self.test_date, "機種A", 'OK'): (1, 1)})
+        self._assert_consistent()
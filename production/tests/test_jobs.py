@@ -0,0 +1,155 @@
+"""
+集計ジョブキュー（AggregationJob / run_workers）のテスト
+"""
+
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from production.jobs import claim, enqueue, queue_metrics, reclaim_expired, run_job, run_pending
+from production.models import (
+    AggregationJob, Line, Category, Part, Machine, Plan, Result, WorkCalendar, WeeklyResultAggregation
+)
+from production.utils import schedule_full_reaggregation
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[],  # ルーターを無効化
+    AGGREGATION_JOB_RETRY_DELAY=5,
+    AGGREGATION_JOB_VISIBILITY_TIMEOUT=300
+)
+class TestAggregationJobQueue(TestCase):
+    """集計ジョブキューのテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        self.line = Line.objects.create(name="ジョブテストライン")
+        WorkCalendar.objects.create(line=self.line, work_start_time=time(8, 30))
+        self.test_date = date(2025, 1, 15)
+
+    def test_enqueue_deduplicates_pending_jobs(self):
+        """待機中の同じキーのジョブはまとめられ、優先度のみ引き上げられること"""
+        first = enqueue(AggregationJob.KIND_REAGGREGATE, self.line.id, self.test_date)
+        second = enqueue(AggregationJob.KIND_REAGGREGATE, self.line.id, self.test_date, priority=5)
+        enqueue(AggregationJob.KIND_PLANNED_PPH, self.line.id, self.test_date)
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(AggregationJob.objects.count(), 2)
+        self.assertEqual(AggregationJob.objects.get(id=first.id).priority, 5)
+
+        # 実行中のジョブがあっても新しい変更は別ジョブとして登録される
+        claim('worker-1', limit=2)
+        third = enqueue(AggregationJob.KIND_REAGGREGATE, self.line.id, self.test_date)
+        self.assertNotEqual(third.id, first.id)
+
+    def test_claim_orders_by_priority(self):
+        """優先度順に取得され、同じジョブが二重に取得されないこと"""
+        low = enqueue(AggregationJob.KIND_REAGGREGATE, self.line.id, self.test_date)
+        high = enqueue(AggregationJob.KIND_PLANNED_PPH, self.line.id, self.test_date)
+        later = enqueue(AggregationJob.KIND_PLANNED_PPH, self.line.id, self.test_date + timedelta(days=1))
+        AggregationJob.objects.filter(id=later.id).update(available_at=timezone.now() + timedelta(minutes=5))
+
+        self.assertEqual([job.id for job in claim('worker-1')], [high.id])
+        self.assertEqual([job.id for job in claim('worker-2')], [low.id])
+        self.assertEqual(claim('worker-3'), [])
+
+        job = AggregationJob.objects.get(id=high.id)
+        self.assertEqual((job.status, job.locked_by, job.attempts), (AggregationJob.STATUS_RUNNING, 'worker-1', 1))
+
+    def test_reaggregate_job(self):
+        """再集計ジョブで集計テーブルが再作成されること"""
+        Result.objects.create(
+            line=self.line.name,
+            machine="設備1",
+            part="機種A",
+            timestamp=timezone.make_aware(datetime.combine(self.test_date, time(10, 0))),
+            serial_number="SN1",
+            judgment='OK',
+            quantity=3
+        )
+        WeeklyResultAggregation.objects.all().delete()
+
+        self.assertTrue(schedule_full_reaggregation(self.line.id, self.test_date))
+        self.assertFalse(WeeklyResultAggregation.objects.exists())
+
+        stats = run_pending('worker-1')
+
+        self.assertEqual((stats['processed'], stats['succeeded']), (1, 1))
+        self.assertEqual(WeeklyResultAggregation.objects.get(line=self.line.name).total_quantity, 3)
+        self.assertEqual(AggregationJob.objects.get().status, AggregationJob.STATUS_DONE)
+
+    def test_retry_with_backoff_and_failure(self):
+        """失敗したジョブはバックオフ後に再実行され、最大試行回数で失敗となること"""
+        job = enqueue(AggregationJob.KIND_PLANNED_PPH, self.line.id, self.test_date)
+        AggregationJob.objects.filter(id=job.id).update(max_attempts=2)
+
+        with patch('production.utils.calculate_planned_pph_for_date', side_effect=RuntimeError("DBエラー")):
+            before = timezone.now()
+            self.assertFalse(run_job(claim('worker-1')[0]))
+            job.refresh_from_db()
+            self.assertEqual(job.status, AggregationJob.STATUS_PENDING)
+            self.assertGreaterEqual(job.available_at, before + timedelta(seconds=5))
+            self.assertEqual(job.last_error, "DBエラー")
+
+            self.assertEqual(claim('worker-1'), [])
+            retried = claim('worker-1', now=job.available_at)[0]
+            self.assertFalse(run_job(retried))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (AggregationJob.STATUS_FAILED, 2))
+
+    def test_reclaim_expired_jobs(self):
+        """ロック期限切れの実行中ジョブが待機中に戻ること"""
+        job = enqueue(AggregationJob.KIND_REAGGREGATE, self.line.id, self.test_date)
+        claim('crashed-worker')
+
+        self.assertEqual(reclaim_expired(), 0)
+        self.assertEqual(reclaim_expired(now=timezone.now() + timedelta(seconds=301)), 1)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (AggregationJob.STATUS_PENDING, ''))
+
+    def test_plan_change_enqueues_pph_job(self):
+        """計画の保存時は計画PPHをその場で計算せず、ジョブを登録すること"""
+        category = Category.objects.create(name="ジョブテストカテゴリ")
+        part = Part.objects.create(name="ジョブテスト機種", category=category, target_pph=60)
+        machine = Machine.objects.create(name="ジョブテスト設備", line=self.line)
+
+        with patch('production.utils.calculate_planned_pph_for_date') as calculate:
+            with self.captureOnCommitCallbacks(execute=True):
+                for sequence in (1, 2):
+                    Plan.objects.create(
+                        date=self.test_date, line=self.line, part=part, machine=machine,
+                        planned_quantity=10, sequence=sequence
+                    )
+            self.assertFalse(calculate.called)
+
+            job = AggregationJob.objects.get()
+            self.assertEqual((job.kind, job.line_id, job.date), (AggregationJob.KIND_PLANNED_PPH, self.line.id, self.test_date))
+
+            out = StringIO()
+            call_command('run_workers', '--once', '--worker-id', 'test-worker', stdout=out)
+
+        calculate.assert_called_once_with(self.line.id, self.test_date)
+        self.assertIn('処理数: 1', out.getvalue())
+        self.assertIn('キュー: 待機0件', out.getvalue())
+
+    def test_queue_metrics(self):
+        """キューの深さと待ち時間が取得できること"""
+        enqueue(AggregationJob.KIND_REAGGREGATE, self.line.id, self.test_date)
+        job = enqueue(AggregationJob.KIND_PLANNED_PPH, self.line.id, self.test_date)
+        AggregationJob.objects.filter(id=job.id).update(created_at=timezone.now() - timedelta(minutes=2))
+
+        metrics = queue_metrics()
+
+        self.assertEqual(metrics['depth'], 2)
+        self.assertEqual(metrics['pending_by_kind'], {'reaggregate': 1, 'planned_pph': 1})
+        self.assertGreaterEqual(metrics['oldest_pending_seconds'], 120)
@@ -1,13 +1,13 @@
 """
 月別分析機能のテストケース
 """
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from unittest.mock import patch, MagicMock
 from datetime import date, datetime, timedelta
 import logging
 
-from production.models import Line, Part, Plan, WeeklyResultAggregation
+from production.models import Category, Line, Machine, Part, Plan, WeeklyResultAggregation
 from production.utils import (
     _get_monthly_data_from_aggregation,
     _calculate_monthly_part_analysis,
@@ -294,4 +294,58 @@ class PerformanceTest(MonthlyAnalysisTestCase):
         self.assertLess(execution_time, 1.0)
         
         # ログに実行時間を記録
-        print(f"月別分析実行時間: {execution_time:.3f}秒")
\ No newline at end of file
+        print(f"月別分析実行時間: {execution_time:.3f}秒")
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[]  # ルーターを無効化
+)
+class MonthlyPartAnalysisQueryTest(TestCase):
+    """機種別分析のクエリ数テスト"""
+    
+    def setUp(self):
+        """テストデータ準備"""
+        self.line = Line.objects.create(name='機種分析テストライン')
+        self.category = Category.objects.create(name='機種分析テストカテゴリ')
+        self.machine = Machine.objects.create(name='設備1', line=self.line)
+        self.month_dates = get_month_dates(date(2025, 1, 15))
+    
+    def _add_parts(self, start, count):
+        """機種ごとに5日分の計画（1日は計画数0）と実績を作成"""
+        for part_num in range(start, start + count):
+            part = Part.objects.create(name=f'機種{part_num}', category=self.category, target_pph=360)
+            days = self.month_dates[:5]
+            Plan.objects.bulk_create([
+                Plan(line=self.line, machine=self.machine, date=day, part=part,
+                     planned_quantity=0 if i == 4 else 100, sequence=part_num)
+                for i, day in enumerate(days)
+            ])
+            WeeklyResultAggregation.objects.bulk_create([
+                WeeklyResultAggregation(date=day, line=self.line.name, part=part.name,
+                                        judgment=judgment, total_quantity=quantity, result_count=1)
+                for day in days for judgment, quantity in (('OK', 90), ('NG', 3))
+            ])
+    
+    def test_constant_query_count(self):
+        """機種数によらず3クエリで計画・実績・稼働日数・平均PPHが集計されること"""
+        self._add_parts(0, 2)
+        with self.assertNumQueries(3):
+            result = _calculate_monthly_part_analysis(self.line.name, self.month_dates)
+        
+        self._add_parts(2, 20)
+        with self.assertNumQueries(3):
+            result = _calculate_monthly_part_analysis(self.line.name, self.month_dates)
+        
+        self.assertEqual(len(result['part_analysis']), 22)
+        first_part = result['part_analysis'][0]
+        self.assertEqual(
+            (first_part['planned'], first_part['actual'], first_part['working_days'], first_part['average_pph']),
+            (400, 450, 4, 112.5)
+        )
+        self.assertTrue(first_part['color'].startswith('#'))
@@ -0,0 +1,108 @@
+"""
+集計処理の並列実行（aggregate_results --workers）のテスト
+"""
+
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from production.models import Line, Result, WeeklyResultAggregation
+from production.parallel_aggregation import UnitResult, aggregate_work_unit, build_work_units
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[]  # ルーターを無効化
+)
+class TestParallelAggregation(TestCase):
+    """並列集計のテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        self.line1 = Line.objects.create(name="並列テストライン1")
+        self.line2 = Line.objects.create(name="並列テストライン2")
+        self.dates = [date(2025, 1, 1) + timedelta(days=offset) for offset in range(5)]
+        for target_date in self.dates:
+            Result.objects.create(
+                line=self.line1.name,
+                machine="設備1",
+                part="機種A",
+                timestamp=timezone.make_aware(datetime.combine(target_date, time(10, 0))),
+                serial_number=f"SN{target_date}",
+                judgment='OK',
+                quantity=2
+            )
+        WeeklyResultAggregation.objects.all().delete()
+
+    def test_build_work_units(self):
+        """ライン × 日付範囲の作業単位に分割されること"""
+        units = build_work_units([self.line1, self.line2], self.dates, unit_days=2)
+
+        self.assertEqual(len(units), 6)
+        self.assertEqual(units[0].dates, self.dates[:2])
+        self.assertEqual(units[2].dates, self.dates[4:])
+        self.assertEqual(units[3].line_id, self.line2.id)
+        self.assertEqual(units[0].label, f'{self.line1.name} 2025-01-01～2025-01-02')
+
+    def test_aggregate_work_unit(self):
+        """作業単位を集計し、既存データのある日はスキップすること"""
+        unit = build_work_units([self.line1], self.dates, unit_days=5)[0]
+
+        result = aggregate_work_unit(unit)
+        self.assertTrue(result.success)
+        self.assertEqual((result.records, result.source_rows, result.skipped_days), (5, 5, 0))
+
+        result = aggregate_work_unit(unit)
+        self.assertEqual((result.records, result.skipped_days), (0, 5))
+        self.assertEqual(WeeklyResultAggregation.objects.filter(line=self.line1.name).count(), 5)
+
+    @patch('time.sleep')
+    def test_aggregate_work_unit_retries(self, sleep):
+        """失敗した作業単位はリトライされ、最終的な失敗は結果に記録されること"""
+        unit = build_work_units([self.line1], self.dates, unit_days=5)[0]
+        original = 'production.services.AggregationService.aggregate_dates_in_chunks'
+
+        with patch(original, side_effect=[RuntimeError("一時的なエラー"), {'records': 5, 'source_rows': 5}]):
+            result = aggregate_work_unit(unit, max_retries=2)
+        self.assertTrue(result.success)
+        self.assertEqual(result.attempts, 2)
+
+        with patch(original, side_effect=RuntimeError("恒久的なエラー")):
+            result = aggregate_work_unit(unit, max_retries=1)
+        self.assertFalse(result.success)
+        self.assertEqual(result.attempts, 2)
+        self.assertIn("恒久的なエラー", result.error)
+
+    def test_command_with_workers(self):
+        """--workers 指定時は作業単位ごとの進捗とスループットを表示し、失敗があればエラーとすること"""
+        def fake_run(units, workers, on_result=None, **options):
+            results = [UnitResult(unit=unit, success=True, records=len(unit.dates), source_rows=10) for unit in units]
+            results[-1] = UnitResult(unit=units[-1], success=False, attempts=3, error="接続エラー")
+            for result in results:
+                on_result(result)
+            return results
+
+        out = StringIO()
+        with patch('production.management.commands.aggregate_results.run_work_units', side_effect=fake_run) as run:
+            with self.assertRaises(CommandError):
+                call_command(
+                    'aggregate_results', '--all-lines',
+                    '--start-date', '2025-01-01', '--end-date', '2025-01-05',
+                    '--workers', '4', '--chunk-days', '3', stdout=out
+                )
+
+        self.assertEqual(run.call_args[0][1], 4)
+        self.assertEqual(len(run.call_args[0][0]), 4)
+        output = out.getvalue()
+        self.assertIn('[100.0%]', output)
+        self.assertIn('作業単位: 3/4 成功', output)
+        self.assertIn('行/秒', output)
+        self.assertIn('失敗: 並列テストライン2 2025-01-04～2025-01-05 - 接続エラー', output)
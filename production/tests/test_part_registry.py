@@ -0,0 +1,73 @@
+"""
+機種レジストリのテスト
+"""
+
+from django.test import TestCase, override_settings
+from production.models import Category, Part
+from production.registry import part_registry
+from production.utils import generate_part_color
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[]  # ルーターを無効化
+)
+class TestPartRegistry(TestCase):
+    """PartRegistry のテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        self.category = Category.objects.create(name="レジストリテストカテゴリ")
+        self.part = Part.objects.create(name="レジストリ機種A", category=self.category, target_pph=60)
+        Part.objects.create(name="レジストリ機種B", category=self.category, target_pph=30)
+        part_registry.invalidate()
+
+    def test_single_query_load(self):
+        """初回参照時に1回のクエリで全機種をロードすること"""
+        with self.assertNumQueries(1):
+            info_a = part_registry.get("レジストリ機種A")
+            info_b = part_registry.get("レジストリ機種B")
+            by_id = part_registry.get_by_id(self.part.id)
+
+        self.assertEqual(info_a.id, self.part.id)
+        self.assertEqual(info_a.category, self.category.name)
+        self.assertEqual(info_a.color, generate_part_color(self.part.id, self.part.name))
+        self.assertEqual(by_id, info_a)
+        self.assertIsNotNone(info_b)
+
+    def test_unknown_part(self):
+        """未登録の機種名は None・デフォルト色を返すこと"""
+        part_registry.get("レジストリ機種A")
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(part_registry.get("未登録機種"))
+            self.assertEqual(part_registry.color_for("未登録機種"), '#000000')
+            self.assertIsNone(part_registry.get(""))
+
+    def test_invalidation_on_part_save(self):
+        """機種の保存・削除でレジストリが無効化されること"""
+        part_registry.get("レジストリ機種A")
+
+        self.part.name = "レジストリ機種A改"
+        self.part.save()
+
+        self.assertIsNone(part_registry.get("レジストリ機種A"))
+        self.assertEqual(part_registry.get("レジストリ機種A改").id, self.part.id)
+
+        part_id = self.part.id
+        self.part.delete()
+        self.assertIsNone(part_registry.get_by_id(part_id))
+
+    def test_invalidation_on_category_save(self):
+        """カテゴリの変更がレジストリに反映されること"""
+        part_registry.get("レジストリ機種A")
+
+        self.category.name = "変更後カテゴリ"
+        self.category.save()
+
+        self.assertEqual(part_registry.get("レジストリ機種A").category, "変更後カテゴリ")
@@ -0,0 +1,86 @@
+"""
+週別・月別統計の前期間比較・前年同期比較のテスト
+"""
+
+from datetime import date, time, timedelta
+from django.test import TestCase, override_settings
+from production.comparisons import comparison_totals, last_year_period_start, previous_period_start
+from production.models import Category, Line, Machine, Part, Plan, WorkCalendar, WeeklyResultAggregation
+from production.rollups import MONTH, WEEK, rebuild_rollups
+from production.utils import _get_monthly_data_from_aggregation, get_weekly_graph_data
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[]  # ルーターを無効化
+)
+class TestPeriodComparisons(TestCase):
+    """前期間比較のテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        self.line = Line.objects.create(name="比較テストライン")
+        WorkCalendar.objects.create(line=self.line, work_start_time=time(8, 30))
+        category = Category.objects.create(name="比較テストカテゴリ")
+        self.machine = Machine.objects.create(name="設備1", line=self.line)
+        self.part = Part.objects.create(name="機種A", category=category, target_pph=360)
+
+        # 2025-W03（今週）・2025-W02（前週）・2024-W03（前年同週）
+        self._add_week(date(2025, 1, 13), planned=100, actual=90)
+        self._add_week(date(2025, 1, 6), planned=100, actual=60)
+        self._add_week(date(2024, 1, 15), planned=80, actual=80)
+        rebuild_rollups(self.line.name)
+
+    def _add_week(self, monday, planned, actual):
+        days = [monday + timedelta(days=i) for i in range(5)]
+        Plan.objects.bulk_create([
+            Plan(line=self.line, machine=self.machine, date=day, part=self.part, planned_quantity=planned)
+            for day in days
+        ])
+        WeeklyResultAggregation.objects.bulk_create([
+            WeeklyResultAggregation(date=day, line=self.line.name, part=self.part.name,
+                                    judgment=judgment, total_quantity=quantity, result_count=1)
+            for day in days for judgment, quantity in (('OK', actual), ('NG', 1))
+        ])
+
+    def test_period_starts(self):
+        """前期間・前年同期の開始日（53週目は前年の最終週）"""
+        self.assertEqual(previous_period_start(WEEK, date(2025, 1, 6)), date(2024, 12, 30))
+        self.assertEqual(previous_period_start(MONTH, date(2025, 1, 1)), date(2024, 12, 1))
+        self.assertEqual(last_year_period_start(WEEK, date(2025, 1, 13)), date(2024, 1, 15))
+        self.assertEqual(last_year_period_start(WEEK, date(2020, 12, 28)), date(2019, 12, 23))
+        self.assertEqual(last_year_period_start(MONTH, date(2025, 3, 1)), date(2024, 3, 1))
+
+    def test_comparison_totals_single_query(self):
+        """前週・前年同週の計画・実績が1クエリで集計されること"""
+        with self.assertNumQueries(1):
+            totals = comparison_totals(self.line.id, self.line.name, WEEK, date(2025, 1, 13))
+
+        self.assertEqual(totals, {
+            date(2025, 1, 6): (500, 300),
+            date(2024, 1, 15): (400, 400),
+        })
+
+    def test_weekly_stats_trends(self):
+        """週間統計に前週比・前年同週比が反映されること"""
+        stats = get_weekly_graph_data(self.line.id, date(2025, 1, 15))['weekly_stats']
+
+        self.assertEqual((stats['total_planned'], stats['total_actual']), (500, 450))
+        self.assertEqual((stats['planned_trend'], stats['planned_change']), ('neutral', 0))
+        self.assertEqual((stats['actual_trend'], stats['actual_change']), ('up', 50.0))
+        self.assertEqual((stats['achievement_trend'], stats['achievement_change']), ('up', 30.0))
+        self.assertEqual((stats['last_year_actual'], stats['last_year_achievement_change']), (400, -10.0))
+
+    def test_monthly_stats_trends(self):
+        """月間統計に前月比・前年同月比が反映されること"""
+        stats = _get_monthly_data_from_aggregation(self.line.id, date(2025, 1, 15))['monthly_stats']
+
+        self.assertEqual((stats['previous_planned'], stats['previous_actual']), (0, 0))
+        self.assertEqual((stats['actual_trend'], stats['actual_change']), ('neutral', 0))
+        self.assertEqual((stats['last_year_planned'], stats['last_year_actual']), (400, 400))
+        self.assertEqual(stats['last_year_actual_change'], 87.5)
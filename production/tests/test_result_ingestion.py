@@ -0,0 +1,162 @@
+"""
+実績一括取り込みAPIのテスト
+"""
+
+import base64
+import json
+from datetime import date, time
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.db import router
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from production.broadcast import broadcast_coalescer
+from production.models import Line, Result, UserLineAccess, WorkCalendar, WeeklyResultAggregation, HourlyResultAggregation
+from production.services import AggregationService
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[],  # ルーターを無効化
+    BROADCAST_COALESCE_WINDOW=60
+)
+class TestResultBulkIngestAPI(TestCase):
+    """実績一括取り込みAPIのテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        self.user = User.objects.create_user(username='station', password='stationpass')
+        self.line = Line.objects.create(name="取り込みテストライン")
+        self.other_line = Line.objects.create(name="権限なしライン")
+        WorkCalendar.objects.create(line=self.line, work_start_time=time(8, 30))
+        UserLineAccess.objects.create(user=self.user, line=self.line)
+        self.client = Client()
+        self.url = reverse('production:result_bulk_ingest_api')
+        credentials = base64.b64encode(b'station:stationpass').decode()
+        self.auth = {'HTTP_AUTHORIZATION': f'Basic {credentials}'}
+
+    def tearDown(self):
+        """時間窓で保留中の通知をテスト用データベースがあるうちに送信"""
+        broadcast_coalescer.flush()
+
+    def _record(self, serial, timestamp='2025-01-15T10:00:00', part='機種A', judgment='OK', quantity=1):
+        return {
+            'line': self.line.name,
+            'machine': '設備1',
+            'part': part,
+            'timestamp': timestamp,
+            'serial_number': serial,
+            'judgment': judgment,
+            'quantity': quantity,
+        }
+
+    def _post(self, body, content_type='application/json'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, data=body, content_type=content_type, **self.auth)
+
+    def test_json_ingestion_aggregates_affected_keys(self):
+        """JSON配列を取り込み、影響を受けた集計キーのみが再計算されること"""
+        records = [
+            self._record('SN1'),
+            self._record('SN2', quantity=2),
+            self._record('SN3', judgment='NG'),
+            self._record('SN4', timestamp='2025-01-16T08:00:00'),  # 1/15 の稼働日
+            self._record('SN5', timestamp='2025-01-16T09:00:00', part='機種B'),
+        ]
+
+        response = self._post(json.dumps(records))
+
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['inserted'], 5)
+        self.assertEqual(data['aggregation_keys'], 3)
+        self.assertEqual(data['dates'], ['2025-01-15', '2025-01-16'])
+        self.assertIn('total', data['timing_ms'])
+
+        self.assertEqual(Result.objects.count(), 5)
+        ok = WeeklyResultAggregation.objects.get(line=self.line.name, date=date(2025, 1, 15), part='機種A', judgment='OK')
+        self.assertEqual((ok.total_quantity, ok.result_count), (4, 3))
+
+        service = AggregationService()
+        for target_date in (date(2025, 1, 15), date(2025, 1, 16)):
+            self.assertTrue(service.validate_aggregation(self.line.id, target_date))
+            self.assertTrue(service.validate_hourly_aggregation(self.line.id, target_date))
+
+        # 2回目のバッチは既存の集計レコードを更新する
+        response = self._post(json.dumps([self._record('SN6')]))
+        self.assertEqual(response.json()['aggregation'], {'created': 0, 'updated': 1, 'deleted': 0})
+        ok.refresh_from_db()
+        self.assertEqual((ok.total_quantity, ok.result_count), (5, 4))
+
+    def test_ndjson_and_csv(self):
+        """NDJSONとCSVを取り込めること"""
+        ndjson = '\n'.join(json.dumps(self._record(f'ND{i}')) for i in range(3))
+        response = self._post(ndjson, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+
+        csv_body = (
+            'line,machine,part,timestamp,serial_number,judgment,quantity\n'
+            f'{self.line.name},設備1,機種A,2025-01-15T11:00:00,CSV1,OK,\n'
+            f'{self.line.name},設備1,機種A,2025-01-15T11:05:00,CSV2,NG,3\n'
+        )
+        response = self._post(csv_body, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['inserted'], 2)
+
+        self.assertEqual(Result.objects.count(), 5)
+        self.assertEqual(HourlyResultAggregation.objects.filter(line=self.line.name).count(), 3)
+
+    def test_invalid_batch_is_rejected(self):
+        """不正なレコードや権限のないラインを含むバッチは全件拒否されること"""
+        records = [
+            self._record('SN1'),
+            dict(self._record('SN2'), judgment='XX'),
+            dict(self._record('SN3'), line=self.other_line.name),
+        ]
+
+        response = self._post(json.dumps(records))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['row'] for error in response.json()['row_errors']], [1, 2])
+        self.assertEqual(Result.objects.count(), 0)
+        self.assertEqual(WeeklyResultAggregation.objects.count(), 0)
+
+    def test_impossible_timestamp_is_row_error(self):
+        """存在しない日時は500ではなく行ごとのエラーとして報告されること"""
+        records = [self._record('SN1'), dict(self._record('SN2'), timestamp='2024-02-30T10:00:00')]
+
+        response = self._post(json.dumps(records))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['row_errors'], [
+            {'row': 1, 'errors': ['timestamp はISO 8601形式の日時である必要があります']}
+        ])
+        self.assertEqual(Result.objects.count(), 0)
+
+    def test_aggregation_failure_rolls_back_results(self):
+        """集計の再計算に失敗した場合は実績も取り込まれず、エラーの詳細は返さないこと"""
+        with patch.object(router, 'db_for_write', wraps=router.db_for_write) as db_for_write, \
+                patch.object(AggregationService, 'refresh_aggregation_keys', side_effect=RuntimeError('ORA-00001')):
+            response = self._post(json.dumps([self._record('SN1')]))
+
+        self.assertEqual(response.status_code, 500)
+        self.assertNotIn('ORA-00001', response.json()['error'])
+        self.assertIn(Result, [call.args[0] for call in db_for_write.call_args_list])
+        self.assertEqual(Result.objects.count(), 0)
+
+    def test_authentication_required(self):
+        """認証情報がない・誤っている場合は401を返すこと"""
+        response = self.client.post(self.url, data='[]', content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+        credentials = base64.b64encode(b'station:wrong').decode()
+        response = self.client.post(
+            self.url, data='[]', content_type='application/json',
+            HTTP_AUTHORIZATION=f'Basic {credentials}'
+        )
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,133 @@
+"""
+週・月の期間別集計（ロールアップ）のテスト
+"""
+
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from production.broadcast import broadcast_coalescer
+from production.models import Line, PeriodResultAggregation, Result, WorkCalendar, WeeklyResultAggregation
+from production.rollups import find_rollup_inconsistencies, range_totals, split_range
+from production.services import AggregationService, WeeklyAnalysisService
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[],  # ルーターを無効化
+    BROADCAST_COALESCE_WINDOW=60
+)
+class TestRollups(TestCase):
+    """期間別集計のテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        self.service = AggregationService()
+        self.line = Line.objects.create(name="ロールアップテストライン")
+        WorkCalendar.objects.create(line=self.line, work_start_time=time(8, 30))
+
+    def tearDown(self):
+        """時間窓で保留中の通知をテスト用データベースがあるうちに送信"""
+        broadcast_coalescer.flush()
+
+    def _create_result(self, work_date, serial, part="機種A", judgment='OK', quantity=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Result.objects.create(
+                line=self.line.name,
+                machine="設備1",
+                part=part,
+                timestamp=timezone.make_aware(datetime.combine(work_date, time(10, 0))),
+                serial_number=serial,
+                judgment=judgment,
+                quantity=quantity
+            )
+
+    def _rollup(self, period, start, part="機種A", judgment='OK'):
+        return PeriodResultAggregation.objects.filter(
+            line=self.line.name, period=period, date=start, part=part, judgment=judgment
+        ).values_list('total_quantity', 'result_count').first()
+
+    def test_incremental_rollups(self):
+        """実績の保存・更新・削除が週・月の集計に差分で反映されること"""
+        result = self._create_result(date(2025, 1, 31), "SN1", quantity=2)  # 2025-W05 (1/27～2/2)
+        self._create_result(date(2025, 2, 1), "SN2", quantity=3)
+
+        self.assertEqual(self._rollup('week', date(2025, 1, 27)), (5, 2))
+        self.assertEqual(self._rollup('month', date(2025, 1, 1)), (2, 1))
+        self.assertEqual(self._rollup('month', date(2025, 2, 1)), (3, 1))
+
+        result.timestamp = timezone.make_aware(datetime(2025, 2, 3, 10, 0))
+        result.judgment = 'NG'
+        with self.captureOnCommitCallbacks(execute=True):
+            result.save()
+
+        self.assertEqual(self._rollup('week', date(2025, 1, 27)), (3, 1))
+        self.assertEqual(self._rollup('week', date(2025, 2, 3), judgment='NG'), (2, 1))
+        self.assertIsNone(self._rollup('month', date(2025, 1, 1)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result.delete()
+        self.assertIsNone(self._rollup('week', date(2025, 2, 3), judgment='NG'))
+        self.assertEqual(find_rollup_inconsistencies(self.line.name), [])
+
+    def test_batch_aggregation_refreshes_rollups(self):
+        """日別集計をまとめて再作成した場合も週・月の集計が再計算されること"""
+        for offset in range(40):
+            self._create_result(date(2025, 1, 1) + timedelta(days=offset), f"SN{offset}", quantity=2)
+        PeriodResultAggregation.objects.all().delete()
+
+        self.service.aggregate_date_range(self.line.id, date(2025, 1, 1), date(2025, 2, 9))
+
+        self.assertEqual(find_rollup_inconsistencies(self.line.name), [])
+        self.assertEqual(self._rollup('month', date(2025, 1, 1)), (62, 31))
+        self.assertEqual(self._rollup('week', date(2025, 2, 3)), (14, 7))
+
+    def test_range_totals_reads_rollups(self):
+        """長い期間は月・週の集計行と端数の日別集計行から集計されること"""
+        self.assertEqual(split_range(date(2025, 1, 30), date(2025, 3, 10)), {
+            'month': [date(2025, 2, 1)],
+            'week': [date(2025, 3, 3)],
+            'day': [date(2025, 1, 30), date(2025, 1, 31), date(2025, 3, 1), date(2025, 3, 2),
+                    date(2025, 3, 10)],
+        })
+
+        for offset in range(0, 90, 3):
+            self._create_result(date(2025, 1, 1) + timedelta(days=offset), f"SN{offset}", quantity=2)
+            self._create_result(date(2025, 1, 1) + timedelta(days=offset), f"NG{offset}", judgment='NG')
+
+        with self.assertNumQueries(1):
+            totals = range_totals(self.line.name, date(2025, 1, 2), date(2025, 3, 31))
+
+        expected = {}
+        for judgment, quantity, count in WeeklyResultAggregation.objects.filter(
+            line=self.line.name, date__range=(date(2025, 1, 2), date(2025, 3, 31))
+        ).values_list('judgment', 'total_quantity', 'result_count'):
+            previous = expected.get((judgment,), (0, 0))
+            expected[(judgment,)] = (previous[0] + quantity, previous[1] + count)
+        self.assertEqual(totals, expected)
+
+        with self.assertNumQueries(1):
+            metrics = WeeklyAnalysisService().get_performance_metrics(self.line.name, date(2025, 1, 2), date(2025, 3, 31))
+        self.assertEqual(metrics['ok_quantity'], expected[('OK',)][0])
+        self.assertEqual(metrics['ng_quantity'], expected[('NG',)][0])
+
+    def test_command_check_and_rebuild(self):
+        """rebuild_rollups --check で不整合を検出し、再構築で修復できること"""
+        self._create_result(date(2025, 1, 15), "SN1", quantity=2)
+        PeriodResultAggregation.objects.filter(period='week').update(total_quantity=5)
+
+        out = StringIO()
+        call_command('rebuild_rollups', '--line-id', str(self.line.id), '--check', stdout=out)
+        self.assertIn('不整合 1件', out.getvalue())
+        self.assertIn('week 2025-01-13 / 機種A / OK: 数量 日別=2 期間別=5', out.getvalue())
+
+        out = StringIO()
+        call_command('rebuild_rollups', '--all-lines', stdout=out)
+        self.assertIn(f'{self.line.name}: 2件作成', out.getvalue())
+        self.assertEqual(find_rollup_inconsistencies(self.line.name), [])
@@ -0,0 +1,189 @@
+"""
+ストリーム集計（stream_aggregate）のテスト
+"""
+
+import json
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from production.models import HourlyResultAggregation, Line, Result, StreamWatermark, WorkCalendar, WeeklyResultAggregation
+from production.ingestion import ingest_results
+from production.services import AggregationService
+from production.streaming import get_watermark, process_batch, reset_watermark, stream_status
+
+
+@override_settings(
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    },
+    DATABASE_ROUTERS=[],  # ルーターを無効化
+    STREAM_AGGREGATION_ENABLED=True,
+    STREAM_AGGREGATION_SETTLE_SECONDS=0,
+    BROADCAST_COALESCE_WINDOW=0
+)
+class TestStreamAggregate(TestCase):
+    """ストリーム集計のテストクラス"""
+
+    def setUp(self):
+        """テスト用データの準備"""
+        self.line = Line.objects.create(name="ストリームテストライン")
+        WorkCalendar.objects.create(line=self.line, work_start_time=time(8, 30))
+        self.test_date = date(2025, 1, 15)
+
+    def _insert_results(self, count, prefix="SN", hour=10):
+        """設備・ETLによる挿入を想定し、シグナルを発火しない bulk_create で実績を作成"""
+        Result.objects.bulk_create([
+            Result(
+                line=self.line.name,
+                machine=f"設備{i % 2 + 1}",
+                part="機種A" if i % 3 else "機種B",
+                timestamp=timezone.make_aware(datetime.combine(self.test_date, time(hour, i % 60))),
+                serial_number=f"{prefix}{i}",
+                judgment='NG' if i % 5 == 0 else 'OK',
+                quantity=2
+            )
+            for i in range(count)
+        ])
+
+    def _aggregated_totals(self):
+        return (
+            sorted(WeeklyResultAggregation.objects.values_list('machine', 'part', 'judgment', 'total_quantity', 'result_count')),
+            sorted(HourlyResultAggregation.objects.values_list('hour', 'machine', 'part', 'judgment', 'total_quantity', 'result_count')),
+        )
+
+    def test_stream_matches_full_aggregation(self):
+        """既存の実績は二重に集計せず、新しい実績のみが全件集計と同じ結果で反映されること"""
+        self._insert_results(4, prefix="OLD")
+        AggregationService().aggregate_dates(self.line.id, [self.test_date])
+        AggregationService().aggregate_hourly_dates(self.line.id, [self.test_date])
+        get_watermark()
+
+        self._insert_results(12, prefix="NEW")
+        stats = process_batch(batch_size=100)
+
+        self.assertEqual((stats.rows, stats.skipped, stats.caught_up), (12, 0, True))
+        streamed = self._aggregated_totals()
+
+        AggregationService().aggregate_dates(self.line.id, [self.test_date])
+        AggregationService().aggregate_hourly_dates(self.line.id, [self.test_date])
+        self.assertEqual(streamed, self._aggregated_totals())
+        self.assertEqual(StreamWatermark.objects.get().processed_rows, 12)
+
+    def test_micro_batches_and_lag(self):
+        """バッチサイズごとに処理され、未処理が残る間は遅延が報告されること"""
+        reset_watermark(since=timezone.now() - timedelta(minutes=1))
+        self._insert_results(5)
+
+        later = timezone.now() + timedelta(seconds=30)
+        first = process_batch(batch_size=2, now=later)
+        self.assertEqual((first.rows, first.caught_up), (2, False))
+        self.assertGreaterEqual(first.lag_seconds, 29)
+        self.assertGreater(stream_status(now=later)['lag_seconds'], 0)
+
+        self.assertEqual(process_batch(batch_size=2, now=later).rows, 2)
+        last = process_batch(batch_size=2, now=later)
+        self.assertEqual((last.rows, last.caught_up, last.lag_seconds), (1, True, 0.0))
+        self.assertEqual(process_batch(batch_size=2, now=later).rows, 0)
+
+        self.assertEqual(
+            sum(WeeklyResultAggregation.objects.values_list('result_count', flat=True)), 5
+        )
+
+    def test_settle_window(self):
+        """作成直後の実績は待機時間が経過するまで処理されないこと"""
+        reset_watermark(since=timezone.now() - timedelta(minutes=1))
+        self._insert_results(3)
+
+        with self.settings(STREAM_AGGREGATION_SETTLE_SECONDS=60):
+            self.assertEqual(process_batch().rows, 0)
+            self.assertEqual(process_batch(now=timezone.now() + timedelta(seconds=61)).rows, 3)
+
+    def test_skips_unknown_line(self):
+        """未登録ラインの実績は集計せずにウォーターマークのみ進めること"""
+        reset_watermark(since=timezone.now() - timedelta(minutes=1))
+        Result.objects.bulk_create([Result(
+            line="未登録ライン", machine="設備1", part="機種A",
+            timestamp=timezone.make_aware(datetime.combine(self.test_date, time(10, 0))),
+            serial_number="X1", judgment='OK', quantity=1
+        )])
+
+        stats = process_batch()
+
+        self.assertEqual((stats.rows, stats.skipped), (1, 1))
+        self.assertFalse(WeeklyResultAggregation.objects.exists())
+        self.assertEqual(process_batch().rows, 0)
+
+    def test_command(self):
+        """stream_aggregate --once で未処理の実績を処理し、--status で位置を表示すること"""
+        call_command('stream_aggregate', '--reset', '--since', '2000-01-01T00:00:00', stdout=StringIO())
+        self._insert_results(6)
+
+        out = StringIO()
+        call_command('stream_aggregate', '--once', '--batch-size', '4', stdout=out)
+
+        self.assertIn('バッチ数: 2', out.getvalue())
+        self.assertIn('処理件数: 6', out.getvalue())
+
+        out = StringIO()
+        call_command('stream_aggregate', '--status', stdout=out)
+        status = json.loads(out.getvalue())
+        self.assertEqual((status['processed_rows'], status['last_id']), (6, Result.objects.order_by('-id').first().id))
+
+    def test_signals_leave_pending_results_to_stream(self):
+        """シグナルで保存した実績がストリームと二重に集計されず、処理済みの実績の更新・削除はシグナルで反映されること"""
+        get_watermark()
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Result.objects.create(
+                line=self.line.name, machine="設備1", part="機種A",
+                timestamp=timezone.make_aware(datetime.combine(self.test_date, time(10, 0))),
+                serial_number="SIG1", judgment='OK', quantity=3
+            )
+        self.assertFalse(WeeklyResultAggregation.objects.exists())
+
+        self.assertEqual(process_batch(batch_size=100).rows, 1)
+        self.assertEqual(
+            list(WeeklyResultAggregation.objects.values_list('total_quantity', 'result_count')), [(3, 1)]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.quantity = 5
+            first.save()
+            Result.objects.create(
+                line=self.line.name, machine="設備1", part="機種A",
+                timestamp=timezone.make_aware(datetime.combine(self.test_date, time(11, 0))),
+                serial_number="SIG2", judgment='OK', quantity=2
+            ).delete()
+        self.assertEqual(process_batch(batch_size=100).rows, 0)
+
+        streamed = self._aggregated_totals()
+        AggregationService().aggregate_dates(self.line.id, [self.test_date])
+        AggregationService().aggregate_hourly_dates(self.line.id, [self.test_date])
+        self.assertEqual(streamed, self._aggregated_totals())
+        self.assertEqual(streamed[0], [("設備1", "機種A", 'OK', 5, 1)])
+
+    def test_ingestion_leaves_results_to_stream(self):
+        """一括取り込みした実績はストリームのみで集計されること"""
+        get_watermark()
+        stats = ingest_results([
+            {'line': self.line.name, 'machine': "設備1", 'part': "機種A", 'timestamp': '2025-01-15T10:00:00',
+             'serial_number': f"ING{i}", 'judgment': 'OK', 'quantity': 2}
+            for i in range(3)
+        ])
+        self.assertEqual((stats['inserted'], stats['hourly_records']), (3, 0))
+        self.assertFalse(WeeklyResultAggregation.objects.exists())
+
+        process_batch(batch_size=100)
+        self.assertEqual(
+            list(WeeklyResultAggregation.objects.values_list('total_quantity', 'result_count')), [(6, 3)]
+        )
+
+    @override_settings(STREAM_AGGREGATION_ENABLED=False)
+    def test_command_requires_stream_aggregation_enabled(self):
+        """ストリーム集計が無効な場合は起動しないこと"""
+        with self.assertRaises(CommandError):
+            call_command('stream_aggregate', '--once', stdout=StringIO())
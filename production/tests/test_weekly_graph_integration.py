@@ -3,10 +3,12 @@
 """
 
 from datetime import date, timedelta
+from django.db import connection
 from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
-from production.models import Line, UserLineAccess, WeeklyResultAggregation
+from production.models import Category, Line, Machine, Part, Plan, UserLineAccess, WeeklyResultAggregation
 from production.utils import get_weekly_graph_data
 
 
@@ -267,4 +269,36 @@ class TestWeeklyGraphIntegration(TestCase):
         
         # 値が一致することを確認（フォールバック使用時は異なる可能性があるため、0以上であることを確認）
         self.assertGreaterEqual(total_actual_from_chart, 0)
-        self.assertGreaterEqual(total_actual_from_stats, 0)
\ No newline at end of file
+        self.assertGreaterEqual(total_actual_from_stats, 0)
+    
+    def test_weekly_graph_constant_query_count(self):
+        """機種数によらず計画・集計・比較・機種の4クエリで構築されること"""
+        category = Category.objects.create(name="統合テストカテゴリ")
+        machine = Machine.objects.create(name="機械A", line=self.line)
+        
+        def add_parts(start, count):
+            for part_num in range(start, start + count):
+                part = Part.objects.create(name=f"製品{part_num}", category=category, target_pph=360)
+                Plan.objects.bulk_create([
+                    Plan(line=self.line, machine=machine, date=day, part=part, planned_quantity=50, sequence=part_num)
+                    for day in self.week_dates
+                ])
+        
+        add_parts(0, 2)
+        get_weekly_graph_data(self.line.id, self.test_date)  # ライン情報をキャッシュ
+        
+        with self.assertNumQueries(4):
+            result = get_weekly_graph_data(self.line.id, self.test_date)
+        self.assertEqual(result['weekly_stats']['total_planned'], 2 * 7 * 50)
+        self.assertEqual(result['weekly_stats']['total_actual'], sum(2 * (100 + i * 10) for i in range(7)))
+        self.assertEqual(result['chart_data']['cumulative_actual'][-1], result['weekly_stats']['total_actual'])
+        
+        add_parts(2, 10)
+        with CaptureQueriesContext(connection) as queries:
+            result = get_weekly_graph_data(self.line.id, self.test_date)
+        self.assertEqual(len(queries), 4)
+        self.assertEqual(len(result['part_analysis']), 12)
+        self.assertEqual(
+            {part['name']: part['actual'] for part in result['part_analysis']}['製品1'],
+            sum(100 + i * 10 for i in range(7))
+        )
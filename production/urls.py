@@ -44,6 +44,7 @@ urlpatterns = [
     path('api/part-info/<int:part_id>/', views.PartInfoAPIView.as_view(), name='part_info_api'),
     path('api/plan-info/<int:plan_id>/', views.PlanInfoAPIView.as_view(), name='plan_info_api'),
     path('api/plan-sequence-update/<int:line_id>/<str:date>/', views.PlanSequenceUpdateAPIView.as_view(), name='plan_sequence_update'),
+    path('api/results/bulk/', views.ResultBulkIngestAPIView.as_view(), name='result_bulk_ingest_api'),
     
     # 週別分析パフォーマンス改善API
     path('api/weekly-analysis/<int:line_id>/<str:date>/', views.WeeklyAnalysisAPIView.as_view(), name='weekly_analysis_api'),
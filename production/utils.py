@@ -3,18 +3,25 @@ from django.db import models
 from django.shortcuts import get_object_or_404
 from django.db.models import Count, Q, Sum
 from django.utils import timezone
-from .models import Plan, Result, WorkCalendar, WorkingDay, Part, PlannedHourlyProduction, PartChangeDowntime, Line
+from .models import Plan, Result, WorkingDay, Part, PlannedHourlyProduction, PartChangeDowntime, Line, WeeklyResultAggregation
+from .registry import calendar_registry, part_registry
+from .dashboard_cache import dashboard_cache
+from .hourly_buckets import bucket_by_work_hour
+from .comparisons import add_comparisons
+from .rollups import MONTH, WEEK
 import jpholiday
 from collections import defaultdict
 import calendar
 import logging
 import hashlib
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=4096)
 def generate_part_color(part_id, part_name=None):
-    """機種IDベースで一意な色を生成する"""
+    """機種IDベースで一意な色を生成する（入力が同じなら結果も同じためメモ化）"""
     # 機種IDと名前を組み合わせてハッシュを生成
     hash_input = f"{part_id}_{part_name or ''}"
     hash_object = hashlib.md5(hash_input.encode())
@@ -82,43 +89,37 @@ def get_dashboard_data(line_id, date_str):
         timestamp__range=(start_dt, end_dt),
         judgment='OK'
     )
-    print('results:', results)
     # --- 5. 機種別データの集計 ---
     # キーは「機種名」の文字列
     part_data: dict[str, dict] = {}
 
     # 5-1. 計画数量を加算
-    for plan in plans:
-        pname = plan.part.name
+    for pname, pid, planned_quantity in plans.values_list('part__name', 'part_id', 'planned_quantity'):
         if pname not in part_data:
             part_data[pname] = {
                 'name': pname,
                 'planned': 0,
                 'actual': 0,
                 'achievement_rate': 0,
-                'color': generate_part_color(plan.part.id, plan.part.name),
+                'color': generate_part_color(pid, pname),
             }
-        part_data[pname]['planned'] += plan.planned_quantity
+        part_data[pname]['planned'] += planned_quantity
 
-    # 5-2. 実績数量を加算＆達成率計算
-    for result in results:
-        pname = result.part  # 文字列としての機種名
-        # カラー取得のため、Part オブジェクトにフォールバック
+    # 5-2. 実績数量を加算＆達成率計算（機種ごとに1回の GROUP BY）
+    part_actuals = results.order_by('part').values('part').annotate(total=Sum('quantity'))
+    for row in part_actuals:
+        pname = row['part']  # 文字列としての機種名
+        # カラー取得のため、機種レジストリにフォールバック
         if pname not in part_data:
-            try:
-                part_obj = Part.objects.get(name=pname)
-                color = generate_part_color(part_obj.id, part_obj.name)
-            except Part.DoesNotExist:
-                color = '#000000'
             part_data[pname] = {
                 'name': pname,
                 'planned': 0,
                 'actual': 0,
                 'achievement_rate': 0,
-                'color': color,
+                'color': part_registry.color_for(pname),
             }
         # 数量を加算
-        part_data[pname]['actual'] += result.quantity
+        part_data[pname]['actual'] += row['total'] or 0
         planned = part_data[pname]['planned']
         if planned > 0:
             part_data[pname]['achievement_rate'] = (
@@ -149,216 +150,133 @@ def get_dashboard_data(line_id, date_str):
         'last_updated': timezone.now().isoformat(),
     }
 
-def generate_hourly_data(line_id, date, plans, results):
-    """時間別データを生成（機種別）- work_start_timeから1時間刻みで生成"""
-    try:
-        work_calendar = WorkCalendar.objects.get(line_id=line_id)
-        work_start = work_calendar.work_start_time
-        morning_meeting_duration = work_calendar.morning_meeting_duration
-    except WorkCalendar.DoesNotExist:
-        work_start = time(8, 30)
-        morning_meeting_duration = 15
-    
-    hourly_data = []
-    
-    # work_start_timeから1時間刻みで24時間分のデータを生成
-    for hour_index in range(24):
-        # 実際の時間を計算（work_start_timeから1時間刻み）
-        hour_start = datetime.combine(date, work_start) + timedelta(hours=hour_index)
-        hour_end = hour_start + timedelta(hours=1)
-        
-        # 最初の時間帯の場合、朝礼時間を考慮して表示
-        display_time = hour_start.strftime('%H:%M')
-        if hour_index == 0:
-            effective_start = hour_start + timedelta(minutes=morning_meeting_duration)
-            display_time = f"{hour_start.strftime('%H:%M')}({effective_start.strftime('%H:%M')}~)"
-        
-        hour_data = {
-            'hour': display_time,
-            'total_planned': 0,
-            'total_actual': 0,
-            'parts': {}
-        }
-        
-        # 新しい計画PPHデータから計画数を取得
-        planned_productions = PlannedHourlyProduction.objects.filter(
-            line_id=line_id,
-            date=date,
-            hour=hour_index  # work_start_timeからのオフセット
-        )
-        
-        # 計画数を集計（機種別、ラインごと）
-        for planned_prod in planned_productions:
-            part_id = planned_prod.part_id
-            part = planned_prod.part
-            
-            if part_id not in hour_data['parts']:
-                hour_data['parts'][part_id] = {
-                    'name': part.name,
-                    'color': generate_part_color(part.id, part.name),
-                    'planned': 0,
-                    'actual': 0,
-                }
-            
-            # ラインごとに集計されているので、そのまま加算
-            hour_data['parts'][part_id]['planned'] += planned_prod.planned_quantity
-            hour_data['total_planned'] += planned_prod.planned_quantity
-        
-        # 実績数を取得（機種別）
-        # 最初の時間帯は朝礼時間を考慮した実績時間範囲
-        result_start = hour_start
-        if hour_index == 0:
-            result_start = hour_start + timedelta(minutes=morning_meeting_duration)
-        
-        for part_id, part_data in hour_data['parts'].items():
-            try:
-                from .models import Part
-                part = Part.objects.get(id=part_id)
-                part_results = results.filter(
-                    timestamp__gte=result_start,
-                    timestamp__lt=hour_end,
-                    judgment='OK',
-                    part=part.name
-                ).count()
-            except Part.DoesNotExist:
-                part_results = 0
-            
-            part_data['actual'] = part_results
-            hour_data['total_actual'] += part_results
-        
-        # 計画がない場合でも実績があれば表示
-        existing_part_ids = set(hour_data['parts'].keys())
-        actual_part_names = results.filter(
-            timestamp__gte=result_start,
-            timestamp__lt=hour_end,
-            judgment='OK'
-        ).values_list('part', flat=True).distinct()
-        
-        for part_name in actual_part_names:
-            if not part_name:
-                continue
-            try:
-                from .models import Part
-                part = Part.objects.get(name=part_name)
-                part_id = part.id
-                if part_id not in existing_part_ids:
-                    part_results = results.filter(
-                        timestamp__gte=result_start,
-                        timestamp__lt=hour_end,
-                        judgment='OK',
-                        part=part_name
-                    ).count()
-                    
-                    hour_data['parts'][part_id] = {
-                        'name': part.name,
-                        'color': generate_part_color(part.id, part.name),
-                        'planned': 0,
-                        'actual': part_results,
-                    }
-                    hour_data['total_actual'] += part_results
-            except Part.DoesNotExist:
-                continue
-        
-        hourly_data.append(hour_data)
-    
-    return hourly_data
+def get_cached_dashboard_data(line_id, date_str):
+    """ダッシュボード用のデータを取得（バージョン付きキャッシュ経由）"""
+    return dashboard_cache.get_or_build(line_id, date_str, get_dashboard_data)
 
 
-def generate_hourly_data_machine_based(line_id, date, plans, active_machines, results):
-    """設備フラグベースの時間別データを生成"""
-    # ── 1. 稼働カレンダー取得 ──
-    try:
-        wc = WorkCalendar.objects.get(line_id=line_id)
-        work_start = wc.work_start_time
-        morning_meeting_duration = wc.morning_meeting_duration
-    except WorkCalendar.DoesNotExist:
-        work_start = time(8, 30)
-        morning_meeting_duration = 15
+def generate_hourly_data(line_id, date, plans, results):
+    """時間別データを生成（機種別）- work_start_timeから1時間刻みで生成
 
-    hourly_data = []
+    単一パス版の generate_hourly_data_machine_based に委譲する。
+    """
+    return generate_hourly_data_machine_based(
+        line_id, date, plans, None, results.filter(judgment='OK')
+    )
 
-    # ── 2. 0時から23時まで１時間刻み ──
-    for hour_index in range(24):
-        # ナイーブな開始／終了時刻を作成
-        naive_start = datetime.combine(date, work_start) + timedelta(hours=hour_index)
-        naive_end   = naive_start + timedelta(hours=1)
 
-        # タイムゾーン付きに変換
-        aware_start = timezone.make_aware(naive_start)
-        aware_end   = timezone.make_aware(naive_end)
+def _build_hour_buckets(date, work_start, morning_meeting_duration):
+    """
+    work_start_time基準の24時間分の表示ラベルと境界時刻を生成
 
-        # 朝礼時間を考慮した表示ラベルと実績開始時刻
+    Returns:
+        tuple: (表示ラベルのリスト[24], 境界時刻のリスト[25])
+            境界[i]～境界[i+1] が hour_index=i の実績集計範囲。
+            最初の時間帯は朝礼終了後から開始する。
+    """
+    day_start = datetime.combine(date, work_start)
+    labels = []
+    boundaries = []
+
+    for hour_index in range(24):
+        naive_start = day_start + timedelta(hours=hour_index)
         display_time = naive_start.strftime('%H:%M')
         if hour_index == 0:
             # 朝礼後開始
             naive_effective = naive_start + timedelta(minutes=morning_meeting_duration)
             display_time = f"{display_time}({naive_effective.strftime('%H:%M')}~)"
-            result_start = timezone.make_aware(naive_effective)
+            # 朝礼が1時間を超える場合でも境界が逆転しないようにする
+            naive_effective = min(naive_effective, naive_start + timedelta(hours=1))
+            boundaries.append(timezone.make_aware(naive_effective))
         else:
-            result_start = aware_start
+            boundaries.append(timezone.make_aware(naive_start))
+        labels.append(display_time)
+
+    boundaries.append(timezone.make_aware(day_start + timedelta(hours=24)))
+    return labels, boundaries
+
 
-        # 初期データ構造
-        hour_record = {
-            'hour':          display_time,
+def generate_hourly_data_machine_based(line_id, date, plans, active_machines, results):
+    """
+    設備フラグベースの時間別データを生成（単一パス版）
+
+    計画PPHを1回のクエリで取得し、実績はwork_start_time基準の時間帯・機種別に
+    DB側で1回の GROUP BY で集計する。時間帯数・機種数に関わらずクエリ数は一定。
+
+    Args:
+        line_id: ライン ID
+        date: 対象日
+        plans: 計画 QuerySet（互換性のため保持）
+        active_machines: 稼働中設備（互換性のため保持）
+        results: 「line／日付／OK」でフィルタ済みの Result QuerySet
+
+    Returns:
+        list: 24時間分の時間別データ
+    """
+    # ── 1. 稼働カレンダー取得 ──
+    work_calendar = calendar_registry.resolve(line_id)
+    work_start = work_calendar.work_start_time
+    morning_meeting_duration = work_calendar.morning_meeting_duration
+
+    labels, boundaries = _build_hour_buckets(date, work_start, morning_meeting_duration)
+
+    hourly_data = [
+        {
+            'hour':          label,
             'total_planned': 0,
             'total_actual':  0,
             'parts':         {},  # { part_id: {name, color, planned, actual}, ... }
         }
+        for label in labels
+    ]
+
+    def part_entry(hour_record, pid, pname):
+        if pid not in hour_record['parts']:
+            hour_record['parts'][pid] = {
+                'name':    pname,
+                'color':   generate_part_color(pid, pname),
+                'planned': 0,
+                'actual':  0,
+            }
+        return hour_record['parts'][pid]
+
+    # ── 2. 計画数量を一括取得 ──
+    phps = PlannedHourlyProduction.objects.filter(
+        line_id=line_id,
+        date=date,
+        hour__lt=24
+    ).values_list('hour', 'part_id', 'part__name', 'planned_quantity')
+
+    for hour_index, pid, pname, planned_quantity in phps:
+        hour_record = hourly_data[hour_index]
+        part_entry(hour_record, pid, pname)['planned'] += planned_quantity
+        hour_record['total_planned']                  += planned_quantity
+
+    # ── 3. 実績を時間帯・機種別にDB側で集計 ──
+    # results は既に「line／日付／OK」でフィルタ済みの QuerySet
+    # 朝礼中の実績は対象外（集計範囲は朝礼終了後から）
+    rows = bucket_by_work_hour(
+        results.filter(
+            timestamp__gte=boundaries[0],
+            timestamp__lt=boundaries[-1]
+        ),
+        work_start,
+        group_fields=('part',)
+    )
 
-        # ── 3. 計画数量を取得 ──
-        phps = PlannedHourlyProduction.objects.filter(
-            line_id=line_id,
-            date=date,
-            hour=hour_index
-        )
-        for php in phps:
-            pid = php.part_id
-            if pid not in hour_record['parts']:
-                hour_record['parts'][pid] = {
-                    'name':    php.part.name,
-                    'color':   generate_part_color(php.part.id, php.part.name),
-                    'planned': 0,
-                    'actual':  0,
-                }
-            hour_record['parts'][pid]['planned']   += php.planned_quantity
-            hour_record['total_planned']           += php.planned_quantity
-
-        # ── 4. 実績数量を取得 ──
-        # results は既に「line／日付／OK」でフィルタ済みの QuerySet
-        print('result_start:', result_start)
-        print('aware_end:', aware_end)
-        
-        hour_qs = results.filter(
-            timestamp__gte=result_start,
-            timestamp__lt=aware_end
-        )
-        print('hour_qs:', hour_qs)
-        part_counts = hour_qs.values('part').annotate(count=Count('id'))
-        print('part_counts:', part_counts)
-        for pc in part_counts:
-            pname = pc['part']      # Result.part は機種名の文字列
-            cnt   = pc['count']
-            # Part オブジェクトを経由して ID と色を取得
-            try:
-                part_obj = Part.objects.get(name=pname)
-            except Part.DoesNotExist:
-                continue
-            pid = part_obj.id
-
-            # 集計フィールドがなければ初期化
-            if pid not in hour_record['parts']:
-                hour_record['parts'][pid] = {
-                    'name':    part_obj.name,
-                    'color':   generate_part_color(part_obj.id, part_obj.name),
-                    'planned': 0,
-                    'actual':  0,
-                }
-
-            # 実績を加算
-            hour_record['parts'][pid]['actual']   += cnt
-            hour_record['total_actual']           += cnt
+    counts = {}  # {(hour_index, 機種名): 件数}
+    for row in rows:
+        if row['part'] and 0 <= row['hour_index'] < 24:
+            counts[(row['hour_index'], row['part'])] = row['result_count']
 
-        hourly_data.append(hour_record)
+    # Result.part は機種名の文字列のため、機種レジストリで ID を解決
+    for (hour_index, pname), cnt in sorted(counts.items()):
+        part_info = part_registry.get(pname)
+        if part_info is None:
+            continue
+        hour_record = hourly_data[hour_index]
+        part_entry(hour_record, part_info.id, pname)['actual'] += cnt
+        hour_record['total_actual']                           += cnt
 
     return hourly_data
 
@@ -474,29 +392,43 @@ def get_month_dates(date):
     return dates
 
 
-def send_dashboard_update(line_id, date):
-    """ダッシュボードの更新をWebSocketで送信"""
+def publish_dashboard_delta(line_id, date):
+    """
+    ダッシュボードの最新データを前回配信分と比較し、変化があれば差分をWebSocketで送信
+    
+    Returns:
+        tuple: (シーケンス番号, 最新データ, 差分メッセージ or None)
+    """
     from channels.layers import get_channel_layer
     from asgiref.sync import async_to_sync
+    from .dashboard_stream import dashboard_stream
     
-    channel_layer = get_channel_layer()
-    room_group_name = f'dashboard_{line_id}_{date}'
+    sequence, dashboard_data, delta = dashboard_stream.update(line_id, date)
     
-    dashboard_data = get_dashboard_data(line_id, date)
+    channel_layer = get_channel_layer()
+    if delta is not None and channel_layer:
+        async_to_sync(channel_layer.group_send)(
+            f'dashboard_{line_id}_{date}',
+            {
+                'type': 'dashboard_delta',
+                'message': delta
+            }
+        )
     
-    async_to_sync(channel_layer.group_send)(
-        room_group_name,
-        {
-            'type': 'dashboard_update',
-            'data': dashboard_data
-        }
-    )
+    return sequence, dashboard_data, delta
+
+
+def send_dashboard_update(line_id, date):
+    """ダッシュボードの更新をWebSocketで送信（前回からの差分のみ）"""
+    publish_dashboard_delta(line_id, date)
 
 
 def schedule_full_reaggregation(line_id: int, target_date) -> bool:
     """
     完全再集計をスケジュールする（フォールバック機能）
     
+    再集計ジョブを登録し、run_workers コマンドのワーカーで実行する。
+    
     Args:
         line_id: ライン ID
         target_date: 対象日
@@ -505,17 +437,11 @@ def schedule_full_reaggregation(line_id: int, target_date) -> bool:
         bool: スケジュール成功時 True
     """
     try:
-        from .services import AggregationService
-        import logging
-        
-        logger = logging.getLogger(__name__)
-        logger.info(f"完全再集計スケジュール: ライン ID={line_id}, 日付={target_date}")
-        
-        # 即座に再集計を実行（本来はキューシステムを使用すべき）
-        service = AggregationService()
-        count = service.aggregate_single_date(line_id, target_date)
+        from .jobs import enqueue
+        from .models import AggregationJob
         
-        logger.info(f"完全再集計完了: {count}件のレコードを作成")
+        job = enqueue(AggregationJob.KIND_REAGGREGATE, line_id, target_date)
+        logger.info(f"完全再集計スケジュール: ライン ID={line_id}, 日付={target_date}, ジョブ ID={job.id}")
         return True
         
     except Exception as e:
@@ -525,135 +451,76 @@ def schedule_full_reaggregation(line_id: int, target_date) -> bool:
 
 def get_weekly_graph_data(line_id, date):
     """
-    週別グラフデータを取得（集計サービス使用版）
+    週別グラフデータを取得（計画・集計データをそれぞれ1回の GROUP BY で集計）
     
-    Args:
-        line_id: ライン ID
-        date: 基準日
-        
-    Returns:
-        dict: 週別グラフデータ
-    """
-    import logging
-    from .services import WeeklyAnalysisService
-    from .models import Part, Line
-    
-    logger = logging.getLogger(__name__)
-    
-    try:
-        # WeeklyAnalysisServiceは複雑すぎるため、直接フォールバック処理を使用
-        logger.info(f"週別グラフデータ取得: フォールバック処理を使用 - line_id={line_id}")
-        return _get_fallback_weekly_data(line_id, date)
-        
-    except Exception as e:
-        logger.error(f"週別グラフデータ取得エラー: {e}")
-        # フォールバック: 既存の方法でデータを取得
-        return _get_fallback_weekly_data(line_id, date)
-
-
-def _get_fallback_weekly_data(line_id, date):
-    """
-    フォールバック用の週別データ取得（既存の方法）
+    計画は (日付, 機種)、日別集計は (日付, 機種) ごとの OK 数量で取得し、チャート・週間統計・
+    機種別分析をメモリ上で組み立てる。クエリ数は機種数によらず一定（計画・集計・前週/前年比較・機種の4クエリ）。
     
     Args:
         line_id: ライン ID
         date: 基準日
         
     Returns:
-        dict: 週別グラフデータ
+        dict: 週別グラフデータ（chart_data, weekly_stats, available_parts, part_analysis）
     """
-    import logging
-    from .models import Plan, Result, Part, Line
-    from django.db import models
-    from django.db.models import Q, Sum
-    
-    logger = logging.getLogger(__name__)
-    logger.warning(f"フォールバック方式で週別データを取得: line_id={line_id}")
-    
-    try:
-        # ラインの存在確認
-        line = Line.objects.get(id=line_id)
-    except Line.DoesNotExist:
+    work_calendar = calendar_registry.get_by_id(line_id)
+    if work_calendar is None:
         logger.error(f"ライン ID {line_id} が見つかりません")
-        # 空のデータ構造を返す
-        return {
-            'chart_data': {
-                'labels': [],
-                'planned': [],
-                'actual': [],
-                'cumulative_planned': [],
-                'cumulative_actual': [],
-            },
-            'weekly_stats': {
-                'total_planned': 0,
-                'total_actual': 0,
-                'achievement_rate': 0,
-                'working_days': 0,
-                'total_days': 7,
-            },
-            'available_parts': Part.objects.none(),
-            'part_analysis': [],
-        }
+        return _empty_weekly_graph_data()
     
+    logger.info(f"週別グラフデータ取得開始: line_id={line_id}, date={date}")
     week_dates = get_week_dates(date)
     
-    # 週間データを取得
-    weekly_data = []
-    total_planned = 0
-    total_actual = 0
-    
-    for day in week_dates:
-        try:
-            day_data = get_dashboard_data(line_id, day.strftime('%Y-%m-%d'))
-            weekly_data.append({
-                'date': day.strftime('%Y-%m-%d'),
-                'date_display': day.strftime('%m/%d(%a)'),
-                'planned': day_data['total_planned'],
-                'actual': day_data['total_actual'],
-                'achievement_rate': day_data['achievement_rate'],
-            })
-            total_planned += day_data['total_planned']
-            total_actual += day_data['total_actual']
-        except Exception as e:
-            logger.error(f"日別データ取得エラー: {day} - {e}")
-            # エラー時は0データを追加
-            weekly_data.append({
-                'date': day.strftime('%Y-%m-%d'),
-                'date_display': day.strftime('%m/%d(%a)'),
-                'planned': 0,
-                'actual': 0,
-                'achievement_rate': 0,
-            })
-    
-    # 累計データ計算
-    cumulative_planned = []
-    cumulative_actual = []
-    planned_sum = 0
-    actual_sum = 0
-    
-    for d in weekly_data:
-        planned_sum += d['planned']
-        actual_sum += d['actual']
-        cumulative_planned.append(planned_sum)
-        cumulative_actual.append(actual_sum)
-    
-    # チャートデータ生成
+    # 計画数量（日付・機種別）
+    planned_by_day = defaultdict(int)
+    planned_by_part = defaultdict(int)
+    plans = Plan.objects.filter(
+        line_id=line_id,
+        date__in=week_dates
+    ).order_by().values('date', 'part__name').annotate(total=Sum('planned_quantity'))
+    for row in plans:
+        planned_by_day[row['date']] += row['total'] or 0
+        planned_by_part[row['part__name']] += row['total'] or 0
+    
+    # 実績数量（日付・機種別の OK 数量、NG のみの機種も利用可能機種に含める）
+    actual_by_day = defaultdict(int)
+    actual_by_part = defaultdict(int)
+    aggregations = WeeklyResultAggregation.objects.filter(
+        line=work_calendar.line_name,
+        date__in=week_dates
+    ).order_by().values('date', 'part').annotate(ok=Sum('total_quantity', filter=Q(judgment='OK')))
+    for row in aggregations:
+        actual_by_day[row['date']] += row['ok'] or 0
+        actual_by_part[row['part']] += row['ok'] or 0
+    
+    # チャートデータ（日別・累計）
     chart_data = {
-        'labels': [d['date_display'] for d in weekly_data],
-        'planned': [d['planned'] for d in weekly_data],
-        'actual': [d['actual'] for d in weekly_data],
-        'cumulative_planned': cumulative_planned,
-        'cumulative_actual': cumulative_actual,
+        'labels': [],
+        'planned': [],
+        'actual': [],
+        'cumulative_planned': [],
+        'cumulative_actual': [],
     }
-    
-    # 週間統計
-    achievement_rate = (total_actual / total_planned * 100) if total_planned > 0 else 0
-    working_days = sum(1 for d in weekly_data if d['planned'] > 0 or d['actual'] > 0)
+    planned_sum = 0
+    actual_sum = 0
+    working_days = 0
+    for day in week_dates:
+        planned = planned_by_day[day]
+        actual = actual_by_day[day]
+        planned_sum += planned
+        actual_sum += actual
+        if planned > 0 or actual > 0:
+            working_days += 1
+        chart_data['labels'].append(day.strftime('%m/%d(%a)'))
+        chart_data['planned'].append(planned)
+        chart_data['actual'].append(actual)
+        chart_data['cumulative_planned'].append(planned_sum)
+        chart_data['cumulative_actual'].append(actual_sum)
     
     weekly_stats = {
-        'total_planned': total_planned,
-        'total_actual': total_actual,
-        'achievement_rate': achievement_rate,
+        'total_planned': planned_sum,
+        'total_actual': actual_sum,
+        'achievement_rate': (actual_sum / planned_sum * 100) if planned_sum > 0 else 0,
         'working_days': working_days,
         'total_days': 7,
         'planned_trend': 'neutral',
@@ -663,60 +530,31 @@ def _get_fallback_weekly_data(line_id, date):
         'actual_change': 0,
         'achievement_change': 0,
     }
-    
-    # 利用可能機種を取得
     try:
-        line = Line.objects.get(id=line_id)
-        
-        # 計画から機種を取得
-        planned_parts = set(Plan.objects.filter(
-            line_id=line_id,
-            date__in=week_dates
-        ).values_list('part__name', flat=True))
-        
-        # 集計データから機種を取得（より安全）
-        from .models import WeeklyResultAggregation
-        aggregated_parts = set(WeeklyResultAggregation.objects.filter(
-            line=line.name,
-            date__in=week_dates
-        ).values_list('part', flat=True))
-        
-        # 両方から機種名を統合
-        all_part_names = planned_parts | aggregated_parts
-        available_parts = Part.objects.filter(name__in=all_part_names).distinct()
-        
-    except Line.DoesNotExist:
-        available_parts = Part.objects.none()
+        # 前週・前年同週との比較（1クエリ）
+        add_comparisons(weekly_stats, line_id, work_calendar.line_name, WEEK, date)
+    except Exception as e:
+        logger.error(f"週別比較データ取得エラー: {e}")
+    
+    # 利用可能機種（評価済みの QuerySet として返し、テンプレートでの再クエリを避ける）
+    part_names = set(planned_by_part) | set(actual_by_part)
+    available_parts = Part.objects.filter(name__in=part_names) if part_names else Part.objects.none()
     
     # 機種別分析
     part_analysis = []
     for part in available_parts:
-        # 計画数を集計
-        part_planned = (
-            Plan.objects.filter(
-                line_id=line_id,
-                date__in=week_dates,
-                part=part
-            ).aggregate(total=Sum('planned_quantity'))['total'] or 0
-        )
-        
-        # 実績数を集計（WeeklyResultAggregationから安全に取得）
-        part_actual = WeeklyResultAggregation.objects.filter(
-            line=line.name,
-            part=part.name,
-            date__in=week_dates,
-            judgment='OK'
-        ).aggregate(total=Sum('total_quantity'))['total'] or 0
-        
-        part_achievement_rate = (part_actual / part_planned * 100) if part_planned > 0 else 0
-        
+        part_planned = planned_by_part[part.name]
+        part_actual = actual_by_part[part.name]
         part_analysis.append({
             'name': part.name,
             'planned': part_planned,
             'actual': part_actual,
-            'achievement_rate': part_achievement_rate,
+            'achievement_rate': (part_actual / part_planned * 100) if part_planned > 0 else 0,
+            'color': generate_part_color(part.id, part.name),
         })
     
+    logger.info(f"週別グラフデータ取得完了: planned={planned_sum}, actual={actual_sum}, parts={len(part_analysis)}")
+    
     return {
         'chart_data': chart_data,
         'weekly_stats': weekly_stats,
@@ -725,6 +563,90 @@ def _get_fallback_weekly_data(line_id, date):
     }
 
 
+def _empty_weekly_graph_data():
+    """ラインが存在しない場合の空の週別グラフデータ"""
+    return {
+        'chart_data': {
+            'labels': [],
+            'planned': [],
+            'actual': [],
+            'cumulative_planned': [],
+            'cumulative_actual': [],
+        },
+        'weekly_stats': {
+            'total_planned': 0,
+            'total_actual': 0,
+            'achievement_rate': 0,
+            'working_days': 0,
+            'total_days': 7,
+        },
+        'available_parts': Part.objects.none(),
+        'part_analysis': [],
+    }
+
+
+def get_daily_part_breakdown(line_id, line_name, dates):
+    """
+    日別・機種別の計画数量と実績数量（計画・日別集計をそれぞれ1回の GROUP BY で集計）
+    
+    Args:
+        line_id: ライン ID
+        line_name: ライン名
+        dates: 対象日付リスト
+        
+    Returns:
+        list: 日付順の日別データ（total_planned, total_actual, ng_count, achievement_rate, parts）
+    """
+    days = {
+        day: {'planned': 0, 'actual': 0, 'ng': 0, 'parts': {}}
+        for day in dates
+    }
+    
+    def part_entry(day, name):
+        parts = days[day]['parts']
+        if name not in parts:
+            parts[name] = {'name': name, 'planned': 0, 'actual': 0, 'color': part_registry.color_for(name)}
+        return parts[name]
+    
+    plans = Plan.objects.filter(
+        line_id=line_id,
+        date__in=dates
+    ).order_by().values('date', 'part__name').annotate(total=Sum('planned_quantity'))
+    for row in plans:
+        planned = row['total'] or 0
+        days[row['date']]['planned'] += planned
+        part_entry(row['date'], row['part__name'])['planned'] += planned
+    
+    aggregations = WeeklyResultAggregation.objects.filter(
+        line=line_name,
+        date__in=dates
+    ).order_by().values('date', 'part').annotate(
+        ok=Sum('total_quantity', filter=Q(judgment='OK')),
+        ng=Sum('total_quantity', filter=Q(judgment='NG'))
+    )
+    for row in aggregations:
+        actual = row['ok'] or 0
+        days[row['date']]['actual'] += actual
+        days[row['date']]['ng'] += row['ng'] or 0
+        part_entry(row['date'], row['part'])['actual'] += actual
+    
+    data = []
+    for day in dates:
+        day_data = days[day]
+        parts = sorted(day_data['parts'].values(), key=lambda part: part['name'])
+        for part in parts:
+            part['achievement_rate'] = (part['actual'] / part['planned'] * 100) if part['planned'] > 0 else 0
+        data.append({
+            'date': day.strftime('%Y-%m-%d'),
+            'total_planned': day_data['planned'],
+            'total_actual': day_data['actual'],
+            'ng_count': day_data['ng'],
+            'achievement_rate': (day_data['actual'] / day_data['planned'] * 100) if day_data['planned'] > 0 else 0,
+            'parts': parts,
+        })
+    return data
+
+
 def _get_monthly_data_from_aggregation(line_id, date):
     """
     WeeklyResultAggregationから月別データを効率的に取得
@@ -829,6 +751,11 @@ def _get_monthly_data_from_aggregation(line_id, date):
             'actual_change': 0,
             'achievement_change': 0,
         }
+        try:
+            # 前月・前年同月との比較（1クエリ）
+            add_comparisons(monthly_stats, line_id, line_name, MONTH, date)
+        except Exception as e:
+            logger.error(f"月別比較データ取得エラー: {e}")
         
         logger.info(f"月別データ取得完了: planned={total_planned}, actual={total_actual}, days={len(month_dates)}")
         
@@ -846,7 +773,7 @@ def _get_monthly_data_from_aggregation(line_id, date):
 
 def _calculate_monthly_part_analysis(line_name, month_dates):
     """
-    月別機種分析データを計算
+    月別機種分析データを計算（機種別の GROUP BY で集計し、機種数によらず3クエリ）
     
     Args:
         line_name (str): ライン名
@@ -855,60 +782,49 @@ def _calculate_monthly_part_analysis(line_name, month_dates):
     Returns:
         Dict: 機種別の計画・実績・達成率データ
     """
-    import logging
-    from .models import WeeklyResultAggregation, Plan, Part
-    from django.db.models import Sum, Q
-    from django.db import models
-    
-    logger = logging.getLogger(__name__)
     logger.info(f"機種別分析計算開始: line={line_name}, days={len(month_dates)}")
     
     try:
-        # 利用可能機種を集計データから取得
-        available_part_names = list(WeeklyResultAggregation.objects.filter(
-            line=line_name,
-            date__in=month_dates
-        ).values_list('part', flat=True).distinct())
+        # 実績数量（機種別の OK 数量）、利用可能機種は集計データに存在する機種
+        part_actuals = {
+            row['part']: row['ok'] or 0
+            for row in WeeklyResultAggregation.objects.filter(
+                line=line_name,
+                date__in=month_dates
+            ).order_by().values('part').annotate(ok=Sum('total_quantity', filter=Q(judgment='OK')))
+        }
         
         # Partモデルから機種情報を取得
-        available_parts = Part.objects.filter(name__in=available_part_names) if available_part_names else Part.objects.none()
+        available_parts = Part.objects.filter(name__in=part_actuals) if part_actuals else Part.objects.none()
+        
+        # 計画数量と稼働日数（計画数量が1以上の日数）を機種別に集計
+        part_plans = {}
+        if part_actuals:
+            part_plans = {
+                row['part__name']: row
+                for row in Plan.objects.filter(
+                    line__name=line_name,
+                    date__in=month_dates,
+                    part__name__in=part_actuals
+                ).order_by().values('part__name').annotate(
+                    planned=Sum('planned_quantity'),
+                    working_days=Count('date', distinct=True, filter=Q(planned_quantity__gt=0))
+                )
+            }
         
         # 機種別分析データ構築
         part_analysis = []
         
         for part in available_parts:
-            # 計画数量の集計（最適化版：select_related使用）
-            part_planned = Plan.objects.select_related('line').filter(
-                line__name=line_name,
-                date__in=month_dates,
-                part=part
-            ).aggregate(total=Sum('planned_quantity'))['total'] or 0
-            
-            # 実績数量の集計（WeeklyResultAggregationから）
-            part_actual = WeeklyResultAggregation.objects.filter(
-                line=line_name,
-                part=part.name,
-                date__in=month_dates,
-                judgment='OK'
-            ).aggregate(total=Sum('total_quantity'))['total'] or 0
+            plan_row = part_plans.get(part.name, {})
+            part_planned = plan_row.get('planned') or 0
+            working_days_count = plan_row.get('working_days') or 0
+            part_actual = part_actuals[part.name]
             
-            # 達成率計算
+            # 達成率・平均PPH計算
             part_achievement_rate = (part_actual / part_planned * 100) if part_planned > 0 else 0
-            
-            # 稼働日数計算（最適化版：select_related使用）
-            working_days_count = Plan.objects.select_related('line').filter(
-                line__name=line_name,
-                date__in=month_dates,
-                part=part,
-                planned_quantity__gt=0
-            ).values('date').distinct().count()
-            
-            # 平均PPH計算
             average_pph = part_actual / working_days_count if working_days_count > 0 else 0
             
-            # 色生成
-            part_color = generate_part_color(part.id, part.name)
-            
             part_analysis.append({
                 'name': part.name,
                 'planned': part_planned,
@@ -916,7 +832,7 @@ def _calculate_monthly_part_analysis(line_name, month_dates):
                 'achievement_rate': part_achievement_rate,
                 'working_days': working_days_count,
                 'average_pph': average_pph,
-                'color': part_color,
+                'color': generate_part_color(part.id, part.name),
             })
         
         logger.info(f"機種別分析計算完了: {len(part_analysis)}機種")
@@ -1265,34 +1181,24 @@ def calculate_planned_pph_for_date(line_id, date):
     logger.info("前回の計画PPH結果をクリアしました")
 
     # 2. 稼働カレンダー取得
-    try:
-        wc = WorkCalendar.objects.get(line_id=line_id)
-        work_start = wc.work_start_time
-        morning_meeting = wc.morning_meeting_duration
-        break_times = wc.break_times or wc.get_default_break_times()
-    except WorkCalendar.DoesNotExist:
-        work_start = time(8, 30)
-        morning_meeting = 15
-        break_times = [
-            {"start": "10:45", "end": "11:00"},
-            {"start": "12:00", "end": "12:45"},
-            {"start": "15:00", "end": "15:15"},
-            {"start": "17:00", "end": "17:15"},
-        ]
+    work_calendar = calendar_registry.resolve(line_id)
+    work_start = work_calendar.work_start_time
+    morning_meeting = work_calendar.morning_meeting_duration
     logger.info(f"作業開始時間: {work_start}, 朝礼: {morning_meeting}分")
 
     # 3. 休憩時間を日時にマッピング
     all_breaks = []
     next_day = date + timedelta(days=1)
-    for bp in break_times:
-        start = datetime.combine(date, datetime.strptime(bp['start'], '%H:%M').time())
-        end = datetime.combine(date, datetime.strptime(bp['end'], '%H:%M').time())
-        all_breaks.append({'start': start, 'end': end})
+    for break_start, break_end in work_calendar.break_intervals:
+        all_breaks.append({
+            'start': datetime.combine(date, break_start),
+            'end': datetime.combine(date, break_end)
+        })
         # 翌日早朝の休憩も含める
-        if datetime.strptime(bp['start'], '%H:%M').time() < work_start:
+        if break_start < work_start:
             all_breaks.append({
-                'start': datetime.combine(next_day, datetime.strptime(bp['start'], '%H:%M').time()),
-                'end': datetime.combine(next_day, datetime.strptime(bp['end'], '%H:%M').time())
+                'start': datetime.combine(next_day, break_start),
+                'end': datetime.combine(next_day, break_end)
             })
     logger.info(f"休憩時間: {len(all_breaks)} 件")
 
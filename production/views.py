@@ -8,7 +8,7 @@ from django.views import View
 from django.http import JsonResponse, HttpResponseForbidden
 from django.urls import reverse_lazy, reverse
 from django.contrib import messages
-from django.db.models import Q, Count, Sum
+from django.db.models import Q, Count, Max, Sum
 from django.utils import timezone
 from datetime import datetime, date, timedelta
 import json
@@ -19,15 +19,20 @@ from django.utils.decorators import method_decorator
 from django.template.loader import render_to_string
 
 from .models import (
-    Line, Plan, Part, Category, Tag, Result, Machine, UserLineAccess, UserPreference, Feedback
+    Line, Plan, Part, Category, Tag, Result, Machine, UserLineAccess, UserPreference, Feedback,
+    WeeklyResultAggregation
 )
 from .forms import (
     PlanForm, PartForm, CategoryForm, TagForm, ResultForm, LineSelectForm, ResultFilterForm, FeedbackForm, FeedbackEditForm
 )
 from .utils import (
-    get_dashboard_data, get_accessible_lines, get_week_dates, get_month_dates,
+    get_cached_dashboard_data, get_accessible_lines, get_week_dates, get_month_dates,
     send_dashboard_update
 )
+from .conditional import AGGREGATION, PLAN, ROLLUP, ConditionalResponseMixin, Validator, source_state
+from .dashboard_cache import dashboard_cache
+from .registry import calendar_registry, part_registry
+from .rollups import MONTH, WEEK
 
 
 class LineAccessMixin(LoginRequiredMixin):
@@ -106,7 +111,7 @@ class DashboardView(LineAccessMixin, TemplateView):
             date_str = date_obj.strftime('%Y-%m-%d')
         
         line = get_object_or_404(Line, id=line_id)
-        dashboard_data = get_dashboard_data(line_id, date_str)
+        dashboard_data = get_cached_dashboard_data(line_id, date_str)
         
         context.update({
             'line': line,
@@ -449,14 +454,11 @@ class ResultListView(LineAccessMixin, ListView):
         # 現在の日付をdate_strとして設定（ナビゲーションメニュー用）
         date_str = timezone.now().date().strftime('%Y-%m-%d')
         
-        # 実績にpart_categoryを追加
+        # 実績にpart_categoryを追加（機種レジストリから解決）
         results = context['results']
         for result in results:
-            try:
-                part = Part.objects.get(name=result.part)
-                result.part_category = part.category.name
-            except Part.DoesNotExist:
-                result.part_category = None
+            part_info = part_registry.get(result.part)
+            result.part_category = part_info.category if part_info else None
         
         context.update({
             'line': line,
@@ -594,13 +596,10 @@ class WeeklyGraphView(LineAccessMixin, TemplateView):
     template_name = 'production/weekly_graph.html'
     
     def get_context_data(self, **kwargs):
-        from .utils import get_weekly_graph_data, get_week_dates
-        from .services import WeeklyAnalysisService
+        from .graph_snapshots import get_graph_data
         import json
-        import logging
         from datetime import datetime, timedelta
         
-        logger = logging.getLogger(__name__)
         context = super().get_context_data(**kwargs)
         line_id = kwargs['line_id']
         
@@ -638,57 +637,12 @@ class WeeklyGraphView(LineAccessMixin, TemplateView):
         week_start = date_obj - timedelta(days=date_obj.weekday())
         week_dates = [week_start + timedelta(days=i) for i in range(7)]
         
-        try:
-            # 高速化: WeeklyAnalysisServiceを直接使用
-            service = WeeklyAnalysisService()
-            
-            # 週別データを取得
-            week_start = week_dates[0]
-            week_end = week_dates[-1]
-            weekly_data = service.get_weekly_data(line.name, week_start, week_end)
-            
-            # 機種別分析は後で取得（利用可能機種を確認してから）
-            part_analysis = {}
-            
-            # パフォーマンス指標を取得
-            performance_metrics = service.get_performance_metrics(line.name, week_start, week_end)
-            
-            # 利用可能機種を取得
-            from .models import WeeklyResultAggregation
-            available_part_names = list(WeeklyResultAggregation.objects.filter(
-                line=line.name,
-                date__in=week_dates
-            ).values_list('part', flat=True).distinct())
-            
-            from .models import Part
-            available_parts = Part.objects.filter(name__in=available_part_names) if available_part_names else Part.objects.none()
-            
-            # WeeklyAnalysisServiceは基本データのみ提供するため、フォールバック処理を使用
-            logger.info(f"WeeklyAnalysisService基本データ取得完了、フォールバック処理でグラフデータ構築: line_id={line_id}")
-            graph_data = get_weekly_graph_data(line_id, date_obj)
-            chart_data = graph_data['chart_data']
-            weekly_stats = graph_data['weekly_stats']
-            available_parts = graph_data['available_parts']
-            part_analysis = graph_data['part_analysis']
-            
-            # パフォーマンス指標を統計に追加
-            if performance_metrics:
-                weekly_stats.update({
-                    'defect_rate': performance_metrics.get('defect_rate', 0),
-                    'production_stability': performance_metrics.get('production_stability', 0),
-                    'efficiency_score': performance_metrics.get('efficiency_score', 0),
-                })
-            
-            logger.info(f"週別グラフビュー: 高速化サービス使用完了 - line_id={line_id}")
-            
-        except Exception as e:
-            # エラー時のフォールバック
-            logger.error(f"WeeklyAnalysisServiceエラー、フォールバック使用: {e}")
-            graph_data = get_weekly_graph_data(line_id, date_obj)
-            chart_data = graph_data['chart_data']
-            weekly_stats = graph_data['weekly_stats']
-            available_parts = graph_data['available_parts']
-            part_analysis = graph_data['part_analysis']
+        # 週別グラフデータ（確定済みの週はスナップショットから取得）
+        graph_data = get_graph_data(line_id, WEEK, date_obj)
+        chart_data = graph_data['chart_data']
+        weekly_stats = graph_data['weekly_stats']
+        available_parts = graph_data['available_parts']
+        part_analysis = graph_data['part_analysis']
         
         # JSONシリアライズ
         chart_data_json = json.dumps(chart_data)
@@ -719,7 +673,7 @@ class MonthlyGraphView(LineAccessMixin, TemplateView):
     template_name = 'production/monthly_graph.html'
     
     def get_context_data(self, **kwargs):
-        from .utils import get_monthly_graph_data
+        from .graph_snapshots import get_graph_data
         import json
         from datetime import datetime, timedelta, date
         from calendar import monthrange
@@ -769,8 +723,8 @@ class MonthlyGraphView(LineAccessMixin, TemplateView):
                 current_date += timedelta(days=1)
             calendar_weeks.append(week)
         
-        # 月別グラフデータを取得
-        graph_data = get_monthly_graph_data(line_id, date_obj)
+        # 月別グラフデータを取得（確定済みの月はスナップショットから取得）
+        graph_data = get_graph_data(line_id, MONTH, date_obj)
         
         # JSONシリアライズ
         chart_data_json = json.dumps(graph_data['chart_data'])
@@ -795,179 +749,131 @@ class MonthlyGraphView(LineAccessMixin, TemplateView):
         return context
 
 
-class DashboardDataAPIView(LineAccessMixin, View):
-    """ダッシュボードデータAPI"""
+def _parse_api_date(value):
+    """API の日付パラメータ（YYYY-MM-DD）を解析（不正な形式は None）"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+class DashboardDataAPIView(LineAccessMixin, ConditionalResponseMixin, View):
+    """ダッシュボードデータAPI（ETag による条件付き GET 対応）"""
+    
+    def get_validator(self, request, line_id, date):
+        work_calendar = calendar_registry.get_by_id(line_id)
+        if work_calendar is None:
+            return None
+        
+        # 実績の保存・削除で進むダッシュボードのデータバージョンも ETag に含める
+        normalized = dashboard_cache.normalize_date(date)
+        target_date = _parse_api_date(normalized)
+        state = source_state(line_id, work_calendar.line_name, target_date, target_date)
+        return Validator.from_state(
+            f'dashboard:{line_id}:{normalized}', state, dashboard_cache.get_version(line_id, normalized)
+        )
     
     def get(self, request, line_id, date):
-        data = get_dashboard_data(line_id, date)
+        data = get_cached_dashboard_data(line_id, date)
         return JsonResponse(data)
 
 
-class GraphDataAPIView(LineAccessMixin, View):
-    """グラフデータAPI（集計サービス使用版）"""
+class GraphDataAPIView(LineAccessMixin, ConditionalResponseMixin, View):
+    """グラフデータAPI（日別・機種別の計画・実績を集計テーブルから取得、ETag による条件付き GET 対応）"""
+    
+    PERIODS = {
+        'weekly': (WEEK, get_week_dates),
+        'monthly': (MONTH, get_month_dates),
+    }
+    
+    def _period_dates(self, period, date):
+        period_type, dates_for = self.PERIODS[period]
+        return period_type, dates_for(_parse_api_date(date) or timezone.now().date())
+    
+    def get_validator(self, request, line_id, period, date):
+        work_calendar = calendar_registry.get_by_id(line_id)
+        if period not in self.PERIODS or work_calendar is None:
+            return None
+        
+        period_type, dates = self._period_dates(period, date)
+        state = source_state(line_id, work_calendar.line_name, dates[0], dates[-1], sources=(AGGREGATION, PLAN))
+        return Validator.from_state(f'{period_type}:{line_id}:{dates[0]}', state)
     
     def get(self, request, line_id, period, date):
         import logging
-        from .services import WeeklyAnalysisService
+        from .utils import get_daily_part_breakdown
         
         logger = logging.getLogger(__name__)
         
-        try:
-            date_obj = datetime.strptime(date, '%Y-%m-%d').date()
-        except ValueError:
-            date_obj = timezone.now().date()
+        if period not in self.PERIODS:
+            return JsonResponse({'error': 'Invalid period'}, status=400)
+        
+        if _parse_api_date(date) is None:
             logger.warning(f"無効な日付形式、現在日付を使用: {date}")
         
-        try:
-            if period == 'weekly':
-                # 高速化: WeeklyAnalysisServiceを使用
-                service = WeeklyAnalysisService()
-                
-                # 週別データを取得
-                weekly_result = service.get_weekly_data(line_id, date_obj)
-                
-                if weekly_result:
-                    # APIレスポンス形式に変換
-                    weekly_data = weekly_result.get('weekly_data', [])
-                    
-                    # 機種別データを取得
-                    week_dates = get_week_dates(date_obj)
-                    part_analysis = service.get_part_analysis(line_id, week_dates)
-                    
-                    # 日別データを構築
-                    data = []
-                    for day_data in weekly_data:
-                        # 機種別データを日付でフィルタリング
-                        day_parts = []
-                        for part in part_analysis:
-                            day_parts.append({
-                                'name': part['name'],
-                                'planned': part.get('planned', 0) // 7,  # 週間計画を7日で分割（簡易）
-                                'actual': part.get('ok_quantity', 0) // 7,  # 週間実績を7日で分割（簡易）
-                                'color': '#007bff'  # デフォルト色
-                            })
-                        
-                        data.append({
-                            'date': day_data['date'],
-                            'total_planned': day_data['planned'],
-                            'total_actual': day_data['actual'],
-                            'parts': day_parts,
-                            'achievement_rate': day_data.get('achievement_rate', 0),
-                            'ng_count': day_data.get('ng_count', 0)
-                        })
-                    
-                    logger.info(f"週別APIデータ取得完了（集計サービス使用）: line_id={line_id}")
-                    return JsonResponse({
-                        'data': data,
-                        'source': 'aggregation_service',
-                        'cache_used': True
-                    })
-                else:
-                    # フォールバック: 既存の方法
-                    logger.warning(f"集計サービスでデータ取得失敗、フォールバック使用: line_id={line_id}")
-                    return self._get_fallback_data(line_id, date_obj, period)
-                    
-            elif period == 'monthly':
-                # 月別データは既存の方法を使用（今回は週別のみ最適化）
-                return self._get_fallback_data(line_id, date_obj, period)
-            else:
-                return JsonResponse({'error': 'Invalid period'}, status=400)
-                
-        except Exception as e:
-            logger.error(f"GraphDataAPIViewエラー: {e}")
-            # エラー時のフォールバック
-            return self._get_fallback_data(line_id, date_obj, period)
-    
-    def _get_fallback_data(self, line_id, date_obj, period):
-        """
-        フォールバック用のデータ取得（既存の方法）
-        
-        Args:
-            line_id: ライン ID
-            date_obj: 日付オブジェクト
-            period: 期間（'weekly' または 'monthly'）
-            
-        Returns:
-            JsonResponse: APIレスポンス
-        """
-        import logging
+        work_calendar = calendar_registry.get_by_id(line_id)
+        if work_calendar is None:
+            return JsonResponse({'error': 'Line not found'}, status=404)
         
-        logger = logging.getLogger(__name__)
-        logger.info(f"フォールバック方式でAPIデータ取得: line_id={line_id}, period={period}")
+        _, dates = self._period_dates(period, date)
         
         try:
-            if period == 'weekly':
-                dates = get_week_dates(date_obj)
-            elif period == 'monthly':
-                dates = get_month_dates(date_obj)
-            else:
-                return JsonResponse({'error': 'Invalid period'}, status=400)
-            
-            # 各日のデータを取得
-            data = []
-            for d in dates:
-                try:
-                    day_data = get_dashboard_data(line_id, d.strftime('%Y-%m-%d'))
-                    data.append({
-                        'date': d.strftime('%Y-%m-%d'),
-                        'total_planned': day_data['total_planned'],
-                        'total_actual': day_data['total_actual'],
-                        'parts': day_data['parts'],
-                        'achievement_rate': day_data.get('achievement_rate', 0)
-                    })
-                except Exception as e:
-                    logger.error(f"日別データ取得エラー: {d} - {e}")
-                    # エラー時は空データを追加
-                    data.append({
-                        'date': d.strftime('%Y-%m-%d'),
-                        'total_planned': 0,
-                        'total_actual': 0,
-                        'parts': [],
-                        'achievement_rate': 0
-                    })
-            
-            return JsonResponse({
-                'data': data,
-                'source': 'fallback_method',
-                'cache_used': False
-            })
-            
+            data = get_daily_part_breakdown(line_id, work_calendar.line_name, dates)
         except Exception as e:
-            logger.error(f"フォールバックAPIデータ取得エラー: {e}")
+            logger.error(f"GraphDataAPIViewエラー: {e}")
             return JsonResponse({'error': 'Data retrieval failed'}, status=500)
+        
+        return JsonResponse({
+            'data': data,
+            'period': period,
+            'start_date': dates[0].strftime('%Y-%m-%d'),
+            'end_date': dates[-1].strftime('%Y-%m-%d'),
+            'source': 'aggregation',
+        })
 
 
-class WeeklyAnalysisAPIView(LineAccessMixin, View):
-    """週別分析専用API（高速版）"""
+class WeeklyAnalysisAPIView(LineAccessMixin, ConditionalResponseMixin, View):
+    """週別分析専用API（高速版、ETag による条件付き GET 対応）"""
+    
+    def get_validator(self, request, line_id, date):
+        date_obj = _parse_api_date(date)
+        work_calendar = calendar_registry.get_by_id(line_id)
+        if date_obj is None or work_calendar is None:
+            return None
+        
+        week_dates = get_week_dates(date_obj)
+        state = source_state(
+            line_id, work_calendar.line_name, week_dates[0], week_dates[-1], sources=(AGGREGATION, ROLLUP, PLAN)
+        )
+        return Validator.from_state(f'weekly_analysis:{line_id}:{week_dates[0]}', state)
     
     def get(self, request, line_id, date):
         import logging
         from .services import WeeklyAnalysisService
+        from .utils import get_daily_part_breakdown, get_weekly_graph_data
         
         logger = logging.getLogger(__name__)
         
-        try:
-            date_obj = datetime.strptime(date, '%Y-%m-%d').date()
-        except ValueError:
+        date_obj = _parse_api_date(date)
+        if date_obj is None:
             return JsonResponse({'error': 'Invalid date format'}, status=400)
         
+        work_calendar = calendar_registry.get_by_id(line_id)
+        if work_calendar is None:
+            return JsonResponse({'error': 'Line not found'}, status=404)
+        
         try:
-            service = WeeklyAnalysisService()
-            
-            # 週別データを取得
-            weekly_data = service.get_weekly_data(line_id, date_obj)
-            
             # 週の日付リストを計算
             week_dates = get_week_dates(date_obj)
             
-            # 機種別分析を取得
-            part_analysis = service.get_part_analysis(line_id, week_dates)
+            # 週別グラフデータ（チャート・週間統計・機種別分析）と日別・機種別の内訳を取得
+            weekly_data = get_weekly_graph_data(line_id, date_obj)
+            daily_data = get_daily_part_breakdown(line_id, work_calendar.line_name, week_dates)
             
             # パフォーマンス指標を取得
-            performance_metrics = service.get_performance_metrics(line_id, week_dates)
-            
-            if not weekly_data:
-                return JsonResponse({'error': 'No data available'}, status=404)
+            performance_metrics = WeeklyAnalysisService().get_performance_metrics(
+                work_calendar.line_name, week_dates[0], week_dates[-1]
+            )
             
             # APIレスポンスを構築
             response_data = {
@@ -977,12 +883,11 @@ class WeeklyAnalysisAPIView(LineAccessMixin, View):
                 'week_end': week_dates[-1].strftime('%Y-%m-%d'),
                 'chart_data': weekly_data['chart_data'],
                 'weekly_stats': weekly_data['weekly_stats'],
-                'part_analysis': part_analysis,
+                'part_analysis': weekly_data['part_analysis'],
                 'performance_metrics': performance_metrics,
-                'daily_data': weekly_data.get('weekly_data', []),
+                'daily_data': daily_data,
                 'metadata': {
                     'source': 'aggregation_service',
-                    'cache_used': True,
                     'generated_at': timezone.now().isoformat()
                 }
             }
@@ -995,8 +900,23 @@ class WeeklyAnalysisAPIView(LineAccessMixin, View):
             return JsonResponse({'error': 'Internal server error'}, status=500)
 
 
-class PerformanceMetricsAPIView(LineAccessMixin, View):
-    """パフォーマンス指標API"""
+class PerformanceMetricsAPIView(LineAccessMixin, ConditionalResponseMixin, View):
+    """パフォーマンス指標API（ETag による条件付き GET 対応）"""
+    
+    def get_validator(self, request, line_id, date):
+        date_obj = _parse_api_date(date)
+        work_calendar = calendar_registry.get_by_id(line_id)
+        if date_obj is None or work_calendar is None:
+            return None
+        
+        # 時間別トレンドはダッシュボードデータから取得するため、そのデータバージョンも含める
+        week_dates = get_week_dates(date_obj)
+        state = source_state(
+            line_id, work_calendar.line_name, week_dates[0], week_dates[-1], sources=(AGGREGATION, ROLLUP)
+        )
+        return Validator.from_state(
+            f'performance_metrics:{line_id}:{date_obj}', state, dashboard_cache.get_version(line_id, date_obj)
+        )
     
     def get(self, request, line_id, date):
         import logging
@@ -1004,11 +924,14 @@ class PerformanceMetricsAPIView(LineAccessMixin, View):
         
         logger = logging.getLogger(__name__)
         
-        try:
-            date_obj = datetime.strptime(date, '%Y-%m-%d').date()
-        except ValueError:
+        date_obj = _parse_api_date(date)
+        if date_obj is None:
             return JsonResponse({'error': 'Invalid date format'}, status=400)
         
+        work_calendar = calendar_registry.get_by_id(line_id)
+        if work_calendar is None:
+            return JsonResponse({'error': 'Line not found'}, status=404)
+        
         try:
             service = WeeklyAnalysisService()
             
@@ -1016,13 +939,15 @@ class PerformanceMetricsAPIView(LineAccessMixin, View):
             week_dates = get_week_dates(date_obj)
             
             # パフォーマンス指標を取得
-            performance_metrics = service.get_performance_metrics(line_id, week_dates)
+            performance_metrics = service.get_performance_metrics(
+                work_calendar.line_name, week_dates[0], week_dates[-1]
+            )
             
             if not performance_metrics:
                 return JsonResponse({'error': 'No metrics available'}, status=404)
             
-            # 時間別トレンドも取得
-            hourly_trend = service.get_hourly_trend(line_id, date_obj)
+            # 時間別トレンド（ダッシュボードの時間別データ）も取得
+            hourly_trend = get_cached_dashboard_data(line_id, date).get('hourly', [])
             
             response_data = {
                 'line_id': line_id,
@@ -1044,8 +969,20 @@ class PerformanceMetricsAPIView(LineAccessMixin, View):
             return JsonResponse({'error': 'Internal server error'}, status=500)
 
 
-class PartInfoAPIView(LoginRequiredMixin, View):
-    """機種情報API"""
+class PartInfoAPIView(LoginRequiredMixin, ConditionalResponseMixin, View):
+    """機種情報API（ETag による条件付き GET 対応）"""
+    
+    def get_validator(self, request, part_id):
+        row = Part.objects.filter(id=part_id).annotate(
+            tag_count=Count('tags'),
+            tags_updated=Max('tags__updated_at')
+        ).values('updated_at', 'category__updated_at', 'tag_count', 'tags_updated').first()
+        if row is None:
+            return None
+        
+        return Validator.build(
+            f'part:{part_id}', row['updated_at'], row['category__updated_at'], row['tags_updated'], row['tag_count']
+        )
     
     def get(self, request, part_id):
         try:
@@ -1064,8 +1001,26 @@ class PartInfoAPIView(LoginRequiredMixin, View):
             return JsonResponse({'error': 'Part not found'}, status=404)
 
 
-class PlanInfoAPIView(LineAccessMixin, View):
-    """計画情報API"""
+class PlanInfoAPIView(LineAccessMixin, ConditionalResponseMixin, View):
+    """計画情報API（ETag による条件付き GET 対応）"""
+    
+    def get_validator(self, request, plan_id):
+        row = Plan.objects.filter(id=plan_id).values(
+            'line_id', 'line__name', 'date', 'updated_at', 'part__updated_at', 'machine__updated_at'
+        ).first()
+        if row is None:
+            return None
+        
+        # 達成率は同日の実績から求めるため、日別集計とダッシュボードのデータバージョンも含める
+        state = source_state(row['line_id'], row['line__name'], row['date'], row['date'], sources=(AGGREGATION,))
+        state.update({
+            'plan': (1, row['updated_at']),
+            'part': (1, row['part__updated_at']),
+            'machine': (1, row['machine__updated_at']),
+        })
+        return Validator.from_state(
+            f'plan:{plan_id}', state, dashboard_cache.get_version(row['line_id'], row['date'])
+        )
     
     def get(self, request, plan_id):
         try:
@@ -1167,6 +1122,66 @@ class PlanSequenceUpdateAPIView(LineAccessMixin, View):
             return JsonResponse({'error': f'サーバーエラーが発生しました: {str(e)}'}, status=500)
 
 
+@method_decorator(csrf_exempt, name='dispatch')
+class ResultBulkIngestAPIView(View):
+    """
+    実績一括取り込みAPI
+
+    JSON配列（application/json）・NDJSON（application/x-ndjson）・CSV（text/csv）を受け付ける。
+    検査ステーション向けにBasic認証、ブラウザ向けにセッション認証（CSRF検証あり）を使用する。
+    """
+
+    def _authenticate(self, request):
+        """リクエストのユーザーを認証（失敗時は None）"""
+        import base64
+        import binascii
+        from django.contrib.auth import authenticate
+        from django.middleware.csrf import CsrfViewMiddleware
+
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if header.startswith('Basic '):
+            try:
+                username, password = base64.b64decode(header[6:]).decode('utf-8').split(':', 1)
+            except (ValueError, UnicodeDecodeError, binascii.Error):
+                return None
+            return authenticate(request, username=username, password=password)
+
+        if request.user.is_authenticated:
+            # セッション認証の場合はCSRFトークンを検証
+            rejected = CsrfViewMiddleware(lambda req: None).process_view(request, None, (), {})
+            if rejected is None:
+                return request.user
+        return None
+
+    def post(self, request):
+        from .exceptions import IngestionError
+        from .ingestion import parse_payload, ingest_results
+        import logging
+        logger = logging.getLogger(__name__)
+
+        user = self._authenticate(request)
+        if user is None:
+            response = JsonResponse({'error': '認証が必要です。'}, status=401)
+            response['WWW-Authenticate'] = 'Basic realm="production"'
+            return response
+
+        # 管理者以外はアクセス権限のあるラインのみ取り込み可能
+        allowed_lines = None
+        if not user.is_superuser:
+            allowed_lines = {access.line.name for access in get_accessible_lines(user)}
+
+        try:
+            records = parse_payload(request.body, request.content_type)
+            stats = ingest_results(records, allowed_lines)
+            return JsonResponse({'success': True, **stats}, status=201)
+
+        except IngestionError as e:
+            return JsonResponse({'error': e.message, **e.details}, status=e.status)
+        except Exception as e:
+            logger.error(f'ResultBulkIngestAPIView error: {str(e)}', exc_info=True)
+            return JsonResponse({'error': 'サーバーエラーが発生しました。'}, status=500)
+
+
 class FeedbackListView(LoginRequiredMixin, ListView):
     """フィードバック一覧"""
     model = Feedback
@@ -1231,6 +1246,7 @@ def get_new_feedback_count(request):
 from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.csrf import csrf_exempt
 from production.monitoring import health_checker, performance_monitor
+from production.broadcast import broadcast_coalescer
 
 
 @staff_member_required
@@ -1317,6 +1333,8 @@ def aggregation_metrics_api(request):
             },
             'line_stats': list(line_stats),
             'error_stats': error_stats,
+            'dashboard_cache': dashboard_cache.get_stats(),
+            'broadcast_coalescer': broadcast_coalescer.get_stats(),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -15,6 +15,15 @@ while ! nc -z $REDIS_HOST $REDIS_PORT; do
 done
 echo "Redis started"
 
+# 集計ワーカーはマイグレーション等を行わずに起動（docker-compose で web の起動完了を待つ）
+if [ "$1" = "aggregation-worker" ]; then
+    echo "Starting aggregation job worker..."
+    exec python manage.py run_workers --settings=config.settings_docker
+elif [ "$1" = "stream-aggregate" ]; then
+    echo "Starting stream aggregation..."
+    exec python manage.py stream_aggregate --settings=config.settings_docker
+fi
+
 # データベースマイグレーション
 echo "Running database migrations..."
 python manage.py migrate --settings=config.settings_docker